@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import List
 from dotenv import load_dotenv, find_dotenv, dotenv_values
 
@@ -54,6 +55,32 @@ class Config:
         self.port = int(os.getenv("PORT", "8000"))
         self.frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
         self.debug = self.env == "development"
+        self.compression_min_bytes = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        # Background jobs (0 workers: one per CPU)
+        self.jobs_dir = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "gea_sales_jobs"))
+        self.job_workers = int(os.getenv("JOB_WORKERS", "0")) or None
+        self.job_ttl_seconds = float(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+        self.job_max_cpu_seconds = float(os.getenv("JOB_MAX_CPU_SECONDS", "600"))
+        self.job_max_seconds = float(os.getenv("JOB_MAX_SECONDS", "1800"))
+        # Machine catalog shared between worker processes (CATALOG_SHARED_MEMORY=0 loads it per process)
+        self.catalog_shared_memory = os.getenv("CATALOG_SHARED_MEMORY", "1") != "0"
+        self.catalog_shm_dir = os.getenv("CATALOG_SHM_DIR") or None
+        # Reload machines.csv in the background when it changes (shared catalog only)
+        self.catalog_watch = os.getenv("CATALOG_WATCH", "1") != "0"
+        self.catalog_watch_interval = float(os.getenv("CATALOG_WATCH_INTERVAL", "2"))
+        # Magic Fill: "stub" forces the offline provider, otherwise OpenAI when OPENAI_API_KEY is set
+        self.magic_fill_provider = os.getenv("MAGIC_FILL_PROVIDER", "").lower()
+        self.magic_fill_cache_size = int(os.getenv("MAGIC_FILL_CACHE_SIZE", "1024"))
+        # Build the TCO surrogate grid for approximate answers (SURROGATE_GRID=0 disables it)
+        self.surrogate_grid = os.getenv("SURROGATE_GRID", "1") != "0"
+        # Worker processes of the bulk TCO pool (0: one per CPU)
+        self.portfolio_workers = int(os.getenv("PORTFOLIO_WORKERS", "0")) or None
+        # Durable storage of the backend, e.g. the scenario history
+        self.data_dir = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+        self.scenario_history = os.getenv("SCENARIO_HISTORY", "1") != "0"
+        self.scenario_history_dir = os.getenv("SCENARIO_HISTORY_DIR", os.path.join(self.data_dir, "scenarios"))
+        self.scenario_history_max_per_project = int(os.getenv("SCENARIO_HISTORY_MAX_PER_PROJECT", "200"))
+        self.scenario_history_max_age_days = float(os.getenv("SCENARIO_HISTORY_MAX_AGE_DAYS", "365"))
         
     @property
     def cors_origins(self) -> List[str]:
@@ -1,8 +1,31 @@
+from contextlib import asynccontextmanager
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from termcolor import colored
 from config import config
 from src.routes.calculation_routes import router as calculation_router
+from src.routes.catalog import router as catalog_router
+from src.routes.jobs import router as jobs_router
+from src.routes.live import router as live_router
+from src.routes.magic_fill import router as magic_fill_router
+from src.routes.scenarios import router as scenarios_router
+from src.routes.formats import CompressionMiddleware
+from src.calculation_engine.portfolio import configure_pool, shutdown_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Report where durable data goes and share one bulk TCO worker pool while the server is up."""
+    if config.scenario_history:
+        print(f"✅ Scenario history stored in {os.path.abspath(config.scenario_history_dir)}")
+    else:
+        print("✅ Scenario history disabled (SCENARIO_HISTORY=0)")
+    configure_pool(config.portfolio_workers)
+    try:
+        yield
+    finally:
+        shutdown_pool()
 
 
 def get_fast_api_instance():
@@ -13,7 +36,8 @@ def get_fast_api_instance():
             description="API for GEA machine TCO calculations",
             version="1.0.0",
             docs_url="/docs", 
-            redoc_url="/redoc"
+            redoc_url="/redoc",
+            lifespan=lifespan,
         )
     elif config.env == 'production':
         return FastAPI(
@@ -21,7 +45,8 @@ def get_fast_api_instance():
             description="API for GEA machine TCO calculations",
             version="1.0.0",
             docs_url=None, 
-            redoc_url=None
+            redoc_url=None,
+            lifespan=lifespan,
         )
     else:
         return FastAPI(
@@ -29,7 +54,8 @@ def get_fast_api_instance():
             description="API for GEA machine TCO calculations",
             version="1.0.0",
             docs_url="/docs", 
-            redoc_url="/redoc"
+            redoc_url="/redoc",
+            lifespan=lifespan,
         )
     
 app = get_fast_api_instance()
@@ -43,6 +69,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for responses above the threshold (streamed responses are left alone)
+app.add_middleware(CompressionMiddleware, minimum_size=config.compression_min_bytes)
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -60,6 +89,11 @@ async def health_check():
 
 # Include calculation routes
 app.include_router(calculation_router)
+app.include_router(catalog_router)
+app.include_router(jobs_router)
+app.include_router(live_router)
+app.include_router(magic_fill_router)
+app.include_router(scenarios_router)
 
 if __name__ == "__main__":
     print(colored(f"Starting GEA Sales Calculation Engine in {config.env} environment", "green"))
@@ -8,28 +8,123 @@ Main components:
 - MachineData: Represents a single machine with all its specifications
 - Project: Represents a project with customer and application details
 - TCO: Represents the calculated total cost of ownership
+- LazyTCO: TCO result that computes months on demand from the closed form
 - Engine: Entry point with CSV loading and calculation functions
+- Kernel: Vectorized batch evaluation of the TCO model (numpy)
+- Daily: Day-resolution schedule on a workday calendar, aggregated to months
+- Monte Carlo: Uncertainty analysis on top of the batch kernel
+- Fleet: Branch-and-bound search for fleets of parallel machines
+- Break-even: Input values at which two machines cost the same
+- Catalog: Machine catalog with a per-application Pareto front
+- Alternatives: KD-tree search for the machines closest to passing a project's rules
+- Diagnostics: All project rules as masks over the catalog, with minimal relaxations
+- Shared Catalog: Catalog columns and cost bases in shared memory for worker processes,
+  hot-reloaded when the CSV changes
+- Portfolio: TCO winners and totals across many projects
+- Jobs: Local process-backed job queue with progress, limits and TTL
+- Live: Per-connection incremental TCO recalculation for what-if sliders
+- Search: Incremental full-text and prefix index over projects
+- Changes: Field-level project change tracking by TCO stage
+- Extract: Rule-based extraction of project fields from pasted text
+- Magic: Magic Fill model providers, answer cache and bounded batch runner
+- History: On-disk scenario history with compressed columnar series
+- Impact: Catalog diffs and the projects a catalog change reaches
+- Surrogate: Precomputed grid for instant approximate TCO totals with an error bound
 """
 
 from .machine_data import MachineData
 from .project import Project
-from .tco import TCO
+from .tco import TCO, LazyTCO
 from .engine import (
     load_machines_from_csv,
     calculate_tco_for_machine,
     compare_machines,
+    rank_machines,
     save_machines_to_json,
     filter_machines_for_project
 )
+from .kernel import ClosedFormSeries, CostBasis, closed_form_series, cost_basis, simulate_batch
+from .daily import simulate_daily
+from .montecarlo import run_montecarlo
+from .fleet import optimize_fleet
+from .breakeven import BreakEven, solve_break_even
+from .alternatives import AlternativesIndex
+from .diagnostics import ConstraintColumns
+from .catalog import Catalog, build_catalog, load_catalog, machine_id, validate_machines
+from .shared_catalog import SharedCatalog, shared_catalog, shared_catalog_store
+from .watch import FileWatcher
+from .portfolio import PortfolioSettings, portfolio_tco
+from .jobs import Job, JobManager, report_progress
+from .live import LiveSession
+from .search import ProjectIndex, tokenize
+from .changes import ProjectChange, apply_patch, classify_changes
+from .extract import Extraction, parse_number, pre_extract
+from .magic import ExtractionCache, MagicProvider, MagicResult, OpenAIProvider, StubProvider, run_batch
+from .history import ScenarioInfo, ScenarioStore
+from .impact import CatalogDiff, CatalogImpact, ProjectMachineIndex, affected_projects, diff_catalogs
+from .surrogate import SurrogateGrid, build_grid, surrogate_grid
 
 __version__ = "1.0.0"
 __all__ = [
     "MachineData",
     "Project",
     "TCO", 
+    "LazyTCO",
     "load_machines_from_csv",
     "calculate_tco_for_machine",
     "compare_machines",
+    "rank_machines",
     "save_machines_to_json",
-    "filter_machines_for_project"
+    "filter_machines_for_project",
+    "ClosedFormSeries",
+    "CostBasis",
+    "closed_form_series",
+    "cost_basis",
+    "simulate_batch",
+    "simulate_daily",
+    "run_montecarlo",
+    "optimize_fleet",
+    "BreakEven",
+    "solve_break_even",
+    "AlternativesIndex",
+    "ConstraintColumns",
+    "Catalog",
+    "build_catalog",
+    "load_catalog",
+    "machine_id",
+    "validate_machines",
+    "SharedCatalog",
+    "shared_catalog",
+    "shared_catalog_store",
+    "FileWatcher",
+    "PortfolioSettings",
+    "portfolio_tco",
+    "Job",
+    "JobManager",
+    "report_progress",
+    "LiveSession",
+    "ProjectIndex",
+    "tokenize",
+    "ProjectChange",
+    "apply_patch",
+    "classify_changes",
+    "Extraction",
+    "parse_number",
+    "pre_extract",
+    "ExtractionCache",
+    "MagicProvider",
+    "MagicResult",
+    "OpenAIProvider",
+    "StubProvider",
+    "run_batch",
+    "ScenarioInfo",
+    "ScenarioStore",
+    "CatalogDiff",
+    "CatalogImpact",
+    "ProjectMachineIndex",
+    "affected_projects",
+    "diff_catalogs",
+    "SurrogateGrid",
+    "build_grid",
+    "surrogate_grid"
 ]
@@ -0,0 +1,11 @@
+"""Batch TCO command line: ``python -m src.calculation_engine --help``."""
+
+import sys
+
+try:
+    from .cli import main
+except ImportError:
+    from cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
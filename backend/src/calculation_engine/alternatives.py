@@ -0,0 +1,240 @@
+"""
+Closest alternatives for projects that no machine satisfies.
+
+The numeric project rules of ``machine_meets_project_constraints`` each
+bound one machine attribute from one side:
+
+- solids: ``feed_solids_min <= solids`` and ``feed_solids_max >= solids``
+- throughput: ``capacity_max >= throughput / hours per day``
+- space and weight: ``length/width/height/total weight <= limit``
+- protection class and motor efficiency: rank at least the required rank
+
+so the machines a project accepts are the points of an axis-aligned box in
+that attribute space. A machine's distance to the box, per attribute the
+amount by which it misses its bound divided by the attribute's spread in the
+catalog, says how far the project would have to move to accept it.
+
+Machines are indexed per application/sub-application in a KD-tree whose
+nodes keep bounding boxes; a query expands nodes in order of their distance
+to the project box and stops once no node can beat the k-th best machine.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+import heapq
+
+import numpy as np
+
+try:
+    from .machine_data import MachineData
+    from .rules import efficiency_floor, efficiency_rank, finite, matches_application
+except ImportError:
+    from machine_data import MachineData
+    from rules import efficiency_floor, efficiency_rank, finite, matches_application
+
+# Attribute, its unit, and which side of the bound a machine has to be on
+DIMENSIONS: Tuple[Tuple[str, str, str], ...] = (
+    ("feed_solids_min_vol_perc", "vol%", "max"),
+    ("feed_solids_max_vol_perc", "vol%", "min"),
+    ("capacity_max_inp", "l/h", "min"),
+    ("length_mm", "mm", "max"),
+    ("width_mm", "mm", "max"),
+    ("height_mm", "mm", "max"),
+    ("total_weight_kg", "kg", "max"),
+    ("protection_class", "rank", "min"),
+    ("motor_efficiency", "rank", "min"),
+)
+_LEAF_SIZE = 16
+
+
+@dataclass
+class Alternative:
+    """A machine the project does not accept, with how far it is from accepting it."""
+    index: int                          # position in the catalog
+    distance: float                     # normalized distance to the project's feasible box
+    gaps: Dict[str, Dict[str, object]]  # violated attribute -> limit, value, gap, normalized gap
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _KDTree:
+    """KD-tree over points for k-nearest queries against an axis-aligned box."""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = _LEAF_SIZE):
+        self.points = points
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        self._lo: List[np.ndarray] = []
+        self._hi: List[np.ndarray] = []
+        self.children: List[Optional[Tuple[int, int]]] = []
+        self.ranges: List[Tuple[int, int]] = []
+        self._build(0, len(points))
+        self.lo = np.array(self._lo)
+        self.hi = np.array(self._hi)
+
+    def _build(self, start: int, end: int) -> int:
+        idx = self.order[start:end]
+        pts = self.points[idx]
+        lo, hi = pts.min(axis=0), pts.max(axis=0)
+        node = len(self.children)
+        self._lo.append(lo)
+        self._hi.append(hi)
+        self.children.append(None)
+        self.ranges.append((start, end))
+        dim = int(np.argmax(hi - lo))
+        if end - start > self.leaf_size and hi[dim] > lo[dim]:
+            mid = (start + end) // 2
+            self.order[start:end] = idx[np.argpartition(pts[:, dim], mid - start)]
+            self.children[node] = (self._build(start, mid), self._build(mid, end))
+        return node
+
+    def query(self, box_lo: np.ndarray, box_hi: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """The k points closest to the box, as (distance, point index), closest first."""
+        # Lower bound of every node at once: distance from its bounding box to the query box
+        gaps = np.maximum(np.maximum(box_lo - self.hi, self.lo - box_hi), 0.0)
+        bounds = np.sqrt(np.einsum("ij,ij->i", gaps, gaps))
+
+        best: List[Tuple[float, int]] = []        # max-heap of (-distance, -index)
+        frontier = [(float(bounds[0]), 0)]
+        while frontier:
+            bound, node = heapq.heappop(frontier)
+            if len(best) == k and bound > -best[0][0]:
+                break
+            children = self.children[node]
+            if children is not None:
+                for child in children:
+                    heapq.heappush(frontier, (float(bounds[child]), child))
+                continue
+            start, end = self.ranges[node]
+            idx = self.order[start:end]
+            pts = self.points[idx]
+            g = np.maximum(np.maximum(box_lo - pts, pts - box_hi), 0.0)
+            for distance, i in zip(np.sqrt(np.einsum("ij,ij->i", g, g)).tolist(), idx.tolist()):
+                entry = (-distance, -i)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        return sorted((-d, -i) for d, i in best)
+
+
+class AlternativesIndex:
+    """
+    Per-application KD-trees over the catalog's constrained attributes.
+
+    Args:
+        machines: Catalog rows (machines with an unknown solids range are left out,
+            since no project can accept them)
+    """
+
+    def __init__(self, machines: Sequence[MachineData]):
+        self._protection = sorted({m.protection_class.lower() for m in machines if m.protection_class})
+        rows, keep = [], []
+        for i, m in enumerate(machines):
+            row = self._features(m)
+            if row is not None:
+                rows.append(row)
+                keep.append(i)
+        features = np.array(rows, dtype=float).reshape(len(rows), len(DIMENSIONS))
+        spread = features.max(axis=0) - features.min(axis=0) if len(rows) else np.ones(len(DIMENSIONS))
+        self.scale = np.where(spread > 0, spread, 1.0)
+        self.features = features
+        self._feature_row = {i: row for row, i in enumerate(keep)}
+
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for row, i in enumerate(keep):
+            m = machines[i]
+            groups.setdefault((m.application, m.sub_application), []).append(row)
+        # (representative machine, catalog index of each tree point, tree)
+        self._groups: List[Tuple[MachineData, np.ndarray, _KDTree]] = []
+        for members in groups.values():
+            members = np.array(members)
+            tree = _KDTree(features[members] / self.scale)
+            self._groups.append((machines[keep[members[0]]], np.array(keep)[members], tree))
+
+    def _features(self, m: MachineData) -> Optional[List[float]]:
+        solids_min, solids_max = finite(m.feed_solids_min_vol_perc), finite(m.feed_solids_max_vol_perc)
+        if solids_min is None or solids_max is None:
+            return None
+        # Missing protection classes and unparseable efficiencies pass any rule: rank them on top;
+        # a missing efficiency fails any requirement: rank it below IE1
+        protection = (
+            self._protection.index(m.protection_class.lower()) if m.protection_class else len(self._protection)
+        )
+        return [
+            solids_min,
+            solids_max,
+            finite(m.capacity_max_inp, 0.0),
+            finite(m.length_mm, 0.0),
+            finite(m.width_mm, 0.0),
+            finite(m.height_mm, 0.0),
+            finite(m.total_weight_kg, 0.0),
+            float(protection),
+            float(efficiency_rank(m.motor_efficiency)),
+        ]
+
+    def _box(self, project, operation_hours_per_day: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Bounds the project puts on each attribute (raw units, +-inf where unconstrained)."""
+        lo = np.full(len(DIMENSIONS), -np.inf)
+        hi = np.full(len(DIMENSIONS), np.inf)
+        solids = finite(project.solids_percentage)
+        if solids is not None:
+            hi[0] = solids
+            lo[1] = solids
+        throughput = finite(project.customer_throughput_per_day) or 0.0
+        if throughput > 0:
+            hours = finite(operation_hours_per_day) if operation_hours_per_day is not None else None
+            lo[2] = throughput / (hours or 20.0)
+        for d, limit in zip((3, 4, 5, 6), (project.length_mm, project.width_mm, project.height_mm, project.weight_kg)):
+            limit = finite(limit)
+            if limit is not None and limit > 0:
+                hi[d] = limit
+        if project.protection_class:
+            # Machines whose class sorts at or above the required one
+            required = project.protection_class.lower()
+            lo[7] = next((r for r, c in enumerate(self._protection) if c >= required), len(self._protection))
+        # Any requirement, even one that does not parse, rules out machines without a rating
+        floor = efficiency_floor(project.motor_efficiency)
+        if floor is not None:
+            lo[8] = floor
+        return lo, hi
+
+    def closest(self, project, k: int = 5, *, operation_hours_per_day: Optional[float] = None) -> List[Alternative]:
+        """
+        The k machines of the project's application that come closest to passing its rules.
+
+        Args:
+            project: Project whose rules to relax
+            k: Number of machines
+            operation_hours_per_day: Hours/day cap for the throughput rule (default 20)
+
+        Returns:
+            Alternatives, closest first (machines the project already accepts have distance 0)
+        """
+        lo, hi = self._box(project, operation_hours_per_day)
+        box_lo, box_hi = lo / self.scale, hi / self.scale
+        found: List[Tuple[float, int]] = []
+        for representative, indices, tree in self._groups:
+            if not matches_application(representative, project):
+                continue
+            found.extend((distance, int(indices[i])) for distance, i in tree.query(box_lo, box_hi, k))
+        found.sort()
+
+        alternatives = []
+        for distance, index in found[:k]:
+            row = self.features[self._feature_row[index]]
+            gaps = {}
+            for d, (name, unit, side) in enumerate(DIMENSIONS):
+                limit = lo[d] if side == "min" else hi[d]
+                gap = (lo[d] - row[d]) if side == "min" else (row[d] - hi[d])
+                if gap > 0:
+                    gaps[name] = {
+                        "limit": float(limit),
+                        "value": float(row[d]),
+                        "gap": float(gap),
+                        "unit": unit,
+                        "normalized_gap": float(gap / self.scale[d]),
+                    }
+            alternatives.append(Alternative(index=index, distance=round(distance, 6), gaps=gaps))
+        return alternatives
@@ -0,0 +1,297 @@
+"""
+Break-even values of one TCO input between two machines.
+
+Answers questions like "above which electricity price does the IE3 machine
+win?" by solving TCO(a) - TCO(b) = 0 for one parameter, all other inputs
+fixed:
+
+- electricity and water price: the monthly model is linear in a flat price
+  (also with escalation and discounting, which only scale each month), so
+  two kernel evaluations give the difference as ``d0 + slope * price`` and
+  the break-even price in closed form
+- throughput per day and operation hours per day: the difference is piecewise
+  linear with jumps (cleaning cycles, services, the hours/day cap), so it is
+  sampled on a grid in one batch run per machine, and every sign change is
+  narrowed down by vectorized k-section (all brackets refined together)
+- years: one run over the longest horizon yields the cumulative cost of both
+  machines after every month, so crossings are exact to the month
+
+The result lists every break-even value in the search range and, between
+them, which machine is cheaper.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import math
+
+import numpy as np
+
+try:
+    from .kernel import CostBasis, cost_basis, hours_per_year_from_throughput, simulate_batch
+    from .machine_data import MachineData
+    from .pricing import price_curve
+except ImportError:
+    from kernel import CostBasis, cost_basis, hours_per_year_from_throughput, simulate_batch
+    from machine_data import MachineData
+    from pricing import price_curve
+
+PARAMETERS = (
+    "electricity_eur_per_kwh",
+    "water_eur_per_l",
+    "throughput_per_day",
+    "operation_hours_per_day",
+    "years",
+)
+_LINEAR = ("electricity_eur_per_kwh", "water_eur_per_l")
+_ESCALATION = {"electricity_eur_per_kwh": "electricity_escalation_pct", "water_eur_per_l": "water_escalation_pct"}
+# Interior points per bracket and refinement rounds of the k-section (32 ** 8 ~ 1e12)
+_REFINE_POINTS = 31
+_MAX_REFINEMENTS = 8
+_TOLERANCE = 1e-9
+
+
+@dataclass
+class BreakEven:
+    """Where the cheaper of two machines changes along one parameter."""
+    parameter: str
+    method: str                         # "linear", "bracketed" or "monthly"
+    low: float
+    high: float
+    break_even: List[float]             # ascending
+    segments: List[Dict[str, object]]   # {"low", "high", "cheaper": "a" | "b" | "tie"}
+    evaluations: int                    # parameter values the kernel was run for (per machine)
+
+    def cheaper_at(self, value: float) -> Optional[str]:
+        """"a", "b" or "tie" at ``value``; None outside the searched range."""
+        for segment in self.segments:
+            if segment["low"] <= value <= segment["high"]:
+                return segment["cheaper"]
+        return None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _cheaper(difference: float) -> str:
+    return "b" if difference > 0 else "a" if difference < 0 else "tie"
+
+
+class _Problem:
+    """TCO(a) - TCO(b) as a vectorized function of the solved parameter."""
+
+    def __init__(self, machines, bases, parameter: str, inputs: dict):
+        self.machines = machines
+        self.bases = bases
+        self.parameter = parameter
+        self.inputs = inputs
+        self.months = int(inputs["years"]) * 12
+        self.evaluations = 0
+
+    def _price(self, name: str, values: np.ndarray, months: int) -> np.ndarray:
+        """Monthly prices as (n, months) when solved for, else one (1, months) row."""
+        escalation = self.inputs[_ESCALATION[name]]
+        if self.parameter == name:
+            return np.multiply.outer(values, price_curve(1.0, months, escalation_pct=escalation))
+        return price_curve(self.inputs[name], months, escalation_pct=escalation)[None, :]
+
+    def _hours(self, machine: MachineData, values: np.ndarray):
+        """Scheduled hours per year, resolved as in ``calculate_toc``."""
+        throughput = values if self.parameter == "throughput_per_day" else self.inputs["throughput_per_day"]
+        hours_per_day = values if self.parameter == "operation_hours_per_day" else self.inputs["operation_hours_per_day"]
+        workdays = self.inputs["workdays_per_week"]
+        if self.inputs["operation_hours_per_year"] is not None:
+            return float(self.inputs["operation_hours_per_year"])
+        if throughput is not None:
+            capacity = 0.0 if math.isnan(machine.capacity_max_inp) else machine.capacity_max_inp
+            return hours_per_year_from_throughput(
+                capacity, throughput, workdays_per_week=workdays, operation_hours_per_day=hours_per_day
+            )
+        if hours_per_day is not None:
+            return np.asarray(hours_per_day, dtype=float) * workdays * 52
+        raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
+
+    def _runs(self, values: np.ndarray, months: int):
+        n = values.size
+        electricity = self._price("electricity_eur_per_kwh", values, months)
+        water = self._price("water_eur_per_l", values, months)
+        self.evaluations += n
+        for machine, basis in zip(self.machines, self.bases):
+            hours = np.broadcast_to(self._hours(machine, values), (n,))
+            yield simulate_batch(
+                basis,
+                hours,
+                months=months,
+                electricity_eur_per_kwh=electricity,
+                water_eur_per_l=water,
+                discount_rate=self.inputs["discount_rate"],
+            )
+
+    def difference(self, values) -> np.ndarray:
+        """TCO(a) - TCO(b) at the end of the horizon, one entry per parameter value."""
+        values = np.asarray(values, dtype=float)
+        a, b = (run.total for run in self._runs(values.ravel(), self.months))
+        return (a - b).reshape(values.shape)
+
+    def monthly_difference(self, months: int) -> np.ndarray:
+        """TCO(a) - TCO(b) after each month 0..months (other inputs at their values)."""
+        a, b = (run.cum_total[0] for run in self._runs(np.zeros(1), months))
+        return a - b
+
+
+def _sign_changes(values: np.ndarray, signs: np.ndarray) -> Tuple[List[float], List[int]]:
+    """Exact roots (grid points where the difference becomes 0) and brackets [i, i + 1] with a sign change."""
+    roots, brackets = [], []
+    for i in np.flatnonzero(signs[:-1] != signs[1:]).tolist():
+        if signs[i + 1] == 0:
+            roots.append(float(values[i + 1]))
+        elif signs[i] != 0:
+            brackets.append(i)
+    return roots, brackets
+
+
+def _refine(problem: _Problem, lo: np.ndarray, hi: np.ndarray, sign_lo: np.ndarray, tolerance: float) -> List[float]:
+    """Narrow all brackets at once: each round evaluates ``_REFINE_POINTS`` interior points per bracket."""
+    rows = np.arange(lo.size)
+    t = np.linspace(0.0, 1.0, _REFINE_POINTS + 2)[1:-1]
+    for _ in range(_MAX_REFINEMENTS):
+        if lo.size == 0 or np.max(hi - lo) <= tolerance:
+            break
+        points = lo[:, None] + (hi - lo)[:, None] * t
+        signs = np.sign(problem.difference(points))
+        differs = signs != sign_lo[:, None]
+        found = differs.any(axis=1)
+        j = differs.argmax(axis=1)
+        at = points[rows, j]
+        before = np.where(j > 0, points[rows, np.maximum(j - 1, 0)], lo)
+        exact = found & (signs[rows, j] == 0)
+        lo = np.where(found, np.where(exact, at, before), points[:, -1])
+        hi = np.where(found, at, hi)
+    return ((lo + hi) / 2.0).tolist()
+
+
+def _default_range(parameter: str, machines, inputs: dict) -> Tuple[float, float]:
+    if parameter == "electricity_eur_per_kwh":
+        return 0.0, 5.0
+    if parameter == "water_eur_per_l":
+        return 0.0, 0.1
+    if parameter == "operation_hours_per_day":
+        return 0.0, 24.0
+    if parameter == "years":
+        return 0.0, 30.0
+    # Above the larger machine's capacity at the hours/day cap both machines run flat out
+    capacities = [0.0 if math.isnan(m.capacity_max_inp) else m.capacity_max_inp for m in machines]
+    return 0.0, max(capacities) * float(inputs["operation_hours_per_day"] or 24.0)
+
+
+def solve_break_even(
+    machine_a: MachineData,
+    machine_b: MachineData,
+    parameter: str,
+    *,
+    low: Optional[float] = None,
+    high: Optional[float] = None,
+    samples: int = 128,
+    bases: Optional[Tuple[CostBasis, CostBasis]] = None,
+    years: int = 5,
+    electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.25,
+    water_eur_per_l: Union[float, Sequence[float]] = 0.002,
+    operation_hours_per_year: Optional[float] = None,
+    throughput_per_day: Optional[float] = None,
+    workdays_per_week: int = 5,
+    operation_hours_per_day: Optional[float] = None,
+    electricity_escalation_pct: float = 0.0,
+    water_escalation_pct: float = 0.0,
+    discount_rate: float = 0.0,
+) -> BreakEven:
+    """
+    Values of ``parameter`` at which machines a and b have the same TCO.
+
+    Args:
+        machine_a: First machine
+        machine_b: Second machine
+        parameter: One of ``PARAMETERS``; the solved price replaces a flat price or curve
+            (escalation still applies on top)
+        low: Lower end of the search range (default depends on the parameter)
+        high: Upper end of the search range
+        samples: Grid points for throughput and hours/day (break-evens closer together
+            than one grid step can be missed)
+        bases: Cost bases of the two machines (default: ``cost_basis`` of each)
+        (remaining arguments as in ``calculate_tco_for_machine``; ``years`` is the horizon
+        unless it is the solved parameter)
+
+    Returns:
+        BreakEven with the break-even values and the cheaper machine in between
+
+    Raises:
+        ValueError: For an unknown parameter, an empty range, a parameter with no effect
+            on the TCO, or invalid operation hours / price inputs
+    """
+    if parameter not in PARAMETERS:
+        raise ValueError(f"Unknown parameter '{parameter}'; expected one of {', '.join(PARAMETERS)}")
+    if parameter in ("throughput_per_day", "operation_hours_per_day") and operation_hours_per_year is not None:
+        raise ValueError(f"{parameter} has no effect when operation_hours_per_year is set")
+    inputs = dict(
+        years=years,
+        electricity_eur_per_kwh=electricity_eur_per_kwh,
+        water_eur_per_l=water_eur_per_l,
+        operation_hours_per_year=operation_hours_per_year,
+        throughput_per_day=throughput_per_day,
+        workdays_per_week=workdays_per_week,
+        operation_hours_per_day=operation_hours_per_day,
+        electricity_escalation_pct=electricity_escalation_pct,
+        water_escalation_pct=water_escalation_pct,
+        discount_rate=discount_rate,
+    )
+    machines = (machine_a, machine_b)
+    default_low, default_high = _default_range(parameter, machines, inputs)
+    low = default_low if low is None else float(low)
+    high = default_high if high is None else float(high)
+    if not low < high:
+        raise ValueError(f"Empty search range [{low}, {high}] for {parameter}")
+    problem = _Problem(machines, bases or (cost_basis(machine_a), cost_basis(machine_b)), parameter, inputs)
+
+    if parameter == "years":
+        # Month m is the first month of the new sign, so segments are read at their first month
+        first, last = max(math.ceil(low * 12), 1), math.floor(high * 12)
+        if first > last:
+            raise ValueError(f"Search range [{low}, {high}] years contains no month")
+        diffs = problem.monthly_difference(last)[first:]
+        months = np.arange(first, last + 1) / 12.0
+        roots, brackets = _sign_changes(months, np.sign(diffs))
+        roots = sorted(roots + [float(months[i + 1]) for i in brackets])
+        bounds = [low] + roots + [high]
+        signs = [diffs[min(max(math.ceil(x * 12), first), last) - first] for x in bounds[:-1]]
+        method = "monthly"
+    else:
+        if parameter in _LINEAR:
+            d0, d1 = problem.difference([0.0, 1.0]).tolist()
+            slope = d1 - d0
+            root = -d0 / slope if slope else math.nan
+            roots = [root] if low <= root <= high else []
+            method = "linear"
+        else:
+            values = np.linspace(low, high, max(int(samples), 2))
+            signs = np.sign(problem.difference(values))
+            roots, brackets = _sign_changes(values, signs)
+            idx = np.array(brackets, dtype=int)
+            roots = sorted(roots + _refine(
+                problem, values[idx], values[idx + 1], signs[idx], _TOLERANCE * (high - low)
+            ))
+            method = "bracketed"
+        bounds = [low] + roots + [high]
+        mids = [(x + y) / 2.0 for x, y in zip(bounds[:-1], bounds[1:])]
+        signs = problem.difference(mids).tolist()
+
+    segments = [
+        {"low": float(x), "high": float(y), "cheaper": _cheaper(d)}
+        for x, y, d in zip(bounds[:-1], bounds[1:], signs)
+    ]
+    return BreakEven(
+        parameter=parameter,
+        method=method,
+        low=low,
+        high=high,
+        break_even=[float(r) for r in roots],
+        segments=segments,
+        evaluations=problem.evaluations,
+    )
@@ -0,0 +1,302 @@
+"""
+Machine catalog with a precomputed Pareto front.
+
+Many catalog rows are strictly dominated: another machine of the same
+application/sub-application costs no more to buy, run and service, and is at
+least as capable. Such a machine can never be the cheapest choice for any
+project, so TCO endpoints may skip it.
+
+Dominance is checked component-wise on the inputs of the TCO model, which
+makes it hold for any electricity/water price, horizon and operating mode:
+
+- acquisition: list price and total weight (construction cost per kg)
+- operating rate: effective power draw, operating water flow and bowl
+  volume (cleaning agent per cycle)
+- maintenance rate: service cost per service (DMR size and drive type)
+- capability: capacity, solids range, protection class, motor efficiency and
+  length/width/height must be at least as good, so the dominating machine
+  passes every project filter the dominated one passes.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+
+try:
+    from .alternatives import AlternativesIndex
+    from .diagnostics import RULES, ConstraintColumns
+    from .engine import load_machines_from_csv
+    from .kernel import BASIS_COLUMNS, CostBasis, cost_basis, stack_bases
+    from .machine_data import MachineData
+    from .rules import efficiency_rank, finite
+except ImportError:
+    from alternatives import AlternativesIndex
+    from diagnostics import RULES, ConstraintColumns
+    from engine import load_machines_from_csv
+    from kernel import BASIS_COLUMNS, CostBasis, cost_basis, stack_bases
+    from machine_data import MachineData
+    from rules import efficiency_rank, finite
+
+
+def machine_id(machine: MachineData) -> str:
+    """Stable catalog key of a machine configuration: type designation, level and drive."""
+    return f"{machine.langtyp}|{machine.level}|{machine.drive_type}"
+
+
+def _protection_rank(protection_class: str) -> Tuple[int, str]:
+    """Order as used by ``protection_class_meets_requirement`` (a missing class passes any requirement)."""
+    return (1, "") if not protection_class else (0, protection_class.lower())
+
+
+@dataclass
+class _Profile:
+    """Cost components (smaller is better) and capabilities of one machine."""
+    costs: Tuple[float, ...]
+    capacity: float
+    solids: Tuple[float, float]
+    protection: Tuple[int, str]
+    efficiency: int
+    dimensions: Tuple[float, float, float]
+
+    @classmethod
+    def of(cls, machine: MachineData, basis: CostBasis) -> "_Profile":
+        return cls(
+            costs=(
+                finite(machine.list_price, 0.0),
+                finite(machine.total_weight_kg, 0.0),
+                basis.power_kw,
+                basis.water_l_s,
+                finite(machine.bowl_volume_lit, 0.0),
+                finite(basis.service_cost, 0.0),
+            ),
+            capacity=finite(machine.capacity_max_inp, 0.0),
+            solids=(finite(machine.feed_solids_min_vol_perc, 0.0), finite(machine.feed_solids_max_vol_perc, 0.0)),
+            protection=_protection_rank(machine.protection_class),
+            efficiency=efficiency_rank(machine.motor_efficiency),
+            dimensions=(finite(machine.length_mm, 0.0), finite(machine.width_mm, 0.0), finite(machine.height_mm, 0.0)),
+        )
+
+    def dominates(self, other: "_Profile") -> bool:
+        """At least as good on everything and strictly better on something."""
+        if any(a > b for a, b in zip(self.costs, other.costs)):
+            return False
+        if any(a > b for a, b in zip(self.dimensions, other.dimensions)):
+            return False
+        if (
+            self.capacity < other.capacity
+            or self.solids[0] > other.solids[0]
+            or self.solids[1] < other.solids[1]
+            or self.protection < other.protection
+            or self.efficiency < other.efficiency
+        ):
+            return False
+        return (
+            any(a < b for a, b in zip(self.costs, other.costs))
+            or any(a < b for a, b in zip(self.dimensions, other.dimensions))
+            or self.capacity > other.capacity
+            or self.solids != other.solids
+            or self.protection > other.protection
+            or self.efficiency > other.efficiency
+        )
+
+
+@dataclass
+class Catalog:
+    """Machines plus, per machine, the non-dominated machine that dominates it (if any)."""
+    machines: List[MachineData]
+    dominated_by: Dict[str, Optional[str]]      # machine_id -> machine_id on the Pareto front, or None
+    version: int = 0                            # set by shared catalogs, increases on every reload
+    bases: Optional[CostBasis] = None           # default cost bases, columnar in machine order
+    _rows: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _alternatives: Optional[AlternativesIndex] = field(default=None, init=False, repr=False, compare=False)
+    _constraints: Optional[ConstraintColumns] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._rows = {machine_id(m): i for i, m in enumerate(self.machines)}
+        self._alternatives = AlternativesIndex(self.machines)
+        self._constraints = ConstraintColumns(self.machines)
+
+    def diagnose(
+        self,
+        project,
+        *,
+        operation_hours_per_day: Optional[float] = None,
+        max_failed_rules: int = 2,
+        max_near_misses: int = 20,
+    ) -> Dict:
+        """
+        Which rules reject which machines for a project (see ``diagnostics``).
+
+        Returns:
+            Dict with the rule names, machine_ids, the rule x machine ``rejections`` matrix,
+            per-rule counts, the passing machine_ids and the near misses with their relaxations
+        """
+        diagnosis = self._constraints.diagnose(
+            project,
+            operation_hours_per_day=operation_hours_per_day,
+            max_failed_rules=max_failed_rules,
+            max_near_misses=max_near_misses,
+        )
+        ids = [machine_id(m) for m in self.machines]
+        return {
+            "rules": list(RULES),
+            "machine_ids": ids,
+            "rejections": diagnosis.rejections.tolist(),
+            "rejected_by": diagnosis.rejected_by,
+            "rejected_only_by": diagnosis.rejected_only_by,
+            "passing": [ids[i] for i in diagnosis.passing.nonzero()[0].tolist()],
+            "near_misses": [
+                {
+                    "machine_id": ids[n.index],
+                    "label": self.machines[n.index].default_label(),
+                    "failed_rules": n.failed_rules,
+                    "relaxation": n.relaxation,
+                }
+                for n in diagnosis.near_misses
+            ],
+        }
+
+    def closest_alternatives(self, project, k: int = 5, *, operation_hours_per_day: Optional[float] = None) -> List[Dict]:
+        """
+        The k machines of the project's application closest to passing its rules (see ``alternatives``).
+
+        Returns:
+            Dicts with machine_id, label, distance, the violated rules (``gaps``) and the machine
+        """
+        return [
+            {
+                "machine_id": machine_id(self.machines[a.index]),
+                "label": self.machines[a.index].default_label(),
+                "distance": a.distance,
+                "gaps": a.gaps,
+                "machine": self.machines[a.index].to_dict(),
+            }
+            for a in self._alternatives.closest(project, k, operation_hours_per_day=operation_hours_per_day)
+        ]
+
+    def machine(self, key: str) -> Optional[MachineData]:
+        """Catalog machine with the given ``machine_id``, or None."""
+        row = self._rows.get(key)
+        return None if row is None else self.machines[row]
+
+    def basis(self, machine: MachineData) -> CostBasis:
+        """Default cost basis of a machine, precomputed for catalog machines."""
+        row = self._rows.get(machine_id(machine))
+        if self.bases is None or row is None:
+            return cost_basis(machine)
+        return CostBasis(
+            label=machine.default_label(),
+            **{name: float(getattr(self.bases, name)[row]) for name in BASIS_COLUMNS},
+        )
+
+    def is_dominated(self, machine: MachineData) -> bool:
+        return self.dominated_by.get(machine_id(machine)) is not None
+
+    def non_dominated(self, machines: Sequence[MachineData]) -> List[MachineData]:
+        """Keep only machines on the Pareto front of their application/sub-application."""
+        return [m for m in machines if not self.is_dominated(m)]
+
+    def dominated(self, machines: Sequence[MachineData]) -> List[Dict[str, str]]:
+        """Machines excluded by the Pareto front, each with the machine that dominates it."""
+        return [
+            {"machine_id": machine_id(m), "label": m.default_label(), "dominated_by": self.dominated_by[machine_id(m)]}
+            for m in machines
+            if self.is_dominated(m)
+        ]
+
+    @property
+    def front_size(self) -> int:
+        return sum(1 for d in self.dominated_by.values() if d is None)
+
+
+def validate_machines(machines: Sequence[MachineData]) -> None:
+    """
+    Check catalog rows before they replace a running catalog.
+
+    Raises:
+        ValueError: If the catalog is empty or a row is unusable (listing the first problems found)
+    """
+    if not machines:
+        raise ValueError("Machine catalog is empty")
+    problems = []
+    seen = set()
+    for row, m in enumerate(machines, start=2):     # row 1 is the CSV header
+        key = machine_id(m)
+        if not m.application or not m.sub_application or not m.langtyp:
+            problems.append(f"row {row}: application, sub application and type designation are required")
+        if key in seen:
+            problems.append(f"row {row}: duplicate machine '{key}'")
+        seen.add(key)
+        if not finite(m.list_price, 0.0) > 0:
+            problems.append(f"row {row}: list price must be a positive number")
+        if not finite(m.capacity_max_inp, 0.0) > 0:
+            problems.append(f"row {row}: maximum capacity must be a positive number")
+        elif finite(m.capacity_min_inp, 0.0) > finite(m.capacity_max_inp, 0.0):
+            problems.append(f"row {row}: minimum capacity exceeds maximum capacity")
+        if finite(m.feed_solids_min_vol_perc, 0.0) > finite(m.feed_solids_max_vol_perc, 0.0):
+            problems.append(f"row {row}: minimum feed solids exceed maximum feed solids")
+    if problems:
+        more = f" (and {len(problems) - 5} more)" if len(problems) > 5 else ""
+        raise ValueError("Invalid machine catalog: " + "; ".join(problems[:5]) + more)
+
+
+def build_catalog(machines: List[MachineData]) -> Catalog:
+    """
+    Compute the Pareto front per application/sub-application.
+
+    The "dominated by" pointer always names a machine on the front (dominance
+    is transitive, so one exists); among several, the one with the lowest
+    list price is chosen.
+
+    Args:
+        machines: Catalog rows
+
+    Returns:
+        Catalog with dominance pointers for every machine
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, m in enumerate(machines):
+        groups.setdefault((m.application.lower(), m.sub_application.lower()), []).append(i)
+
+    bases = [cost_basis(m) for m in machines]
+    profiles = [_Profile.of(m, b) for m, b in zip(machines, bases)]
+    dominated_by: Dict[str, Optional[str]] = {}
+    for members in groups.values():
+        front = [
+            i for i in members
+            if not any(profiles[j].dominates(profiles[i]) for j in members if j != i)
+        ]
+        by_price = sorted(front, key=lambda i: profiles[i].costs[0])
+        for i in members:
+            pointer = None
+            if i not in front:
+                pointer = next(machine_id(machines[j]) for j in by_price if profiles[j].dominates(profiles[i]))
+            dominated_by[machine_id(machines[i])] = pointer
+
+    return Catalog(machines=machines, dominated_by=dominated_by, bases=stack_bases(bases))
+
+
+_cache: Dict[str, Tuple[float, Catalog]] = {}
+
+
+def load_catalog(path: str) -> Catalog:
+    """
+    Load a machine CSV and build its Pareto front, cached until the file changes.
+
+    Every rebuild of a path gets the next version number.
+
+    Raises:
+        FileNotFoundError: If the CSV file doesn't exist
+    """
+    key = os.path.abspath(path)
+    try:
+        mtime = os.path.getmtime(key)
+    except OSError:
+        raise FileNotFoundError(f"CSV not found: {path}")
+    cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        catalog = build_catalog(load_machines_from_csv(key))
+        catalog.version = cached[1].version + 1 if cached is not None else 1
+        cached = (mtime, catalog)
+        _cache[key] = cached
+    return cached[1]
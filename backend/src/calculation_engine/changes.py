@@ -0,0 +1,108 @@
+"""
+Field-level change tracking for projects.
+
+A TCO response is computed in two stages, and each project field feeds one
+of them:
+
+- filter: which machines are relevant (application, solids, throughput,
+  protection class, motor efficiency, space and weight limits)
+- pricing: the TCO of the relevant machines (years, prices, workdays)
+
+Contact fields feed neither. Classifying an edit by the furthest-upstream
+stage it touches tells caches how much to throw away: a filter change
+invalidates everything downstream of the filter, a pricing change keeps the
+relevant machines and only reprices them, and a contact change invalidates
+nothing.
+"""
+
+from dataclasses import dataclass, asdict, fields, replace
+from typing import Any, Dict, Tuple
+
+try:
+    from .project import Project
+    from .rules import same
+except ImportError:
+    from project import Project
+    from rules import same
+
+# Stages in pipeline order: a change invalidates its stage and every later one
+STAGES = ("none", "pricing", "filter")
+
+FIELD_STAGES = {
+    "project_name": "none",
+    "company_name": "none",
+    "telefon_nummer": "none",
+    "email": "none",
+    "contact_person": "none",
+    "years": "pricing",
+    "energy_price_eur_per_kwh": "pricing",
+    "water_price_eur_per_l": "pricing",
+    "workdays_per_week": "pricing",
+    "application": "filter",
+    "sub_application": "filter",
+    "solids_percentage": "filter",
+    "customer_throughput_per_day": "filter",
+    "protection_class": "filter",
+    "motor_efficiency": "filter",
+    "length_mm": "filter",
+    "width_mm": "filter",
+    "height_mm": "filter",
+    "weight_kg": "filter",
+}
+
+
+@dataclass
+class ProjectChange:
+    """What an edit changed and the furthest-upstream stage it invalidates."""
+    changed: Dict[str, Tuple[Any, Any]]     # field -> (old value, new value)
+    stage: str                              # one of STAGES
+
+    @property
+    def invalidates_filter(self) -> bool:
+        return self.stage == "filter"
+
+    @property
+    def invalidates_pricing(self) -> bool:
+        return self.stage in ("pricing", "filter")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def classify_changes(old: Project, new: Project) -> ProjectChange:
+    """
+    Compare two versions of a project field by field.
+
+    Args:
+        old: Stored project
+        new: Edited project
+
+    Returns:
+        ProjectChange with the changed fields and the stage to invalidate from
+    """
+    changed = {
+        f.name: (getattr(old, f.name), getattr(new, f.name))
+        for f in fields(Project)
+        if not same(getattr(old, f.name), getattr(new, f.name))
+    }
+    stage = max((FIELD_STAGES.get(name, "filter") for name in changed), key=STAGES.index, default="none")
+    return ProjectChange(changed=changed, stage=stage)
+
+
+def apply_patch(project: Project, updates: Dict[str, Any]) -> Project:
+    """
+    New project with ``updates`` applied (the stored project is left untouched).
+
+    Raises:
+        ValueError: For unknown fields, renames, or null values of required fields
+    """
+    known = {f.name for f in fields(Project)}
+    unknown = sorted(set(updates) - known)
+    if unknown:
+        raise ValueError(f"Unknown project fields: {', '.join(unknown)}")
+    if "project_name" in updates and updates["project_name"] != project.project_name:
+        raise ValueError("project_name cannot be changed by a patch")
+    nulls = sorted(name for name, value in updates.items() if value is None and name != "motor_efficiency")
+    if nulls:
+        raise ValueError(f"Fields cannot be null: {', '.join(nulls)}")
+    return replace(project, **updates)
@@ -0,0 +1,489 @@
+"""
+Offline batch TCO runs, e.g. nightly re-pricing of every open quote.
+
+Reads projects (and optionally scenarios) from CSV or JSONL, evaluates every
+project × scenario with ``filter_machines_for_project`` and the TCO engine
+across a process pool, and writes one row per relevant machine to CSV, JSONL
+or Parquet as chunks complete.
+
+Work is distributed in chunks of input rows. After a chunk's rows are durably
+written, a checkpoint line records it (and, for CSV/JSONL, the output size),
+so an interrupted run restarts with ``--resume``: completed chunks are skipped
+and any partially written output is truncated back to the last checkpoint.
+
+Usage (from the backend directory):
+    python -m src.calculation_engine --projects quotes.csv --scenarios tariffs.jsonl \\
+        --output results.csv --workers 8 --resume
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import MISSING, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import pathlib
+import sys
+
+try:
+    from .engine import filter_machines_for_project, load_machines_from_csv, rank_machines
+    from .project import Project
+except ImportError:
+    from engine import filter_machines_for_project, load_machines_from_csv, rank_machines
+    from project import Project
+
+OUTPUT_COLUMNS = [
+    "project_name", "scenario_id", "rank", "langtyp", "label",
+    "total", "ca", "cc", "co", "cm", "hours_per_year", "error",
+]
+
+# Scenario columns and how they map onto rank_machines arguments
+_SCENARIO_FLOATS = (
+    "electricity_eur_per_kwh", "water_eur_per_l", "operation_hours_per_year", "throughput_per_day",
+    "operation_hours_per_day", "electricity_escalation_pct", "water_escalation_pct", "discount_rate",
+)
+_SCENARIO_INTS = ("years", "workdays_per_week")
+
+
+# ============================================================================
+# INPUT
+# ============================================================================
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from a CSV (header row) or JSONL file."""
+    p = pathlib.Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"Input not found: {path}")
+    if p.suffix.lower() in {".jsonl", ".ndjson"}:
+        with p.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with p.open("r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() in {"", "-"})
+
+
+def _price(value):
+    """Flat price, or a curve given as a JSON list (JSONL) or "a;b;c" (CSV)."""
+    if isinstance(value, (list, tuple)):
+        return [float(v) for v in value]
+    if isinstance(value, str) and (";" in value or value.strip().startswith("[")):
+        text = value.strip().strip("[]")
+        return [float(v) for v in text.replace(",", ";").split(";") if v.strip()]
+    return float(value)
+
+
+def project_from_record(record: Dict[str, Any]) -> Project:
+    """
+    Build a Project from a flat record; missing contact fields default to "".
+
+    Raises:
+        ValueError: If a required numeric field is missing or malformed
+    """
+    kwargs: Dict[str, Any] = {}
+    for f in fields(Project):
+        value = record.get(f.name)
+        if _blank(value):
+            if f.name == "motor_efficiency":
+                kwargs[f.name] = None
+            elif f.type is str:
+                kwargs[f.name] = ""
+            elif f.default is not MISSING:
+                continue
+            else:
+                raise ValueError(f"Missing value for '{f.name}'")
+        elif f.type is int:
+            kwargs[f.name] = int(float(value))
+        elif f.type is float:
+            kwargs[f.name] = float(value)
+        else:
+            kwargs[f.name] = str(value).strip()
+    return Project(**kwargs)
+
+
+def scenario_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Scenario overrides from a record (blank cells mean "use the project's value")."""
+    scenario: Dict[str, Any] = {"scenario_id": str(record.get("scenario_id") or "")}
+    for name in _SCENARIO_FLOATS:
+        if not _blank(record.get(name)):
+            scenario[name] = _price(record[name]) if name.endswith(("_per_kwh", "_per_l")) else float(record[name])
+    for name in _SCENARIO_INTS:
+        if not _blank(record.get(name)):
+            scenario[name] = int(float(record[name]))
+    return scenario
+
+
+def iter_jobs(projects_path: str, scenarios_path: Optional[str]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    (project record, scenario) pairs in a deterministic order.
+
+    Without a scenario file every project row is its own scenario (scenario
+    columns may sit on the project row); with one, every project is crossed
+    with every scenario.
+    """
+    scenarios = [scenario_from_record(r) for r in read_records(scenarios_path)] if scenarios_path else None
+    for record in read_records(projects_path):
+        for scenario in (scenarios or [scenario_from_record(record)]):
+            yield record, scenario
+
+
+def chunked(items: Iterable, size: int) -> Iterator[Tuple[int, List]]:
+    """(chunk index, items) pairs of at most ``size`` items."""
+    it = iter(items)
+    for index in itertools.count():
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield index, chunk
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+_machines = None
+
+
+def _init_worker(machines_path: str) -> None:
+    """Load the catalog once per worker process."""
+    global _machines
+    _machines = load_machines_from_csv(machines_path)
+
+
+def evaluate_job(record: Dict[str, Any], scenario: Dict[str, Any], machines, top_k: Optional[int]) -> List[Dict[str, Any]]:
+    """Output rows for one project × scenario: one per relevant machine, cheapest first."""
+    name = str(record.get("project_name") or "")
+    base = {"project_name": name, "scenario_id": scenario.get("scenario_id", "")}
+    try:
+        project = project_from_record(record)
+        if "throughput_per_day" in scenario:
+            # The throughput filter must see the scenario's throughput too
+            project.customer_throughput_per_day = scenario["throughput_per_day"]
+        # Same defaults as the project TCO endpoint: 20 h/day cap with throughput, project prices
+        hours_per_day = scenario.get("operation_hours_per_day", 20.0)
+        relevant = filter_machines_for_project(machines, project, operation_hours_per_day=hours_per_day)
+        if not relevant:
+            return [{**base, "error": "No relevant machines"}]
+        ranked = rank_machines(
+            relevant,
+            top_k or len(relevant),
+            years=scenario.get("years", project.years),
+            electricity_eur_per_kwh=scenario.get("electricity_eur_per_kwh", project.energy_price_eur_per_kwh),
+            water_eur_per_l=scenario.get("water_eur_per_l", project.water_price_eur_per_l),
+            operation_hours_per_year=scenario.get("operation_hours_per_year"),
+            throughput_per_day=project.customer_throughput_per_day,
+            workdays_per_week=scenario.get("workdays_per_week", project.workdays_per_week),
+            operation_hours_per_day=hours_per_day,
+            electricity_escalation_pct=scenario.get("electricity_escalation_pct", 0.0),
+            water_escalation_pct=scenario.get("water_escalation_pct", 0.0),
+            discount_rate=scenario.get("discount_rate", 0.0),
+            # Rows only carry totals, so no monthly series is built
+            lazy=True,
+        )
+    except (ValueError, TypeError) as e:
+        return [{**base, "error": str(e)}]
+
+    return [
+        {
+            **base,
+            "rank": rank,
+            "langtyp": machine.langtyp,
+            "label": tco.label,
+            "total": tco.total,
+            "ca": tco.ca,
+            "cc": tco.cc,
+            "co": tco.co,
+            "cm": tco.cm,
+            "hours_per_year": tco.hours_per_year,
+        }
+        for rank, (machine, tco) in enumerate(ranked, start=1)
+    ]
+
+
+def _evaluate_chunk(index: int, jobs: List[Tuple[Dict[str, Any], Dict[str, Any]]], top_k: Optional[int]) -> Tuple[int, List[Dict[str, Any]]]:
+    rows: List[Dict[str, Any]] = []
+    for record, scenario in jobs:
+        rows.extend(evaluate_job(record, scenario, _machines, top_k))
+    return index, rows
+
+
+# ============================================================================
+# OUTPUT AND CHECKPOINTS
+# ============================================================================
+
+class ResultWriter:
+    """
+    Incremental result sink.
+
+    CSV and JSONL append to one file, flushed and fsynced per chunk, and
+    report the file size after each chunk so a resume can truncate a
+    half-written tail. Parquet writes one part file per chunk into a
+    directory (written to a temporary name and renamed), which is atomic.
+    """
+
+    def __init__(self, path: str, fmt: str):
+        self.path = pathlib.Path(path)
+        self.fmt = fmt
+        self._file = None
+        self._csv = None
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def open(self, truncate_to: Optional[int], resume: bool) -> None:
+        if self.fmt == "parquet":
+            if not resume:
+                for part in self.path.glob("part-*.parquet"):
+                    part.unlink()
+            return
+        exists = self.path.exists()
+        self._file = self.path.open("r+b" if exists else "wb")
+        if not resume:
+            self._file.truncate(0)
+        elif truncate_to is not None:
+            self._file.truncate(truncate_to)
+        self._file.seek(0, os.SEEK_END)
+        if self.fmt == "csv" and self._file.tell() == 0:
+            self._write_text(",".join(OUTPUT_COLUMNS) + "\n")
+
+    def _write_text(self, text: str) -> None:
+        self._file.write(text.encode("utf-8"))
+
+    def write_chunk(self, index: int, rows: List[Dict[str, Any]]) -> Optional[int]:
+        """Durably write a chunk's rows; returns the output size for CSV/JSONL."""
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist([{c: row.get(c) for c in OUTPUT_COLUMNS} for row in rows])
+            tmp = self.path / f".part-{index:06d}.parquet.tmp"
+            pq.write_table(table, tmp)
+            os.replace(tmp, self.path / f"part-{index:06d}.parquet")
+            return None
+
+        if self.fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=OUTPUT_COLUMNS, lineterminator="\n")
+            writer.writerows({c: row.get(c) for c in OUTPUT_COLUMNS} for row in rows)
+            self._write_text(buffer.getvalue())
+        else:
+            self._write_text("".join(json.dumps({c: row.get(c) for c in OUTPUT_COLUMNS}) + "\n" for row in rows))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of completed chunks next to the output.
+
+    The first line pins the run configuration; resuming with different
+    inputs or chunk size is refused rather than silently mixing results.
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any]):
+        self.path = pathlib.Path(path)
+        self.config = config
+        self.entries: List[Dict[str, Any]] = []
+        self.done: set = set()
+        self.offset: Optional[int] = None
+
+    def load(self) -> None:
+        """
+        Read completed chunks; a torn last line from a crash is ignored.
+
+        Raises:
+            ValueError: If the checkpoint belongs to a different run configuration
+        """
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+        if entries and entries[0].get("config") != self.config:
+            raise ValueError(f"Checkpoint {self.path} was written for a different run; remove it or drop --resume")
+        self.entries = entries[1:]
+        for entry in self.entries:
+            self.done.add(entry["chunk"])
+            if entry.get("offset") is not None:
+                self.offset = entry["offset"]
+
+    def start(self) -> None:
+        """(Re)write the log: the config line plus the intact entries, dropping any torn tail."""
+        lines = [json.dumps({"config": self.config})] + [json.dumps(e) for e in self.entries]
+        self.path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def record(self, index: int, offset: Optional[int]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"chunk": index, "offset": offset}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.add(index)
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def _output_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    suffix = pathlib.Path(path).suffix.lower()
+    if suffix in {".jsonl", ".ndjson"}:
+        return "jsonl"
+    if suffix == ".parquet":
+        return "parquet"
+    return "csv"
+
+
+def run_batch(
+    projects_path: str,
+    output_path: str,
+    *,
+    scenarios_path: Optional[str] = None,
+    machines_path: Optional[str] = None,
+    output_format: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    top_k: Optional[int] = None,
+    resume: bool = False,
+    log=None,
+) -> Dict[str, int]:
+    """
+    Evaluate every project × scenario and write the results incrementally.
+
+    Args:
+        projects_path: CSV/JSONL with one project per row (Project field names)
+        output_path: Output file (CSV/JSONL) or directory (Parquet part files)
+        scenarios_path: Optional CSV/JSONL of scenarios crossed with every project
+        machines_path: Machine catalog CSV (defaults to the packaged machines.csv)
+        output_format: "csv", "jsonl" or "parquet" (defaults to the output suffix)
+        workers: Worker processes (defaults to the number of CPUs; 1 runs inline)
+        chunk_size: Project × scenario pairs per work unit and checkpoint
+        top_k: Only write the k cheapest machines per project × scenario
+        resume: Continue from the checkpoint of an interrupted run
+        log: Callable for progress messages (defaults to stderr)
+
+    Returns:
+        Counts of chunks processed/skipped and rows written
+
+    Raises:
+        FileNotFoundError: If an input file doesn't exist
+        ValueError: If the checkpoint does not match this run
+    """
+    log = log or (lambda msg: print(msg, file=sys.stderr))
+    machines_path = machines_path or os.path.join(os.path.dirname(__file__), "machines.csv")
+    fmt = _output_format(output_path, output_format)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    checkpoint = Checkpoint(
+        f"{output_path.rstrip('/')}.checkpoint",
+        config={
+            "projects": os.path.abspath(projects_path),
+            "scenarios": os.path.abspath(scenarios_path) if scenarios_path else None,
+            "machines": os.path.abspath(machines_path),
+            "chunk_size": chunk_size,
+            "top_k": top_k,
+            "format": fmt,
+        },
+    )
+    writer = ResultWriter(output_path, fmt)
+    if resume:
+        checkpoint.load()
+    checkpoint.start()
+    writer.open(truncate_to=checkpoint.offset, resume=resume)
+
+    stats = {"chunks": 0, "skipped": 0, "rows": 0}
+
+    def pending_chunks() -> Iterator[Tuple[int, List]]:
+        for index, jobs in chunked(iter_jobs(projects_path, scenarios_path), chunk_size):
+            if index in checkpoint.done:
+                stats["skipped"] += 1
+                continue
+            yield index, jobs
+
+    def finish(index: int, rows: List[Dict[str, Any]]) -> None:
+        offset = writer.write_chunk(index, rows)
+        checkpoint.record(index, offset)
+        stats["chunks"] += 1
+        stats["rows"] += len(rows)
+        log(f"chunk {index} done ({len(rows)} rows, {stats['chunks']} chunks this run)")
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        if workers <= 1:
+            _init_worker(machines_path)
+            for index, jobs in pending_chunks():
+                finish(*_evaluate_chunk(index, jobs, top_k))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(machines_path,)) as pool:
+                # Keep a bounded number of chunks in flight so huge inputs stream instead of loading at once
+                in_flight = set()
+                for index, jobs in pending_chunks():
+                    in_flight.add(pool.submit(_evaluate_chunk, index, jobs, top_k))
+                    if len(in_flight) >= 2 * workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(*future.result())
+                for future in wait(in_flight).done:
+                    finish(*future.result())
+    finally:
+        writer.close()
+
+    log(f"finished: {stats['chunks']} chunks, {stats['rows']} rows written, {stats['skipped']} chunks skipped (already done)")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.calculation_engine",
+        description="Batch TCO for project × scenario files (CSV/JSONL in; CSV/JSONL/Parquet out).",
+    )
+    parser.add_argument("--projects", required=True, help="CSV/JSONL with one project per row")
+    parser.add_argument("--scenarios", help="CSV/JSONL of scenarios crossed with every project")
+    parser.add_argument("--output", required=True, help="Output file (CSV/JSONL) or directory (Parquet)")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="Output format (default: from --output suffix)")
+    parser.add_argument("--machines", help="Machine catalog CSV (default: packaged machines.csv)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Project × scenario pairs per chunk (default: 200)")
+    parser.add_argument("--top-k", type=int, help="Only write the k cheapest machines per project × scenario")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoint")
+    args = parser.parse_args(argv)
+
+    try:
+        run_batch(
+            args.projects,
+            args.output,
+            scenarios_path=args.scenarios,
+            machines_path=args.machines,
+            output_format=args.format,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            top_k=args.top_k,
+            resume=args.resume,
+        )
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,209 @@
+"""
+Daily-resolution TCO schedule.
+
+The monthly model spreads ``hours_per_year / 12`` evenly over every month and
+can only fire a service at a month end. The daily schedule runs the machine
+``hours_per_year / (workdays_per_week * 52)`` hours on each workday of a real
+calendar (weeks start on Monday, so 5 workdays are Monday to Friday) and fires
+events on the day they fall due:
+
+- cleaning after every 10 scheduled operating hours (2 h downtime plus the
+  bowl-volume cleaning cost), as in the monthly model
+- service once the effective hours since the last service reach 8000 h, or
+  on the same calendar date 24 months after it, whichever comes first
+
+Nothing loops over days. Cumulative workday counts come from the calendar,
+cleaning cycles from floor division of the cumulative scheduled hours, and
+effective hours from one cumulative sum. Service days are found with
+``np.searchsorted`` per event. The days are then aggregated at the month ends,
+so the output has the shape of ``simulate_batch``, and prices, escalation and
+discounting still apply per month.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+try:
+    from .kernel import (
+        CLEANING_DOWNTIME_HOURS,
+        CLEANING_INTERVAL_HOURS,
+        SERVICE_INTERVAL_HOURS,
+        SERVICE_INTERVAL_MONTHS,
+        BatchSeries,
+        CostBasis,
+        _EPS,
+        _month_major,
+    )
+    from .pricing import discount_factors
+except ImportError:
+    from kernel import (
+        CLEANING_DOWNTIME_HOURS,
+        CLEANING_INTERVAL_HOURS,
+        SERVICE_INTERVAL_HOURS,
+        SERVICE_INTERVAL_MONTHS,
+        BatchSeries,
+        CostBasis,
+        _EPS,
+        _month_major,
+    )
+    from pricing import discount_factors
+
+
+@dataclass(frozen=True)
+class _Calendar:
+    """Day-level calendar of a horizon, plus the 24 months after it for service due dates."""
+    days: int                           # days in the horizon
+    month_starts: np.ndarray            # day offset of the first day of each month
+    month_ends: np.ndarray              # day index of the last day of months 1..N
+    workday: np.ndarray                 # bool per day of the horizon
+    cum_workdays: np.ndarray            # workdays up to and including each day
+    plus_interval: np.ndarray           # day index of (day j + 24 months), j = 0..days
+
+
+def default_start_date() -> date:
+    """First day of the current month, the default commissioning date."""
+    return date.today().replace(day=1)
+
+
+@lru_cache(maxsize=64)
+def _calendar(start: date, months: int, workdays_per_week: int) -> _Calendar:
+    span = months + SERVICE_INTERVAL_MONTHS + 1
+    firsts = [
+        date(start.year + (start.month - 1 + m) // 12, (start.month - 1 + m) % 12 + 1, 1)
+        for m in range(span + 1)
+    ]
+    month_starts = np.array([(d - start).days for d in firsts], dtype=np.int64)
+    days = int(month_starts[months])
+
+    weekday = (start.weekday() + np.arange(days)) % 7
+    workday = weekday < workdays_per_week
+
+    # Same day of month 24 months later, clamped to that month's length
+    j = np.arange(days + 1)
+    month = np.searchsorted(month_starts, j, side="right") - 1
+    target = month + SERVICE_INTERVAL_MONTHS
+    length = month_starts[target + 1] - month_starts[target]
+    plus_interval = month_starts[target] + np.minimum(j - month_starts[month], length - 1)
+
+    return _Calendar(
+        days=days,
+        month_starts=month_starts,
+        month_ends=month_starts[1:months + 1] - 1,
+        workday=workday,
+        cum_workdays=np.cumsum(workday),
+        plus_interval=plus_interval,
+    )
+
+
+def _service_days(effective: np.ndarray, calendar: _Calendar) -> np.ndarray:
+    """Day indices of the services of one scenario, given its cumulative effective hours per day."""
+    hits = []
+    last, base = -1, 0.0
+    while True:
+        due = int(calendar.plus_interval[last + 1]) - 1
+        day = min(int(np.searchsorted(effective, base + SERVICE_INTERVAL_HOURS - 1e-6)), due)
+        if day >= calendar.days:
+            return np.asarray(hits, dtype=np.int64)
+        hits.append(day)
+        last, base = day, effective[day]
+
+
+def simulate_daily(
+    basis: CostBasis,
+    hours_per_year,
+    *,
+    months: int,
+    workdays_per_week: int = 5,
+    start_date: Optional[date] = None,
+    electricity_eur_per_kwh=0.25,
+    water_eur_per_l=0.002,
+    unplanned_downtime=0.0,
+    discount_rate: float = 0.0,
+) -> BatchSeries:
+    """
+    Run the TCO model on a daily timeline and aggregate it to months.
+
+    Same inputs and output as ``simulate_batch``, plus the calendar.
+
+    Args:
+        basis: Machine constants from ``cost_basis`` (or ``stack_bases``)
+        hours_per_year: Scheduled operation hours (``hours_per_day × workdays × 52``), scalar or shape (n,)
+        months: Horizon in months, counted from the month of ``start_date``
+        workdays_per_week: Operating days per week (1-7, Monday first)
+        start_date: Commissioning date; the horizon starts on the first day of
+            its month (defaults to the current month)
+        electricity_eur_per_kwh: Scalar, per-scenario (n,), per-month (1, months) or (n, months)
+        water_eur_per_l: Same shapes as electricity
+        unplanned_downtime: Fraction of scheduled hours lost, scalar or (n,)
+        discount_rate: Yearly discount rate for NPV (0 = undiscounted)
+
+    Returns:
+        BatchSeries with cumulative monthly totals and final operating/maintenance costs
+
+    Raises:
+        ValueError: If workdays_per_week is not between 1 and 7
+    """
+    if not 1 <= int(workdays_per_week) <= 7:
+        raise ValueError("workdays_per_week must be between 1 and 7")
+    start = (start_date or default_start_date()).replace(day=1)
+    calendar = _calendar(start, int(months), int(workdays_per_week))
+
+    hours = np.asarray(hours_per_year, dtype=float)
+    uptime = 1.0 - np.clip(np.asarray(unplanned_downtime, dtype=float), 0.0, 1.0)
+    per_day = np.atleast_1d(hours * uptime) / (int(workdays_per_week) * 52)
+    n = per_day.shape[0]
+
+    # Cumulative scheduled hours and cleaning cycles at the end of every day, shape (days, n)
+    cycles = np.multiply.outer(calendar.cum_workdays.astype(float), per_day / CLEANING_INTERVAL_HOURS)
+    cycles += _EPS
+    np.floor(cycles, out=cycles)
+    cycles_today = np.diff(cycles, axis=0, prepend=0.0)
+
+    # A workday loses 2 h per cleaning, but never more than it had
+    effective = np.maximum(per_day - CLEANING_DOWNTIME_HOURS * cycles_today, 0.0)
+    effective *= calendar.workday[:, None]
+    np.cumsum(effective, axis=0, out=effective)
+
+    # Aggregate to months
+    monthly_cycles = np.diff(cycles[calendar.month_ends], axis=0, prepend=0.0)
+    monthly_effective = np.diff(effective[calendar.month_ends], axis=0, prepend=0.0)
+
+    eur_per_hour = (
+        basis.power_kw * _month_major(electricity_eur_per_kwh)
+        + (basis.water_l_s * 3600.0) * _month_major(water_eur_per_l)
+    )
+    cum = np.empty((months + 1, n))
+    cum[0] = 0.0
+    increments = cum[1:]
+    np.multiply(monthly_effective, eur_per_hour, out=increments)
+    monthly_cycles *= basis.cleaning_cost_per_cycle
+    increments += monthly_cycles
+
+    rows, service_months = [], []
+    for r in range(n):
+        days = _service_days(effective[:, r], calendar)
+        rows.append(np.full(days.size, r, dtype=np.int64))
+        service_months.append(np.searchsorted(calendar.month_starts, days, side="right"))
+    rows = np.concatenate(rows)
+    service_months = np.concatenate(service_months)
+
+    # Two services can fall into one month only for > 8000 h per month; add.at handles it
+    service_cost = np.broadcast_to(basis.service_cost, (n,))
+    np.add.at(increments, (service_months - 1, rows), service_cost[rows])
+
+    factors = discount_factors(months, discount_rate)
+    if factors is None:
+        cm = np.bincount(rows, minlength=n) * service_cost
+    else:
+        increments *= factors[:, None]
+        cm = np.bincount(rows, weights=factors[service_months - 1], minlength=n) * service_cost
+
+    np.cumsum(increments, axis=0, out=increments)
+    co = cum[-1] - cm
+    cum += basis.upfront
+
+    return BatchSeries(cum_total=cum.T, co=co, cm=cm)
@@ -0,0 +1,221 @@
+"""
+Why machines fail a project: every filter rule as a mask over the catalog.
+
+``filter_machines_for_project`` stops at the first rule a machine fails.
+Diagnostics evaluate all rules of ``matches_application`` and
+``machine_meets_project_constraints``, with the same semantics (missing
+values pass or fail exactly as they do there), as boolean masks over
+catalog columns that are extracted once per catalog:
+
+- a rule x machine rejection matrix and the number of machines each rule rejects
+  (in total, and as the only rule failed)
+- near misses: machines of the project's application that fail only a few
+  rules, each with the smallest change to the project that admits it
+
+Relaxations change one project field per failed rule (the solids percentage
+moves to the nearest end of the machine's range, a dimension limit rises to
+the machine's size, a class requirement drops to the machine's class). A
+throughput failure can be fixed either way, so both the highest admissible
+throughput and the hours/day the machine would need are given.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+
+import numpy as np
+
+try:
+    from .machine_data import MachineData
+    from .rules import efficiency_floor, efficiency_rank, finite, matches_application
+except ImportError:
+    from machine_data import MachineData
+    from rules import efficiency_floor, efficiency_rank, finite, matches_application
+
+RULES = (
+    "application",
+    "solids",
+    "throughput",
+    "protection_class",
+    "motor_efficiency",
+    "length",
+    "width",
+    "height",
+    "weight",
+)
+_SIZE_RULES = (
+    ("length", "length_mm", "length_mm"),
+    ("width", "width_mm", "width_mm"),
+    ("height", "height_mm", "height_mm"),
+    ("weight", "weight_kg", "total_weight_kg"),
+)
+
+
+@dataclass
+class NearMiss:
+    """A machine of the project's application that fails only a few rules."""
+    index: int
+    failed_rules: List[str]
+    relaxation: Dict[str, object]       # project field -> value that admits the machine
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class Diagnosis:
+    """Rule-by-rule outcome of filtering a catalog for one project."""
+    rejections: np.ndarray              # bool, (len(RULES), machines): rule rejects machine
+    passing: np.ndarray                 # bool, (machines,)
+    near_misses: List[NearMiss]
+
+    @property
+    def rejected_by(self) -> Dict[str, int]:
+        return dict(zip(RULES, self.rejections.sum(axis=1).tolist()))
+
+    @property
+    def rejected_only_by(self) -> Dict[str, int]:
+        """Machines each rule rejects on its own (admitted if just that rule were dropped)."""
+        single = self.rejections.sum(axis=0) == 1
+        return dict(zip(RULES, (self.rejections & single).sum(axis=1).tolist()))
+
+
+class ConstraintColumns:
+    """
+    The catalog attributes the project rules read, as arrays.
+
+    Args:
+        machines: Catalog rows
+    """
+
+    def __init__(self, machines: Sequence[MachineData]):
+        self.machines = list(machines)
+        # Application rules are substring tests, evaluated once per distinct pair
+        pairs: Dict[Tuple[str, str], int] = {}
+        self._pairs: List[MachineData] = []
+        index = []
+        for m in self.machines:
+            key = (m.application, m.sub_application)
+            if key not in pairs:
+                pairs[key] = len(self._pairs)
+                self._pairs.append(m)
+            index.append(pairs[key])
+        self._pair_index = np.array(index, dtype=int)
+
+        self.solids_min = np.array([finite(m.feed_solids_min_vol_perc, math.nan) for m in machines])
+        self.solids_max = np.array([finite(m.feed_solids_max_vol_perc, math.nan) for m in machines])
+        self.capacity = np.nan_to_num(np.array([finite(m.capacity_max_inp, math.nan) for m in machines]), nan=0.0)
+        # Rule -> (project limit field, machine size column); missing sizes fit any limit, as in the engine
+        self.sizes = {
+            rule: (limit, np.array([finite(getattr(m, attribute), math.nan) for m in machines]))
+            for rule, limit, attribute in _SIZE_RULES
+        }
+
+        # Protection classes compare as lower-case strings; rank them so the test is numeric
+        self._classes = sorted({m.protection_class.lower() for m in machines if m.protection_class})
+        self.protection = np.array(
+            [self._classes.index(m.protection_class.lower()) if m.protection_class else -1 for m in machines],
+            dtype=int,
+        )
+        self.efficiency = np.array([efficiency_rank(m.motor_efficiency) for m in machines], dtype=int)
+
+    def _application_mask(self, project) -> np.ndarray:
+        per_pair = np.array([matches_application(m, project) for m in self._pairs], dtype=bool)
+        return per_pair[self._pair_index] if len(per_pair) else np.zeros(0, dtype=bool)
+
+    def masks(self, project, *, operation_hours_per_day: Optional[float] = None) -> np.ndarray:
+        """Rejection matrix: row r is True where rule ``RULES[r]`` rejects the machine."""
+        reject = np.zeros((len(RULES), len(self.machines)), dtype=bool)
+        reject[0] = ~self._application_mask(project)
+
+        solids = finite(project.solids_percentage, math.nan)
+        reject[1] = ~((self.solids_min <= solids) & (solids <= self.solids_max))
+
+        throughput = finite(project.customer_throughput_per_day, 0.0)
+        if throughput > 0:
+            allowed = finite(operation_hours_per_day, math.nan)
+            allowed = 20.0 if math.isnan(allowed) else allowed
+            with np.errstate(divide="ignore"):
+                reject[2] = (self.capacity <= 0) | (throughput / self.capacity > allowed)
+
+        if project.protection_class:
+            required = project.protection_class.lower()
+            rank = next((r for r, c in enumerate(self._classes) if c >= required), len(self._classes))
+            reject[3] = (self.protection >= 0) & (self.protection < rank)
+
+        floor = efficiency_floor(project.motor_efficiency)
+        if floor is not None:
+            reject[4] = self.efficiency < floor
+
+        # The engine drops all size limits if any of them does not parse
+        try:
+            limits = [float(getattr(project, field)) for _, field, _ in _SIZE_RULES]
+        except (TypeError, ValueError):
+            limits = [0.0] * len(_SIZE_RULES)
+        for (rule, _, _), limit in zip(_SIZE_RULES, limits):
+            if not math.isnan(limit) and limit > 0:
+                reject[RULES.index(rule)] = self.sizes[rule][1] > limit
+        return reject
+
+    def _relaxation(self, i: int, failed: List[str], project, operation_hours_per_day: Optional[float]) -> Dict[str, object]:
+        m = self.machines[i]
+        change: Dict[str, object] = {}
+        for rule in failed:
+            if rule == "solids":
+                low, high = float(self.solids_min[i]), float(self.solids_max[i])
+                solids = finite(project.solids_percentage, math.nan)
+                if math.isnan(low) or math.isnan(high) or low > high:
+                    change["solids_percentage"] = None      # no solids content fits the machine
+                else:
+                    change["solids_percentage"] = low if math.isnan(solids) else min(max(solids, low), high)
+            elif rule == "throughput":
+                allowed = finite(operation_hours_per_day, math.nan)
+                allowed = 20.0 if math.isnan(allowed) else allowed
+                capacity = float(self.capacity[i])
+                needed = finite(project.customer_throughput_per_day, 0.0) / capacity if capacity > 0 else math.inf
+                change["customer_throughput_per_day"] = capacity * allowed if capacity > 0 else None
+                change["operation_hours_per_day"] = needed if needed <= 24 else None
+            elif rule == "protection_class":
+                change["protection_class"] = m.protection_class
+            elif rule == "motor_efficiency":
+                change["motor_efficiency"] = m.motor_efficiency
+            elif rule in self.sizes:
+                field, column = self.sizes[rule]
+                change[field] = float(column[i])
+        return change
+
+    def diagnose(
+        self,
+        project,
+        *,
+        operation_hours_per_day: Optional[float] = None,
+        max_failed_rules: int = 2,
+        max_near_misses: int = 20,
+    ) -> Diagnosis:
+        """
+        Evaluate every rule for every machine.
+
+        Args:
+            project: Project to filter for
+            operation_hours_per_day: Hours/day cap of the throughput rule (default 20)
+            max_failed_rules: Failed rules a machine of the right application may have to count as a near miss
+            max_near_misses: Near misses to return, fewest failed rules first
+
+        Returns:
+            Diagnosis with the rejection matrix, the passing mask and the near misses
+        """
+        reject = self.masks(project, operation_hours_per_day=operation_hours_per_day)
+        failed_count = reject.sum(axis=0)
+        passing = failed_count == 0
+
+        candidates = np.flatnonzero(~reject[0] & (failed_count > 0) & (failed_count <= max_failed_rules))
+        candidates = candidates[np.argsort(failed_count[candidates], kind="stable")][:max_near_misses]
+        near_misses = []
+        for i in candidates.tolist():
+            failed = [rule for r, rule in enumerate(RULES) if reject[r, i]]
+            near_misses.append(NearMiss(
+                index=i,
+                failed_rules=failed,
+                relaxation=self._relaxation(i, failed, project, operation_hours_per_day),
+            ))
+        return Diagnosis(rejections=reject, passing=passing, near_misses=near_misses)
@@ -1,5 +1,7 @@
-from typing import List, Dict, Optional
+from datetime import date
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import csv
+import heapq
 import json
 import math
 import pathlib
@@ -8,9 +10,15 @@ import pathlib
 try:
     from .machine_data import MachineData
     from .tco import TCO
+    from .kernel import cost_basis, hours_per_year_from_throughput, stack_bases, total_cost_lower_bound
+    from .pricing import price_curve
+    from .rules import machine_meets_project_constraints, matches_application
 except ImportError:
     from machine_data import MachineData
     from tco import TCO
+    from kernel import cost_basis, hours_per_year_from_throughput, stack_bases, total_cost_lower_bound
+    from pricing import price_curve
+    from rules import machine_meets_project_constraints, matches_application
 
 # Normalize a CSV header to a compact key (lowercase, no spaces/underscores/brackets)
 def _norm(s: str) -> str:
@@ -131,8 +139,8 @@ def load_machines_from_csv(path: str) -> List[MachineData]:
 def calculate_tco_for_machine(
     machine: MachineData,
     years: int = 5,
-    electricity_eur_per_kwh: float = 0.25,
-    water_eur_per_l: float = 0.002,
+    electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.25,
+    water_eur_per_l: Union[float, Sequence[float]] = 0.002,
     training_cost: float = 0.0,
     label: Optional[str] = None,
     # Operation hours approach
@@ -141,6 +149,14 @@ def calculate_tco_for_machine(
     throughput_per_day: Optional[float] = None,
     workdays_per_week: int = 5,
     operation_hours_per_day: Optional[float] = None,
+    # Price escalation and NPV
+    electricity_escalation_pct: float = 0.0,
+    water_escalation_pct: float = 0.0,
+    discount_rate: float = 0.0,
+    # Timeline resolution
+    schedule: str = "monthly",
+    start_date: Optional[date] = None,
+    lazy: bool = False,
 ) -> TCO:
     """
     Calculate TCO for a single machine with given parameters.
@@ -148,14 +164,20 @@ def calculate_tco_for_machine(
     Args:
         machine: MachineData object
         years: Number of years for calculation
-        electricity_eur_per_kwh: Electricity cost per kWh
-        water_eur_per_l: Water cost per liter
+        electricity_eur_per_kwh: Electricity cost per kWh (flat, per-year or per-month curve)
+        water_eur_per_l: Water cost per liter (flat, per-year or per-month curve)
         training_cost: Training cost for the machine
         label: Custom label for the TCO calculation
         operation_hours_per_year: Hours of operation per year (optional)
         throughput_per_day: Daily throughput in capacity units (optional)
         workdays_per_week: Number of workdays per week (1-7, default 5)
         operation_hours_per_day: Available operation hours per day (optional)
+        electricity_escalation_pct: Yearly electricity price escalation (fraction, e.g. 0.03)
+        water_escalation_pct: Yearly water price escalation (fraction)
+        discount_rate: Yearly discount rate for NPV (0 = undiscounted)
+        schedule: "monthly" (uniform months) or "daily" (workday calendar, see daily.py)
+        start_date: Commissioning date for the daily schedule (defaults to the current month)
+        lazy: Return a LazyTCO whose monthly series is only built on demand
         
     Returns:
         TCO object with calculated costs
@@ -170,14 +192,20 @@ def calculate_tco_for_machine(
         operation_hours_per_year=operation_hours_per_year,
         throughput_per_day=throughput_per_day,
         workdays_per_week=workdays_per_week,
-        operation_hours_per_day=operation_hours_per_day
+        operation_hours_per_day=operation_hours_per_day,
+        electricity_escalation_pct=electricity_escalation_pct,
+        water_escalation_pct=water_escalation_pct,
+        discount_rate=discount_rate,
+        schedule=schedule,
+        start_date=start_date,
+        lazy=lazy,
     )
 
 def compare_machines(
     machines: List[MachineData],
     years: int = 5,
-    electricity_eur_per_kwh: float = 0.25,
-    water_eur_per_l: float = 0.002,
+    electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.25,
+    water_eur_per_l: Union[float, Sequence[float]] = 0.002,
     training_cost: float = 0.0,
     # Operation hours approach
     operation_hours_per_year: Optional[float] = None,
@@ -185,6 +213,14 @@ def compare_machines(
     throughput_per_day: Optional[float] = None,
     workdays_per_week: int = 5,
     operation_hours_per_day: Optional[float] = None,
+    # Price escalation and NPV
+    electricity_escalation_pct: float = 0.0,
+    water_escalation_pct: float = 0.0,
+    discount_rate: float = 0.0,
+    top_k: Optional[int] = None,
+    schedule: str = "monthly",
+    start_date: Optional[date] = None,
+    lazy: bool = False,
 ) -> List[TCO]:
     """
     Compare multiple machines by calculating TCO for each.
@@ -192,17 +228,46 @@ def compare_machines(
     Args:
         machines: List of MachineData objects
         years: Number of years for calculation
-        electricity_eur_per_kwh: Electricity cost per kWh
-        water_eur_per_l: Water cost per liter
+        electricity_eur_per_kwh: Electricity cost per kWh (flat, per-year or per-month curve)
+        water_eur_per_l: Water cost per liter (flat, per-year or per-month curve)
         training_cost: Training cost for the machines
         operation_hours_per_year: Hours of operation per year (optional)
         throughput_per_day: Daily throughput in capacity units (optional)
         workdays_per_week: Number of workdays per week (1-7, default 5)
         operation_hours_per_day: Available operation hours per day (optional)
+        electricity_escalation_pct: Yearly electricity price escalation (fraction, e.g. 0.03)
+        water_escalation_pct: Yearly water price escalation (fraction)
+        discount_rate: Yearly discount rate for NPV (0 = undiscounted)
+        top_k: Only return the k cheapest machines (see ``rank_machines``)
+        schedule: "monthly" or "daily" (see ``calculate_tco_for_machine``)
+        start_date: Commissioning date for the daily schedule
+        lazy: Return LazyTCOs; a ranking that only reads totals then builds no monthly series
         
     Returns:
         List of TCO objects sorted by total cost (ascending)
     """
+    if top_k is not None:
+        return [
+            tco for _, tco in rank_machines(
+                machines,
+                top_k,
+                years=years,
+                electricity_eur_per_kwh=electricity_eur_per_kwh,
+                water_eur_per_l=water_eur_per_l,
+                training_cost=training_cost,
+                operation_hours_per_year=operation_hours_per_year,
+                throughput_per_day=throughput_per_day,
+                workdays_per_week=workdays_per_week,
+                operation_hours_per_day=operation_hours_per_day,
+                electricity_escalation_pct=electricity_escalation_pct,
+                water_escalation_pct=water_escalation_pct,
+                discount_rate=discount_rate,
+                schedule=schedule,
+                start_date=start_date,
+                lazy=lazy,
+            )
+        ]
+
     tcos = []
     for machine in machines:
         tco = calculate_tco_for_machine(
@@ -214,87 +279,152 @@ def compare_machines(
             operation_hours_per_year=operation_hours_per_year,
             throughput_per_day=throughput_per_day,
             workdays_per_week=workdays_per_week,
-            operation_hours_per_day=operation_hours_per_day
+            operation_hours_per_day=operation_hours_per_day,
+            electricity_escalation_pct=electricity_escalation_pct,
+            water_escalation_pct=water_escalation_pct,
+            discount_rate=discount_rate,
+            schedule=schedule,
+            start_date=start_date,
+            lazy=lazy,
         )
         tcos.append(tco)
     
     # Sort by total cost (ascending)
     return sorted(tcos, key=lambda t: t.total)
 
-def save_machines_to_json(machines: List[MachineData], filepath: str) -> None:
-    """
-    Save machine data to JSON file.
-    
-    Args:
-        machines: List of MachineData objects
-        filepath: Path to save the JSON file
-    """
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump([m.to_dict() for m in machines], f, ensure_ascii=False, indent=2)
-
-def _machine_meets_project_constraints(machine: MachineData, project, *, operation_hours_per_day: Optional[float] = None) -> bool:
-    """
-    Shared validation to decide if a machine configuration is legit for a given project.
+def _hours_per_year(
+    machine: MachineData,
+    *,
+    operation_hours_per_year: Optional[float],
+    throughput_per_day: Optional[float],
+    workdays_per_week: int,
+    operation_hours_per_day: Optional[float],
+) -> float:
+    """Scheduled operation hours per year, resolved exactly as in ``calculate_toc``."""
+    if operation_hours_per_year is not None:
+        return float(operation_hours_per_year)
+    if throughput_per_day is not None:
+        capacity_max = machine.capacity_max_inp if not math.isnan(machine.capacity_max_inp) else 0.0
+        return float(hours_per_year_from_throughput(
+            capacity_max,
+            throughput_per_day,
+            workdays_per_week=workdays_per_week,
+            operation_hours_per_day=operation_hours_per_day,
+        ))
+    if operation_hours_per_day is not None:
+        return float(operation_hours_per_day) * workdays_per_week * 52
+    raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
 
-    Rules:
-    - Application and sub-application compatibility are handled in caller.
-    - Solids percentage must be within machine's min/max range.
-    - Throughput feasibility considering daily operation cap (20 h/day) when project provides daily throughput.
-      If project provides customer_throughput_per_day > 0:
-        - Required hours per day = throughput_per_day / capacity_max_inp
-        - Must be <= 20 hours/day to be feasible
-    - Protection class and motor efficiency must meet/exceed requirements.
-    - Physical constraints: machine dimensions must fit within project's max length/width/height; weight <= maxWeight.
+def rank_machines(
+    machines: List[MachineData],
+    top_k: int,
+    years: int = 5,
+    electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.25,
+    water_eur_per_l: Union[float, Sequence[float]] = 0.002,
+    training_cost: float = 0.0,
+    label: Optional[str] = None,
+    operation_hours_per_year: Optional[float] = None,
+    throughput_per_day: Optional[float] = None,
+    workdays_per_week: int = 5,
+    operation_hours_per_day: Optional[float] = None,
+    electricity_escalation_pct: float = 0.0,
+    water_escalation_pct: float = 0.0,
+    discount_rate: float = 0.0,
+    schedule: str = "monthly",
+    start_date: Optional[date] = None,
+    lazy: bool = False,
+) -> List[Tuple[MachineData, TCO]]:
     """
-    # Solids check
-    if not (machine.feed_solids_min_vol_perc <= project.solids_percentage <= machine.feed_solids_max_vol_perc):
-        return False
+    The ``top_k`` cheapest machines with their full TCO, without simulating the rest.
 
-    # Throughput vs hours/day cap (configurable, defaults to 20h if not provided)
-    try:
-        throughput_per_day = float(project.customer_throughput_per_day)
-    except Exception:
-        throughput_per_day = 0.0
+    Every machine first gets a closed-form lower bound on its total
+    (acquisition + commissioning + minimum operating and service cost, see
+    ``total_cost_lower_bound``). Machines are then simulated in order of that
+    bound while a heap keeps the k best totals; as soon as the next bound
+    cannot beat the k-th best total, no remaining machine can enter and their
+    monthly series are never built.
 
-    if throughput_per_day > 0:
-        capacity_max = 0.0 if (machine.capacity_max_inp is None or math.isnan(machine.capacity_max_inp)) else float(machine.capacity_max_inp)
-        if capacity_max <= 0:
-            return False
-        required_hours_per_day = throughput_per_day / capacity_max
-        allowed_hours_per_day = float(operation_hours_per_day) if (operation_hours_per_day is not None and not math.isnan(float(operation_hours_per_day))) else 20.0
-        if required_hours_per_day > allowed_hours_per_day:
-            return False
+    Args:
+        machines: List of MachineData objects
+        top_k: Number of machines to return
+        (remaining arguments as in ``calculate_tco_for_machine``)
 
-    # Protection class
-    if not _protection_class_meets_requirement(machine.protection_class, project.protection_class):
-        return False
+    Returns:
+        (machine, TCO) pairs sorted by total cost (ascending), at most ``top_k``
 
-    # Motor efficiency
-    if not _motor_efficiency_meets_requirement(machine.motor_efficiency, project.motor_efficiency):
-        return False
+    Raises:
+        ValueError: If top_k < 1, for invalid price curves or missing operation hours inputs
+    """
+    if top_k < 1:
+        raise ValueError("top_k must be at least 1")
+    if not machines:
+        return []
 
-    # Physical constraints (allow zeros meaning no constraint)
-    try:
-        max_len = float(project.length_mm)
-        max_wid = float(project.width_mm)
-        max_hei = float(project.height_mm)
-        max_weight = float(project.weight_kg)
-    except Exception:
-        max_len = max_wid = max_hei = max_weight = 0.0
+    months = int(years) * 12
+    hours = [
+        _hours_per_year(
+            machine,
+            operation_hours_per_year=operation_hours_per_year,
+            throughput_per_day=throughput_per_day,
+            workdays_per_week=workdays_per_week,
+            operation_hours_per_day=operation_hours_per_day,
+        )
+        for machine in machines
+    ]
+    columns = stack_bases(cost_basis(machine, training_cost=training_cost) for machine in machines)
+    bounds = total_cost_lower_bound(
+        columns,
+        hours,
+        months=months,
+        electricity_eur_per_kwh=price_curve(electricity_eur_per_kwh, months, escalation_pct=electricity_escalation_pct),
+        water_eur_per_l=price_curve(water_eur_per_l, months, escalation_pct=water_escalation_pct),
+        discount_rate=discount_rate,
+    )
+    if schedule == "daily":
+        # The bound assumes uniform months; the daily calendar can fall below it
+        bounds = [-math.inf] * len(machines)
 
-    def is_positive(x: float) -> bool:
-        return isinstance(x, (int, float)) and not math.isnan(x) and x > 0
+    best: List[Tuple[float, int, TCO]] = []      # max-heap on total via negation
+    for i in sorted(range(len(machines)), key=lambda i: bounds[i]):
+        if len(best) >= top_k and bounds[i] >= -best[0][0]:
+            break
+        tco = calculate_tco_for_machine(
+            machines[i],
+            years=years,
+            electricity_eur_per_kwh=electricity_eur_per_kwh,
+            water_eur_per_l=water_eur_per_l,
+            training_cost=training_cost,
+            label=label,
+            operation_hours_per_year=operation_hours_per_year,
+            throughput_per_day=throughput_per_day,
+            workdays_per_week=workdays_per_week,
+            operation_hours_per_day=operation_hours_per_day,
+            electricity_escalation_pct=electricity_escalation_pct,
+            water_escalation_pct=water_escalation_pct,
+            discount_rate=discount_rate,
+            schedule=schedule,
+            start_date=start_date,
+            lazy=lazy,
+        )
+        entry = (-tco.total, -i, tco)
+        if len(best) < top_k:
+            heapq.heappush(best, entry)
+        elif entry > best[0]:
+            heapq.heapreplace(best, entry)
 
-    if is_positive(max_len) and machine.length_mm > max_len:
-        return False
-    if is_positive(max_wid) and machine.width_mm > max_wid:
-        return False
-    if is_positive(max_hei) and machine.height_mm > max_hei:
-        return False
-    if is_positive(max_weight) and machine.total_weight_kg > max_weight:
-        return False
+    ranked = sorted(best, key=lambda e: (-e[0], -e[1]))
+    return [(machines[-i], tco) for _, i, tco in ranked]
 
-    return True
+def save_machines_to_json(machines: List[MachineData], filepath: str) -> None:
+    """
+    Save machine data to JSON file.
+    
+    Args:
+        machines: List of MachineData objects
+        filepath: Path to save the JSON file
+    """
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump([m.to_dict() for m in machines], f, ensure_ascii=False, indent=2)
 
 def filter_machines_for_project(machines: List[MachineData], project, *, operation_hours_per_day: Optional[float] = None) -> List[MachineData]:
     """
@@ -318,141 +448,15 @@ def filter_machines_for_project(machines: List[MachineData], project, *, operati
     relevant_machines = []
     
     for machine in machines:
-        # Check application match
-        if (project.application.lower() not in machine.application.lower() and 
-            machine.application.lower() not in project.application.lower()):
-            continue
-            
-        # Check sub-application match
-        if (project.sub_application.lower() not in machine.sub_application.lower() and
-            machine.sub_application.lower() not in project.sub_application.lower()):
+        # Check application and sub-application match
+        if not matches_application(machine, project):
             continue
 
         # Shared comprehensive constraint check
-        if not _machine_meets_project_constraints(machine, project, operation_hours_per_day=operation_hours_per_day):
+        if not machine_meets_project_constraints(machine, project, operation_hours_per_day=operation_hours_per_day):
             continue
         
         relevant_machines.append(machine)
     
     return relevant_machines
 
-def _protection_class_meets_requirement(machine_class: str, project_class: str) -> bool:
-    """Check if machine protection class meets project requirements."""
-    if not machine_class or not project_class:
-        return True  # If either is missing, assume it's acceptable
-    
-    # Simple string comparison for now - could be enhanced with proper IP rating logic
-    return machine_class.lower() >= project_class.lower()
-
-def _motor_efficiency_meets_requirement(machine_efficiency: Optional[str], project_efficiency: Optional[str]) -> bool:
-    """Check if machine motor efficiency meets project requirements."""
-    if not project_efficiency:
-        return True  # If project has no requirement, any machine is acceptable
-    
-    if not machine_efficiency:
-        return False  # If machine has no efficiency rating, it doesn't meet requirements
-    
-    # Simple string comparison for efficiency classes
-    efficiency_order = ["ie1", "ie2", "ie3", "ie4", "ie5"]
-    try:
-        machine_ie = next(i for i, eff in enumerate(efficiency_order) if eff in machine_efficiency.lower())
-        project_ie = next(i for i, eff in enumerate(efficiency_order) if eff in project_efficiency.lower())
-        return machine_ie >= project_ie
-    except StopIteration:
-        return True  # If we can't parse the efficiency, assume it's acceptable
-
-# --- Example usage ---
-if __name__ == "__main__":
-    print("=== GEA Sales TCO Calculation Engine ===\n")
-    
-    # Load machines from CSV
-    try:
-        machines = load_machines_from_csv(r"C:\Cursor\GEA_sales\backend\src\calculation_engine\machines.csv")
-        print(f"✅ Loaded {len(machines)} machines from CSV")
-    except FileNotFoundError as e:
-        print(f"❌ Error loading CSV: {e}")
-        exit(1)
-    
-    if not machines:
-        print("❌ No machines found in CSV file")
-        exit(1)
-    
-    # Display first machine details
-    print(f"\n📋 First machine details:")
-    print(f"   Application: {machines[0].application}")
-    print(f"   Sub-Application: {machines[0].sub_application}")
-    print(f"   DMR: {machines[0].dmr} mm")
-    print(f"   List Price: €{machines[0].list_price:,.2f}")
-    print(f"   Power Consumption: {machines[0].power_consumption_total_kw} kW")
-    print(f"   Drive Type: {machines[0].drive_type}")
-    
-    # Example TCO calculation
-    print(f"\n💰 TCO Calculation Example:")
-    print("   Parameters:")
-    print("   - Operation: 8,000 hours/year")
-    print("   - Duration: 5 years")
-    print("   - Electricity: €0.25/kWh")
-    print("   - Water: €0.002/L")
-    
-    # Calculate TCO for first machine using operation hours
-    tco = calculate_tco_for_machine(
-        machines[0],
-        operation_hours_per_year=8000
-    )
-    
-    print(f"\n📊 TCO Results for '{tco.label}':")
-    print(f"   Acquisition Cost (Ca): €{tco.ca:,.2f}")
-    print(f"   Commissioning Cost (Cc): €{tco.cc:,.2f}")
-    print(f"   Operating Cost (Co): €{tco.co:,.2f}")
-    print(f"   Maintenance Cost (Cm): €{tco.cm:,.2f}")
-    print(f"   Total Cost of Ownership: €{tco.total:,.2f}")
-    
-    # Show monthly progression (first 12 months)
-    print(f"\n📈 Monthly Cumulative Total (first 12 months):")
-    for i, cost in enumerate(tco.monthly_cum_total[:12]):
-        print(f"   Month {i:2d}: €{cost:10,.2f}")
-    if len(tco.monthly_cum_total) > 12:
-        print(f"   ... (showing first 12 of {len(tco.monthly_cum_total)} months)")
-    
-    # Compare multiple machines
-    print(f"\n🔍 Comparing first 3 machines:")
-    comparison_tcos = compare_machines(
-        machines[:3],
-        operation_hours_per_year=8000
-    )
-    for i, tco in enumerate(comparison_tcos):
-        print(f"   {i+1}. {tco.label}: €{tco.total:,.2f}")
-    
-    # Find best value machine
-    if comparison_tcos:
-        best_value = comparison_tcos[0]  # Already sorted by total cost
-        print(f"\n🏆 Best Value: {best_value.label} at €{best_value.total:,.2f}")
-    
-    # Example throughput-based calculation
-    print(f"\n🔄 Throughput-Based Calculation Example:")
-    print("   Parameters:")
-    print("   - Throughput: 1000 units/day")
-    print("   - Workdays: 5 days/week")
-    print("   - Max operation: 12 hours/day")
-    print("   - Duration: 5 years")
-    
-    if machines:
-        throughput_tco = calculate_tco_for_machine(
-            machines[0],
-            throughput_per_day=1000,
-            workdays_per_week=5,
-            operation_hours_per_day=12
-        )
-        
-        print(f"\n📊 Throughput TCO Results for '{throughput_tco.label}':")
-        print(f"   Total Cost of Ownership: €{throughput_tco.total:,.2f}")
-        print(f"   (Based on {1000} units/day throughput)")
-    
-    # Save results to JSON
-    try:
-        save_machines_to_json(machines, "machines.json")
-        print(f"\n💾 Saved machine data to machines.json")
-    except Exception as e:
-        print(f"\n❌ Error saving JSON: {e}")
-    
-    print(f"\n=== Example Complete ===")
\ No newline at end of file
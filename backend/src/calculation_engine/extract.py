@@ -0,0 +1,327 @@
+"""
+Rule-based extraction of project fields from pasted text (Magic Fill pre-pass).
+
+Most pasted texts are enquiry forms or e-mail signatures in which the easy
+fields are unambiguous: e-mail addresses, phone numbers, IP ratings, IE
+classes, millimetre dimensions and litre-per-day throughput. This pass finds
+those with compiled regular expressions and a small English/German lexicon,
+so the language model is only asked for what is left.
+
+Two sources, labelled lines first:
+
+- ``Label: value`` lines whose label is in the lexicon (``Durchsatz: 85.000 l/Tag``)
+- free-text patterns over the whole text for fields no label gave
+  (``3000 x 2000 x 2500 mm``, ``IP55``, ``info@example.com``)
+
+Prices, the horizon and the throughput are only taken with their unit
+(``0,25 €/kWh``, ``10 Jahre``, ``5000 l/Tag``); under a recognised label a
+bare number is left to the model, as it may mean something else.
+
+Values are returned raw (numbers converted to the project's units);
+callers coerce them like model output. ``labeled`` lists every field a
+recognised label named, and ``free_text`` says whether anything besides
+labelled lines and recognised patterns is left, i.e. whether the text may
+hold fields only a model can read.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+import re
+import unicodedata
+
+# Label lexicon (labels are case- and accent-folded), most specific first: the first match wins
+_LABELS = [
+    ("email", r"e-?mail|mail"),
+    ("telefon_nummer", r"phone|telefon|telephone|tel|mobile|mobil|handy|fon"),
+    ("sub_application", r"sub-?\s*application|unteranwendung|sub-?\s*app|process|prozess"),
+    ("application", r"application|anwendung|branche|industry|product|produkt"),
+    ("contact_person", r"contact|contact person|ansprechpartner(in)?|kontakt(person)?"),
+    ("company_name", r"company|firma|unternehmen|customer|kunde"),
+    ("water_price_eur_per_l", r"water (price|costs?)|wasser(preis|kosten)"),
+    ("energy_price_eur_per_kwh", r"electricity( price| costs?)?|(energy|power) (price|costs?)|strom(preis|kosten)?|energie(preis|kosten)"),
+    ("solids_percentage", r"solids?( content)?|feststoff(e|gehalt)?|trockensubstanz"),
+    ("customer_throughput_per_day", r"throughput|durchsatz|capacity|kapazitat|tagesmenge|volume per day"),
+    ("workdays_per_week", r"workdays?( per week)?|working days|arbeitstage|days per week|tage pro woche"),
+    ("years", r"years|jahre|laufzeit|horizon"),
+    ("protection_class", r"protection( class)?|schutzart|schutzklasse|ip( rating| class)?"),
+    ("motor_efficiency", r"(motor )?efficiency( class)?|motors?|effizienz(klasse)?|wirkungsgrad|ie( class)?"),
+    ("length_mm", r"length|lange|laenge"),
+    ("width_mm", r"width|breite"),
+    ("height_mm", r"height|hohe|hoehe"),
+    ("weight_kg", r"weight|gewicht"),
+]
+_LABEL_PATTERNS = [(name, re.compile(rf"\b(?:{pattern})\b")) for name, pattern in _LABELS]
+# Labels that are the unit of a bare number ("Years: 10")
+_UNIT_LABELS = re.compile(r"years|jahre")
+_LABEL_LINE = re.compile(r"^[ \t]*([^\W\d][^:=\n]{0,40}?)[ \t]*[:=][ \t]*(.+?)[ \t]*$", re.MULTILINE)
+# Lines with an unknown label and at most this many words are form fields a project does not store
+_SHORT_VALUE_WORDS = 8
+
+# Application lexicon (values match _coerce_parsed). Long stems also match as the start of
+# German compounds ("Zitrusverarbeitung"), drink names also as their end ("Apfelsaft", "Rotwein")
+_APPLICATIONS = {
+    "Citrus": r"\b(?:citrus|zitrus|orange|zitrone|grapefruit|mandarin|limette)\w*|\b(?:lemons?|limes?)\b",
+    "Wine": r"\b(?:wines?|weine?|sekt|prosecco|champagner?|winery|wineries|weingut|sparkling)\b|\w+weine?\b|\bwein\w+",
+    "Beer": r"\b(?:beers?|biere?|brewery|breweries|kwass|kvass|pils\w*)\b|\bbrauerei\w*|\w+biere?\b|\bbier\w+",
+    "Tea": r"\b(?:teas?|tee|iced tea|eistee)\b",
+    "Fruit Juice": r"\b(?:fruit ?juices?|juices?|s[äa]fte?|smoothies?|apples?)\b|\b(?:fruchtsaft|apfel)\w*|\w+s[äa]ft(?:e|es)?\b",
+}
+_APPLICATION_PATTERNS = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in _APPLICATIONS.items()}
+
+_NUMBER = r"\d+(?:[.,' \u00a0]\d{3})*(?:[.,]\d+)?|\d*[.,]\d+"
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"(?:\+|00)\d[\d \t/().-]{5,}\d|\b0\d{2,5}[ \t/-]?\d[\d \t/-]{3,}\d")
+_IP = re.compile(r"\bIP\s?(\d{2})\b", re.IGNORECASE)
+_IE = re.compile(r"\bIE\s?([1-5])\b", re.IGNORECASE)
+_DIMENSIONS = re.compile(
+    rf"({_NUMBER})\s*[x×*]\s*({_NUMBER})\s*[x×*]\s*({_NUMBER})\s*(mm|cm|m)\b", re.IGNORECASE
+)
+_THROUGHPUT = re.compile(
+    rf"({_NUMBER})\s*(k|tsd\.?|thousand)?\s*(l|liters?|litres?|liter|hl|hektoliter|m3|m³|cbm)\s*(?:/|per|pro|a)\s*(?:day|d|tag|24\s*h)\b",
+    re.IGNORECASE,
+)
+_SOLIDS = re.compile(
+    rf"({_NUMBER})\s*(?:vol\.?\s*)?%\s*(?:vol\.?\s*)?(?:solids|feststoff\w*|ts)\b"
+    rf"|(?:solids|feststoff\w*)\D{{0,20}}?({_NUMBER})\s*(?:vol\.?\s*)?%",
+    re.IGNORECASE,
+)
+_ENERGY_PRICE = re.compile(rf"({_NUMBER})\s*(€|eur|euro|ct|cent)\s*(?:/|per|pro)\s*kwh", re.IGNORECASE)
+_WATER_PRICE = re.compile(rf"({_NUMBER})\s*(€|eur|euro|ct|cent)\s*(?:/|per|pro)\s*(m3|m³|cbm|l|liter|litre)\b", re.IGNORECASE)
+_YEARS = re.compile(rf"({_NUMBER})\s*(?:years?|yrs?|jahre?n?)\b", re.IGNORECASE)
+_WORKDAYS = re.compile(r"\b([1-7])\s*(?:days?|tage?)\s*(?:/|per|pro|a|die)\s*(?:week|woche)\b", re.IGNORECASE)
+_LEFTOVER_WORD = re.compile(r"[^\W\d_]{3,}")
+
+_LENGTH_TO_MM = {"mm": 1.0, "cm": 10.0, "m": 1000.0}
+_VOLUME_TO_L = {"hl": 100.0, "hektoliter": 100.0, "m3": 1000.0, "m³": 1000.0, "cbm": 1000.0}
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold().replace("ß", "ss"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def parse_number(text: str) -> Optional[float]:
+    """
+    First number in ``text``, reading both ``1.234,5`` and ``1,234.5``.
+
+    A lone separator followed by exactly three digits is a thousands separator
+    (``85.000``), unless the integer part is 0 (``0,002``).
+    """
+    match = re.search(_NUMBER, text)
+    if not match:
+        return None
+    raw = re.sub(r"[\s'\u00a0]", "", match.group(0))
+    if "," in raw and "." in raw:
+        decimal = "," if raw.rfind(",") > raw.rfind(".") else "."
+        raw = raw.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in raw or "." in raw:
+        sep = "," if "," in raw else "."
+        head, _, tail = raw.rpartition(sep)
+        if raw.count(sep) > 1 or (len(tail) == 3 and head.strip("0") != ""):
+            raw = raw.replace(sep, "")
+        else:
+            raw = raw.replace(sep, ".")
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _phone(text: str) -> Optional[str]:
+    match = _PHONE.search(text)
+    if not match:
+        return None
+    phone = re.sub(r"\s+", " ", match.group(0)).strip()
+    return "+" + phone[2:] if phone.startswith("00") else phone
+
+
+def _application(text: str) -> Optional[str]:
+    """The only application the text names, or None if it names none or several."""
+    hits = {name for name, pattern in _APPLICATION_PATTERNS.items() if pattern.search(text)}
+    # "orange juice" is citrus, not generic fruit juice
+    if hits == {"Citrus", "Fruit Juice"}:
+        hits = {"Citrus"}
+    return hits.pop() if len(hits) == 1 else None
+
+
+def _efficiency(text: str) -> Optional[str]:
+    match = _IE.search(text)
+    if not match:
+        return None
+    return "≥ IE3" if int(match.group(1)) >= 3 else "-"
+
+
+def _scaled(value: Optional[float], unit: Optional[str], table: Dict[str, float]) -> Optional[float]:
+    if value is None:
+        return None
+    return value * table.get((unit or "").lower(), 1.0)
+
+
+def _length(text: str) -> Optional[float]:
+    match = re.search(rf"({_NUMBER})\s*(mm|cm|m)?\b", text, re.IGNORECASE)
+    return _scaled(parse_number(match.group(1)), match.group(2), _LENGTH_TO_MM) if match else None
+
+
+def _weight(text: str) -> Optional[float]:
+    match = re.search(rf"({_NUMBER})\s*(kg|t|tonnen|tons?)?\b", text, re.IGNORECASE)
+    if not match:
+        return None
+    value = parse_number(match.group(1))
+    return value * 1000.0 if value is not None and (match.group(2) or "").lower().startswith("t") else value
+
+
+def _throughput(text: str) -> Optional[float]:
+    match = _THROUGHPUT.search(text)
+    if match:
+        value = parse_number(match.group(1))
+        if value is not None and match.group(2):
+            value *= 1000.0
+        return _scaled(value, match.group(3), _VOLUME_TO_L)
+    # Without a per-day unit the number may as well be an hourly capacity
+    return None
+
+
+def _price(text: str, pattern: "re.Pattern") -> Optional[float]:
+    match = pattern.search(text)
+    if not match:
+        return None
+    value = parse_number(match.group(1))
+    if value is None:
+        return None
+    if match.group(2).lower() in ("ct", "cent"):
+        value /= 100.0
+    if pattern is _WATER_PRICE and match.group(3).lower() in ("m3", "m³", "cbm"):
+        value /= 1000.0
+    # Unit conversions leave binary noise (2,1 €/m³ -> 0.0021000000000000003)
+    return round(value, 9)
+
+
+def _solids(text: str) -> Optional[float]:
+    match = _SOLIDS.search(text)
+    return parse_number(match.group(1) or match.group(2)) if match else parse_number(text)
+
+
+def _labelled_value(name: str, value: str, unit: str = ""):
+    """Raw field value of a labelled line (None if the value does not parse)."""
+    if unit and not re.search(r"[^\W\d_]", value):
+        # A bare number takes the unit from its label ("Länge [mm]: 3000")
+        value = f"{value} {unit}"
+    if name == "email":
+        match = _EMAIL.search(value)
+        return match.group(0) if match else None
+    if name == "telefon_nummer":
+        return _phone(value) or (value if re.search(r"\d{4,}", re.sub(r"\D", "", value)) else None)
+    if name == "application":
+        return _application(value) or value
+    if name in ("company_name", "contact_person", "sub_application"):
+        return value
+    if name == "protection_class":
+        match = _IP.search(value)
+        return f"IP{match.group(1)}" if match else None
+    if name == "motor_efficiency":
+        return _efficiency(value)
+    if name in ("length_mm", "width_mm", "height_mm"):
+        return _length(value)
+    if name == "weight_kg":
+        return _weight(value)
+    if name == "customer_throughput_per_day":
+        return _throughput(value)
+    if name == "solids_percentage":
+        return _solids(value)
+    if name == "energy_price_eur_per_kwh":
+        return _price(value, _ENERGY_PRICE)
+    if name == "water_price_eur_per_l":
+        return _price(value, _WATER_PRICE)
+    if name == "years":
+        match = _YEARS.search(value)
+        return parse_number(match.group(1)) if match else None
+    return parse_number(value)
+
+
+@dataclass
+class Extraction:
+    """Fields found by the rule-based pass."""
+    values: Dict[str, object] = field(default_factory=dict)     # field -> raw value
+    labeled: Set[str] = field(default_factory=set)              # fields named by a recognised label
+    free_text: bool = False                                     # text beyond labelled lines and patterns
+
+    def to_dict(self) -> dict:
+        return {"values": self.values, "labeled": sorted(self.labeled), "free_text": self.free_text}
+
+
+def _label_field(label: str) -> Optional[str]:
+    label = re.sub(r"\(.*?\)|\[.*?\]", "", _fold(label))
+    for name, pattern in _LABEL_PATTERNS:
+        if pattern.search(label):
+            return name
+    return None
+
+
+def _label_unit(label: str) -> str:
+    match = re.search(r"[(\[]\s*([^)\]]+?)\s*[)\]]", label)
+    if match:
+        return match.group(1)
+    return label.strip() if _UNIT_LABELS.fullmatch(_fold(label).strip()) else ""
+
+
+def pre_extract(text: str) -> Extraction:
+    """
+    Extract the fields the text states plainly.
+
+    Args:
+        text: Pasted enquiry text
+
+    Returns:
+        Extraction with raw values, the labelled fields and whether free text remains
+    """
+    result = Extraction()
+    leftover = []
+    last = 0
+    for match in _LABEL_LINE.finditer(text):
+        name = _label_field(match.group(1))
+        if name is None and len(match.group(2).split()) > _SHORT_VALUE_WORDS:
+            continue
+        leftover.append(text[last:match.start()])
+        last = match.end()
+        if name is None:
+            # Unknown short fields (dates, project numbers, ...) carry nothing a project stores
+            continue
+        result.labeled.add(name)
+        if name not in result.values:
+            value = _labelled_value(name, match.group(2), _label_unit(match.group(1)))
+            if value is not None:
+                result.values[name] = value
+    leftover.append(text[last:])
+    rest = "\n".join(leftover)
+
+    # Free-text patterns for fields no label gave; their matches are cut from the leftover
+    def take(pattern: "re.Pattern", names, convert) -> None:
+        nonlocal rest
+        match = pattern.search(rest)
+        if match is None:
+            return
+        values = convert(match)
+        for name, value in zip(names, values):
+            if value is not None:
+                result.values.setdefault(name, value)
+        rest = rest[:match.start()] + " " + rest[match.end():]
+
+    take(_EMAIL, ["email"], lambda m: [m.group(0)])
+    take(_DIMENSIONS, ["length_mm", "width_mm", "height_mm"], lambda m: [
+        _scaled(parse_number(m.group(i)), m.group(4), _LENGTH_TO_MM) for i in (1, 2, 3)
+    ])
+    take(_THROUGHPUT, ["customer_throughput_per_day"], lambda m: [_throughput(m.group(0))])
+    take(_SOLIDS, ["solids_percentage"], lambda m: [parse_number(m.group(1) or m.group(2))])
+    take(_ENERGY_PRICE, ["energy_price_eur_per_kwh"], lambda m: [_price(m.group(0), _ENERGY_PRICE)])
+    take(_WATER_PRICE, ["water_price_eur_per_l"], lambda m: [_price(m.group(0), _WATER_PRICE)])
+    take(_WORKDAYS, ["workdays_per_week"], lambda m: [int(m.group(1))])
+    take(_IP, ["protection_class"], lambda m: [f"IP{m.group(1)}"])
+    take(_IE, ["motor_efficiency"], lambda m: [_efficiency(m.group(0))])
+    take(_PHONE, ["telefon_nummer"], lambda m: [_phone(m.group(0))])
+    if "application" not in result.values:
+        application = _application(rest)
+        if application is not None:
+            result.values["application"] = application
+
+    result.free_text = bool(_LEFTOVER_WORD.search(rest))
+    return result
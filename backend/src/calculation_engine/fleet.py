@@ -0,0 +1,427 @@
+"""
+Multi-machine fleet optimizer.
+
+When a single machine cannot reach a project's daily throughput, several
+machines can run in parallel. This module searches fleets of up to
+``max_units`` machines (identical or mixed) that together
+
+- reach the daily throughput within the daily hours cap,
+- fit the footprint budget (sum of length × width) and the total weight budget,
+- individually satisfy the per-machine rules (application, solids,
+  protection class, motor efficiency, length/width/height),
+
+and ranks them by combined TCO. Throughput is split in proportion to
+capacity, so every unit of a fleet runs the same hours per day.
+
+The search is a depth-first branch-and-bound over multisets of machine types:
+
+- types dominated by at least ``top_n`` others (each at least as good on
+  capacity, every cost rate, footprint and weight) are dropped before the search;
+- a node is pruned when even the most capacity-rich completion cannot reach
+  the throughput, or when the closed-form TCO lower bound of its units at the
+  lowest reachable hours already exceeds the current N-th best fleet;
+- only fleets that survive the bound are simulated exactly.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, asdict, fields, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import heapq
+import math
+
+import numpy as np
+
+try:
+    from .kernel import CostBasis, closed_form_total, cost_basis, simulate_batch, stack_bases, total_cost_lower_bound
+    from .machine_data import MachineData
+    from .pricing import price_curve
+    from .rules import machine_meets_project_constraints, matches_application
+except ImportError:
+    from kernel import CostBasis, closed_form_total, cost_basis, simulate_batch, stack_bases, total_cost_lower_bound
+    from machine_data import MachineData
+    from pricing import price_curve
+    from rules import machine_meets_project_constraints, matches_application
+
+
+def _is_positive(x) -> bool:
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return False
+    return not math.isnan(x) and x > 0
+
+
+def fleet_unit_candidates(machines: List[MachineData], project) -> List[MachineData]:
+    """
+    Machines that may serve as one unit of a fleet.
+
+    Applies every per-machine rule of ``filter_machines_for_project`` except
+    throughput and weight, which a fleet satisfies jointly; a unit also needs
+    a positive capacity to take a share of the throughput.
+    """
+    return [
+        machine for machine in machines
+        if matches_application(machine, project)
+        and _is_positive(machine.capacity_max_inp)
+        and machine_meets_project_constraints(machine, project, check_throughput=False, check_weight=False)
+    ]
+
+
+def _dominator_counts(attributes: np.ndarray) -> np.ndarray:
+    """
+    For every row, the number of other rows dominating it (all columns: smaller is better).
+
+    Of several identical rows, the earlier ones count as dominating the later ones.
+    """
+    counts = np.zeros(attributes.shape[0], dtype=np.int64)
+    index = np.arange(attributes.shape[0])
+    for i, row in enumerate(attributes):
+        no_worse = np.all(attributes <= row, axis=1)
+        strictly_better = np.any(attributes < row, axis=1) | (index < i)
+        no_worse[i] = False
+        counts[i] = np.count_nonzero(no_worse & strictly_better)
+    return counts
+
+
+def _take(columns: CostBasis, index: np.ndarray) -> CostBasis:
+    """Rows ``index`` of a columnar CostBasis (see ``stack_bases``)."""
+    return replace(columns, **{f.name: getattr(columns, f.name)[index] for f in fields(columns) if f.name != "label"})
+
+
+@dataclass
+class FleetOption:
+    """One feasible fleet and its combined TCO."""
+    units: int
+    machines: List[Dict[str, Any]]      # [{"label", "langtyp", "count", "unit_total"}]
+    total: float
+    hours_per_day: float
+    capacity_per_hour: float
+    footprint_m2: float
+    total_weight_kg: float
+    monthly_cum_total: List[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class FleetSearchResult:
+    """Ranked fleets plus search statistics."""
+    options: List[FleetOption]
+    candidate_types: int                # machine types passing the per-unit rules
+    dominated_types: int                # types dropped by dominance pruning
+    nodes_explored: int
+    fleets_evaluated: int               # fleets simulated exactly
+    exhaustive: bool                    # False if the node budget stopped the search
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "options": [o.to_dict() for o in self.options],
+            "candidate_types": self.candidate_types,
+            "dominated_types": self.dominated_types,
+            "nodes_explored": self.nodes_explored,
+            "fleets_evaluated": self.fleets_evaluated,
+            "exhaustive": self.exhaustive,
+        }
+
+
+def optimize_fleet(
+    machines: List[MachineData],
+    project,
+    *,
+    throughput_per_day: Optional[float] = None,
+    max_units: int = 4,
+    allow_mixed: bool = True,
+    top_n: int = 5,
+    years: int = 20,
+    electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.25,
+    water_eur_per_l: Union[float, Sequence[float]] = 0.002,
+    workdays_per_week: int = 5,
+    operation_hours_per_day: float = 20.0,
+    electricity_escalation_pct: float = 0.0,
+    water_escalation_pct: float = 0.0,
+    discount_rate: float = 0.0,
+    max_footprint_m2: Optional[float] = None,
+    max_total_weight_kg: Optional[float] = None,
+    node_limit: int = 200_000,
+) -> FleetSearchResult:
+    """
+    Find the cheapest fleets of parallel machines for a project.
+
+    Args:
+        machines: Catalog to search
+        project: Project object with requirements
+        throughput_per_day: Daily throughput (defaults to the project's)
+        max_units: Maximum number of machines in a fleet
+        allow_mixed: Allow different machine types in one fleet
+        top_n: Number of fleets to return
+        years: Horizon in years
+        electricity_eur_per_kwh: Flat price or price curve
+        water_eur_per_l: Flat price or price curve
+        workdays_per_week: Number of workdays per week
+        operation_hours_per_day: Daily hours cap every unit must stay within
+        electricity_escalation_pct: Yearly electricity price escalation (fraction)
+        water_escalation_pct: Yearly water price escalation (fraction)
+        discount_rate: Yearly discount rate for NPV
+        max_footprint_m2: Footprint budget (defaults to project length × width)
+        max_total_weight_kg: Total weight budget (defaults to the project's weight_kg)
+        node_limit: Search node budget; the result reports whether it was exhaustive
+
+    Returns:
+        FleetSearchResult with fleets sorted by total cost (ascending)
+
+    Raises:
+        ValueError: For invalid limits or price curves
+    """
+    if max_units < 1 or top_n < 1:
+        raise ValueError("max_units and top_n must be at least 1")
+    if not operation_hours_per_day or operation_hours_per_day <= 0:
+        raise ValueError("operation_hours_per_day must be positive")
+
+    months = int(years) * 12
+    electricity = price_curve(electricity_eur_per_kwh, months, escalation_pct=electricity_escalation_pct)
+    water = price_curve(water_eur_per_l, months, escalation_pct=water_escalation_pct)
+
+    throughput = float(throughput_per_day if throughput_per_day is not None else project.customer_throughput_per_day or 0.0)
+    throughput = max(throughput, 0.0)
+    required_capacity = throughput / operation_hours_per_day
+
+    if max_footprint_m2 is None and _is_positive(project.length_mm) and _is_positive(project.width_mm):
+        max_footprint_m2 = float(project.length_mm) * float(project.width_mm) / 1e6
+    if max_total_weight_kg is None and _is_positive(project.weight_kg):
+        max_total_weight_kg = float(project.weight_kg)
+    area_budget = max_footprint_m2 if max_footprint_m2 is not None else math.inf
+    weight_budget = max_total_weight_kg if max_total_weight_kg is not None else math.inf
+
+    candidates = fleet_unit_candidates(machines, project)
+    candidates = [
+        m for m in candidates
+        if m.length_mm * m.width_mm / 1e6 <= area_budget and m.total_weight_kg <= weight_budget
+    ]
+    if not candidates:
+        return FleetSearchResult([], 0, 0, 0, 0, True)
+
+    bases = [cost_basis(m) for m in candidates]
+    area = np.array([m.length_mm * m.width_mm / 1e6 for m in candidates])
+    weight = np.array([m.total_weight_kg for m in candidates], dtype=float)
+    columns = stack_bases(bases)
+    attributes = np.column_stack([
+        -columns.capacity_max,
+        columns.ca + columns.cc,
+        columns.power_kw,
+        columns.water_l_s,
+        columns.cleaning_cost_per_cycle,
+        columns.service_cost,
+        area,
+        weight,
+    ])
+    # A type dominated by top_n others can be dropped: swapping it for each of its
+    # dominators yields top_n distinct fleets that are no worse
+    kept = np.flatnonzero(_dominator_counts(attributes) < top_n).tolist()
+    dominated_types = len(candidates) - len(kept)
+
+    # Search order: cheapest upfront first, so incumbents are found early
+    kept.sort(key=lambda i: bases[i].upfront)
+    candidates = [candidates[i] for i in kept]
+    bases = [bases[i] for i in kept]
+    area, weight = area[kept], weight[kept]
+    columns = stack_bases(bases)
+    capacity = columns.capacity_max
+    upfront = columns.ca + columns.cc
+    n_types = len(candidates)
+    max_capacity = float(capacity.max())
+
+    def hours_per_year(total_capacity):
+        """Hours every unit runs when a fleet of this total capacity shares the throughput."""
+        if required_capacity <= 0:
+            return np.zeros_like(total_capacity, dtype=float) if np.ndim(total_capacity) else 0.0
+        return np.minimum(throughput / total_capacity, operation_hours_per_day) * workdays_per_week * 52
+
+    def unit_bounds(total_capacity: float) -> np.ndarray:
+        """Lower bound of every type's TCO at the hours of a fleet with at most this capacity."""
+        return total_cost_lower_bound(
+            columns,
+            hours_per_year(total_capacity),
+            months=months,
+            electricity_eur_per_kwh=electricity,
+            water_eur_per_l=water,
+            discount_rate=discount_rate,
+            monotone=True,
+        )
+
+    # Flat, undiscounted prices have an exact closed-form total; otherwise simulate
+    flat_prices = not discount_rate and months > 0 and np.ptp(electricity) == 0 and np.ptp(water) == 0
+    series_cache: Dict[Tuple[int, float], np.ndarray] = {}
+
+    def unit_series(i: int, total_capacity: float) -> np.ndarray:
+        key = (i, total_capacity)
+        if key not in series_cache:
+            series_cache[key] = simulate_batch(
+                bases[i],
+                hours_per_year(total_capacity),
+                months=months,
+                electricity_eur_per_kwh=electricity[None, :],
+                water_eur_per_l=water[None, :],
+                discount_rate=discount_rate,
+            ).cum_total[0]
+        return series_cache[key]
+
+    def unit_total(i: int, total_capacity: float) -> float:
+        if flat_prices:
+            return closed_form_total(
+                bases[i],
+                hours_per_year(total_capacity),
+                months=months,
+                electricity_eur_per_kwh=float(electricity[0]),
+                water_eur_per_l=float(water[0]),
+            )
+        return float(unit_series(i, total_capacity)[-1])
+
+    best: List[Tuple[float, Tuple[int, ...]]] = []      # max-heap on total via negation
+    seen = set()
+    stats = {"nodes": 0, "evaluated": 0}
+
+    def threshold() -> float:
+        return -best[0][0] if len(best) >= top_n else math.inf
+
+    def evaluate(fleet: Tuple[int, ...]) -> None:
+        if fleet in seen:
+            return
+        seen.add(fleet)
+        total_capacity = float(sum(capacity[i] for i in fleet))
+        counts = Counter(fleet)
+        if not flat_prices and len(best) >= top_n:
+            # Simulating is the expensive part; rule the fleet out with its bound first
+            bounds = total_cost_lower_bound(
+                columns,
+                hours_per_year(total_capacity),
+                months=months,
+                electricity_eur_per_kwh=electricity,
+                water_eur_per_l=water,
+                discount_rate=discount_rate,
+            )
+            if sum(bounds[i] * c for i, c in counts.items()) >= threshold():
+                return
+        total = sum(unit_total(i, total_capacity) * c for i, c in counts.items())
+        stats["evaluated"] += 1
+        if total >= threshold():
+            return
+        heapq.heappush(best, (-total, fleet))
+        if len(best) > top_n:
+            heapq.heappop(best)
+
+    def to_option(fleet: Tuple[int, ...]) -> FleetOption:
+        """Materialize the monthly series only for the fleets that are returned."""
+        total_capacity = float(sum(capacity[i] for i in fleet))
+        counts = Counter(fleet)
+        series = {i: unit_series(i, total_capacity) for i in counts}
+        return FleetOption(
+            units=len(fleet),
+            machines=[
+                {
+                    "label": bases[i].label,
+                    "langtyp": candidates[i].langtyp,
+                    "count": c,
+                    "unit_total": float(series[i][-1]),
+                }
+                for i, c in sorted(counts.items())
+            ],
+            total=float(sum(series[i][-1] * c for i, c in counts.items())),
+            hours_per_day=hours_per_year(total_capacity) / (workdays_per_week * 52) if workdays_per_week else 0.0,
+            capacity_per_hour=total_capacity,
+            footprint_m2=float(sum(area[i] for i in fleet)),
+            total_weight_kg=float(sum(weight[i] for i in fleet)),
+            monthly_cum_total=sum(series[i] * c for i, c in counts.items()).tolist(),
+        )
+
+    # Seed incumbents with the smallest identical fleet of every type
+    for i in range(n_types):
+        count = max(1, math.ceil(required_capacity / capacity[i] - 1e-9))
+        if count <= max_units and count * area[i] <= area_budget and count * weight[i] <= weight_budget:
+            evaluate((i,) * count)
+
+    exhaustive = True
+
+    def search(fleet: Tuple[int, ...], start: int, total_capacity: float, used_area: float, used_weight: float) -> None:
+        nonlocal exhaustive
+        stats["nodes"] += 1
+        if stats["nodes"] > node_limit:
+            exhaustive = False
+            return
+        slots = max_units - len(fleet)
+        if slots == 0:
+            return
+
+        # Lowest hours any completion can reach, and the bounds valid at those hours
+        bounds = unit_bounds(total_capacity + slots * max_capacity)
+        fleet_bound = float(sum(bounds[i] for i in fleet))
+        upfront_so_far = float(sum(upfront[i] for i in fleet))
+
+        if fleet and not allow_mixed:
+            types = np.array([fleet[-1]])
+        else:
+            # Types are sorted by upfront cost, so stop where the upfront alone breaks the threshold
+            stop = int(np.searchsorted(upfront, threshold() - upfront_so_far, side="left"))
+            types = np.arange(start, max(start, stop))
+        if types.size == 0:
+            return
+
+        new_capacity = total_capacity + capacity[types]
+        new_area, new_weight = used_area + area[types], used_weight + weight[types]
+        deficit = np.maximum(required_capacity - new_capacity, 0.0)
+        more_needed = deficit > 1e-9
+        # Completion: at least one more unit, and at least the best cost per capacity times
+        # the missing capacity (fractional cover relaxation); only types >= j may be added
+        cheapest_from = np.minimum.accumulate(bounds[::-1])[::-1][types]
+        cheapest_ratio_from = np.minimum.accumulate((bounds / capacity)[::-1])[::-1][types]
+        own = fleet_bound + bounds[types]
+        bound = own + np.where(more_needed, np.maximum(cheapest_from, deficit * cheapest_ratio_from), 0.0)
+        # Anything below a feasible child adds at least one more unit
+        extension = own + cheapest_from
+        ok = (
+            (new_area <= area_budget + 1e-9)
+            & (new_weight <= weight_budget + 1e-9)
+            & (deficit <= (slots - 1) * max_capacity + 1e-9)
+            & (bound < threshold())
+        )
+        survivors = np.flatnonzero(ok)
+
+        # Feasible children are screened with the (tighter) bound at their own hours before evaluation
+        feasible = survivors[~more_needed[survivors]]
+        screen = np.full(types.size, np.inf)
+        if feasible.size:
+            hours = hours_per_year(new_capacity[feasible])
+            screen[feasible] = sum(
+                c * total_cost_lower_bound(
+                    bases[i], hours, months=months,
+                    electricity_eur_per_kwh=electricity, water_eur_per_l=water, discount_rate=discount_rate,
+                )
+                for i, c in Counter(fleet).items()
+            ) + total_cost_lower_bound(
+                _take(columns, types[feasible]), hours, months=months,
+                electricity_eur_per_kwh=electricity, water_eur_per_l=water, discount_rate=discount_rate,
+            )
+        # Most promising children first; once one misses the (tightening) threshold, all later ones do
+        for k in survivors[np.argsort(bound[survivors], kind="stable")]:
+            if bound[k] >= threshold():
+                break
+            j = int(types[k])
+            child = fleet + (j,)
+            if not more_needed[k] and screen[k] < threshold():
+                evaluate(child)
+            if slots > 1 and (more_needed[k] or extension[k] < threshold()):
+                search(child, j, float(new_capacity[k]), float(new_area[k]), float(new_weight[k]))
+                if not exhaustive:
+                    return
+
+    search((), 0, 0.0, 0.0, 0.0)
+
+    options = [to_option(fleet) for _, fleet in sorted(best, key=lambda e: -e[0])]
+    return FleetSearchResult(
+        options=options,
+        candidate_types=n_types + dominated_types,
+        dominated_types=dominated_types,
+        nodes_explored=stats["nodes"],
+        fleets_evaluated=stats["evaluated"],
+        exhaustive=exhaustive,
+    )
@@ -0,0 +1,356 @@
+"""
+Scenario history: every computed TCO response, stored for cheap reopening.
+
+A scenario is one TCO calculation of a project: the normalized request (the
+inputs after resolving the project's defaults), the catalog version it ran
+on, the project as it was, and per machine the TCO figures and monthly
+cumulative series.
+
+Storage:
+
+- one compressed ``.npz`` file per scenario, columnar: one array per TCO
+  field across machines, and all series concatenated into one column
+- series are delta-encoded on their IEEE-754 bit patterns (consecutive
+  months of a cumulative cost differ in the low bits only) and byte-shuffled,
+  so deflate sees long runs of zero bytes; decoding is bit-exact
+- an SQLite index of (project, created_at) with the scenario's label,
+  catalog version, cheapest machine and size, so listing a project's history
+  never opens a scenario file
+
+Retention: a project keeps at most ``max_per_project`` scenarios, and
+scenarios older than ``max_age_days`` are dropped; both are applied on every
+save. Saving a scenario identical to the project's latest one (same project
+fields, inputs and catalog version) returns the latest one instead of storing
+a copy.
+
+A scenario is stored as computed: a response built without series (only
+``total`` per machine) reopens without series as well.
+"""
+
+from contextlib import closing
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+import uuid
+
+import numpy as np
+
+SERIES_FIELD = "monthly_cum_total"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    scenario_id TEXT PRIMARY KEY,
+    project_name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    catalog_version INTEGER,
+    label TEXT,
+    fingerprint TEXT NOT NULL,
+    machines INTEGER NOT NULL,
+    best_machine_id TEXT,
+    best_total REAL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_by_project_time ON scenarios (project_name, created_at);
+CREATE INDEX IF NOT EXISTS scenarios_by_time ON scenarios (created_at);
+"""
+
+
+def encode_series(values: np.ndarray) -> np.ndarray:
+    """Delta-encode float64 values on their bit patterns and byte-shuffle them (8 x n uint8)."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.int64)
+    # int64 differences wrap around on overflow, and the cumulative sum wraps back
+    delta = np.diff(bits, prepend=np.int64(0))
+    return np.ascontiguousarray(delta.view(np.uint8).reshape(-1, 8).T)
+
+
+def decode_series(shuffled: np.ndarray) -> np.ndarray:
+    """Inverse of ``encode_series``."""
+    delta = np.ascontiguousarray(shuffled.T).view(np.int64).ravel()
+    return np.cumsum(delta, dtype=np.int64).view(np.float64)
+
+
+def _is_number(x) -> bool:
+    return x is None or (isinstance(x, (int, float)) and not isinstance(x, bool))
+
+
+def _final_total(result: dict) -> float:
+    """Final cumulative cost of one TCO result: last month of the series, else ``total``."""
+    series = result.get(SERIES_FIELD)
+    if series:
+        return series[-1]
+    total = result.get("total")
+    return math.inf if total is None or not math.isfinite(total) else total
+
+
+def _json_default(x):
+    if hasattr(x, "isoformat"):
+        return x.isoformat()
+    return str(x)
+
+
+@dataclass
+class ScenarioInfo:
+    """Index entry of a stored scenario."""
+    scenario_id: str
+    project_name: str
+    created_at: float                   # Unix time
+    catalog_version: Optional[int]
+    label: Optional[str]
+    machines: int
+    best_machine_id: Optional[str]      # cheapest machine by final total
+    best_total: Optional[float]
+    bytes: int                          # size of the scenario file
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ScenarioStore:
+    """
+    On-disk scenario history.
+
+    Args:
+        directory: Root directory of the index and the scenario files
+        max_per_project: Scenarios kept per project, newest first
+        max_age_days: Scenarios older than this are dropped (0: no age limit)
+    """
+
+    def __init__(self, directory: str, *, max_per_project: int = 200, max_age_days: float = 365.0):
+        self.directory = directory
+        self.max_per_project = max_per_project
+        self.max_age_days = max_age_days
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.sqlite")
+        with closing(self._connect()) as db, db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation: safe across threads and job worker processes
+        return sqlite3.connect(self._index_path, timeout=10.0)
+
+    def _path(self, scenario_id: str) -> str:
+        return os.path.join(self.directory, scenario_id[:2], f"{scenario_id}.npz")
+
+    @staticmethod
+    def fingerprint(project: dict, inputs: dict, catalog_version: Optional[int]) -> str:
+        payload = json.dumps([project, inputs, catalog_version], sort_keys=True, default=_json_default)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def save(
+        self,
+        project_name: str,
+        *,
+        inputs: Dict[str, Any],
+        catalog_version: Optional[int],
+        response: Dict[str, Any],
+        machine_ids: List[str],
+    ) -> ScenarioInfo:
+        """
+        Store one TCO response.
+
+        Args:
+            project_name: Project the scenario belongs to
+            inputs: Normalized request (JSON-serializable after ISO dates)
+            catalog_version: Catalog version the response was computed on
+            response: The TCO response (``project``, ``relevant_machines``, ``tco_results``, ...)
+            machine_ids: Catalog key of each relevant machine, aligned with ``tco_results``
+
+        Returns:
+            Index entry of the stored scenario (or of the identical latest one)
+        """
+        project = response.get("project", {})
+        fingerprint = self.fingerprint(project, inputs, catalog_version)
+        with closing(self._connect()) as db:
+            latest = db.execute(
+                "SELECT scenario_id, fingerprint FROM scenarios WHERE project_name = ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (project_name,),
+            ).fetchone()
+        if latest is not None and latest[1] == fingerprint:
+            info = self.info(latest[0])
+            if info is not None:
+                return info
+
+        results = response.get("tco_results", [])
+        scenario_id = uuid.uuid4().hex
+        columns = self._columns(results)
+        meta = {
+            "scenario_id": scenario_id,
+            "project_name": project_name,
+            "inputs": inputs,
+            "catalog_version": catalog_version,
+            "columns": sorted(k for k in columns if k not in ("series", "series_lengths")),
+            # Everything of the response except the per-machine columns
+            "response": {k: v for k, v in response.items() if k not in ("relevant_machines", "tco_results")},
+        }
+        columns["meta"] = np.array(json.dumps(meta, default=_json_default))
+        columns["machine_id"] = np.array(machine_ids, dtype=str)
+        columns["machine_json"] = np.array(
+            [json.dumps(m, default=_json_default) for m in response.get("relevant_machines", [])], dtype=str
+        )
+
+        path = self._path(scenario_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp, path)
+
+        totals = [_final_total(r) for r in results]
+        best = int(np.argmin(totals)) if results else None
+        info = ScenarioInfo(
+            scenario_id=scenario_id,
+            project_name=project_name,
+            created_at=time.time(),
+            catalog_version=catalog_version,
+            label=inputs.get("label"),
+            machines=len(results),
+            best_machine_id=machine_ids[best] if best is not None and best < len(machine_ids) else None,
+            best_total=float(totals[best]) if best is not None and math.isfinite(totals[best]) else None,
+            bytes=os.path.getsize(path),
+        )
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    info.scenario_id, info.project_name, info.created_at, info.catalog_version, info.label,
+                    fingerprint, info.machines, info.best_machine_id, info.best_total, info.bytes,
+                ),
+            )
+        self.prune(project_name)
+        return info
+
+    @staticmethod
+    def _columns(results: List[dict]) -> Dict[str, np.ndarray]:
+        """TCO results as columns: numeric fields as float64 (None as NaN), others as JSON strings."""
+        columns: Dict[str, np.ndarray] = {}
+        keys = list(dict.fromkeys(k for r in results for k in r if k != SERIES_FIELD))
+        for key in keys:
+            values = [r.get(key) for r in results]
+            if all(_is_number(v) for v in values):
+                columns[f"num:{key}"] = np.array([math.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                columns[f"json:{key}"] = np.array([json.dumps(v, default=_json_default) for v in values], dtype=str)
+        series = [r.get(SERIES_FIELD) or [] for r in results]
+        columns["series_lengths"] = np.array([len(s) for s in series], dtype=np.int64)
+        flat = np.concatenate([np.asarray(s, dtype=np.float64) for s in series]) if series else np.zeros(0)
+        columns["series"] = encode_series(flat)
+        return columns
+
+    def load(self, scenario_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a stored scenario back.
+
+        Returns:
+            Dict with ``info``, ``inputs`` and ``response`` (the stored TCO response,
+            field for field), or None if the scenario does not exist
+        """
+        info = self.info(scenario_id)
+        if info is None:
+            return None
+        try:
+            data = np.load(self._path(scenario_id), allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        with data:
+            meta = json.loads(str(data["meta"]))
+            lengths = data["series_lengths"]
+            flat = decode_series(data["series"])
+            ends = np.cumsum(lengths)
+            series = [flat[end - n:end].tolist() for n, end in zip(lengths.tolist(), ends.tolist())]
+            results: List[Dict[str, Any]] = [{} for _ in series]
+            for column in meta["columns"]:
+                kind, key = column.split(":", 1)
+                values = data[column]
+                for r, v in zip(results, values.tolist()):
+                    r[key] = (None if math.isnan(v) else v) if kind == "num" else json.loads(v)
+            for r, s in zip(results, series):
+                r[SERIES_FIELD] = s
+            machines = [json.loads(m) for m in data["machine_json"].tolist()]
+            machine_ids = data["machine_id"].tolist()
+        response = dict(meta["response"])
+        response["relevant_machines"] = machines
+        response["tco_results"] = results
+        return {"info": info.to_dict(), "inputs": meta["inputs"], "machine_ids": machine_ids, "response": response}
+
+    def info(self, scenario_id: str) -> Optional[ScenarioInfo]:
+        with closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT scenario_id, project_name, created_at, catalog_version, label, machines, "
+                "best_machine_id, best_total, bytes FROM scenarios WHERE scenario_id = ?",
+                (scenario_id,),
+            ).fetchone()
+        return ScenarioInfo(*row) if row else None
+
+    def list(
+        self,
+        project_name: str,
+        *,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[ScenarioInfo]:
+        """A project's scenarios, newest first, optionally within [since, until) (Unix time)."""
+        query = (
+            "SELECT scenario_id, project_name, created_at, catalog_version, label, machines, "
+            "best_machine_id, best_total, bytes FROM scenarios WHERE project_name = ?"
+        )
+        params: List[Any] = [project_name]
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND created_at < ?"
+            params.append(until)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with closing(self._connect()) as db:
+            return [ScenarioInfo(*row) for row in db.execute(query, params)]
+
+    def count(self, project_name: str) -> int:
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM scenarios WHERE project_name = ?", (project_name,)).fetchone()[0]
+
+    def delete(self, scenario_ids: List[str]) -> None:
+        """Remove scenarios from the index and disk."""
+        if not scenario_ids:
+            return
+        with closing(self._connect()) as db, db:
+            db.executemany("DELETE FROM scenarios WHERE scenario_id = ?", [(s,) for s in scenario_ids])
+        for scenario_id in scenario_ids:
+            try:
+                os.remove(self._path(scenario_id))
+            except FileNotFoundError:
+                pass
+
+    def prune(self, project_name: Optional[str] = None) -> int:
+        """
+        Apply the retention policy (to one project's count limit, or every project's).
+
+        Returns:
+            Number of scenarios removed
+        """
+        expired: List[str] = []
+        with closing(self._connect()) as db:
+            if self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400.0
+                expired += [r[0] for r in db.execute("SELECT scenario_id FROM scenarios WHERE created_at < ?", (cutoff,))]
+            projects = (
+                [project_name] if project_name is not None
+                else [r[0] for r in db.execute("SELECT DISTINCT project_name FROM scenarios")]
+            )
+            for name in projects:
+                expired += [r[0] for r in db.execute(
+                    "SELECT scenario_id FROM scenarios WHERE project_name = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                    (name, self.max_per_project),
+                )]
+        expired = list(dict.fromkeys(expired))
+        self.delete(expired)
+        return len(expired)
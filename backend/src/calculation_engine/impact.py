@@ -0,0 +1,252 @@
+"""
+Catalog change impact: which stored projects a new machines.csv reaches.
+
+A catalog reload used to invalidate every cached TCO. Most edits touch a
+handful of rows (a price update on three machines, say), and a project's
+default TCO only depends on:
+
+- the machines in its filtered (relevant) set, and
+- whether a new or edited machine now passes its rules, and
+- for projects without any relevant machine, the machines of its
+  application (they make up the closest alternatives)
+
+``diff_catalogs`` compares two catalog versions by ``machine_id`` (type
+designation, level and drive). ``ProjectMachineIndex`` maps every machine to
+the projects whose filtered set contains it. ``affected_projects`` combines
+the two, so only those projects are recomputed and every other cached result
+carries over to the new version.
+"""
+
+from dataclasses import dataclass, asdict, field, fields
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import time
+
+try:
+    from .catalog import Catalog, machine_id
+    from .engine import filter_machines_for_project
+    from .machine_data import MachineData
+    from .project import Project
+    from .rules import matches_application, same
+except ImportError:
+    from catalog import Catalog, machine_id
+    from engine import filter_machines_for_project
+    from machine_data import MachineData
+    from project import Project
+    from rules import matches_application, same
+
+
+@dataclass
+class CatalogDiff:
+    """Rows added, removed and changed between two catalog versions."""
+    from_version: int
+    to_version: int
+    added: List[str] = field(default_factory=list)                                  # machine_ids
+    removed: List[str] = field(default_factory=list)
+    changed: Dict[str, Dict[str, Tuple[Any, Any]]] = field(default_factory=dict)    # machine_id -> field -> (old, new)
+
+    @property
+    def touched(self) -> Set[str]:
+        return set(self.added) | set(self.removed) | set(self.changed)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def diff_catalogs(old: Catalog, new: Catalog) -> CatalogDiff:
+    """
+    Compare two catalogs row by row, keyed by ``machine_id``.
+
+    Args:
+        old: Catalog the cached results were computed on
+        new: Catalog now being served
+
+    Returns:
+        Added and removed machine ids in catalog order, and per changed machine the changed fields
+    """
+    names = [f.name for f in fields(MachineData)]
+    before = {machine_id(m): m for m in old.machines}
+    after = {machine_id(m): m for m in new.machines}
+    diff = CatalogDiff(from_version=old.version, to_version=new.version)
+    diff.removed = [key for key in before if key not in after]
+    for key, m in after.items():
+        previous = before.get(key)
+        if previous is None:
+            diff.added.append(key)
+            continue
+        changed = {
+            name: (getattr(previous, name), getattr(m, name))
+            for name in names
+            if not same(getattr(previous, name), getattr(m, name))
+        }
+        if changed:
+            diff.changed[key] = changed
+    return diff
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """Filtered machine set of one project, and what it was computed from."""
+    machine_ids: Tuple[str, ...]
+    catalog_version: int
+    filter_version: Optional[int] = None        # project version whose filter inputs it reflects
+
+
+class ProjectMachineIndex:
+    """Reverse index: machine_id -> projects whose filtered set contains it."""
+
+    def __init__(self):
+        self._entries: Dict[str, IndexEntry] = {}
+        self._projects: Dict[str, Set[str]] = {}
+
+    def set(
+        self,
+        project_name: str,
+        machine_ids: Iterable[str],
+        *,
+        catalog_version: int,
+        filter_version: Optional[int] = None,
+    ) -> None:
+        """Replace a project's filtered set."""
+        self.discard(project_name)
+        entry = IndexEntry(tuple(machine_ids), catalog_version, filter_version)
+        self._entries[project_name] = entry
+        for key in entry.machine_ids:
+            self._projects.setdefault(key, set()).add(project_name)
+
+    def get(self, project_name: str) -> Optional[IndexEntry]:
+        return self._entries.get(project_name)
+
+    def discard(self, project_name: str) -> None:
+        entry = self._entries.pop(project_name, None)
+        if entry is None:
+            return
+        for key in entry.machine_ids:
+            names = self._projects.get(key)
+            if names is not None:
+                names.discard(project_name)
+                if not names:
+                    del self._projects[key]
+
+    def copy(self) -> "ProjectMachineIndex":
+        """Independent copy, e.g. to work on off the event loop."""
+        index = ProjectMachineIndex()
+        index._entries = dict(self._entries)
+        index._projects = {key: set(names) for key, names in self._projects.items()}
+        return index
+
+    def projects_of(self, key: str) -> Set[str]:
+        """Projects whose filtered set contains a machine."""
+        return set(self._projects.get(key, ()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def affected_projects(
+    diff: CatalogDiff,
+    index: ProjectMachineIndex,
+    projects: Dict[str, Project],
+    old: Catalog,
+    new: Catalog,
+    hours_per_day: Callable[[Project], Optional[float]],
+) -> Dict[str, List[str]]:
+    """
+    Projects whose default TCO a catalog diff can change, with the reasons.
+
+    ``index`` must hold every project's filtered set on ``old``.
+
+    Args:
+        diff: ``diff_catalogs(old, new)``
+        index: Reverse index on the old catalog
+        projects: Stored projects by name
+        old: Previous catalog
+        new: Current catalog
+        hours_per_day: Hours/day cap a project is filtered with
+
+    Returns:
+        project name -> reasons, in the order found
+    """
+    affected: Dict[str, List[str]] = {}
+    for key in diff.removed:
+        for name in index.projects_of(key):
+            affected.setdefault(name, []).append(f"removed {key}")
+    for key in diff.changed:
+        for name in index.projects_of(key):
+            affected.setdefault(name, []).append(f"changed {key}")
+
+    # New and edited rows may now pass rules they failed before
+    entrants = [new.machine(key) for key in diff.added + list(diff.changed)]
+    for name, project in projects.items():
+        if name in affected:
+            continue
+        passing = filter_machines_for_project(entrants, project, operation_hours_per_day=hours_per_day(project))
+        if passing:
+            affected[name] = [f"{machine_id(m)} now passes" for m in passing]
+
+    # Projects without a match show the closest machines of their application instead
+    touched = [old.machine(key) for key in diff.removed] + entrants
+    touched += [old.machine(key) for key in diff.changed]
+    for name, project in projects.items():
+        entry = index.get(name)
+        if name in affected or entry is None or entry.machine_ids:
+            continue
+        if any(matches_application(m, project) for m in touched):
+            affected[name] = ["closest alternatives may change"]
+    return affected
+
+
+@dataclass
+class ProjectImpact:
+    """Cheapest machine of one affected project's default TCO, before and after."""
+    project_name: str
+    reasons: List[str]
+    before: Optional[str] = None                # machine_id (None: no relevant machine)
+    after: Optional[str] = None
+    before_total: Optional[float] = None
+    after_total: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def flipped(self) -> bool:
+        return self.error is None and self.before != self.after
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["flipped"] = self.flipped
+        return d
+
+
+@dataclass
+class CatalogImpact:
+    """What one catalog reload reached, and the outcome of recomputing it."""
+    diff: CatalogDiff
+    affected: Dict[str, List[str]]              # project name -> reasons
+    unaffected: int                             # projects whose cached results carried over
+    status: str = "running"                     # running | done | failed
+    projects: List[ProjectImpact] = field(default_factory=list)
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def flipped(self) -> List[str]:
+        return [p.project_name for p in self.projects if p.flipped]
+
+    def to_dict(self) -> dict:
+        return {
+            "from_version": self.diff.from_version,
+            "to_version": self.diff.to_version,
+            "status": self.status,
+            "diff": self.diff.to_dict(),
+            "affected": self.affected,
+            "unaffected": self.unaffected,
+            "flipped": self.flipped,
+            "projects": [p.to_dict() for p in self.projects],
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
@@ -0,0 +1,368 @@
+"""
+Local job queue for long-running calculations.
+
+Jobs run in worker processes on the same machine, so no external broker is
+needed. Each job gets its own process (at most ``max_workers`` at a time,
+the rest wait in a FIFO queue), which is what makes the per-job limits
+enforceable:
+
+- CPU time: ``RLIMIT_CPU`` is set in the worker, so the kernel stops it once
+  it has used its CPU seconds.
+- Wall time: the manager kills the worker when it runs past its timeout.
+
+Workers start from a forkserver (spawn where there is none) rather than a
+fork of the server, so they do not inherit its threads, locks and sockets.
+A job is therefore a ``kind`` plus a picklable ``payload``, and every worker
+runs the manager's ``runner``, an importable ``"module:function"``, as
+``runner(kind, payload)``. Anything the job needs from the server's memory
+(e.g. the projects it calculates) has to travel in the payload.
+
+Progress is a shared float that calculation code updates through
+``report_progress`` (a no-op outside a job). Job records and results are JSON
+files under ``jobs_dir/<job_id>/``; finished jobs are deleted ``ttl_seconds``
+after they finish. Records of jobs whose server process died are marked as
+failed when the next manager opens the directory.
+"""
+
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from typing import Any, Deque, Dict, Optional, Tuple
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import resource
+import shutil
+import signal
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Progress of the job running in this process (set in job workers only)
+_progress = None
+
+
+def report_progress(fraction: float) -> None:
+    """Report the completed fraction (0..1) of the current job; does nothing outside a job."""
+    if _progress is not None:
+        _progress.value = min(max(float(fraction), 0.0), 1.0)
+
+
+@dataclass
+class Job:
+    """State of one job as stored in ``job.json``."""
+    job_id: str
+    kind: str
+    status: str
+    created_at: float
+    cpu_seconds: float
+    timeout_seconds: float
+    meta: Dict[str, Any] = field(default_factory=dict)
+    progress: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: Optional[float] = None
+    error: Optional[str] = None
+    owner_pid: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _write_json(path: str, payload: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _job_context():
+    """Start method of job workers (see the module docstring)."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _job_main(runner: str, kind: str, payload: Any, progress, directory: str, cpu_seconds: float) -> None:
+    """Entry point of a job worker: apply the CPU limit, import the runner, run, and persist the result or error."""
+    global _progress
+    _progress = progress
+    limit = max(1, math.ceil(cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, limit + 1))
+    try:
+        module, _, name = runner.partition(":")
+        result = getattr(importlib.import_module(module), name)(kind, payload)
+        _write_json(os.path.join(directory, "result.json"), result)
+    except BaseException as e:
+        # HTTPException carries its message in ``detail``
+        message = getattr(e, "detail", None) or str(e) or type(e).__name__
+        _write_json(os.path.join(directory, "error.json"), {"error": str(message)})
+        os._exit(1)
+
+
+class JobManager:
+    """
+    Queue, run and persist jobs.
+
+    Args:
+        jobs_dir: Directory holding one sub-directory per job
+        runner: ``"module:function"`` each worker imports and calls as ``runner(kind, payload)``;
+            its return value must be JSON-serializable
+        max_workers: Jobs running at the same time (defaults to the number of CPUs)
+        ttl_seconds: How long finished jobs and their results are kept
+        max_cpu_seconds: Upper bound (and default) for a job's CPU time
+        max_timeout_seconds: Upper bound (and default) for a job's wall time
+        poll_interval: Seconds between checks of running workers
+    """
+
+    def __init__(
+        self,
+        jobs_dir: str,
+        *,
+        runner: str,
+        max_workers: Optional[int] = None,
+        ttl_seconds: float = 24 * 3600,
+        max_cpu_seconds: float = 600.0,
+        max_timeout_seconds: float = 1800.0,
+        poll_interval: float = 0.2,
+    ):
+        self.jobs_dir = jobs_dir
+        self.runner = runner
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.ttl_seconds = ttl_seconds
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_timeout_seconds = max_timeout_seconds
+        self.poll_interval = poll_interval
+
+        self._context = _job_context()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[Tuple[str, Any]] = deque()     # (job_id, payload)
+        self._running: Dict[str, Tuple[Any, Any]] = {}     # job_id -> (process, shared progress)
+        self._saved_progress: Dict[str, float] = {}
+        self._monitor: Optional[threading.Thread] = None
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._recover()
+
+    # --- persistence ---
+
+    def _directory(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _save(self, job: Job) -> None:
+        _write_json(os.path.join(self._directory(job.job_id), "job.json"), job.to_dict())
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        data = _read_json(os.path.join(self._directory(job_id), "job.json"))
+        return Job(**data) if isinstance(data, dict) else None
+
+    def _recover(self) -> None:
+        """Pick up records left by earlier server processes and drop expired ones."""
+        now = time.time()
+        for job_id in os.listdir(self.jobs_dir):
+            job = self._load(job_id)
+            if job is None:
+                continue
+            if job.status not in FINISHED and not _pid_alive(job.owner_pid):
+                self._finish(job, FAILED, "Interrupted by a server restart", now)
+            if job.expires_at is not None and job.expires_at <= now:
+                shutil.rmtree(self._directory(job_id), ignore_errors=True)
+
+    def _finish(self, job: Job, status: str, error: Optional[str], now: float) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = now
+        job.expires_at = now + self.ttl_seconds
+        if status == SUCCEEDED:
+            job.progress = 1.0
+        self._save(job)
+
+    # --- public API ---
+
+    def submit(
+        self,
+        kind: str,
+        payload: Any = None,
+        *,
+        cpu_seconds: Optional[float] = None,
+        timeout_seconds: Optional[float] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        """
+        Queue ``runner(kind, payload)``; ``payload`` must be picklable.
+
+        Requested limits are capped at the manager's maxima.
+
+        Returns:
+            The queued Job
+        """
+        job = Job(
+            job_id=uuid.uuid4().hex,
+            kind=kind,
+            status=QUEUED,
+            created_at=time.time(),
+            cpu_seconds=min(cpu_seconds or self.max_cpu_seconds, self.max_cpu_seconds),
+            timeout_seconds=min(timeout_seconds or self.max_timeout_seconds, self.max_timeout_seconds),
+            meta=dict(meta or {}),
+            owner_pid=os.getpid(),
+        )
+        os.makedirs(self._directory(job.job_id))
+        self._save(job)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._queue.append((job.job_id, payload))
+            self._ensure_monitor()
+            self._start_queued()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Current state of a job, also for jobs started by another server process."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job_id in self._running:
+                    job.progress = self._running[job_id][1].value
+                return job
+        job = self._load(job_id)
+        if job is None or (job.expires_at is not None and job.expires_at <= time.time()):
+            return None
+        return job
+
+    def result(self, job_id: str) -> Optional[Any]:
+        """Result of a succeeded job (None if there is none)."""
+        return _read_json(os.path.join(self._directory(job_id), "result.json"))
+
+    def delete(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job, or remove a finished one with its result.
+
+        Returns:
+            The job as it was after cancelling (or before removal), or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id) or self._load(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                self._queue = deque(entry for entry in self._queue if entry[0] != job_id)
+                self._finish(job, CANCELLED, "Cancelled", time.time())
+                return job
+            if job.status == RUNNING and job_id in self._running:
+                process, progress = self._running.pop(job_id)
+                process.kill()
+                process.join()
+                job.progress = progress.value
+                self._finish(job, CANCELLED, "Cancelled", time.time())
+                self._start_queued()
+                return job
+            if job.status == RUNNING:
+                # Owned by another server process, which stops it on its next poll
+                self._finish(job, CANCELLED, "Cancelled", time.time())
+                return job
+            self._jobs.pop(job_id, None)
+            shutil.rmtree(self._directory(job_id), ignore_errors=True)
+            return job
+
+    # --- scheduling ---
+
+    def _ensure_monitor(self) -> None:
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._run_monitor, name="job-monitor", daemon=True)
+            self._monitor.start()
+
+    def _start_queued(self) -> None:
+        while self._queue and len(self._running) < self.max_workers:
+            job_id, payload = self._queue.popleft()
+            job = self._jobs[job_id]
+            progress = self._context.Value("d", 0.0, lock=False)
+            process = self._context.Process(
+                target=_job_main,
+                args=(self.runner, job.kind, payload, progress, self._directory(job_id), job.cpu_seconds),
+                name=f"job-{job_id}",
+            )
+            process.start()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running[job_id] = (process, progress)
+            self._save(job)
+
+    def _run_monitor(self) -> None:
+        last_sweep = 0.0
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                now = time.time()
+                self._poll(now)
+                self._start_queued()
+                if now - last_sweep >= min(60.0, self.ttl_seconds):
+                    self._sweep(now)
+                    last_sweep = now
+
+    def _poll(self, now: float) -> None:
+        for job_id, (process, progress) in list(self._running.items()):
+            job = self._jobs[job_id]
+            job.progress = progress.value
+            if process.exitcode is None:
+                on_disk = self._load(job_id)
+                if on_disk is not None and on_disk.status == CANCELLED:
+                    # Cancelled through another server process
+                    process.kill()
+                    process.join()
+                    del self._running[job_id]
+                    self._jobs[job_id] = on_disk
+                elif now - job.started_at > job.timeout_seconds:
+                    process.kill()
+                    process.join()
+                    del self._running[job_id]
+                    self._finish(job, FAILED, f"Time limit of {job.timeout_seconds:g} s exceeded", now)
+                elif progress.value - self._saved_progress.get(job_id, 0.0) >= 0.01:
+                    # Keep the record fresh for readers in other server processes
+                    self._saved_progress[job_id] = progress.value
+                    self._save(job)
+                continue
+
+            process.join()
+            del self._running[job_id]
+            self._saved_progress.pop(job_id, None)
+            directory = self._directory(job_id)
+            if process.exitcode == 0 and os.path.exists(os.path.join(directory, "result.json")):
+                self._finish(job, SUCCEEDED, None, now)
+            elif process.exitcode == -signal.SIGXCPU:
+                self._finish(job, FAILED, f"CPU limit of {job.cpu_seconds:g} s exceeded", now)
+            else:
+                error = _read_json(os.path.join(directory, "error.json")) or {}
+                self._finish(job, FAILED, error.get("error") or f"Worker exited with code {process.exitcode}", now)
+
+    def _sweep(self, now: float) -> None:
+        """Delete finished jobs past their expiry."""
+        for job_id in os.listdir(self.jobs_dir):
+            job = self._jobs.get(job_id) or self._load(job_id)
+            if job is not None and job.expires_at is not None and job.expires_at <= now:
+                self._jobs.pop(job_id, None)
+                shutil.rmtree(self._directory(job_id), ignore_errors=True)
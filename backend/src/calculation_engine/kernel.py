@@ -0,0 +1,510 @@
+"""
+Vectorized TCO kernel.
+
+Evaluates the monthly TCO cost model for many scenarios at once with numpy
+array operations instead of a per-month Python loop:
+
+- cleaning every 10 operating hours (2 h downtime + bowl-volume cleaning cost)
+- electricity and water on the effective (post-cleaning) hours
+- service at 8000 effective hours OR 24 months, whichever comes first
+
+``calculate_toc`` runs every input through this module, so flat prices,
+price curves, escalation and discounting all share one boundary rule: a
+cleaning is due once the scheduled hours reach a multiple of 10 h, a service
+once the effective hours reach 8000 h (both with a small tolerance, so whole
+hours/day that land exactly on a boundary count).
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import bisect
+import math
+
+import numpy as np
+
+try:
+    from .pricing import discount_factors
+except ImportError:
+    from pricing import discount_factors
+
+CLEANING_INTERVAL_HOURS = 10.0
+CLEANING_DOWNTIME_HOURS = 2.0
+SERVICE_INTERVAL_HOURS = 8000.0
+SERVICE_INTERVAL_MONTHS = 24
+
+# Tolerance used when comparing accumulated hours against event thresholds
+_EPS = 1e-9
+
+
+def _clean(value, default: float = 0.0) -> float:
+    """Float value with None/NaN mapped to ``default``."""
+    if value is None:
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(value) else value
+
+
+@dataclass(frozen=True)
+class CostBasis:
+    """
+    Machine-dependent constants of the TCO model.
+
+    Everything that does not depend on prices, operation hours or the horizon,
+    precomputed once per machine so batch evaluations only touch arrays.
+    """
+    label: str
+    ca: float                           # acquisition (list price)
+    cc: float                           # commissioning (training + construction)
+    power_kw: float                     # power after drive/IE efficiency factors
+    water_l_s: float                    # continuous operating water flow
+    cleaning_cost_per_cycle: float
+    service_cost: float                 # base DMR service + drive-type extra
+    capacity_max: float
+
+    @property
+    def upfront(self) -> float:
+        return self.ca + self.cc
+
+
+def cost_basis(
+    machine,
+    *,
+    training_cost: float = 0.0,
+    construction_cost_per_kg: float = 5.0,
+    cost_cleaning_eur_per_lit: float = 0.5,
+    label: Optional[str] = None,
+) -> CostBasis:
+    """
+    Extract the machine constants used by ``calculate_toc``.
+
+    Args:
+        machine: MachineData object
+        training_cost: Training cost added to commissioning
+        construction_cost_per_kg: Construction cost per kg of machine weight
+        cost_cleaning_eur_per_lit: Cleaning agent cost per litre of bowl volume
+        label: Custom label (defaults to the machine's generated label)
+
+    Returns:
+        CostBasis for the machine
+    """
+    drive_str = (machine.drive_type or "").lower()
+    is_flat_belt = ("flat" in drive_str) and ("belt" in drive_str)
+
+    efficiency_factor = 1.0
+    if is_flat_belt:
+        efficiency_factor += 0.01
+    if machine.motor_efficiency and "IE3" in str(machine.motor_efficiency).upper():
+        efficiency_factor -= 0.01
+
+    dmr_mm = _clean(machine.dmr, default=math.nan)
+    service_cost = machine.service_price_from_dmr(dmr_mm) + (2000.0 if is_flat_belt else 0.0)
+
+    return CostBasis(
+        label=label or machine.default_label(),
+        ca=_clean(machine.list_price),
+        cc=training_cost + construction_cost_per_kg * machine.total_weight_kg,
+        power_kw=_clean(machine.power_consumption_total_kw) * efficiency_factor,
+        water_l_s=_clean(machine.op_water_l_s),
+        cleaning_cost_per_cycle=machine.bowl_volume_lit * cost_cleaning_eur_per_lit,
+        service_cost=service_cost,
+        capacity_max=_clean(machine.capacity_max_inp),
+    )
+
+
+# Numeric fields of CostBasis, in the order columnar stores keep them
+BASIS_COLUMNS = ("ca", "cc", "power_kw", "water_l_s", "cleaning_cost_per_cycle", "service_cost", "capacity_max")
+
+
+def stack_bases(bases) -> CostBasis:
+    """
+    Columnar CostBasis whose numeric fields are arrays, one entry per machine.
+
+    The closed-form helpers (e.g. ``total_cost_lower_bound``) broadcast over
+    it, so bounds for a whole candidate set cost one numpy call.
+    """
+    bases = list(bases)
+    return CostBasis(
+        label="",
+        **{
+            name: np.array([getattr(b, name) for b in bases], dtype=float)
+            for name in BASIS_COLUMNS
+        },
+    )
+
+
+def hours_per_year_from_throughput(
+    capacity_max: float,
+    throughput_per_day,
+    *,
+    workdays_per_week: int = 5,
+    operation_hours_per_day: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Vectorized form of the throughput branch in ``calculate_toc``.
+
+    Required hours/day = throughput / capacity, capped at ``operation_hours_per_day``.
+    ``capacity_max`` may also be an array with one capacity per machine.
+
+    Raises:
+        ValueError: If a machine has no usable capacity
+    """
+    if np.any(np.asarray(capacity_max) <= 0):
+        raise ValueError(f"Invalid capacity_max_inp: {capacity_max}. Cannot calculate operation hours from throughput.")
+    hours_per_day = np.asarray(throughput_per_day, dtype=float) / capacity_max
+    if operation_hours_per_day is not None:
+        hours_per_day = np.minimum(hours_per_day, operation_hours_per_day)
+    return hours_per_day * workdays_per_week * 52
+
+
+def _month_major(values) -> np.ndarray:
+    """
+    Reshape a price input so it broadcasts against the kernel's (months, n) arrays.
+
+    Accepts a scalar, a per-scenario vector of length n, a per-month row of
+    shape (1, months) or a full (n, months) matrix.
+    """
+    arr = np.asarray(values, dtype=float)
+    return arr.T if arr.ndim == 2 else arr
+
+
+def cleaning_cycles(hrs_per_month, months: int) -> np.ndarray:
+    """
+    Cumulative number of cleaning cycles after each month, shape (months + 1, n).
+
+    Cleaning fires every ``CLEANING_INTERVAL_HOURS`` of scheduled operation, so
+    after m months exactly floor(m * h / 10) cycles have happened.
+    """
+    h = np.atleast_1d(np.asarray(hrs_per_month, dtype=float))
+    m = np.arange(months + 1, dtype=float)
+    cycles = np.multiply.outer(m, h / CLEANING_INTERVAL_HOURS)
+    cycles += _EPS
+    return np.floor(cycles, out=cycles)
+
+
+def cumulative_effective_hours(month, hrs_per_month) -> np.ndarray:
+    """
+    Closed-form effective operating hours accumulated after ``month`` months.
+
+    Each cleaning cycle removes 2 h of operation, but a month never drops
+    below zero hours, which only matters when h < 2 (then the month is lost).
+    """
+    h = np.asarray(hrs_per_month, dtype=float)
+    m = np.asarray(month, dtype=float)
+    cycles = np.floor(m * h / CLEANING_INTERVAL_HOURS + _EPS)
+    return m * h - np.minimum(h, CLEANING_DOWNTIME_HOURS) * cycles
+
+
+def service_months(hrs_per_month: float, months: int) -> List[int]:
+    """
+    Service months for a single scenario.
+
+    Scalar form of ``service_schedule``; for one scenario the handful of
+    service events is cheaper to walk in plain Python than through numpy.
+    """
+    h = float(hrs_per_month)
+    downtime = min(h, CLEANING_DOWNTIME_HOURS)
+    rate = h - downtime * h / CLEANING_INTERVAL_HOURS
+
+    def cum_effective(m: int) -> float:
+        return m * h - downtime * math.floor(m * h / CLEANING_INTERVAL_HOURS + _EPS)
+
+    result: List[int] = []
+    last, base = 0, 0.0
+    while True:
+        cap = last + SERVICE_INTERVAL_MONTHS
+        target = base + SERVICE_INTERVAL_HOURS - 1e-6
+        month = cap if rate <= 0 else min(max(math.ceil((target - downtime) / rate), last + 1), cap)
+        while month < cap and cum_effective(month) < target:
+            month += 1
+        if month > months:
+            return result
+        result.append(month)
+        last, base = month, cum_effective(month)
+
+
+def service_schedule(hrs_per_month, months: int):
+    """
+    Months in which a service fires, for every scenario at once.
+
+    Walks service events rather than months. For each event the first month
+    whose effective hours reach the next 8000 h threshold is solved from the
+    closed form (E(m) lies within [m * r, m * r + 2] for the average effective
+    rate r), then capped at 24 months after the previous service.
+
+    Returns:
+        (scenario_index, month_index) integer arrays, one entry per service
+    """
+    h = np.atleast_1d(np.asarray(hrs_per_month, dtype=float))
+    if h.size == 1:
+        hits = np.asarray(service_months(h[0], months), dtype=np.int64)
+        return np.zeros(hits.size, dtype=np.int64), hits
+
+    downtime = np.minimum(h, CLEANING_DOWNTIME_HOURS)
+    rate = h - downtime * h / CLEANING_INTERVAL_HOURS
+
+    rows = np.arange(h.size)
+    last = np.zeros(h.size, dtype=np.int64)
+    base = np.zeros(h.size)
+    hit_rows, hit_months = [], []
+    while rows.size:
+        hh, dd, rr = h[rows], downtime[rows], rate[rows]
+        cap = last[rows] + SERVICE_INTERVAL_MONTHS
+        target = base[rows] + SERVICE_INTERVAL_HOURS - 1e-6
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estimate = np.where(rr > 0, np.ceil((target - dd) / rr), cap)
+        month = np.clip(estimate, last[rows] + 1, cap).astype(np.int64)
+        short = (month < cap) & (cumulative_effective_hours(month, hh) < target)
+        while short.any():
+            month[short] += 1
+            short &= (month < cap)
+            short[short] = cumulative_effective_hours(month[short], hh[short]) < target[short]
+        due = month <= months
+        rows, month = rows[due], month[due]
+        hit_rows.append(rows)
+        hit_months.append(month)
+        last[rows] = month
+        base[rows] = cumulative_effective_hours(month, h[rows])
+
+    if not hit_rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hit_rows), np.concatenate(hit_months)
+
+
+def total_cost_lower_bound(
+    basis: CostBasis,
+    hours_per_year,
+    *,
+    months: int,
+    electricity_eur_per_kwh=0.25,
+    water_eur_per_l=0.002,
+    discount_rate: float = 0.0,
+    monotone: bool = False,
+):
+    """
+    Closed-form lower bound on the final TCO, without building a monthly series.
+
+    Cleaning cycles and effective hours over the horizon are exact. Prices
+    and discount factors are taken at their minimum over the horizon (exact
+    for flat, undiscounted prices). Services are counted from below: at least
+    one every 24 months, and at least one per 8000 h + one month of operation.
+
+    Args:
+        basis: Machine constants from ``cost_basis``
+        hours_per_year: Scheduled operation hours, scalar or array
+        months: Horizon in months
+        electricity_eur_per_kwh: Flat price or price curve
+        water_eur_per_l: Flat price or price curve
+        discount_rate: Yearly discount rate (0 = undiscounted)
+        monotone: Relax effective hours to their average so the bound is also
+            nondecreasing in hours, i.e. valid for any hours >= ``hours_per_year``
+
+    Returns:
+        Lower bound on ``TCO.total`` (same shape as ``hours_per_year``)
+    """
+    h = np.asarray(hours_per_year, dtype=float) / 12.0
+    cycles = np.floor(months * h / CLEANING_INTERVAL_HOURS + _EPS)
+    downtime = np.minimum(h, CLEANING_DOWNTIME_HOURS)
+    if monotone:
+        effective = months * h * (1.0 - downtime / CLEANING_INTERVAL_HOURS) - downtime * _EPS
+    else:
+        effective = months * h - downtime * cycles
+
+    elec = float(np.min(electricity_eur_per_kwh)) if np.size(electricity_eur_per_kwh) else 0.0
+    water = float(np.min(water_eur_per_l)) if np.size(water_eur_per_l) else 0.0
+    factors = discount_factors(months, discount_rate)
+    floor_factor = float(factors[-1]) if factors is not None and factors.size else 1.0
+
+    operating = cycles * basis.cleaning_cost_per_cycle + effective * (
+        basis.power_kw * elec + basis.water_l_s * 3600.0 * water
+    )
+    # Each service interval accumulates less than 8000 h plus one month of operation
+    by_hours = np.where(
+        effective >= SERVICE_INTERVAL_HOURS,
+        np.floor((effective - SERVICE_INTERVAL_HOURS) / (SERVICE_INTERVAL_HOURS + h) - 1e-9) + 1.0,
+        0.0,
+    )
+    services = np.maximum(by_hours, months // SERVICE_INTERVAL_MONTHS)
+    return basis.upfront + floor_factor * (operating + services * basis.service_cost)
+
+
+@dataclass(frozen=True)
+class ClosedFormSeries:
+    """
+    Cumulative cost of one scenario at flat, undiscounted prices, by month.
+
+    Nothing per month is stored: cleaning cycles and effective hours have
+    closed forms and the service months are a short tuple, so any month costs
+    O(log services) and the whole series is only built when asked for.
+    """
+    upfront: float
+    hrs_per_month: float
+    months: int
+    cleaning_cost_per_cycle: float
+    eur_per_hour: float                 # electricity + water per effective operating hour
+    service_cost: float
+    service_months: Tuple[int, ...]
+
+    def _parts(self, month: int):
+        h = self.hrs_per_month
+        cycles = math.floor(month * h / CLEANING_INTERVAL_HOURS + _EPS)
+        effective = month * h - min(h, CLEANING_DOWNTIME_HOURS) * cycles
+        services = bisect.bisect_right(self.service_months, month)
+        return cycles, effective, services
+
+    def operating(self, month: int) -> float:
+        """Cumulative operating cost (cleaning, electricity, water) after ``month`` months."""
+        cycles, effective, _ = self._parts(month)
+        return cycles * self.cleaning_cost_per_cycle + effective * self.eur_per_hour
+
+    def maintenance(self, month: int) -> float:
+        """Cumulative service cost after ``month`` months."""
+        return self._parts(month)[2] * self.service_cost
+
+    def at(self, month: int) -> float:
+        """Cumulative total after ``month`` months (month 0: upfront costs)."""
+        cycles, effective, services = self._parts(month)
+        return (
+            self.upfront
+            + cycles * self.cleaning_cost_per_cycle
+            + effective * self.eur_per_hour
+            + services * self.service_cost
+        )
+
+    def cum_total(self, months=None) -> np.ndarray:
+        """Cumulative totals at the given months (default: all, 0..months), vectorized."""
+        m = np.arange(self.months + 1, dtype=float) if months is None else np.asarray(months, dtype=float)
+        h = self.hrs_per_month
+        cycles = np.floor(m * h / CLEANING_INTERVAL_HOURS + _EPS)
+        effective = m * h - min(h, CLEANING_DOWNTIME_HOURS) * cycles
+        services = np.searchsorted(np.asarray(self.service_months, dtype=float), m, side="right")
+        return self.upfront + cycles * self.cleaning_cost_per_cycle + effective * self.eur_per_hour + services * self.service_cost
+
+
+def closed_form_series(
+    basis: CostBasis,
+    hours_per_year: float,
+    *,
+    months: int,
+    electricity_eur_per_kwh: float = 0.25,
+    water_eur_per_l: float = 0.002,
+) -> ClosedFormSeries:
+    """Closed-form parameters of one scenario at flat, undiscounted prices (see ``ClosedFormSeries``)."""
+    h = float(hours_per_year) / 12.0
+    return ClosedFormSeries(
+        upfront=basis.upfront,
+        hrs_per_month=h,
+        months=int(months),
+        cleaning_cost_per_cycle=basis.cleaning_cost_per_cycle,
+        eur_per_hour=basis.power_kw * electricity_eur_per_kwh + basis.water_l_s * 3600.0 * water_eur_per_l,
+        service_cost=basis.service_cost,
+        service_months=tuple(service_months(h, int(months))),
+    )
+
+
+def closed_form_total(
+    basis: CostBasis,
+    hours_per_year: float,
+    *,
+    months: int,
+    electricity_eur_per_kwh: float = 0.25,
+    water_eur_per_l: float = 0.002,
+) -> float:
+    """
+    Exact final TCO for flat, undiscounted prices without a monthly series.
+
+    Cleaning cycles and effective hours have closed forms and the service
+    events are walked one by one, so the cost is O(number of services).
+    """
+    series = closed_form_series(
+        basis,
+        hours_per_year,
+        months=months,
+        electricity_eur_per_kwh=electricity_eur_per_kwh,
+        water_eur_per_l=water_eur_per_l,
+    )
+    return series.at(months)
+
+
+@dataclass
+class BatchSeries:
+    """Cumulative cost series for n scenarios of one machine."""
+    cum_total: np.ndarray               # shape (n, months + 1), month 0 included
+    co: np.ndarray                      # final operating cost per scenario
+    cm: np.ndarray                      # final maintenance cost per scenario
+
+    @property
+    def total(self) -> np.ndarray:
+        return self.cum_total[:, -1]
+
+
+def simulate_batch(
+    basis: CostBasis,
+    hours_per_year,
+    *,
+    months: int,
+    electricity_eur_per_kwh=0.25,
+    water_eur_per_l=0.002,
+    unplanned_downtime=0.0,
+    discount_rate: float = 0.0,
+) -> BatchSeries:
+    """
+    Run the monthly TCO model for many scenarios of one machine at once.
+
+    Arrays are built month-major so cumulative sums run over contiguous
+    rows; ``cum_total`` is returned as an (n, months + 1) view of that buffer.
+    A columnar basis from ``stack_bases`` runs n different machines instead,
+    one per scenario.
+
+    Args:
+        basis: Machine constants from ``cost_basis`` (or ``stack_bases``)
+        hours_per_year: Scheduled operation hours, scalar or shape (n,)
+        months: Horizon in months
+        electricity_eur_per_kwh: Scalar, per-scenario (n,), per-month (1, months) or (n, months)
+        water_eur_per_l: Same shapes as electricity
+        unplanned_downtime: Fraction of scheduled hours lost to unplanned stops,
+            scalar or (n,). The machine draws no power or water while down.
+        discount_rate: Yearly discount rate; when set, all monthly costs after
+            month 0 (and the returned co/cm) are present values
+
+    Returns:
+        BatchSeries with cumulative totals and final operating/maintenance costs
+    """
+    hours = np.asarray(hours_per_year, dtype=float)
+    uptime = 1.0 - np.clip(np.asarray(unplanned_downtime, dtype=float), 0.0, 1.0)
+    hrs_per_month = np.atleast_1d(hours * uptime) / 12.0
+    n = hrs_per_month.shape[0]
+
+    cycles = np.diff(cleaning_cycles(hrs_per_month, months), axis=0)
+    effective = hrs_per_month - np.minimum(hrs_per_month, CLEANING_DOWNTIME_HOURS) * cycles
+
+    eur_per_hour = (
+        basis.power_kw * _month_major(electricity_eur_per_kwh)
+        + (basis.water_l_s * 3600.0) * _month_major(water_eur_per_l)
+    )
+    cum = np.empty((months + 1, n))
+    cum[0] = 0.0
+    increments = cum[1:]
+    np.multiply(effective, eur_per_hour, out=increments)
+    cycles *= basis.cleaning_cost_per_cycle
+    increments += cycles
+
+    # At most one service per scenario and month, so plain fancy-index add is safe
+    rows, service_months = service_schedule(hrs_per_month, months)
+    service_cost = np.broadcast_to(basis.service_cost, (n,))
+    increments[service_months - 1, rows] += service_cost[rows]
+
+    factors = discount_factors(months, discount_rate)
+    if factors is None:
+        cm = np.bincount(rows, minlength=n) * service_cost
+    else:
+        increments *= factors[:, None]
+        cm = np.bincount(rows, weights=factors[service_months - 1], minlength=n) * service_cost
+
+    np.cumsum(increments, axis=0, out=increments)
+    co = cum[-1] - cm
+    cum += basis.upfront
+
+    return BatchSeries(cum_total=cum.T, co=co, cm=cm)
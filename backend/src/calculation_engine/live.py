@@ -0,0 +1,277 @@
+"""
+Live TCO recalculation for interactive what-if sliders.
+
+A LiveSession belongs to one client connection. It keeps the project, the
+machines matching its application and their cost bases, and the current
+parameters. A slider move changes one or two parameters; the session then
+re-runs all relevant machines in a single batch-kernel call and reports only
+what changed since the last push:
+
+- machines that became relevant (with their data) or dropped out
+  (the hours/day cap decides which machines can reach the throughput),
+- machines whose TCO differs from the last pushed one.
+
+Evaluation is split from committing: ``evaluate`` is a pure function of the
+parameters, so a caller may drop a result that a newer delta has already
+superseded; ``commit`` diffs against the last pushed state and records it.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import math
+
+import numpy as np
+
+try:
+    from .catalog import machine_id
+    from .kernel import CostBasis, cost_basis, hours_per_year_from_throughput, simulate_batch, stack_bases
+    from .machine_data import MachineData
+    from .pricing import price_curve
+    from .rules import machine_meets_project_constraints, matches_application
+except ImportError:
+    from catalog import machine_id
+    from kernel import CostBasis, cost_basis, hours_per_year_from_throughput, simulate_batch, stack_bases
+    from machine_data import MachineData
+    from pricing import price_curve
+    from rules import machine_meets_project_constraints, matches_application
+
+# Parameters a client may change, with their validators
+_NUMBER = "number"
+_PRICE = "price"
+LIVE_PARAMETERS = {
+    "years": _NUMBER,
+    "throughput_per_day": _NUMBER,
+    "operation_hours_per_day": _NUMBER,
+    "operation_hours_per_year": _NUMBER,
+    "workdays_per_week": _NUMBER,
+    "electricity_eur_per_kwh": _PRICE,
+    "water_eur_per_l": _PRICE,
+    "electricity_escalation_pct": _NUMBER,
+    "water_escalation_pct": _NUMBER,
+    "discount_rate": _NUMBER,
+}
+# Parameters that may be cleared with null
+_OPTIONAL = ("throughput_per_day", "operation_hours_per_day", "operation_hours_per_year")
+
+
+def _check_number(name: str, value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a number")
+    return float(value)
+
+
+@dataclass
+class LiveEvaluation:
+    """TCO of the relevant machines for one parameter set."""
+    generation: int
+    params: Dict[str, Any]
+    machine_ids: List[str]
+    tcos: Dict[str, Dict[str, Any]]     # machine_id -> TCO dict
+
+
+class LiveSession:
+    """
+    Per-connection state of a live recalculation.
+
+    Args:
+        project: Project being explored
+        machines: Machine catalog
+        params: Initial parameter overrides (see ``LIVE_PARAMETERS``)
+        basis: Cost basis per machine (e.g. ``Catalog.basis`` to reuse precomputed ones)
+    """
+
+    def __init__(
+        self,
+        project,
+        machines: Sequence[MachineData],
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        basis: Callable[[MachineData], CostBasis] = cost_basis,
+    ):
+        self.project = project
+        self.candidates = [m for m in machines if matches_application(m, project)]
+        self.ids = [machine_id(m) for m in self.candidates]
+        self.bases: List[CostBasis] = [basis(m) for m in self.candidates]
+        self._relevant_cache: Dict[Optional[float], np.ndarray] = {}
+
+        # Sliders start at the project's stored values; 20 h/day is the TCO endpoint's default cap
+        self.params: Dict[str, Any] = {
+            "years": project.years,
+            "throughput_per_day": project.customer_throughput_per_day,
+            "operation_hours_per_day": 20.0,
+            "operation_hours_per_year": None,
+            "workdays_per_week": project.workdays_per_week,
+            "electricity_eur_per_kwh": project.energy_price_eur_per_kwh,
+            "water_eur_per_l": project.water_price_eur_per_l,
+            "electricity_escalation_pct": 0.0,
+            "water_escalation_pct": 0.0,
+            "discount_rate": 0.0,
+        }
+        self.generation = 0
+        self._pushed: Dict[str, Dict[str, Any]] = {}
+        if params:
+            self.apply(params)
+
+    def apply(self, delta: Dict[str, Any]) -> int:
+        """
+        Validate and merge a parameter delta.
+
+        Returns:
+            The new generation number
+
+        Raises:
+            ValueError: On a delta that is not a dict, unknown parameters, invalid
+                values or a price curve that does not fit the horizon (nothing is applied)
+        """
+        if not isinstance(delta, dict):
+            raise ValueError("params must be a JSON object")
+        updates = {}
+        for name, value in delta.items():
+            kind = LIVE_PARAMETERS.get(name)
+            if kind is None:
+                raise ValueError(f"Unknown parameter '{name}'")
+            if value is None:
+                if name not in _OPTIONAL:
+                    raise ValueError(f"{name} cannot be null")
+            elif kind == _PRICE and isinstance(value, list):
+                value = [_check_number(name, v) for v in value]
+            else:
+                value = _check_number(name, value)
+            updates[name] = value
+
+        years = updates.get("years", self.params["years"])
+        if years < 1 or years != int(years):
+            raise ValueError("years must be a positive whole number")
+        workdays = updates.get("workdays_per_week", self.params["workdays_per_week"])
+        if not 1 <= workdays <= 7 or workdays != int(workdays):
+            raise ValueError("workdays_per_week must be a whole number from 1 to 7")
+        hours_per_day = updates.get("operation_hours_per_day", self.params["operation_hours_per_day"])
+        if hours_per_day is not None and not 0 < hours_per_day <= 24:
+            raise ValueError("operation_hours_per_day must be between 0 and 24")
+
+        params = {**self.params, **updates}
+        params["years"] = int(params["years"])
+        params["workdays_per_week"] = int(params["workdays_per_week"])
+        if params["operation_hours_per_year"] is None and params["throughput_per_day"] is None and params["operation_hours_per_day"] is None:
+            raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
+        for name in ("electricity_eur_per_kwh", "water_eur_per_l"):
+            price_curve(params[name], params["years"] * 12)
+
+        self.params = params
+        self.generation += 1
+        return self.generation
+
+    def _relevant(self, hours_per_day: Optional[float]) -> np.ndarray:
+        """Indices of candidates passing the project rules at this hours/day cap (cached per cap)."""
+        relevant = self._relevant_cache.get(hours_per_day)
+        if relevant is None:
+            relevant = np.array([
+                i for i, m in enumerate(self.candidates)
+                if machine_meets_project_constraints(m, self.project, operation_hours_per_day=hours_per_day)
+            ], dtype=int)
+            self._relevant_cache[hours_per_day] = relevant
+        return relevant
+
+    def evaluate(self, params: Optional[Dict[str, Any]] = None, generation: Optional[int] = None) -> LiveEvaluation:
+        """
+        TCO of every relevant machine for a parameter set (defaults to the current one).
+
+        Does not touch the session state, so it can run in a worker thread.
+
+        Raises:
+            ValueError: If a machine without capacity has to run from throughput
+        """
+        params = dict(self.params if params is None else params)
+        generation = self.generation if generation is None else generation
+        months = params["years"] * 12
+        hours_per_day = params["operation_hours_per_day"]
+        throughput = params["throughput_per_day"]
+        hours_per_year = params["operation_hours_per_year"]
+        workdays = params["workdays_per_week"]
+
+        electricity = price_curve(params["electricity_eur_per_kwh"], months, escalation_pct=params["electricity_escalation_pct"])
+        water = price_curve(params["water_eur_per_l"], months, escalation_pct=params["water_escalation_pct"])
+
+        relevant = self._relevant(hours_per_day)
+        ids = [self.ids[i] for i in relevant]
+        if not len(relevant):
+            return LiveEvaluation(generation=generation, params=params, machine_ids=[], tcos={})
+
+        bases = stack_bases(self.bases[i] for i in relevant)
+        needed = None
+        if hours_per_year is not None:
+            hours = np.full(len(relevant), float(hours_per_year))
+        elif throughput is not None:
+            hours = hours_per_year_from_throughput(
+                bases.capacity_max, throughput, workdays_per_week=workdays, operation_hours_per_day=hours_per_day,
+            )
+            needed = throughput / bases.capacity_max
+        elif hours_per_day is not None:
+            hours = np.full(len(relevant), float(hours_per_day) * workdays * 52)
+        else:
+            raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
+
+        series = simulate_batch(
+            bases,
+            hours,
+            months=months,
+            electricity_eur_per_kwh=electricity[None, :],
+            water_eur_per_l=water[None, :],
+            discount_rate=params["discount_rate"],
+        )
+
+        available = None
+        if hours_per_year is None and hours_per_day is not None:
+            available = float(hours_per_day)
+        discount_rate = float(params["discount_rate"]) if params["discount_rate"] else None
+        tcos = {}
+        for row, i in enumerate(relevant):
+            tcos[self.ids[i]] = {
+                "label": self.bases[i].label,
+                "monthly_cum_total": series.cum_total[row].tolist(),
+                "ca": self.bases[i].ca,
+                "cc": self.bases[i].cc,
+                "co": float(series.co[row]),
+                "cm": float(series.cm[row]),
+                "needed_hours_per_day": float(needed[row]) if needed is not None else None,
+                "available_hours_per_day": available,
+                "hours_per_year": float(hours[row]),
+                "discount_rate": discount_rate,
+            }
+        return LiveEvaluation(generation=generation, params=params, machine_ids=ids, tcos=tcos)
+
+    def commit(self, evaluation: LiveEvaluation) -> Dict[str, Any]:
+        """
+        Record an evaluation as pushed and return only what changed since the last push.
+
+        Returns:
+            Dict with ``added`` (machine dicts of newly relevant machines),
+            ``removed`` (machine ids), ``changed`` (machine_id -> TCO dict),
+            ``order`` (relevant machine ids, cheapest first) and ``params``
+        """
+        index = {mid: i for i, mid in enumerate(self.ids)}
+        added = [
+            {"machine_id": mid, **self.candidates[index[mid]].to_dict()}
+            for mid in evaluation.machine_ids
+            if mid not in self._pushed
+        ]
+        removed = [mid for mid in self._pushed if mid not in evaluation.tcos]
+        changed = {
+            mid: tco for mid, tco in evaluation.tcos.items()
+            if self._pushed.get(mid) != tco
+        }
+        self._pushed = evaluation.tcos
+        order = sorted(evaluation.machine_ids, key=lambda mid: evaluation.tcos[mid]["monthly_cum_total"][-1])
+        return {
+            "generation": evaluation.generation,
+            "params": evaluation.params,
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "unchanged": len(evaluation.tcos) - len(changed),
+            "order": order,
+        }
+
+    def reset(self) -> None:
+        """Forget what was pushed, so the next commit sends everything."""
+        self._pushed = {}
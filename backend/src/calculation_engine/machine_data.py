@@ -1,5 +1,6 @@
 from dataclasses import dataclass, asdict
-from typing import Any, Optional, List, Dict
+from datetime import date
+from typing import Any, Optional, Dict, Sequence, Union
 import math
 
 @dataclass
@@ -38,8 +39,8 @@ class MachineData:
         self,
         *,
         years: int,
-        electricity_eur_per_kwh: float = 0.156,
-        water_eur_per_l: float = 0.0016,
+        electricity_eur_per_kwh: Union[float, Sequence[float]] = 0.156,
+        water_eur_per_l: Union[float, Sequence[float]] = 0.0016,
         training_cost: float = 0.0,
         construction_cost_per_kg: float = 5.0,
         cost_cleaning_eur_per_lit: float = 0.5,
@@ -51,6 +52,14 @@ class MachineData:
         throughput_per_day: Optional[float] = None,
         workdays_per_week: int = 5,
         operation_hours_per_day: Optional[float] = None,
+        # Price escalation and NPV
+        electricity_escalation_pct: float = 0.0,
+        water_escalation_pct: float = 0.0,
+        discount_rate: float = 0.0,
+        # Timeline resolution
+        schedule: str = "monthly",
+        start_date: Optional[date] = None,
+        lazy: bool = False,
     ):
         """
         Calculate Total Cost of Ownership (TCO) for the machine over specified years.
@@ -82,14 +91,45 @@ class MachineData:
         - If operation_hours_per_year provided: use directly
         - If throughput_per_day provided: calculate based on machine capacity
         - If operation_hours_per_day provided: use for daily calculation
+
+        Price Curves and NPV:
+        =====================
+        - electricity_eur_per_kwh / water_eur_per_l: flat price, or a curve with
+          one value per year or one value per month
+        - *_escalation_pct: yearly escalation as a fraction, compounded from year 2
+        - discount_rate: yearly rate; monthly costs are discounted to present value
+        Every input runs through the vectorized kernel (kernel.py), so a flat
+        curve, escalation 0 or discount 0 give the same result as a flat price.
+
+        Schedule:
+        =========
+        - "monthly" (default): hrs_per_year / 12 every month, events at month ends
+        - "daily": hours only on the workdays of a real calendar starting in the
+          month of start_date, cleaning and service on the day they fall due,
+          aggregated to the same monthly series (see daily.py)
+
+        Lazy:
+        =====
+        - lazy=True returns a LazyTCO that keeps the closed-form parameters (or
+          the kernel's array) and builds the monthly list only when asked for;
+          for callers that need totals or a few months, e.g. rankings
         
         Returns: TCO object with monthly cumulative totals and final cost breakdown
         """
         # Handle imports for both module and direct execution
         try:
-            from .tco import TCO
+            from .tco import TCO, LazyTCO
+            from .kernel import closed_form_series, cost_basis, simulate_batch
+            from .pricing import is_scalar_price, price_curve
+            from .daily import simulate_daily
         except ImportError:
-            from tco import TCO
+            from tco import TCO, LazyTCO
+            from kernel import closed_form_series, cost_basis, simulate_batch
+            from pricing import is_scalar_price, price_curve
+            from daily import simulate_daily
+
+        if schedule not in ("monthly", "daily"):
+            raise ValueError(f"Unknown schedule '{schedule}' (expected 'monthly' or 'daily')")
         
         # ============================================================================
         # OPERATION HOURS CALCULATION
@@ -130,189 +170,91 @@ class MachineData:
         
         # Generate label if not provided
         if not label:
-            parts = []
-            if self.application:
-                parts.append(self.application.strip())
-            if self.sub_application:
-                parts.append(self.sub_application.strip())
-            if self.dmr is not None and not (isinstance(self.dmr, float) and math.isnan(self.dmr)):
-                try:
-                    parts.append(f"DMR {int(float(self.dmr))} mm")
-                except Exception:
-                    parts.append(f"DMR {self.dmr}")
-            label = " – ".join(parts) if parts else "Machine"
-
-        # ============================================================================
-        # INITIALIZATION AND DATA PREPARATION
-        # ============================================================================
-        
-        months = int(years) * 12
-        hrs_per_month = float(hrs_per_year) / 12.0
-
-        # Extract and validate machine specifications
-        power_kw = 0.0 if (self.power_consumption_total_kw is None or math.isnan(self.power_consumption_total_kw)) else float(self.power_consumption_total_kw)
-        water_lps = 0.0 if (self.op_water_l_s is None or math.isnan(self.op_water_l_s)) else float(self.op_water_l_s)
-        water_lpej = 0.0 if (self.op_water_l_it_eject is None or math.isnan(self.op_water_l_it_eject)) else float(self.op_water_l_it_eject)
-        dmr_mm = float('nan') if (self.dmr is None or (isinstance(self.dmr, float) and math.isnan(self.dmr))) else float(self.dmr)
-        listprice = 0.0 if (self.list_price is None or math.isnan(self.list_price)) else float(self.list_price)
-        drive_str = (self.drive_type or "").lower()
-
-        # ============================================================================
-        # Ca - ACQUISITION COSTS (One-time, Month 0)
-        # ============================================================================
-        
-        Ca = listprice  # Machine acquisition cost
-
-        # ============================================================================
-        # Cc - COMMISSIONING COSTS (One-time, Month 0)
-        # ============================================================================
-        
-        # Training costs
-        training_total = training_cost
-        
-        # Construction costs (cost per kg × machine weight)
-        construction_total = construction_cost_per_kg * self.total_weight_kg
-        
-        Cc = training_total + construction_total
+            label = self.default_label()
 
         # ============================================================================
-        # Cm - MAINTENANCE COSTS (Periodic)
+        # COST MODEL (closed form for lazy flat prices, otherwise the vectorized kernel)
         # ============================================================================
-        
-        # Base service cost based on DMR size
-        base_service_cost = self.service_price_from_dmr(dmr_mm)
-        
-        # Additional cost for flat-belt drives
-        is_flat_belt = ("flat" in drive_str) and ("belt" in drive_str)
-        drivetype_extra_per_service = 2000.0 if is_flat_belt else 0.0
-        
-        # Service tracking variables
-        hours_since_service = 0.0
-        months_since_service = 0
-        
-        # Cleaning tracking variables
-        hours_since_cleaning = 0.0
 
-        # ============================================================================
-        # Co - OPERATING COSTS (Monthly)
-        # ============================================================================
-        
-        # Apply efficiency factors to power consumption
-        efficiency_factor = 1.0
-        
-        # Flat-belt drives: +1% energy consumption
-        if is_flat_belt:
-            efficiency_factor += 0.01
-        
-        # IE3 efficiency: -1% energy consumption
-        if self.motor_efficiency and "IE3" in str(self.motor_efficiency).upper():
-            efficiency_factor -= 0.01
-        
-        # Apply efficiency factor to power consumption
-        adjusted_power_kw = power_kw * efficiency_factor
-        
-        # Calculate cleaning costs
-        # Every 10 hours: 2 hours downtime + cleaning agent costs
-        cleaning_interval_hours = 10.0
-        cleaning_downtime_hours = 2.0
-        cleaning_cost_per_cycle = self.bowl_volume_lit * cost_cleaning_eur_per_lit
-        
-        # Calculate unplanned downtime costs
-        # 2% of operation hours per year
-        unplanned_downtime_hours_per_year = hrs_per_year * unplanned_downtime
-        # Note: Unplanned downtime cost would need production value per hour
-        # For now, we'll track the downtime hours but not apply a cost
-
-        # ============================================================================
-        # CUMULATIVE COST TRACKING
-        # ============================================================================
-        
-        cum_Ca = Ca
-        cum_Cc = Cc
-        cum_Co = 0.0
-        cum_Cm = 0.0
-
-        monthly_cum_total: List[float] = []
-        # Month 0: Record upfront costs
-        monthly_cum_total.append(cum_Ca + cum_Cc + cum_Co + cum_Cm)
-
-        # ============================================================================
-        # MONTHLY ITERATION (Months 1 to N)
-        # ============================================================================
-        
-        for _m in range(1, months + 1):
-            # Co - OPERATING COSTS (Monthly)
-            # ===============================
-            
-            # Calculate effective operation hours (accounting for cleaning downtime)
-            effective_hrs_per_month = hrs_per_month
-            
-            # Check for cleaning requirement
-            hours_since_cleaning += hrs_per_month
-            cleaning_cycles_this_month = 0
-            
-            while hours_since_cleaning >= cleaning_interval_hours:
-                # Apply cleaning cost
-                cum_Co += cleaning_cost_per_cycle
-                cleaning_cycles_this_month += 1
-                hours_since_cleaning -= cleaning_interval_hours
-                
-                # Reduce effective operation hours by cleaning downtime
-                effective_hrs_per_month -= cleaning_downtime_hours
-            
-            # Ensure effective hours don't go negative
-            effective_hrs_per_month = max(0.0, effective_hrs_per_month)
-            
-            # Electricity costs (using adjusted power consumption)
-            energy_kwh = adjusted_power_kw * effective_hrs_per_month
-            electricity_cost = energy_kwh * float(electricity_eur_per_kwh)
-            
-            # Water costs (from continuous flow, using effective hours)
-            water_l_from_flow = water_lps * (effective_hrs_per_month * 3600.0)
-            water_cost = water_l_from_flow * float(water_eur_per_l)
-            
-            # Monthly operating cost
-            Co_month = electricity_cost + water_cost
-            cum_Co += Co_month
-
-            # Cm - MAINTENANCE COSTS (Periodic)
-            # ==================================
-            
-            # Accumulate service counters (using effective hours)
-            hours_since_service += effective_hrs_per_month
-            months_since_service += 1
-
-            # Service trigger: earliest of 8000 hours OR 24 months
-            need_service = (hours_since_service >= 8000.0) or (months_since_service >= 24)
-
-            if need_service:
-                # Apply service cost
-                service_cost = base_service_cost + drivetype_extra_per_service
-                cum_Cm += service_cost
-                
-                # Reset service counters
-                hours_since_service = 0.0
-                months_since_service = 0
+        months = int(years) * 12
+        basis = cost_basis(
+            self,
+            training_cost=training_cost,
+            construction_cost_per_kg=construction_cost_per_kg,
+            cost_cleaning_eur_per_lit=cost_cleaning_eur_per_lit,
+            label=label,
+        )
+        flat = (
+            schedule == "monthly"
+            and is_scalar_price(electricity_eur_per_kwh)
+            and is_scalar_price(water_eur_per_l)
+            and not (electricity_escalation_pct or water_escalation_pct or discount_rate)
+        )
 
-            # Record cumulative total for this month
-            monthly_cum_total.append(cum_Ca + cum_Cc + cum_Co + cum_Cm)
+        if lazy and flat:
+            # The kernel's model in closed form, evaluated per month on demand
+            series = closed_form_series(
+                basis,
+                hrs_per_year,
+                months=months,
+                electricity_eur_per_kwh=float(electricity_eur_per_kwh),
+                water_eur_per_l=float(water_eur_per_l),
+            )
+            return LazyTCO(
+                label,
+                series,
+                ca=basis.ca,
+                cc=basis.cc,
+                co=series.operating(months),
+                cm=series.maintenance(months),
+                needed_hours_per_day=needed_hours_per_day,
+                available_hours_per_day=available_hours_per_day,
+                hours_per_year=float(hrs_per_year),
+            )
 
-        # ============================================================================
-        # RETURN TCO OBJECT
-        # ============================================================================
-        
-        return TCO(
-            label=label,
-            monthly_cum_total=monthly_cum_total,
-            ca=cum_Ca,
-            cc=cum_Cc,
-            co=cum_Co,
-            cm=cum_Cm,
+        prices = dict(
+            electricity_eur_per_kwh=price_curve(electricity_eur_per_kwh, months, escalation_pct=electricity_escalation_pct)[None, :],
+            water_eur_per_l=price_curve(water_eur_per_l, months, escalation_pct=water_escalation_pct)[None, :],
+            discount_rate=discount_rate,
+        )
+        if schedule == "daily":
+            series = simulate_daily(
+                basis,
+                hrs_per_year,
+                months=months,
+                workdays_per_week=workdays_per_week,
+                start_date=start_date,
+                **prices,
+            )
+        else:
+            series = simulate_batch(basis, hrs_per_year, months=months, **prices)
+        return (LazyTCO if lazy else TCO)(
+            label,
+            series.cum_total[0] if lazy else series.cum_total[0].tolist(),
+            ca=basis.ca,
+            cc=basis.cc,
+            co=float(series.co[0]),
+            cm=float(series.cm[0]),
             needed_hours_per_day=needed_hours_per_day,
             available_hours_per_day=available_hours_per_day,
             hours_per_year=float(hrs_per_year),
+            discount_rate=float(discount_rate) if discount_rate else None,
         )
 
+    def default_label(self) -> str:
+        """Human-readable label, e.g. "Wine – Clarific. of Sparkling Wine – DMR 312 mm"."""
+        parts = []
+        if self.application:
+            parts.append(self.application.strip())
+        if self.sub_application:
+            parts.append(self.sub_application.strip())
+        if self.dmr is not None and not (isinstance(self.dmr, float) and math.isnan(self.dmr)):
+            try:
+                parts.append(f"DMR {int(float(self.dmr))} mm")
+            except Exception:
+                parts.append(f"DMR {self.dmr}")
+        return " – ".join(parts) if parts else "Machine"
+
     def service_price_from_dmr(self, dmr_mm: float) -> float:
         """
         DMR bands:
@@ -0,0 +1,364 @@
+"""
+Magic Fill model calls: providers, a result cache and a bounded batch runner.
+
+A Magic Fill extraction is the rule-based pass (``extract.py``) plus, for the
+fields it leaves open, one language model call. This module owns the model
+side:
+
+- providers: ``OpenAIProvider`` (one shared async client, no blocking calls on
+  the event loop) and ``StubProvider`` (canned answers, no network; for tests
+  and offline demos)
+- ``ExtractionCache``: LRU cache of model answers keyed by text and requested
+  fields, so re-imported leads cost nothing
+- ``call_with_retry``: exponential backoff with full jitter on transient
+  provider errors (rate limits, timeouts, connection and server errors)
+- ``run_batch``: many texts with duplicates collapsed, cache hits answered
+  first, and the rest fanned out under a concurrency limit, yielding results
+  as they complete
+
+Which fields to request and how to coerce answers is the caller's business,
+passed in as ``plan`` and ``coerce``.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import random
+
+# plan(text) -> (locally resolved fields, fields to ask the model for)
+Plan = Callable[[str], Tuple[Dict[str, object], List[str]]]
+Coerce = Callable[[dict], dict]
+
+
+class TransientProviderError(Exception):
+    """A provider failure worth retrying (rate limit, timeout, 5xx)."""
+
+
+class MagicProvider(ABC):
+    """Answers a request for some project fields of a text with raw JSON values."""
+
+    name = "provider"
+
+    @abstractmethod
+    async def extract(self, text: str, fields: List[str]) -> dict:
+        """
+        Raw values of ``fields`` found in ``text`` (null for fields not found).
+
+        Raises:
+            TransientProviderError: A failure worth retrying
+        """
+
+
+def _strip_fences(content: str) -> str:
+    # Some models wrap JSON in code fences
+    cleaned = content.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.strip("`")
+        if cleaned.lower().startswith("json"):
+            cleaned = cleaned[4:]
+        cleaned = cleaned.strip()
+    return cleaned
+
+
+class OpenAIProvider(MagicProvider):
+    """
+    Chat completion provider with one shared async client.
+
+    Args:
+        api_key: OpenAI API key
+        prompt: Builds the system prompt for the requested fields
+        model: Chat model
+        max_tokens: Completion limit
+        timeout: Request timeout (seconds)
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        prompt: Callable[[List[str]], str],
+        *,
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 500,
+        timeout: float = 30.0,
+    ):
+        from openai import AsyncOpenAI
+
+        # Retries are done by call_with_retry, with jitter shared across a batch
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0, timeout=timeout)
+        self.prompt = prompt
+        self.model = model
+        self.max_tokens = max_tokens
+
+    async def extract(self, text: str, fields: List[str]) -> dict:
+        """
+        Raises:
+            TransientProviderError: Rate limit, timeout, connection or server error
+            json.JSONDecodeError: The model did not return valid JSON
+        """
+        import openai
+
+        try:
+            chat = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.prompt(fields)},
+                    {"role": "user", "content": f"Extract fields from the following text:\n\n{text.strip()}"},
+                ],
+                temperature=0.2,
+                max_tokens=self.max_tokens,
+            )
+        except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            raise TransientProviderError(str(e)) from e
+        content = chat.choices[0].message.content if chat.choices else "{}"
+        return json.loads(_strip_fences(content or "{}")) or {}
+
+
+class StubProvider(MagicProvider):
+    """
+    Offline provider with canned answers.
+
+    Args:
+        answers: Field -> value returned whenever the field is requested (others are null)
+        delay: Seconds each call takes
+        transient_failures: Number of initial calls that fail with TransientProviderError
+    """
+
+    name = "stub"
+
+    def __init__(self, answers: Optional[Dict[str, object]] = None, *, delay: float = 0.0, transient_failures: int = 0):
+        self.answers = dict(answers or {})
+        self.delay = delay
+        self.transient_failures = transient_failures
+        self.calls: List[Tuple[str, List[str]]] = []
+
+    async def extract(self, text: str, fields: List[str]) -> dict:
+        self.calls.append((text, list(fields)))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.transient_failures > 0:
+            self.transient_failures -= 1
+            raise TransientProviderError("stub: simulated transient failure")
+        return {name: self.answers.get(name) for name in fields}
+
+
+def normalize_text(text: str) -> str:
+    """Text as compared for duplicates (line endings and outer whitespace ignored)."""
+    return "\n".join(line.rstrip() for line in text.strip().replace("\r\n", "\n").replace("\r", "\n").split("\n"))
+
+
+class ExtractionCache:
+    """
+    LRU cache of coerced model answers.
+
+    Args:
+        max_entries: Entries kept before the least recently used is dropped
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, fields: List[str]) -> str:
+        payload = json.dumps([normalize_text(text), sorted(fields)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, fields: List[str]) -> Optional[dict]:
+        key = self.key(text, fields)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return dict(self._entries[key])
+
+    def put(self, text: str, fields: List[str], answer: dict) -> None:
+        key = self.key(text, fields)
+        self._entries[key] = dict(answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+async def call_with_retry(
+    provider: MagicProvider,
+    text: str,
+    fields: List[str],
+    *,
+    attempts: int = 4,
+    base_delay: float = 0.5,
+    max_delay: float = 8.0,
+) -> Tuple[dict, int]:
+    """
+    Call a provider, backing off on transient errors.
+
+    The n-th retry waits a random time up to ``min(max_delay, base_delay * 2**n)``
+    (full jitter), so a batch that hits a rate limit does not retry in lockstep.
+
+    Returns:
+        (raw answer, attempts made)
+
+    Raises:
+        TransientProviderError: Still failing after ``attempts`` calls
+        Exception: Any non-transient provider error, at once
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await provider.extract(text, fields), attempt
+        except TransientProviderError:
+            if attempt == attempts:
+                raise
+            await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1))))
+    raise AssertionError("unreachable")
+
+
+@dataclass
+class MagicResult:
+    """Outcome of one Magic Fill extraction."""
+    local: Dict[str, object]                    # fields the rule-based pass resolved
+    requested: List[str]                        # fields the model was (or would have been) asked for
+    from_model: Dict[str, object] = field(default_factory=dict)
+    source: str = "local"                       # local | cache | model
+    attempts: int = 0                           # provider calls made
+    error: Optional[str] = None
+
+    @property
+    def parsed(self) -> Dict[str, object]:
+        # Local values always win over the model's
+        return {**self.from_model, **self.local}
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["parsed"] = self.parsed
+        return d
+
+
+async def magic_extract(
+    text: str,
+    plan: Plan,
+    coerce: Coerce,
+    provider: Optional[MagicProvider],
+    *,
+    cache: Optional[ExtractionCache] = None,
+    attempts: int = 4,
+    base_delay: float = 0.5,
+) -> MagicResult:
+    """
+    Extract one text: rule-based pass, then cache, then the provider.
+
+    Without a provider only the local values are returned.
+
+    Raises:
+        TransientProviderError, json.JSONDecodeError, ...: Provider errors after retries
+    """
+    local, requested = plan(text)
+    result = MagicResult(local=local, requested=list(requested))
+    if not requested or provider is None:
+        return result
+    cached = cache.get(text, requested) if cache is not None else None
+    if cached is not None:
+        result.from_model, result.source = cached, "cache"
+        return result
+    raw, result.attempts = await call_with_retry(provider, text, requested, attempts=attempts, base_delay=base_delay)
+    result.from_model = {k: v for k, v in coerce(raw or {}).items() if k in requested}
+    result.source = "model"
+    if cache is not None:
+        cache.put(text, requested, result.from_model)
+    return result
+
+
+async def run_batch(
+    texts: List[str],
+    plan: Plan,
+    coerce: Coerce,
+    provider: Optional[MagicProvider],
+    *,
+    cache: Optional[ExtractionCache] = None,
+    concurrency: int = 8,
+    attempts: int = 4,
+    base_delay: float = 0.5,
+) -> AsyncIterator[Tuple[List[int], MagicResult]]:
+    """
+    Extract many texts, yielding results as they complete.
+
+    Identical texts (after ``normalize_text``) are extracted once and yielded
+    together with all their indices. Texts that need no model call or hit the
+    cache come first; the rest run at most ``concurrency`` at a time. A text
+    whose extraction fails is yielded with ``error`` set and does not stop the
+    others.
+
+    Args:
+        texts: Texts to extract
+        plan: Local pass, returning (resolved fields, fields to request)
+        coerce: Sanitizes a raw model answer
+        provider: Model provider (None: local values only)
+        cache: Answer cache shared across batches
+        concurrency: Provider calls in flight at most
+        attempts: Provider calls per text before giving up on transient errors
+        base_delay: First backoff delay (seconds)
+
+    Yields:
+        (indices into ``texts``, result)
+    """
+    groups: "OrderedDict[str, List[int]]" = OrderedDict()
+    for i, text in enumerate(texts):
+        groups.setdefault(normalize_text(text), []).append(i)
+
+    pending: List[Tuple[List[int], str, MagicResult]] = []
+    for text, indices in groups.items():
+        try:
+            local, requested = plan(text)
+        except Exception as e:
+            yield indices, MagicResult(local={}, requested=[], error=str(e))
+            continue
+        result = MagicResult(local=local, requested=list(requested))
+        cached = cache.get(text, requested) if cache is not None and requested and provider is not None else None
+        if cached is not None:
+            result.from_model, result.source = cached, "cache"
+        if not requested or provider is None or cached is not None:
+            yield indices, result
+        else:
+            pending.append((indices, text, result))
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def extract(indices: List[int], text: str, result: MagicResult):
+        async with semaphore:
+            try:
+                raw, result.attempts = await call_with_retry(
+                    provider, text, result.requested, attempts=attempts, base_delay=base_delay
+                )
+                result.from_model = {k: v for k, v in coerce(raw or {}).items() if k in result.requested}
+                result.source = "model"
+                if cache is not None:
+                    cache.put(text, result.requested, result.from_model)
+            except asyncio.CancelledError:
+                raise
+            except TransientProviderError as e:
+                result.attempts = attempts
+                result.error = f"Gave up after {attempts} attempts: {e}"
+            except json.JSONDecodeError:
+                result.error = "Model did not return valid JSON"
+            except Exception as e:
+                result.error = str(e) or type(e).__name__
+        return indices, result
+
+    tasks = [asyncio.ensure_future(extract(*item)) for item in pending]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        # A client that stops reading the stream cancels the calls still queued
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,311 @@
+"""
+Portfolio TCO across many projects.
+
+Projects are grouped by application/sub-application so the application match
+runs once per group; the remaining per-project rules then only look at that
+group's candidates. Each project evaluates all of its relevant machines in one
+call of the batch kernel (one machine per kernel scenario), and groups are
+spread over a process pool, so the work scales with the number of cores.
+
+A server shares one long-lived pool between calls: ``configure_pool`` sizes
+it, the first call that needs it starts it, and ``shutdown_pool`` stops it.
+Without ``configure_pool`` every call starts a pool of its own.
+"""
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import math
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+try:
+    from .jobs import report_progress
+    from .kernel import cost_basis, hours_per_year_from_throughput, simulate_batch, stack_bases
+    from .machine_data import MachineData
+    from .pricing import price_curve
+    from .rules import machine_meets_project_constraints, matches_application
+except ImportError:
+    from jobs import report_progress
+    from kernel import cost_basis, hours_per_year_from_throughput, simulate_batch, stack_bases
+    from machine_data import MachineData
+    from pricing import price_curve
+    from rules import machine_meets_project_constraints, matches_application
+
+# Below this many projects a process pool costs more than it saves
+_MIN_PROJECTS_FOR_POOL = 16
+
+# Pool shared by the portfolio_tco calls of this process (see configure_pool), started
+# on first use, and the process that configured it: a forked child must not use it
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_workers: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    """forkserver (or spawn) workers do not inherit the threads, locks and sockets of a server the way fork does."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def configure_pool(max_workers: Optional[int] = None) -> None:
+    """
+    Let every ``portfolio_tco`` call of this process share one process pool.
+
+    The pool starts with the first call that needs worker processes, so a
+    server process that never runs a large bulk TCO starts none.
+
+    Args:
+        max_workers: Worker processes (defaults to the number of CPUs)
+    """
+    global _pool_pid, _pool_workers
+    shutdown_pool()
+    _pool_pid = os.getpid()
+    _pool_workers = max_workers or os.cpu_count() or 1
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes of the shared pool, cancelling queued tasks, and stop sharing one."""
+    global _pool, _pool_pid, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = _pool_pid = _pool_workers = None
+
+
+def _shared_pool() -> Optional[ProcessPoolExecutor]:
+    """The shared pool, started on first use; None unless ``configure_pool`` ran in this process."""
+    global _pool
+    if _pool_pid != os.getpid():
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=_pool_context())
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken shared pool; the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+@dataclass
+class PortfolioSettings:
+    """Overrides shared by all projects; None falls back to each project's own value."""
+    years: Optional[int] = None
+    electricity_eur_per_kwh: Optional[Union[float, Sequence[float]]] = None
+    water_eur_per_l: Optional[Union[float, Sequence[float]]] = None
+    workdays_per_week: Optional[int] = None
+    operation_hours_per_year: Optional[float] = None
+    operation_hours_per_day: Optional[float] = None
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
+    training_cost: float = 0.0
+
+
+@dataclass
+class ProjectPortfolioEntry:
+    """TCO summary of one project: the cheapest machine and every relevant machine's total."""
+    project_name: str
+    application: str
+    sub_application: str
+    relevant_machines: int
+    winner: Optional[Dict[str, Any]]        # {"langtyp", "label", "total", "hours_per_day"}
+    totals: List[Dict[str, Any]]            # [{"langtyp", "label", "total"}], ascending
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class PortfolioResult:
+    """Per-project entries plus portfolio-level figures."""
+    entries: List[ProjectPortfolioEntry]
+    portfolio_total: float                  # sum of the winners' totals
+    projects_without_machine: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entries": [e.to_dict() for e in self.entries],
+            "portfolio_total": self.portfolio_total,
+            "projects_without_machine": self.projects_without_machine,
+        }
+
+
+def _project_entry(project, candidates: List[MachineData], settings: PortfolioSettings) -> ProjectPortfolioEntry:
+    """Filter a group's candidates for one project and evaluate them in a single kernel call."""
+    entry = ProjectPortfolioEntry(
+        project_name=project.project_name,
+        application=project.application,
+        sub_application=project.sub_application,
+        relevant_machines=0,
+        winner=None,
+        totals=[],
+    )
+    try:
+        throughput = project.customer_throughput_per_day
+        # Same 20 h/day default cap as the project TCO endpoint when working from throughput
+        hours_per_day = settings.operation_hours_per_day
+        if hours_per_day is None and throughput is not None:
+            hours_per_day = 20.0
+
+        machines = [
+            m for m in candidates
+            if machine_meets_project_constraints(m, project, operation_hours_per_day=hours_per_day)
+        ]
+        entry.relevant_machines = len(machines)
+        if not machines:
+            return entry
+
+        years = settings.years if settings.years is not None else project.years
+        months = int(years) * 12
+        electricity = (
+            settings.electricity_eur_per_kwh
+            if settings.electricity_eur_per_kwh is not None
+            else project.energy_price_eur_per_kwh
+        )
+        water = settings.water_eur_per_l if settings.water_eur_per_l is not None else project.water_price_eur_per_l
+        workdays = settings.workdays_per_week if settings.workdays_per_week is not None else project.workdays_per_week
+
+        if settings.operation_hours_per_year is not None:
+            hours = np.full(len(machines), float(settings.operation_hours_per_year))
+        elif throughput is not None:
+            hours = np.array([
+                float(hours_per_year_from_throughput(
+                    m.capacity_max_inp if not math.isnan(m.capacity_max_inp) else 0.0,
+                    throughput,
+                    workdays_per_week=workdays,
+                    operation_hours_per_day=hours_per_day,
+                ))
+                for m in machines
+            ])
+        elif hours_per_day is not None:
+            hours = np.full(len(machines), float(hours_per_day) * workdays * 52)
+        else:
+            raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
+
+        series = simulate_batch(
+            stack_bases(cost_basis(m, training_cost=settings.training_cost) for m in machines),
+            hours,
+            months=months,
+            electricity_eur_per_kwh=price_curve(electricity, months, escalation_pct=settings.electricity_escalation_pct)[None, :],
+            water_eur_per_l=price_curve(water, months, escalation_pct=settings.water_escalation_pct)[None, :],
+            discount_rate=settings.discount_rate,
+        )
+        totals = series.total
+        order = np.argsort(totals, kind="stable")
+        entry.totals = [
+            {"langtyp": machines[i].langtyp, "label": machines[i].default_label(), "total": float(totals[i])}
+            for i in order
+        ]
+        best = int(order[0])
+        entry.winner = {
+            **entry.totals[0],
+            "hours_per_day": float(hours[best]) / (workdays * 52) if workdays else 0.0,
+        }
+    except ValueError as e:
+        entry.error = str(e)
+    return entry
+
+
+def _evaluate_group(task: Tuple[List[Any], List[MachineData], PortfolioSettings]) -> List[ProjectPortfolioEntry]:
+    projects, candidates, settings = task
+    return [_project_entry(project, candidates, settings) for project in projects]
+
+
+def _map_groups(pool: Executor, payloads: List[Any], limit: int) -> Iterator[List[ProjectPortfolioEntry]]:
+    """``pool.map(_evaluate_group, payloads)`` with at most ``limit`` tasks in flight, as a shared pool serves other calls too."""
+    remaining = iter(payloads)
+    pending = deque(pool.submit(_evaluate_group, payload) for _, payload in zip(range(limit), remaining))
+    while pending:
+        result = pending.popleft().result()
+        for payload in remaining:
+            pending.append(pool.submit(_evaluate_group, payload))
+            break
+        yield result
+
+
+def portfolio_tco(
+    projects: Sequence,
+    machines: List[MachineData],
+    settings: Optional[PortfolioSettings] = None,
+    *,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 32,
+) -> PortfolioResult:
+    """
+    Compute TCO winners and totals for many projects.
+
+    Args:
+        projects: Project objects
+        machines: Machine catalog
+        settings: Shared overrides (defaults to every project's own values)
+        max_workers: Worker processes (defaults to the number of CPUs, or the size of
+            the ``configure_pool`` pool; 1 runs inline)
+        chunk_size: Maximum projects per task, so large groups still spread over workers
+
+    Returns:
+        PortfolioResult with one entry per project, in input order. Projects whose
+        inputs are invalid (e.g. a price curve that does not fit their horizon)
+        carry an ``error`` instead of a winner.
+    """
+    settings = settings or PortfolioSettings()
+
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, project in enumerate(projects):
+        groups.setdefault((project.application.lower(), project.sub_application.lower()), []).append(i)
+
+    tasks: List[Tuple[List[int], Tuple[List[Any], List[MachineData], PortfolioSettings]]] = []
+    for members in groups.values():
+        candidates = [m for m in machines if matches_application(m, projects[members[0]])]
+        for start in range(0, len(members), max(1, chunk_size)):
+            chunk = members[start:start + chunk_size]
+            tasks.append((chunk, ([projects[i] for i in chunk], candidates, settings)))
+
+    shared = _pool_pid == os.getpid()
+    workers = max_workers or (_pool_workers if shared else None) or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    payloads = [payload for _, payload in tasks]
+    outputs: List[List[ProjectPortfolioEntry]] = []
+    if workers <= 1 or len(projects) < _MIN_PROJECTS_FOR_POOL:
+        for payload in payloads:
+            outputs.append(_evaluate_group(payload))
+            report_progress(len(outputs) / len(tasks))
+    elif not shared:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as own_pool:
+            for group_entries in _map_groups(own_pool, payloads, workers):
+                outputs.append(group_entries)
+                report_progress(len(outputs) / len(tasks))
+    else:
+        pool = _shared_pool()
+        try:
+            for group_entries in _map_groups(pool, payloads, workers):
+                outputs.append(group_entries)
+                report_progress(len(outputs) / len(tasks))
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); replace the pool so later calls work again
+            _discard_pool(pool)
+            raise
+
+    entries: List[Optional[ProjectPortfolioEntry]] = [None] * len(projects)
+    for (indices, _), group_entries in zip(tasks, outputs):
+        for i, entry in zip(indices, group_entries):
+            entries[i] = entry
+
+    return PortfolioResult(
+        entries=entries,
+        portfolio_total=float(sum(e.winner["total"] for e in entries if e.winner)),
+        projects_without_machine=sum(1 for e in entries if e.winner is None),
+    )
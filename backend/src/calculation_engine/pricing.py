@@ -0,0 +1,68 @@
+"""
+Time-varying prices and discounting for TCO.
+
+Turns the price inputs customers quote (a flat rate, a yearly escalation, an
+explicit per-year or per-month tariff curve) into one price per month, and
+provides the monthly discount factors used for NPV. Everything is a numpy
+array so the kernel can apply prices element-wise to the monthly kWh and
+litre series.
+"""
+
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+PriceInput = Union[float, Sequence[float]]
+
+
+def is_scalar_price(price: PriceInput) -> bool:
+    """True for a single flat price (the classic ``calculate_toc`` input)."""
+    return np.ndim(price) == 0
+
+
+def price_curve(price: PriceInput, months: int, *, escalation_pct: float = 0.0) -> np.ndarray:
+    """
+    Expand a price input to one price per month (months 1..N).
+
+    Args:
+        price: Flat price, per-year curve (one value per year) or per-month
+            curve (one value per month)
+        months: Horizon in months
+        escalation_pct: Yearly escalation as a fraction (0.03 = +3 % per year),
+            compounded from year 2 on top of the flat price or curve
+
+    Returns:
+        Array of length ``months``
+
+    Raises:
+        ValueError: If a curve length matches neither the years nor the months of the horizon
+    """
+    values = np.asarray(price, dtype=float)
+    years = -(-months // 12)
+    year_index = np.arange(months) // 12
+
+    if values.ndim == 0:
+        curve = np.full(months, float(values))
+    elif values.ndim == 1 and values.size == months:
+        curve = values.copy()
+    elif values.ndim == 1 and values.size == years:
+        curve = values[year_index]
+    else:
+        raise ValueError(
+            f"Price curve has {values.size} values; expected {years} (per year) or {months} (per month)"
+        )
+
+    if escalation_pct:
+        curve *= (1.0 + float(escalation_pct)) ** year_index
+    return curve
+
+
+def discount_factors(months: int, discount_rate: Optional[float]) -> Optional[np.ndarray]:
+    """
+    Present-value factor for each month 1..N at a yearly ``discount_rate``.
+
+    Returns None when there is nothing to discount so callers can skip the multiply.
+    """
+    if not discount_rate:
+        return None
+    return (1.0 + float(discount_rate)) ** (-np.arange(1, months + 1) / 12.0)
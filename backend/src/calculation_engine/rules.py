@@ -0,0 +1,157 @@
+"""
+Per-machine project rules shared by the filter and its consumers.
+
+Application matching, the solids, throughput, protection class, motor
+efficiency and size/weight rules of ``filter_machines_for_project``, and the
+small value helpers (finite floats, NaN-aware equality) that the catalog,
+alternatives, diagnostics, change and impact analyses apply the same way.
+"""
+
+from typing import Optional
+import math
+
+try:
+    from .machine_data import MachineData
+except ImportError:
+    from machine_data import MachineData
+
+
+def finite(x, default: Optional[float] = None) -> Optional[float]:
+    """``x`` as a float, or ``default`` if it is missing, not a number, NaN or infinite."""
+    try:
+        x = float(x)
+    except (TypeError, ValueError):
+        return default
+    return x if math.isfinite(x) else default
+
+
+def same(a, b) -> bool:
+    """Equality where NaN equals NaN (a value that stays NaN is not a change)."""
+    return a == b or (a != a and b != b)
+
+
+def matches_application(machine: MachineData, project) -> bool:
+    """Application and sub-application match (case-insensitive, either side may contain the other)."""
+    if (project.application.lower() not in machine.application.lower() and
+        machine.application.lower() not in project.application.lower()):
+        return False
+    if (project.sub_application.lower() not in machine.sub_application.lower() and
+        machine.sub_application.lower() not in project.sub_application.lower()):
+        return False
+    return True
+
+
+def protection_class_meets_requirement(machine_class: str, project_class: str) -> bool:
+    """Check if machine protection class meets project requirements."""
+    if not machine_class or not project_class:
+        return True  # If either is missing, assume it's acceptable
+    
+    # Simple string comparison for now - could be enhanced with proper IP rating logic
+    return machine_class.lower() >= project_class.lower()
+
+
+# Motor efficiency classes, lowest first; the rank of a machine without a rating,
+# and of one whose rating cannot be parsed (it meets any requirement)
+EFFICIENCY_ORDER = ["ie1", "ie2", "ie3", "ie4", "ie5"]
+EFFICIENCY_MISSING = -1
+EFFICIENCY_UNPARSED = len(EFFICIENCY_ORDER)
+
+
+def efficiency_rank(efficiency: Optional[str]) -> int:
+    """Rank of a motor efficiency rating in ``EFFICIENCY_ORDER``."""
+    if not efficiency:
+        return EFFICIENCY_MISSING
+    return next((i for i, eff in enumerate(EFFICIENCY_ORDER) if eff in efficiency.lower()), EFFICIENCY_UNPARSED)
+
+
+def efficiency_floor(project_efficiency: Optional[str]) -> Optional[int]:
+    """
+    Lowest machine efficiency rank that meets a project's requirement; None without one.
+
+    A requirement that cannot be parsed still rules out machines without a rating.
+    """
+    if not project_efficiency:
+        return None
+    required = efficiency_rank(project_efficiency)
+    return 0 if required == EFFICIENCY_UNPARSED else required
+
+
+def motor_efficiency_meets_requirement(machine_efficiency: Optional[str], project_efficiency: Optional[str]) -> bool:
+    """Check if machine motor efficiency meets project requirements."""
+    floor = efficiency_floor(project_efficiency)
+    return floor is None or efficiency_rank(machine_efficiency) >= floor
+
+
+def machine_meets_project_constraints(
+    machine: MachineData,
+    project,
+    *,
+    operation_hours_per_day: Optional[float] = None,
+    check_throughput: bool = True,
+    check_weight: bool = True,
+) -> bool:
+    """
+    Shared validation to decide if a machine configuration is legit for a given project.
+
+    ``check_throughput=False`` and ``check_weight=False`` skip the rules a fleet
+    of several machines meets jointly rather than per machine (see fleet.py).
+
+    Rules:
+    - Application and sub-application compatibility are handled in caller.
+    - Solids percentage must be within machine's min/max range.
+    - Throughput feasibility considering daily operation cap (20 h/day) when project provides daily throughput.
+      If project provides customer_throughput_per_day > 0:
+        - Required hours per day = throughput_per_day / capacity_max_inp
+        - Must be <= 20 hours/day to be feasible
+    - Protection class and motor efficiency must meet/exceed requirements.
+    - Physical constraints: machine dimensions must fit within project's max length/width/height; weight <= maxWeight.
+    """
+    # Solids check
+    if not (machine.feed_solids_min_vol_perc <= project.solids_percentage <= machine.feed_solids_max_vol_perc):
+        return False
+
+    # Throughput vs hours/day cap (configurable, defaults to 20h if not provided)
+    try:
+        throughput_per_day = float(project.customer_throughput_per_day)
+    except Exception:
+        throughput_per_day = 0.0
+
+    if check_throughput and throughput_per_day > 0:
+        capacity_max = 0.0 if (machine.capacity_max_inp is None or math.isnan(machine.capacity_max_inp)) else float(machine.capacity_max_inp)
+        if capacity_max <= 0:
+            return False
+        required_hours_per_day = throughput_per_day / capacity_max
+        allowed_hours_per_day = float(operation_hours_per_day) if (operation_hours_per_day is not None and not math.isnan(float(operation_hours_per_day))) else 20.0
+        if required_hours_per_day > allowed_hours_per_day:
+            return False
+
+    # Protection class
+    if not protection_class_meets_requirement(machine.protection_class, project.protection_class):
+        return False
+
+    # Motor efficiency
+    if not motor_efficiency_meets_requirement(machine.motor_efficiency, project.motor_efficiency):
+        return False
+
+    # Physical constraints (allow zeros meaning no constraint)
+    try:
+        max_len = float(project.length_mm)
+        max_wid = float(project.width_mm)
+        max_hei = float(project.height_mm)
+        max_weight = float(project.weight_kg)
+    except Exception:
+        max_len = max_wid = max_hei = max_weight = 0.0
+
+    def is_positive(x: float) -> bool:
+        return isinstance(x, (int, float)) and not math.isnan(x) and x > 0
+
+    if is_positive(max_len) and machine.length_mm > max_len:
+        return False
+    if is_positive(max_wid) and machine.width_mm > max_wid:
+        return False
+    if is_positive(max_hei) and machine.height_mm > max_hei:
+        return False
+    if check_weight and is_positive(max_weight) and machine.total_weight_kg > max_weight:
+        return False
+
+    return True
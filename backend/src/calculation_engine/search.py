@@ -0,0 +1,218 @@
+"""
+Full-text and prefix search over projects.
+
+An in-process inverted index from tokens to the projects containing them,
+updated one project at a time. Tokens are case- and accent-folded words of
+the searchable fields; an email address is also indexed whole and by its
+domain, a phone number by its digits.
+
+A query matches the projects that contain every query token, either as a
+whole token or as a token prefix (so ``brau`` finds "Brauerei"). Ranking
+adds, per query token, the weight of the best field it matched in (project
+name > company > contact/email > application) times the token's inverse
+document frequency; exact matches count double a prefix match.
+
+Prefix lookups bisect a sorted vocabulary and expand to at most
+``max_expansions`` tokens. Ranking and paging work on sets of equally
+scored projects (set operations plus a heap for the page), so there is no
+per-project Python work beyond the page returned.
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Set, Tuple
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+
+try:
+    from .project import Project
+except ImportError:
+    from project import Project
+
+# Field -> ranking weight
+SEARCH_FIELDS = {
+    "project_name": 3.0,
+    "company_name": 2.5,
+    "contact_person": 2.0,
+    "email": 2.0,
+    "application": 1.5,
+    "sub_application": 1.0,
+    "telefon_nummer": 1.0,
+}
+_PREFIX_FACTOR = 0.5
+_WORD = re.compile(r"[0-9a-z]+")
+# Letters NFKD does not decompose
+_FOLD = str.maketrans({"ß": "ss", "æ": "ae", "ø": "o", "œ": "oe", "ł": "l"})
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold().translate(_FOLD))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Case- and accent-folded words of a text (what both documents and queries are split into)."""
+    return _WORD.findall(_fold(text or ""))
+
+
+def _field_tokens(name: str, value) -> Set[str]:
+    text = "" if value is None else str(value)
+    tokens = set(tokenize(text))
+    if name == "email" and "@" in text:
+        email = _fold(text.strip())
+        tokens.update((email, email.split("@", 1)[1]))
+    elif name == "telefon_nummer":
+        digits = "".join(ch for ch in text if ch.isdigit())
+        if digits:
+            tokens.add(digits)
+    return tokens
+
+
+@dataclass
+class SearchHit:
+    """One ranked search result."""
+    project_name: str
+    score: float
+    matched_fields: List[str]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ProjectIndex:
+    """
+    Inverted index over projects, keyed by project name.
+
+    Postings keep the projects of a token grouped by the weight they match
+    with. A document's score only depends on which weight it matched each
+    query token with, so ranking works on a handful of set intersections
+    instead of on every matching project.
+
+    Args:
+        max_expansions: Vocabulary tokens a query prefix may expand to
+    """
+
+    def __init__(self, max_expansions: int = 64):
+        self.max_expansions = max_expansions
+        self._postings: Dict[str, Dict[float, Set[str]]] = {}          # token -> weight -> keys
+        self._vocabulary: List[str] = []                                # sorted tokens
+        self._documents: Dict[str, Dict[str, Tuple[float, str]]] = {}   # key -> token -> (weight, field)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, key: str, project: Project) -> None:
+        """Index a project under ``key``, replacing what was indexed for it before."""
+        self.remove(key)
+        best: Dict[str, Tuple[float, str]] = {}
+        for name, weight in SEARCH_FIELDS.items():
+            for token in _field_tokens(name, getattr(project, name, None)):
+                if weight > best.get(token, (0.0, ""))[0]:
+                    best[token] = (weight, name)
+        for token, (weight, _) in best.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings.setdefault(weight, set()).add(key)
+        self._documents[key] = best
+
+    def remove(self, key: str) -> None:
+        """Drop a project from the index (no-op if it is not indexed)."""
+        for token, (weight, _) in self._documents.pop(key, {}).items():
+            postings = self._postings[token]
+            postings[weight].discard(key)
+            if not postings[weight]:
+                del postings[weight]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _matches(self, term: str) -> Dict[float, Set[str]]:
+        """Disjoint weight classes of the projects matching a query term (as a token or a prefix)."""
+        classes = list(self._postings.get(term, {}).items())
+        start = bisect.bisect_right(self._vocabulary, term)
+        for token in self._vocabulary[start:start + self.max_expansions]:
+            if not token.startswith(term):
+                break
+            classes.extend((weight * _PREFIX_FACTOR, keys) for weight, keys in self._postings[token].items())
+        if len(classes) <= 1:
+            return dict(classes)
+
+        # A project matching through several tokens counts with its best weight
+        merged: Dict[float, Set[str]] = {}
+        seen: Set[str] = set()
+        for weight, keys in sorted(classes, key=lambda c: -c[0]):
+            new = keys - seen
+            if new:
+                seen |= new
+                merged[weight] = merged[weight] | new if weight in merged else new
+        return merged
+
+    def _matched_fields(self, key: str, terms: List[str]) -> List[str]:
+        fields = []
+        tokens = self._documents[key]
+        for term in terms:
+            _, name = max(
+                (entry for token, entry in tokens.items() if token.startswith(term)),
+                key=lambda entry: entry[0],
+            )
+            if name not in fields:
+                fields.append(name)
+        return fields
+
+    def search(self, query: str, *, limit: int = 20, offset: int = 0) -> Tuple[int, List[SearchHit]]:
+        """
+        Rank the projects matching every token of ``query``.
+
+        Args:
+            query: Free text (names, companies, people, emails, phone numbers, applications)
+            limit: Page size
+            offset: Hits to skip
+
+        Returns:
+            (total number of matches, hits of the requested page, best first, ties by name)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        per_term = [self._matches(term) for term in terms]
+        sizes = [sum(len(keys) for keys in matches.values()) for matches in per_term]
+        if not min(sizes):
+            return 0, []
+
+        # Split the matches into groups of equal score, starting from the rarest term
+        total_documents = len(self._documents)
+        groups: List[Tuple[float, Optional[Set[str]]]] = [(0.0, None)]
+        for t in sorted(range(len(terms)), key=sizes.__getitem__):
+            idf = math.log(1.0 + total_documents / sizes[t])
+            groups = [
+                (score + weight * idf, keys if within is None else within & keys)
+                for score, within in groups
+                for weight, keys in per_term[t].items()
+            ]
+            groups = [(score, keys) for score, keys in groups if keys]
+            if not groups:
+                return 0, []
+
+        by_score: Dict[float, Set[str]] = {}
+        for score, keys in groups:
+            score = round(score, 4)
+            by_score[score] = by_score[score] | keys if score in by_score else keys
+
+        total = sum(len(keys) for keys in by_score.values())
+        hits: List[SearchHit] = []
+        skip = offset
+        for score in sorted(by_score, reverse=True):
+            keys = by_score[score]
+            if skip >= len(keys):
+                skip -= len(keys)
+                continue
+            for key in heapq.nsmallest(skip + limit - len(hits), keys)[skip:]:
+                hits.append(SearchHit(project_name=key, score=score, matched_fields=self._matched_fields(key, terms)))
+            skip = 0
+            if len(hits) >= limit:
+                break
+        return total, hits
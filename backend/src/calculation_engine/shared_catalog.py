@@ -0,0 +1,371 @@
+"""
+Machine catalog shared between server worker processes.
+
+With ``uvicorn main:app --workers N`` every worker used to parse
+``machines.csv`` and build its own catalog. A SharedCatalog keeps one copy of
+the numeric catalog columns, the precomputed cost bases and the Pareto
+pointers in shared memory that every worker maps:
+
+- ``<name>.v<version>``: one immutable segment per catalog version (header,
+  float64 machine columns, float64 cost-basis columns, int64 dominance
+  pointers, then the text columns as JSON)
+- ``<name>.current``: a 32-byte pointer (sequence number, version, and the
+  mtime and size of the CSV the version was built from), written under a
+  seqlock so readers never see half an update
+
+Segments are files on ``/dev/shm`` (POSIX shared memory on Linux, with the
+temp directory as fallback elsewhere), mapped with ``mmap``.
+
+The first worker that finds no segment for the current CSV builds one while
+holding ``<name>.lock`` and publishes it by swapping the pointer; the other
+workers wait for the lock and then attach. A changed CSV becomes the next
+version the same way, after validation (a file that fails it is rejected
+and the current version stays). With ``watch`` a background thread does
+this as soon as the file changes, instead of the next request. Workers switch on their next access, while requests
+that still hold the old Catalog keep reading the old mapping: the old
+segment is unlinked after the swap, but the kernel keeps its pages until the
+last process unmaps them.
+
+Numeric columns are zero-copy numpy views of the shared pages, so they cost
+the same memory for one worker or many. Only the MachineData objects, rebuilt
+from those columns on attach, are per process.
+"""
+
+from dataclasses import fields
+from typing import Any, Callable, Dict, Optional, Tuple
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+try:
+    from .catalog import Catalog, build_catalog, machine_id, validate_machines
+    from .engine import load_machines_from_csv
+    from .kernel import BASIS_COLUMNS, CostBasis
+    from .machine_data import MachineData
+    from .watch import FileWatcher
+except ImportError:
+    from catalog import Catalog, build_catalog, machine_id, validate_machines
+    from engine import load_machines_from_csv
+    from kernel import BASIS_COLUMNS, CostBasis
+    from machine_data import MachineData
+    from watch import FileWatcher
+
+_NUMERIC_FIELDS = tuple(f.name for f in fields(MachineData) if f.type is float)
+_TEXT_FIELDS = tuple(f.name for f in fields(MachineData) if f.type is not float)
+
+_MAGIC = b"GEACAT01"
+# Segments written with another field layout are rebuilt instead of misread
+_LAYOUT = zlib.crc32("|".join(_NUMERIC_FIELDS + _TEXT_FIELDS + BASIS_COLUMNS).encode("utf-8"))
+_HEADER = struct.Struct("<8sQQQQ")      # magic, layout, version, rows, text bytes
+_POINTER = struct.Struct("<QQqq")       # sequence, version, CSV mtime_ns, CSV size
+_SEQUENCE = struct.Struct("<Q")
+
+
+class _StaleSegment(Exception):
+    """The segment the pointer names was written with another layout."""
+
+
+def _default_directory() -> str:
+    shm = "/dev/shm"
+    return shm if os.path.isdir(shm) and os.access(shm, os.W_OK) else tempfile.gettempdir()
+
+
+def _stamp(path: str) -> Tuple[int, int]:
+    """(mtime_ns, size) of the CSV, the key a published version is valid for."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise FileNotFoundError(f"CSV not found: {path}")
+    return st.st_mtime_ns, st.st_size
+
+
+def _segment_bytes(catalog: Catalog, version: int) -> bytes:
+    """Serialize a catalog into the segment layout described in the module docstring."""
+    machines = catalog.machines
+    index = {machine_id(m): i for i, m in enumerate(machines)}
+    numeric = np.array([[getattr(m, name) for m in machines] for name in _NUMERIC_FIELDS], dtype=np.float64)
+    bases = np.array([getattr(catalog.bases, name) for name in BASIS_COLUMNS], dtype=np.float64)
+    dominated = np.array(
+        [-1 if catalog.dominated_by[machine_id(m)] is None else index[catalog.dominated_by[machine_id(m)]] for m in machines],
+        dtype=np.int64,
+    )
+    text = json.dumps([[getattr(m, name) for name in _TEXT_FIELDS] for m in machines]).encode("utf-8")
+    header = _HEADER.pack(_MAGIC, _LAYOUT, version, len(machines), len(text))
+    return header + numeric.tobytes() + bases.tobytes() + dominated.tobytes() + text
+
+
+def _map_segment(path: str, version: int) -> Catalog:
+    """
+    Map a segment read-only and build a Catalog on top of it.
+
+    Raises:
+        FileNotFoundError: If the segment is gone (replaced by a newer version)
+        _StaleSegment: If the segment has another layout or version
+    """
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, layout, segment_version, n, text_bytes = _HEADER.unpack_from(buf)
+    if magic != _MAGIC or layout != _LAYOUT or segment_version != version:
+        raise _StaleSegment(path)
+
+    offset = _HEADER.size
+    numeric = np.frombuffer(buf, dtype=np.float64, count=len(_NUMERIC_FIELDS) * n, offset=offset)
+    numeric = numeric.reshape(len(_NUMERIC_FIELDS), n)
+    offset += numeric.nbytes
+    bases = np.frombuffer(buf, dtype=np.float64, count=len(BASIS_COLUMNS) * n, offset=offset)
+    bases = bases.reshape(len(BASIS_COLUMNS), n)
+    offset += bases.nbytes
+    dominated = np.frombuffer(buf, dtype=np.int64, count=n, offset=offset)
+    offset += dominated.nbytes
+    text = json.loads(buf[offset:offset + text_bytes].decode("utf-8"))
+
+    rows = numeric.T.tolist()
+    machines = [
+        MachineData(**dict(zip(_NUMERIC_FIELDS, rows[i])), **dict(zip(_TEXT_FIELDS, text[i])))
+        for i in range(n)
+    ]
+    ids = [machine_id(m) for m in machines]
+    return Catalog(
+        machines=machines,
+        dominated_by={ids[i]: (None if j < 0 else ids[j]) for i, j in enumerate(dominated.tolist())},
+        version=version,
+        bases=CostBasis(label="", **{name: bases[k] for k, name in enumerate(BASIS_COLUMNS)}),
+    )
+
+
+class SharedCatalog:
+    """
+    Catalog of one CSV file, shared through shared memory by all processes that open it.
+
+    Args:
+        path: Machine CSV
+        directory: Where segments live (defaults to ``/dev/shm``)
+        name: Segment name prefix (defaults to one derived from the CSV path)
+    """
+
+    def __init__(self, path: str, *, directory: Optional[str] = None, name: Optional[str] = None):
+        self.path = os.path.abspath(path)
+        self.directory = directory or _default_directory()
+        self.name = name or "gea_catalog_" + hashlib.sha1(self.path.encode("utf-8")).hexdigest()[:12]
+        self._base = os.path.join(self.directory, self.name)
+        self._lock = threading.Lock()
+        self._pointer: Optional[mmap.mmap] = None
+        self._catalog: Optional[Catalog] = None
+        self._watcher: Optional[FileWatcher] = None
+        self._rejected: Optional[Tuple[int, int]] = None     # stamp of a CSV that failed validation
+        self.last_error: Optional[str] = None
+
+    # --- pointer ---
+
+    def _open_pointer(self) -> mmap.mmap:
+        if self._pointer is None:
+            fd = os.open(f"{self._base}.current", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < _POINTER.size:
+                    os.ftruncate(fd, _POINTER.size)
+                self._pointer = mmap.mmap(fd, _POINTER.size)
+            finally:
+                os.close(fd)
+        return self._pointer
+
+    def _read_pointer(self) -> Tuple[int, Tuple[int, int]]:
+        """Published version (0 = none) and the CSV stamp it was built from."""
+        pointer = self._open_pointer()
+        while True:
+            sequence, version, mtime_ns, size = _POINTER.unpack_from(pointer)
+            if sequence % 2 == 0 and _SEQUENCE.unpack_from(pointer)[0] == sequence:
+                return version, (mtime_ns, size)
+            time.sleep(0)
+
+    def _write_pointer(self, version: int, stamp: Tuple[int, int]) -> None:
+        pointer = self._open_pointer()
+        sequence = _SEQUENCE.unpack_from(pointer)[0]
+        _SEQUENCE.pack_into(pointer, 0, sequence + 1)
+        struct.pack_into("<Qqq", pointer, _SEQUENCE.size, version, *stamp)
+        _SEQUENCE.pack_into(pointer, 0, sequence + 2)
+
+    # --- publishing ---
+
+    def _segment_path(self, version: int) -> str:
+        return f"{self._base}.v{version}"
+
+    def publish(self, catalog: Catalog, stamp: Tuple[int, int]) -> int:
+        """
+        Write ``catalog`` as the next version and swap the pointer to it.
+
+        Callers must hold the publish lock (see ``_locked``).
+
+        Returns:
+            The new version
+        """
+        previous, _ = self._read_pointer()
+        version = previous + 1
+        path = self._segment_path(version)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_segment_bytes(catalog, version))
+        os.replace(tmp, path)
+        self._write_pointer(version, stamp)
+        if previous:
+            try:
+                os.unlink(self._segment_path(previous))
+            except FileNotFoundError:
+                pass
+        return version
+
+    def _locked(self):
+        """Exclusive publish lock across processes (released when the file is closed)."""
+        f = open(f"{self._base}.lock", "a+")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _refresh(self, stale: Optional[int] = None) -> int:
+        """
+        Parse, validate, build and publish the CSV, unless the published version already matches it.
+
+        A file that fails validation is not retried until it changes again, and
+        the published version stays current; with no version yet, the error is raised.
+
+        Raises:
+            FileNotFoundError: If the CSV file doesn't exist
+            ValueError: If the CSV fails validation and there is no version to keep
+        """
+        stamp = _stamp(self.path)
+        with self._locked():
+            version, published = self._read_pointer()
+            if version and version != stale and (published == stamp or stamp == self._rejected):
+                return version
+            try:
+                machines = load_machines_from_csv(self.path)
+                validate_machines(machines)
+                catalog = build_catalog(machines)
+            except ValueError as e:
+                self.last_error = str(e)
+                if version and version != stale:
+                    self._rejected = stamp
+                    return version
+                raise
+            self.last_error = None
+            return self.publish(catalog, stamp)
+
+    def _outdated(self, published: Tuple[int, int]) -> bool:
+        stamp = _stamp(self.path)
+        return stamp != published and stamp != self._rejected
+
+    # --- reading ---
+
+    def catalog(self) -> Catalog:
+        """
+        The current catalog version, mapped into this process.
+
+        Without a watcher every call checks the CSV and publishes a changed file
+        first. With one (see ``watch``), calls only read the version pointer and
+        the watcher thread does the work.
+
+        Raises:
+            FileNotFoundError: If the CSV file doesn't exist
+            ValueError: If the CSV fails validation and no version was published yet
+        """
+        with self._lock:
+            stale = None
+            while True:
+                version, published = self._read_pointer()
+                if not version or version == stale or (self._watcher is None and self._outdated(published)):
+                    version = self._refresh(stale)
+                if self._catalog is not None and self._catalog.version == version:
+                    return self._catalog
+                try:
+                    self._catalog = _map_segment(self._segment_path(version), version)
+                    return self._catalog
+                except FileNotFoundError:
+                    continue                # replaced by a newer version in between
+                except _StaleSegment:
+                    stale = version
+
+    def watch(
+        self,
+        *,
+        interval: float = 2.0,
+        debounce: float = 0.5,
+        listener: Optional[Callable[[Optional[int], Optional[str]], None]] = None,
+    ) -> FileWatcher:
+        """
+        Reload the CSV in a background thread whenever it changes.
+
+        The watcher thread parses, validates and builds the new file (Pareto
+        front, cost bases, indexes), publishes it and maps it, so requests only
+        see the version pointer move. Requests holding the previous Catalog
+        finish on it. A file that fails validation leaves the current version
+        in place.
+
+        Args:
+            interval: Poll interval in seconds where inotify is unavailable
+            debounce: Seconds the file must stay unchanged before it is loaded
+            listener: Called as ``listener(version, error)`` after each reload
+
+        Returns:
+            The running FileWatcher (started once per store)
+        """
+        if self._watcher is None:
+            def reload():
+                self._refresh()
+                version = self.catalog().version
+                if listener is not None:
+                    listener(version, self.last_error)
+
+            def failed(e: Exception):
+                self.last_error = str(e)
+                if listener is not None:
+                    listener(None, self.last_error)
+
+            # Compare against the CSV the published version was built from, so
+            # a change between publishing and starting the thread is not lost
+            version, published = self._read_pointer()
+            self._watcher = FileWatcher(
+                self.path, reload, on_error=failed, interval=interval, debounce=debounce,
+                baseline=published if version else None,
+            ).start()
+        return self._watcher
+
+    def status(self) -> Dict[str, Any]:
+        """Published version, the CSV it was built from, and the last reload error."""
+        version, (mtime_ns, size) = self._read_pointer()
+        return {
+            "version": version,
+            "csv_path": self.path,
+            "csv_modified_at": mtime_ns / 1e9 if version else None,
+            "csv_size": size if version else None,
+            "last_error": self.last_error,
+            "watching": self._watcher.mode if self._watcher is not None else None,
+        }
+
+
+_stores: Dict[str, SharedCatalog] = {}
+
+
+def shared_catalog_store(path: str, *, directory: Optional[str] = None) -> SharedCatalog:
+    """The process-wide SharedCatalog of a machine CSV (``directory`` as for ``SharedCatalog``)."""
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is None:
+        store = _stores.setdefault(key, SharedCatalog(key, directory=directory))
+    return store
+
+
+def shared_catalog(path: str) -> Catalog:
+    """
+    Catalog of a machine CSV via shared memory; the drop-in for ``load_catalog`` in servers.
+
+    Raises:
+        FileNotFoundError: If the CSV file doesn't exist
+    """
+    return shared_catalog_store(path).catalog()
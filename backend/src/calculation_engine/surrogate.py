@@ -0,0 +1,241 @@
+"""
+Surrogate tables for instant approximate TCO totals.
+
+At flat, undiscounted prices the final TCO of a machine is
+
+    upfront + cycles * cleaning_cost + effective_hours * eur_per_hour + services * service_cost
+
+where cycles, effective hours and the number of services depend only on the
+horizon and the hours per year, not on the machine, and ``eur_per_hour`` is
+linear in the prices. A SurrogateGrid tabulates those three counts once,
+for whole years 1..30 and hours/year from 1 h/day on 1 day/week to 24 h/day
+on 7 days/week. Any machine, price and throughput is then answered by
+linear interpolation between two hour nodes; prices need no grid.
+
+Error bound, per machine and query:
+
+- cycles are a floor of a linear function, so interpolating them is off by
+  less than one cycle; effective hours lose 2 h per cycle, so they are off
+  by less than 2 h
+- services are a step function of hours, but not a monotone one: one more
+  cleaning cycle costs 2 h of operation, which can push a service into the
+  next month and shift every later one. The grid samples each cell finely
+  enough to catch every such window (see ``build_grid``) and keeps the spread
+  of the service count over the cell, usually zero
+
+Together:
+
+    error_bound = cleaning_cost + 2 h * eur_per_hour + service_spread * service_cost
+
+Queries outside the grid (longer horizons, fewer or more hours) are for the
+caller to compute exactly; see ``SurrogateGrid.covers``.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from .kernel import (
+        CLEANING_DOWNTIME_HOURS,
+        CostBasis,
+        cleaning_cycles,
+        cumulative_effective_hours,
+        hours_per_year_from_throughput,
+        service_schedule,
+    )
+except ImportError:
+    from kernel import (
+        CLEANING_DOWNTIME_HOURS,
+        CostBasis,
+        cleaning_cycles,
+        cumulative_effective_hours,
+        hours_per_year_from_throughput,
+        service_schedule,
+    )
+
+SURROGATE_MAX_YEARS = 30
+SURROGATE_MIN_HOURS = 1.0 * 1 * 52          # 1 h/day, 1 workday/week
+SURROGATE_MAX_HOURS = 24.0 * 7 * 52         # 24 h/day, 7 workdays/week
+SURROGATE_HOURS_STEP = 24.0
+# A cleaning cycle can delay a service only while effective hours recover from
+# its 2 h downtime, i.e. within 24 / months hours per year: 1/15 at 30 years
+SURROGATE_CHECK_STEP = 1.0 / 32
+_CHUNK_CELLS = 16
+
+
+@dataclass
+class SurrogateTotals:
+    """Approximate final costs of n machines, with the error bound of each."""
+    total: np.ndarray
+    co: np.ndarray                      # cleaning, electricity and water
+    cm: np.ndarray                      # services
+    error_bound: np.ndarray
+
+
+@dataclass(frozen=True)
+class SurrogateGrid:
+    """Cleaning cycles, effective hours and services after each whole year, at each hour node."""
+    hours: np.ndarray                   # (nodes,) hours per year
+    cycles: np.ndarray                  # (years, nodes)
+    effective: np.ndarray               # (years, nodes)
+    services: np.ndarray                # (years, nodes)
+    service_spread: np.ndarray          # (years, nodes - 1): max - min services within each cell
+
+    @property
+    def max_years(self) -> int:
+        return self.cycles.shape[0]
+
+    def covers(self, years: int, hours_per_year) -> np.ndarray:
+        """Whether a horizon and hours per year (scalar or array) lie on the grid."""
+        h = np.asarray(hours_per_year, dtype=float)
+        on_horizon = years == int(years) and 1 <= years <= self.max_years
+        return on_horizon & (h >= self.hours[0]) & (h <= self.hours[-1])
+
+    def evaluate(
+        self,
+        basis: CostBasis,
+        hours_per_year,
+        *,
+        years: int,
+        electricity_eur_per_kwh: float,
+        water_eur_per_l: float,
+    ) -> SurrogateTotals:
+        """
+        Interpolated final costs for one machine or a columnar basis (``stack_bases``).
+
+        Args:
+            basis: Machine constants, scalar or columnar
+            hours_per_year: Scheduled hours per year, scalar or one per machine
+            years: Horizon in whole years
+            electricity_eur_per_kwh: Flat price
+            water_eur_per_l: Flat price
+
+        Raises:
+            ValueError: If a query lies outside the grid
+        """
+        h = np.asarray(hours_per_year, dtype=float)
+        if not np.all(self.covers(years, h)):
+            raise ValueError(
+                f"Outside the surrogate grid: years 1..{self.max_years}, "
+                f"{self.hours[0]:g}..{self.hours[-1]:g} hours per year"
+            )
+        x = (h - self.hours[0]) / (self.hours[1] - self.hours[0])
+        j = np.minimum(x.astype(np.int64), self.hours.size - 2)
+        t = x - j
+        row = int(years) - 1
+
+        def interpolate(table: np.ndarray) -> np.ndarray:
+            return table[row, j] * (1.0 - t) + table[row, j + 1] * t
+
+        eur_per_hour = basis.power_kw * electricity_eur_per_kwh + basis.water_l_s * 3600.0 * water_eur_per_l
+        co = interpolate(self.cycles) * basis.cleaning_cost_per_cycle + interpolate(self.effective) * eur_per_hour
+        cm = interpolate(self.services) * basis.service_cost
+        error_bound = (
+            basis.cleaning_cost_per_cycle + CLEANING_DOWNTIME_HOURS * eur_per_hour
+            + self.service_spread[row, j] * basis.service_cost
+        )
+        return SurrogateTotals(total=basis.upfront + co + cm, co=co, cm=cm, error_bound=error_bound)
+
+
+def _services_by_year(hours_per_year: np.ndarray, max_years: int) -> np.ndarray:
+    """Services fired up to each year end, shape (max_years, len(hours_per_year))."""
+    rows, service_month = service_schedule(hours_per_year / 12.0, 12 * max_years)
+    counts = np.bincount(
+        (service_month - 1) // 12 * hours_per_year.size + rows, minlength=max_years * hours_per_year.size
+    )
+    return np.cumsum(counts.reshape(max_years, hours_per_year.size), axis=0).astype(float)
+
+
+def build_grid(
+    *,
+    max_years: int = SURROGATE_MAX_YEARS,
+    min_hours: float = SURROGATE_MIN_HOURS,
+    max_hours: float = SURROGATE_MAX_HOURS,
+    step: float = SURROGATE_HOURS_STEP,
+    check_step: float = SURROGATE_CHECK_STEP,
+) -> SurrogateGrid:
+    """
+    Tabulate the machine-independent counts of the TCO model.
+
+    The service spread of each cell is sampled every ``check_step`` hours per
+    year, which must stay below 24 / (12 * max_years) for the error bound to
+    hold. Hours below 24 per year are not supported: there a cleaning cycle
+    costs less than 2 h of operation.
+
+    Args:
+        max_years: Longest horizon on the grid
+        min_hours: First hour node (hours per year)
+        max_hours: Last hour node (rounded up to a whole step)
+        step: Hours per year between nodes
+        check_step: Hours per year between service-spread samples
+
+    Returns:
+        SurrogateGrid
+    """
+    if min_hours < 12.0 * CLEANING_DOWNTIME_HOURS:
+        raise ValueError(f"min_hours must be at least {12.0 * CLEANING_DOWNTIME_HOURS:g}")
+    if check_step >= 24.0 / (12 * max_years):
+        raise ValueError(f"check_step must be below {24.0 / (12 * max_years):g} for {max_years} years")
+    nodes = int(np.ceil((max_hours - min_hours) / step)) + 1
+    hours = min_hours + step * np.arange(nodes, dtype=float)
+    year_ends = 12 * np.arange(1, max_years + 1)
+
+    cycles = cleaning_cycles(hours / 12.0, 12 * max_years)[year_ends]
+    effective = cumulative_effective_hours(year_ends[:, None], hours[None, :] / 12.0)
+    services = _services_by_year(hours, max_years)
+
+    samples = int(np.ceil(step / check_step))
+    offsets = np.linspace(0.0, step, samples + 1)
+    spread = np.zeros((max_years, nodes - 1))
+    for start in range(0, nodes - 1, _CHUNK_CELLS):
+        cells = np.arange(start, min(start + _CHUNK_CELLS, nodes - 1))
+        counts = _services_by_year((hours[cells, None] + offsets[None, :]).ravel(), max_years)
+        counts = counts.reshape(max_years, cells.size, samples + 1)
+        spread[:, cells] = counts.max(axis=2) - counts.min(axis=2)
+    return SurrogateGrid(hours=hours, cycles=cycles, effective=effective, services=services, service_spread=spread)
+
+
+@lru_cache(maxsize=1)
+def surrogate_grid() -> SurrogateGrid:
+    """The process-wide default grid, built on first use."""
+    return build_grid()
+
+
+def scheduled_hours(
+    capacity_max,
+    *,
+    operation_hours_per_year: Optional[float] = None,
+    throughput_per_day: Optional[float] = None,
+    workdays_per_week: int = 5,
+    operation_hours_per_day: Optional[float] = None,
+) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[float]]:
+    """
+    Hours per year of each machine as ``calculate_toc`` schedules them.
+
+    Args:
+        capacity_max: Maximum capacity per machine (array)
+
+    Returns:
+        (hours per year, needed hours/day or None, available hours/day or None)
+
+    Raises:
+        ValueError: If no operating input is given, or a machine without capacity has to run from throughput
+    """
+    capacity_max = np.asarray(capacity_max, dtype=float)
+    if operation_hours_per_year is not None:
+        return np.full(capacity_max.shape, float(operation_hours_per_year)), None, None
+    available = float(operation_hours_per_day) if operation_hours_per_day is not None else None
+    if throughput_per_day is not None:
+        hours = hours_per_year_from_throughput(
+            capacity_max,
+            throughput_per_day,
+            workdays_per_week=workdays_per_week,
+            operation_hours_per_day=operation_hours_per_day,
+        )
+        return hours, throughput_per_day / capacity_max, available
+    if operation_hours_per_day is not None:
+        return np.full(capacity_max.shape, operation_hours_per_day * workdays_per_week * 52.0), None, available
+    raise ValueError("Must provide either operation_hours_per_year, throughput_per_day, or operation_hours_per_day")
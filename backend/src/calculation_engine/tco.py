@@ -1,7 +1,9 @@
-from dataclasses import dataclass, asdict
-from typing import Any, List, Dict
+from dataclasses import dataclass, asdict, fields
+from typing import Any, List, Dict, Optional, Sequence, Union
 import json
 
+import numpy as np
+
 @dataclass
 class TCO:
     """
@@ -19,14 +21,130 @@ class TCO:
     needed_hours_per_day: float | None = None
     available_hours_per_day: float | None = None
     hours_per_year: float | None = None
+    # Set when costs after month 0 are discounted to present value (NPV)
+    discount_rate: float | None = None
 
     @property
     def total(self) -> float:
         """Final cumulative total (last element of monthly_cum_total)."""
         return self.monthly_cum_total[-1] if self.monthly_cum_total else 0.0
 
-    def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+    def cum_total_at(self, index: Union[int, slice, Sequence[int]]):
+        """Cumulative total at a month index, a slice of months, or a list of month indices."""
+        if isinstance(index, (int, slice)):
+            return self.monthly_cum_total[index]
+        return [self.monthly_cum_total[i] for i in index]
+
+    def to_dict(self, include_series: bool = True, checkpoints: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """
+        Args:
+            include_series: Include ``monthly_cum_total`` (otherwise it is empty and ``total`` is added)
+            checkpoints: Months whose cumulative total is added under ``checkpoints``
+        """
+        if include_series and checkpoints is None:
+            return asdict(self)
+        return _serialize(self, include_series, checkpoints)
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **({"ensure_ascii": False, "indent": 2} | kwargs))
+
+
+def _serialize(tco, include_series: bool, checkpoints: Optional[Sequence[int]]) -> Dict[str, Any]:
+    d = {
+        f.name: [] if f.name == "monthly_cum_total" and not include_series else getattr(tco, f.name)
+        for f in fields(TCO)
+    }
+    if not include_series:
+        d["total"] = tco.total
+    if checkpoints is not None:
+        months = list(checkpoints)
+        d["checkpoints"] = {str(m): v for m, v in zip(months, tco.cum_total_at(months))}
+    return d
+
+
+class LazyTCO:
+    """
+    TCO whose monthly series is computed on demand.
+
+    Holds the closed-form parameters of the scenario (``ClosedFormSeries``:
+    upfront cost, cost per effective hour, cleaning and service schedule) or,
+    for price curves, discounting and the daily schedule, the kernel's
+    cumulative array. ``total``, single months and slices are evaluated
+    without building a list; ``monthly_cum_total`` materializes the series
+    once (e.g. when serialized with the series) and caches it.
+
+    Same interface as ``TCO``. Closed-form values use the kernel's cleaning and
+    service boundaries, so they agree with the materialized series up to the
+    rounding of the running sum.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        series,
+        *,
+        ca: float,
+        cc: float,
+        co: float,
+        cm: float,
+        needed_hours_per_day: Optional[float] = None,
+        available_hours_per_day: Optional[float] = None,
+        hours_per_year: Optional[float] = None,
+        discount_rate: Optional[float] = None,
+    ):
+        self.label = label
+        self.series = series                # ClosedFormSeries, or 1-D array of cumulative totals
+        self.ca = ca
+        self.cc = cc
+        self.co = co
+        self.cm = cm
+        self.needed_hours_per_day = needed_hours_per_day
+        self.available_hours_per_day = available_hours_per_day
+        self.hours_per_year = hours_per_year
+        self.discount_rate = discount_rate
+        self._materialized: Optional[List[float]] = None
+
+    @property
+    def months(self) -> int:
+        return len(self.series) - 1 if isinstance(self.series, np.ndarray) else self.series.months
+
+    @property
+    def total(self) -> float:
+        return self.cum_total_at(self.months)
+
+    def cum_total_at(self, index: Union[int, slice, Sequence[int]]):
+        """Cumulative total at a month index, a slice of months, or a list of month indices."""
+        n = self.months + 1
+        if isinstance(index, slice):
+            return self.cum_total_at(range(*index.indices(n)))
+        if isinstance(index, (int, np.integer)):
+            month = int(index) + n if index < 0 else int(index)
+            if not 0 <= month < n:
+                raise IndexError(f"Month {index} is outside 0..{n - 1}")
+            if isinstance(self.series, np.ndarray):
+                return float(self.series[month])
+            return self.series.at(month)
+        months = np.asarray(list(index), dtype=np.int64)
+        months = np.where(months < 0, months + n, months)
+        if months.size and (months.min() < 0 or months.max() >= n):
+            raise IndexError(f"Months must lie in 0..{n - 1}")
+        values = self.series[months] if isinstance(self.series, np.ndarray) else self.series.cum_total(months)
+        return values.tolist()
+
+    @property
+    def monthly_cum_total(self) -> List[float]:
+        if self._materialized is None:
+            series = self.series if isinstance(self.series, np.ndarray) else self.series.cum_total()
+            self._materialized = series.tolist()
+        return self._materialized
+
+    def materialize(self) -> TCO:
+        """Plain ``TCO`` with the full monthly series."""
+        return TCO(**{f.name: getattr(self, f.name) for f in fields(TCO)})
+
+    def to_dict(self, include_series: bool = True, checkpoints: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """Same layout as ``TCO.to_dict``; the series is only built with ``include_series``."""
+        return _serialize(self, include_series, checkpoints)
 
     def to_json(self, **kwargs) -> str:
         return json.dumps(self.to_dict(), **({"ensure_ascii": False, "indent": 2} | kwargs))
@@ -0,0 +1,160 @@
+"""
+Watch a single file for changes.
+
+On Linux the watcher uses inotify on the file's directory, so it also
+notices editors and deploy scripts that replace the file by renaming a new
+one over it. Elsewhere, or if inotify is unavailable, it polls the file's
+mtime and size. Either way a change is only reported once the file has
+stopped changing for ``debounce`` seconds, so a file still being written is
+not picked up half-way.
+"""
+
+from typing import Callable, Optional, Tuple
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+_EVENT = struct.Struct("iIII")          # wd, mask, cookie, name length
+
+
+def _libc_inotify():
+    """libc with inotify functions, or None where there is no inotify."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class FileWatcher:
+    """
+    Call ``on_change()`` from a background thread whenever ``path`` changes.
+
+    Args:
+        path: File to watch
+        on_change: Callback; exceptions it raises are passed to ``on_error``
+        on_error: Called with the exception of a failed callback (default: ignore)
+        interval: Poll interval in seconds (also the inotify safety re-check)
+        debounce: Seconds the file must stay unchanged before it is reported
+        use_inotify: Set False to force polling
+        baseline: Stamp (mtime_ns, size) of the version the caller already has;
+            a file that differs from it is reported even if it changed before
+            the watcher started (default: the file as it is now)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        on_change: Callable[[], None],
+        *,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        interval: float = 2.0,
+        debounce: float = 0.5,
+        use_inotify: bool = True,
+        baseline: Optional[Tuple[int, int]] = None,
+    ):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.on_error = on_error
+        self.interval = interval
+        self.debounce = debounce
+        self._libc = _libc_inotify() if use_inotify else None
+        self._fd: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Taken here, not in the thread, so a change right after construction is not missed
+        self._seen = baseline if baseline is not None else _stamp(self.path)
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def start(self) -> "FileWatcher":
+        if self._libc is not None and self._fd is None:
+            fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                directory = os.path.dirname(self.path).encode()
+                if self._libc.inotify_add_watch(fd, directory, _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        self._thread = threading.Thread(target=self._run, name=f"watch-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _touched(self) -> bool:
+        """Wait up to one interval for inotify events; True if one names the file."""
+        ready, _, _ = select.select([self._fd], [], [], self.interval)
+        if not ready:
+            return False
+        name = os.path.basename(self.path).encode()
+        touched = False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            start = offset + _EVENT.size
+            touched = touched or data[start:start + length].rstrip(b"\0") == name
+            offset = start + length
+        return touched
+
+    def _settled(self) -> Optional[Tuple[int, int]]:
+        """Wait until the file stops changing (or the watcher stops) and return its stamp."""
+        stamp = _stamp(self.path)
+        while not self._stop.wait(self.debounce):
+            current = _stamp(self.path)
+            if current == stamp:
+                break
+            stamp = current
+        return stamp
+
+    def _run(self) -> None:
+        seen = self._seen
+        while not self._stop.is_set():
+            if self._fd is not None:
+                self._touched()
+            elif self._stop.wait(self.interval):
+                break
+            # inotify only wakes the loop early; the stamp decides, which also covers missed events
+            if _stamp(self.path) == seen:
+                continue
+            settled = self._settled()
+            if self._stop.is_set():
+                break
+            # A missing file is not a change to load; wait for it to come back
+            if settled is not None and settled != seen:
+                seen = settled
+                try:
+                    self.on_change()
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(e)
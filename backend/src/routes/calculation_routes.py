@@ -1,52 +1,65 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field
+from datetime import date
+import asyncio
 import os
 import sys
 
+import numpy as np
+
 # Add the backend directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
+from config import config
 from src.calculation_engine.engine import (
-    load_machines_from_csv,
     calculate_tco_for_machine,
     compare_machines,
+    rank_machines,
     save_machines_to_json,
     filter_machines_for_project
 )
 from src.calculation_engine.machine_data import MachineData
 from src.calculation_engine.project import Project
 from src.calculation_engine.tco import TCO
-from src.calculation_engine.demo import get_demo_data
-from openai import OpenAI
-import json
+from src.calculation_engine.montecarlo import run_montecarlo
+from src.calculation_engine.fleet import optimize_fleet
+from src.calculation_engine.breakeven import solve_break_even
+from src.calculation_engine.search import SEARCH_FIELDS
+from src.calculation_engine.changes import ProjectChange, apply_patch, classify_changes
+from src.calculation_engine.portfolio import PortfolioSettings, portfolio_tco
+from src.calculation_engine.pricing import is_scalar_price, price_curve
+from src.calculation_engine.kernel import stack_bases
+from src.calculation_engine.surrogate import SurrogateGrid, scheduled_hours, surrogate_grid
+from src.calculation_engine.jobs import report_progress
+from src.routes.formats import negotiated
+from src.routes.state import (
+    WarmFilter,
+    WarmTCO,
+    cached_relevant,
+    index_project,
+    machine_catalog,
+    on_catalog_change,
+    project_index,
+    project_versions,
+    projects_storage,
+    record_scenario,
+    stage_versions,
+    warm_filter,
+    warm_tasks,
+    warm_tco,
+)
 
 # Remove module-level key/client; resolve per request
 
 router = APIRouter(prefix="/api/calculation", tags=["calculation"])
 
-# In-memory storage for projects (using project_name as primary key)
-projects_storage: dict[str, Project] = {}
-
-# Auto-load demo data on startup
-def _load_demo_data():
-    """Load demo data into projects storage on startup."""
-    try:
-        demo_data = get_demo_data()
-        for project in demo_data["projects"]:
-            projects_storage[project.project_name] = project
-        print(f"✅ Loaded {len(demo_data['projects'])} demo projects on startup")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not load demo data on startup: {e}")
-
-# Load demo data when module is imported
-_load_demo_data()
-
-
 class TCOCalculationRequest(BaseModel):
     years: int = 5
-    electricity_eur_per_kwh: float = 0.25
-    water_eur_per_l: float = 0.002
+    # Flat price, or a curve with one value per year or per month
+    electricity_eur_per_kwh: Union[float, List[float]] = 0.25
+    water_eur_per_l: Union[float, List[float]] = 0.002
     commissioning_pct: float = 0.10
     extra_maint_pct: float = 0.00
     label: Optional[str] = None
@@ -54,8 +67,110 @@ class TCOCalculationRequest(BaseModel):
     operation_hours_per_year: Optional[float] = None
     # Throughput approach
     throughput_per_day: Optional[float] = None
-    workdays_per_week: int = 5
+    workdays_per_week: Optional[int] = None
+    operation_hours_per_day: Optional[float] = None
+    # Yearly escalation (fractions, e.g. 0.03 = +3 %/year) and NPV discount rate
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
+    # Evaluate only machines on the Pareto front of their application
+    non_dominated_only: bool = False
+    # Return only the k cheapest machines, sorted by total (others are bounded, not simulated)
+    top_k: Optional[int] = Field(None, ge=1)
+    # "daily" runs on a workday calendar from start_date (default: current month)
+    schedule: Literal["monthly", "daily"] = "monthly"
+    start_date: Optional[date] = None
+    # False: results carry "total" and an empty monthly_cum_total, and no series is built
+    include_series: bool = True
+    # Months whose cumulative total is returned under "checkpoints" (e.g. [12, 36, 60])
+    checkpoint_months: Optional[List[int]] = None
+    # Totals only, from the surrogate grid with an error bound where the request lies on it
+    approximate: bool = False
+
+class DistributionSpec(BaseModel):
+    """Distribution of one uncertain input; unused parameters are ignored."""
+    dist: Literal["fixed", "uniform", "normal", "lognormal", "triangular"] = "fixed"
+    value: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+
+class MonteCarloRequest(BaseModel):
+    n_scenarios: int = Field(10000, ge=1, le=200000)
+    seed: Optional[int] = None
+    years: Optional[int] = None
+    percentiles: List[float] = [10.0, 50.0, 90.0]
+    # Uncertain inputs; missing specs default to the project's fixed values
+    electricity_eur_per_kwh: Optional[DistributionSpec] = None
+    water_eur_per_l: Optional[DistributionSpec] = None
+    throughput_per_day: Optional[DistributionSpec] = None
+    unplanned_downtime: Optional[DistributionSpec] = None
+    # Operation hours approach
+    operation_hours_per_year: Optional[float] = None
+    workdays_per_week: Optional[int] = None
+    operation_hours_per_day: Optional[float] = None
+    # Yearly escalation on top of the sampled prices and NPV discount rate
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
+    non_dominated_only: bool = False
+
+class FleetRequest(BaseModel):
+    max_units: int = Field(4, ge=1, le=8)
+    allow_mixed: bool = True
+    top_n: int = Field(5, ge=1, le=50)
+    years: Optional[int] = None
+    # Flat price, or a curve with one value per year or per month (defaults to the project's prices)
+    electricity_eur_per_kwh: Optional[Union[float, List[float]]] = None
+    water_eur_per_l: Optional[Union[float, List[float]]] = None
+    throughput_per_day: Optional[float] = None
+    workdays_per_week: Optional[int] = None
+    operation_hours_per_day: Optional[float] = None
+    # Budgets for the whole fleet (default to the project's length × width and weight)
+    max_footprint_m2: Optional[float] = None
+    max_total_weight_kg: Optional[float] = None
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
+
+class BulkTCORequest(BaseModel):
+    # Project names, or "all" for every stored project
+    projects: Union[Literal["all"], List[str]] = "all"
+    # Shared overrides; unset values fall back to each project's own settings
+    years: Optional[int] = None
+    electricity_eur_per_kwh: Optional[Union[float, List[float]]] = None
+    water_eur_per_l: Optional[Union[float, List[float]]] = None
+    workdays_per_week: Optional[int] = None
+    operation_hours_per_year: Optional[float] = None
+    operation_hours_per_day: Optional[float] = None
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
+    non_dominated_only: bool = False
+    max_workers: Optional[int] = Field(None, ge=1)
+
+class BreakEvenRequest(BaseModel):
+    # Catalog machine_ids (langtyp|level|drive_type) of the two machines to compare
+    machine_a: str
+    machine_b: str
+    parameter: Literal["electricity_eur_per_kwh", "water_eur_per_l", "throughput_per_day", "operation_hours_per_day", "years"]
+    # Search range (defaults depend on the parameter) and grid size for throughput and hours/day
+    low: Optional[float] = None
+    high: Optional[float] = None
+    samples: int = Field(128, ge=8, le=4096)
+    # Remaining inputs as in TCOCalculationRequest; unset values fall back to the project
+    years: Optional[int] = None
+    electricity_eur_per_kwh: Optional[Union[float, List[float]]] = None
+    water_eur_per_l: Optional[Union[float, List[float]]] = None
+    operation_hours_per_year: Optional[float] = None
+    throughput_per_day: Optional[float] = None
+    workdays_per_week: Optional[int] = None
     operation_hours_per_day: Optional[float] = None
+    electricity_escalation_pct: float = 0.0
+    water_escalation_pct: float = 0.0
+    discount_rate: float = 0.0
 
 class ProjectRequest(BaseModel):
     project_name: str
@@ -79,52 +194,176 @@ class ProjectRequest(BaseModel):
     energy_price_eur_per_kwh: Optional[float] = 0.25
     water_price_eur_per_l: Optional[float] = 0.002
 
+class ProjectPatchRequest(BaseModel):
+    # Only the fields sent are changed (project_name cannot be)
+    company_name: Optional[str] = None
+    telefon_nummer: Optional[str] = None
+    email: Optional[str] = None
+    contact_person: Optional[str] = None
+    application: Optional[str] = None
+    sub_application: Optional[str] = None
+    solids_percentage: Optional[float] = None
+    customer_throughput_per_day: Optional[float] = None
+    workdays_per_week: Optional[int] = None
+    protection_class: Optional[str] = None
+    motor_efficiency: Optional[str] = None
+    length_mm: Optional[float] = None
+    width_mm: Optional[float] = None
+    height_mm: Optional[float] = None
+    weight_kg: Optional[float] = None
+    years: Optional[int] = None
+    energy_price_eur_per_kwh: Optional[float] = None
+    water_price_eur_per_l: Optional[float] = None
+    # Reject the patch (409) unless the project is still at this version
+    expected_version: Optional[int] = None
+
 class ProjectResponse(BaseModel):
     success: bool
     project: dict
     message: str
+    version: Optional[int] = None
+
+class ProjectPatchResponse(BaseModel):
+    success: bool
+    project: dict
+    version: int
+    changed_fields: List[str]
+    # Furthest-upstream TCO stage the change invalidated: "none", "pricing" or "filter"
+    invalidated: str
+    message: str
 
 class ProjectsListResponse(BaseModel):
     success: bool
     count: int
     projects: List[dict]
 
+class ProjectSearchResponse(BaseModel):
+    success: bool
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[dict]
+
 class ProjectTCOResponse(BaseModel):
     success: bool
     project: dict
     relevant_machines: List[dict]
     tco_results: List[dict]
     message: str
+    # Relevant machines skipped with non_dominated_only, and what dominates them
+    excluded_machines: List[dict] = []
+    # When no machine is relevant: the machines closest to passing the project's rules
+    closest_alternatives: List[dict] = []
+    # Scenario history entry of this result (None if history is disabled)
+    scenario_id: Optional[str] = None
+
+
+class AlternativesResponse(BaseModel):
+    success: bool
+    project_name: str
+    alternatives: List[dict]
+    message: str
+
+
+class DiagnosticsResponse(BaseModel):
+    success: bool
+    project_name: str
+    rules: List[str]
+    machine_ids: List[str]
+    # rejections[r][m]: rule r rejects machine m
+    rejections: List[List[bool]]
+    rejected_by: Dict[str, int]
+    rejected_only_by: Dict[str, int]
+    passing: List[str]
+    near_misses: List[dict]
+    message: str
+
+
+class BreakEvenResponse(BaseModel):
+    success: bool
+    project_name: str
+    parameter: str
+    machine_a: dict
+    machine_b: dict
+    method: str
+    break_even: List[float]
+    # Ranges of the parameter with the machine_id of the cheaper machine ("tie" if equal)
+    segments: List[dict]
+    current_value: Optional[float] = None
+    cheaper_at_current: Optional[str] = None
+    evaluations: int
+    message: str
+
 
+class MonteCarloResponse(BaseModel):
+    success: bool
+    project: dict
+    n_scenarios: int
+    results: List[dict]
+    message: str
+    excluded_machines: List[dict] = []
 
-class MagicFillRequest(BaseModel):
-    text: str
 
-class MagicFillResponse(BaseModel):
+class FleetResponse(BaseModel):
     success: bool
-    parsed: dict
-    message: Optional[str] = None
+    project: dict
+    options: List[dict]
+    candidate_types: int
+    dominated_types: int
+    nodes_explored: int
+    fleets_evaluated: int
+    exhaustive: bool
+    message: str
 
 
-class MachinesListResponse(BaseModel):
+class BulkTCOResponse(BaseModel):
     success: bool
     count: int
-    machines: List[dict]
+    portfolio_total: float
+    projects_without_machine: int
+    results: List[dict]
+    message: str
 
 
 @router.get("/projects", response_model=ProjectsListResponse)
-async def get_projects():
-    """Get all projects."""
+async def get_projects(http_request: Request = None):
+    """Get all projects (JSON, or Arrow/msgpack per the Accept header)."""
     try:
         projects_list = [project.to_dict() for project in projects_storage.values()]
-        return ProjectsListResponse(
+        return negotiated(http_request, ProjectsListResponse(
             success=True,
             count=len(projects_list),
             projects=projects_list
-        )
+        ), "projects")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving projects: {str(e)}")
 
+@router.get("/projects/search", response_model=ProjectSearchResponse)
+async def search_projects(
+    q: str = Query(..., min_length=1, description="Words or word prefixes: name, company, contact, email, phone, application"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """Ranked search over projects; every query word must match a word (or word start) of the project."""
+    try:
+        total, hits = project_index.search(q, limit=limit, offset=offset)
+        return ProjectSearchResponse(
+            success=True,
+            query=q,
+            total=total,
+            limit=limit,
+            offset=offset,
+            results=[
+                {**hit.to_dict(), "project": projects_storage[hit.project_name].to_dict()}
+                for hit in hits
+            ],
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching projects: {str(e)}")
+
 @router.get("/projects/{project_name}", response_model=ProjectResponse)
 async def get_project(project_name: str):
     """Get a specific project by name."""
@@ -136,7 +375,8 @@ async def get_project(project_name: str):
         return ProjectResponse(
             success=True,
             project=project.to_dict(),
-            message=f"Project '{project_name}' retrieved successfully"
+            message=f"Project '{project_name}' retrieved successfully",
+            version=project_versions.get(project_name),
         )
     except HTTPException:
         raise
@@ -172,21 +412,383 @@ async def create_or_update_project(project_data: ProjectRequest):
         
         # Store/update the project (using project_name as primary key)
         is_update = project_data.project_name in projects_storage
-        projects_storage[project_data.project_name] = project
+        store_project(project)
         
         action = "updated" if is_update else "created"
         return ProjectResponse(
             success=True,
             project=project.to_dict(),
-            message=f"Project '{project_data.project_name}' {action} successfully"
+            message=f"Project '{project_data.project_name}' {action} successfully",
+            version=project_versions.get(project_data.project_name),
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving project: {str(e)}")
 
+@router.patch("/projects/{project_name}", response_model=ProjectPatchResponse)
+async def patch_project(project_name: str, patch: ProjectPatchRequest):
+    """Change some fields of a project; cached TCO stages are invalidated only as far as the change reaches."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+        updates = patch.model_dump(exclude_unset=True)
+        expected = updates.pop("expected_version", None)
+        if expected is not None and expected != project_versions.get(project_name):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Project '{project_name}' is at version {project_versions.get(project_name)}, not {expected}",
+            )
+
+        change = store_project(apply_patch(projects_storage[project_name], updates))
+        return ProjectPatchResponse(
+            success=True,
+            project=projects_storage[project_name].to_dict(),
+            version=project_versions[project_name],
+            changed_fields=list(change.changed),
+            invalidated=change.stage,
+            message=(
+                f"Project '{project_name}' updated ({', '.join(change.changed)})"
+                if change.changed else f"Project '{project_name}' unchanged"
+            ),
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating project: {str(e)}")
+
+def tco_inputs(project: Project, request: TCOCalculationRequest) -> dict:
+    """Resolve a TCO request against the project's stored values (request values win, zeros preserved)."""
+    # Determine effective hours/day for filtering when using throughput
+    has_throughput = (
+        request.throughput_per_day is not None or project.customer_throughput_per_day is not None
+    )
+    # Default to 20 hours/day cap when performing throughput-based calculations and not explicitly provided
+    hours_per_day = (
+        request.operation_hours_per_day
+        if request.operation_hours_per_day is not None
+        else (20 if has_throughput else None)
+    )
+    return dict(
+        years=request.years if request.years is not None else project.years,
+        electricity_eur_per_kwh=(
+            request.electricity_eur_per_kwh
+            if request.electricity_eur_per_kwh is not None
+            else project.energy_price_eur_per_kwh
+        ),
+        water_eur_per_l=(
+            request.water_eur_per_l
+            if request.water_eur_per_l is not None
+            else project.water_price_eur_per_l
+        ),
+        # Commissioning should be construction-only (5 €/kg × total weight).
+        # Set training_cost to 0 so Cc = construction_cost_per_kg × total_weight_kg.
+        training_cost=0.0,
+        label=request.label,
+        operation_hours_per_year=request.operation_hours_per_year,
+        throughput_per_day=(
+            request.throughput_per_day
+            if request.throughput_per_day is not None
+            else project.customer_throughput_per_day
+        ),
+        workdays_per_week=(
+            request.workdays_per_week
+            if request.workdays_per_week is not None
+            else project.workdays_per_week
+        ),
+        operation_hours_per_day=hours_per_day,
+        electricity_escalation_pct=request.electricity_escalation_pct,
+        water_escalation_pct=request.water_escalation_pct,
+        discount_rate=request.discount_rate,
+        schedule=request.schedule,
+        start_date=request.start_date,
+    )
+
+
+def _calculate_project_tco(
+    project: Project,
+    request: TCOCalculationRequest,
+    catalog,
+    relevant: Optional[List[MachineData]] = None,
+) -> ProjectTCOResponse:
+    """TCO of all relevant machines of a project (body of the TCO endpoint); ``relevant`` skips the filter."""
+    project_name = project.project_name
+    calc_kwargs = tco_inputs(project, request)
+
+    # Filter machines based on project requirements and available hours/day
+    relevant_machines = relevant if relevant is not None else filter_machines_for_project(
+        catalog.machines, project, operation_hours_per_day=calc_kwargs["operation_hours_per_day"]
+    )
+
+    excluded_machines = []
+    if request.non_dominated_only:
+        excluded_machines = catalog.dominated(relevant_machines)
+        relevant_machines = catalog.non_dominated(relevant_machines)
+
+    if not relevant_machines:
+        return ProjectTCOResponse(
+            success=True,
+            project=project.to_dict(),
+            relevant_machines=[],
+            tco_results=[],
+            message=f"No relevant machines found for project '{project_name}'",
+            excluded_machines=excluded_machines,
+            closest_alternatives=catalog.closest_alternatives(
+                project, operation_hours_per_day=calc_kwargs["operation_hours_per_day"]
+            ),
+        )
+
+    # Reject malformed price curves up front rather than per machine
+    months = int(calc_kwargs["years"]) * 12
+    try:
+        price_curve(calc_kwargs["electricity_eur_per_kwh"], months)
+        price_curve(calc_kwargs["water_eur_per_l"], months)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    checkpoints = request.checkpoint_months
+    if checkpoints is not None and any(not 0 <= m <= months for m in checkpoints):
+        raise HTTPException(status_code=400, detail=f"checkpoint_months must lie in 0..{months}")
+    if request.approximate:
+        return _approximate_project_tco(project, request, catalog, relevant_machines, calc_kwargs, excluded_machines)
+    # Without the series, TCOs stay lazy: totals and checkpoints come from the closed form
+    lazy = not request.include_series
+
+    if request.top_k is not None:
+        # Cheapest k only; relevant_machines stays aligned with tco_results
+        ranked = rank_machines(relevant_machines, request.top_k, lazy=lazy, **calc_kwargs)
+        return ProjectTCOResponse(
+            success=True,
+            project=project.to_dict(),
+            relevant_machines=[machine.to_dict() for machine, _ in ranked],
+            tco_results=[tco.to_dict(request.include_series, checkpoints) for _, tco in ranked],
+            message=f"TCO calculated for the {len(ranked)} cheapest of {len(relevant_machines)} relevant machines",
+            excluded_machines=excluded_machines,
+        )
+
+    # Calculate TCO for each relevant machine
+    tco_results = []
+    for i, machine in enumerate(relevant_machines):
+        tco = calculate_tco_for_machine(machine, lazy=lazy, **calc_kwargs)
+        tco_results.append(tco.to_dict(request.include_series, checkpoints))
+        report_progress((i + 1) / len(relevant_machines))
+
+    return ProjectTCOResponse(
+        success=True,
+        project=project.to_dict(),
+        relevant_machines=[machine.to_dict() for machine in relevant_machines],
+        tco_results=tco_results,
+        message=f"TCO calculated for {len(relevant_machines)} relevant machines",
+        excluded_machines=excluded_machines,
+    )
+
+
+# Surrogate grid behind approximate=true, built once per process in the background
+# when the catalog is first loaded (SURROGATE_GRID=0 disables it)
+_surrogate: Optional[SurrogateGrid] = None
+_surrogate_task: Optional[asyncio.Task] = None
+
+
+def _surrogate_grid() -> Optional[SurrogateGrid]:
+    """The surrogate grid if built; otherwise start building it and return None."""
+    global _surrogate_task
+    if _surrogate is not None or not config.surrogate_grid:
+        return _surrogate
+    if _surrogate_task is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        async def build():
+            global _surrogate
+            try:
+                _surrogate = await run_in_threadpool(surrogate_grid)
+            except Exception as e:
+                print(f"⚠️ Warning: Could not build the surrogate TCO grid: {e}")
+
+        _surrogate_task = loop.create_task(build())
+    return None
+
+
+@on_catalog_change
+def _start_surrogate_grid(previous, catalog) -> None:
+    # First catalog load: precompute the surrogate grid for approximate requests
+    if previous is None:
+        _surrogate_grid()
+
+
+def _approximate_results(relevant: List[MachineData], catalog, calc_kwargs: dict, checkpoints) -> List[dict]:
+    """
+    Totals of every relevant machine, from the surrogate grid where possible.
+
+    The grid covers flat, undiscounted prices on the monthly schedule, whole
+    years up to its horizon and its range of hours per year. Everything else,
+    and every request for checkpoints, is computed exactly (lazily).
+    """
+    grid = _surrogate
+    results: List[Optional[dict]] = [None] * len(relevant)
+    if (
+        grid is not None
+        and checkpoints is None
+        and calc_kwargs["schedule"] == "monthly"
+        and is_scalar_price(calc_kwargs["electricity_eur_per_kwh"])
+        and is_scalar_price(calc_kwargs["water_eur_per_l"])
+        and not calc_kwargs["electricity_escalation_pct"]
+        and not calc_kwargs["water_escalation_pct"]
+        and not calc_kwargs["discount_rate"]
+    ):
+        bases = [catalog.basis(m) for m in relevant]
+        hours, needed, available = scheduled_hours(
+            np.array([b.capacity_max for b in bases]),
+            operation_hours_per_year=calc_kwargs["operation_hours_per_year"],
+            throughput_per_day=calc_kwargs["throughput_per_day"],
+            workdays_per_week=calc_kwargs["workdays_per_week"],
+            operation_hours_per_day=calc_kwargs["operation_hours_per_day"],
+        )
+        years = calc_kwargs["years"]
+        rows = np.flatnonzero(grid.covers(years, hours))
+        if rows.size:
+            approx = grid.evaluate(
+                stack_bases(bases[i] for i in rows),
+                hours[rows],
+                years=years,
+                electricity_eur_per_kwh=float(calc_kwargs["electricity_eur_per_kwh"]),
+                water_eur_per_l=float(calc_kwargs["water_eur_per_l"]),
+            )
+            for k, i in enumerate(rows):
+                results[i] = {
+                    "label": calc_kwargs["label"] or bases[i].label,
+                    "monthly_cum_total": [],
+                    "ca": bases[i].ca,
+                    "cc": bases[i].cc,
+                    "co": float(approx.co[k]),
+                    "cm": float(approx.cm[k]),
+                    "needed_hours_per_day": float(needed[i]) if needed is not None else None,
+                    "available_hours_per_day": available,
+                    "hours_per_year": float(hours[i]),
+                    "discount_rate": None,
+                    "total": float(approx.total[k]),
+                    "approximate": True,
+                    "error_bound": float(approx.error_bound[k]),
+                }
+    for i, machine in enumerate(relevant):
+        if results[i] is None:
+            tco = calculate_tco_for_machine(machine, lazy=True, **calc_kwargs)
+            results[i] = {**tco.to_dict(False, checkpoints), "approximate": False, "error_bound": 0.0}
+    return results
+
+
+def _approximate_project_tco(
+    project: Project,
+    request: TCOCalculationRequest,
+    catalog,
+    relevant: List[MachineData],
+    calc_kwargs: dict,
+    excluded_machines: List[dict],
+) -> ProjectTCOResponse:
+    """Body of the TCO endpoint for approximate=true: totals only, cheapest first with top_k."""
+    results = _approximate_results(relevant, catalog, calc_kwargs, request.checkpoint_months)
+    order = list(range(len(relevant)))
+    if request.top_k is not None:
+        order = sorted(order, key=lambda i: results[i]["total"])[:request.top_k]
+    from_grid = sum(results[i]["approximate"] for i in order)
+    scope = (
+        f"the {len(order)} cheapest of {len(relevant)}" if request.top_k is not None else str(len(relevant))
+    )
+    return ProjectTCOResponse(
+        success=True,
+        project=project.to_dict(),
+        relevant_machines=[relevant[i].to_dict() for i in order],
+        tco_results=[results[i] for i in order],
+        message=f"TCO calculated for {scope} relevant machines ({from_grid} from the surrogate grid)",
+        excluded_machines=excluded_machines,
+    )
+
+
+# Rapid successive edits restart this quiet period instead of queueing computations
+PRECOMPUTE_DELAY_SECONDS = 0.25
+
+
+def default_tco_request(project: Project) -> TCOCalculationRequest:
+    """The TCO a user sees first: the project's own years and prices, 20 h/day cap."""
+    return TCOCalculationRequest(
+        years=project.years,
+        electricity_eur_per_kwh=project.energy_price_eur_per_kwh,
+        water_eur_per_l=project.water_price_eur_per_l,
+    )
+
+
+def schedule_precompute(project: Project) -> None:
+    """Warm the default TCO of a just-mutated project in the background, cancelling any superseded run."""
+    name = project.project_name
+    warm_tco.pop(name, None)
+    previous = warm_tasks.pop(name, None)
+    if previous is not None:
+        previous.cancel()
+
+    async def precompute():
+        try:
+            await asyncio.sleep(PRECOMPUTE_DELAY_SECONDS)
+            catalog = machine_catalog()
+            request = default_tco_request(project)
+            inputs = tco_inputs(project, request)
+            stamps = dict(stage_versions.get(name, {}))
+            hours_per_day = inputs["operation_hours_per_day"]
+            relevant = cached_relevant(name, catalog, hours_per_day)
+            if relevant is None:
+                relevant = filter_machines_for_project(catalog.machines, project, operation_hours_per_day=hours_per_day)
+                warm_filter[name] = WarmFilter(stamps.get("filter"), catalog.version, hours_per_day, relevant)
+                index_project(name, catalog, relevant, stamps.get("filter"))
+            response = await run_in_threadpool(_calculate_project_tco, project, request, catalog, relevant)
+            # A newer edit may have invalidated the pricing while the thread was computing
+            if stage_versions.get(name, {}).get("pricing") == stamps.get("pricing"):
+                warm_tco[name] = WarmTCO(project, stamps.get("pricing"), catalog.version, inputs, response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Warning: Could not precompute TCO for project '{name}': {e}")
+        finally:
+            if warm_tasks.get(name) is asyncio.current_task():
+                del warm_tasks[name]
+
+    warm_tasks[name] = asyncio.get_running_loop().create_task(precompute())
+
+
+def store_project(project: Project) -> Optional[ProjectChange]:
+    """
+    Store a new version of a project and invalidate only what the change reaches.
+
+    Contact edits re-index the project for search and touch no TCO cache; price,
+    years and workday edits reprice the cached relevant machines; filter edits
+    recompute both stages.
+
+    Returns:
+        The change against the stored version (None for a new project)
+    """
+    name = project.project_name
+    previous = projects_storage.get(name)
+    change = classify_changes(previous, project) if previous is not None else None
+    if change is not None and not change.changed:
+        return change
+
+    projects_storage[name] = project
+    version = project_versions[name] = project_versions.get(name, 0) + 1
+    stamps = stage_versions.setdefault(name, {})
+    if change is None or any(field in SEARCH_FIELDS for field in change.changed):
+        project_index.add(name, project)
+    if change is None or change.invalidates_filter:
+        stamps["filter"] = version
+    if change is None or change.invalidates_pricing:
+        stamps["pricing"] = version
+        schedule_precompute(project)
+    return change
+
+
 @router.post("/projects/{project_name}/tco", response_model=ProjectTCOResponse)
 async def calculate_project_tco(
     project_name: str,
-    request: TCOCalculationRequest
+    request: TCOCalculationRequest,
+    http_request: Request = None,
 ):
     """Calculate TCO for all relevant machines for a specific project."""
     try:
@@ -196,237 +798,334 @@ async def calculate_project_tco(
         
         project = projects_storage[project_name]
         
-        # Load all machines from CSV
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'calculation_engine', 'machines.csv')
-        all_machines = load_machines_from_csv(csv_path)
-        
-        # Determine effective hours/day for filtering when using throughput
-        has_throughput = (
-            request.throughput_per_day is not None or project.customer_throughput_per_day is not None
+        # Load all machines from CSV (cached with its Pareto front until the file changes)
+        catalog = machine_catalog()
+        if request.approximate:
+            _surrogate_grid()
+
+        # Served from the background precomputation when the inputs resolve to the project defaults
+        warm = warm_tco.get(project_name)
+        inputs = tco_inputs(project, request)
+        if (
+            warm is not None
+            and warm.pricing_version == stage_versions.get(project_name, {}).get("pricing")
+            and warm.catalog_version == catalog.version
+            and not request.non_dominated_only
+            and request.top_k is None
+            and request.include_series
+            and request.checkpoint_months is None
+            and not request.approximate
+            and inputs == warm.inputs
+        ):
+            response = warm.response
+            if warm.project is not project:
+                # Only fields outside the TCO pipeline changed since (e.g. contact details)
+                response = response.model_copy(update={"project": project.to_dict()})
+        else:
+            relevant = cached_relevant(project_name, catalog, inputs["operation_hours_per_day"])
+            response = _calculate_project_tco(project, request, catalog, relevant)
+        # Approximate previews (slider drags) are not worth a history entry
+        scenario_id = None if request.approximate else await record_scenario(project_name, request, inputs, catalog, response)
+        if scenario_id is not None:
+            response = response.model_copy(update={"scenario_id": scenario_id})
+        # Arrow rows: each TCO result joined with its machine
+        return negotiated(
+            http_request,
+            response,
+            "tco_results",
+            rows=[{**m, **t} for m, t in zip(response.relevant_machines, response.tco_results)],
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating project TCO: {str(e)}")
+
+
+@router.get("/projects/{project_name}/alternatives", response_model=AlternativesResponse)
+async def get_closest_alternatives(
+    project_name: str,
+    k: int = Query(5, ge=1, le=50),
+    operation_hours_per_day: float = Query(20.0, gt=0, le=24),
+):
+    """The k machines of the project's application that come closest to passing its rules."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+        project = projects_storage[project_name]
+        alternatives = machine_catalog().closest_alternatives(project, k, operation_hours_per_day=operation_hours_per_day)
+        return AlternativesResponse(
+            success=True,
+            project_name=project_name,
+            alternatives=alternatives,
+            message=f"{len(alternatives)} closest machines for project '{project_name}'",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding alternatives: {str(e)}")
+
+
+@router.get("/projects/{project_name}/diagnostics", response_model=DiagnosticsResponse)
+async def get_constraint_diagnostics(
+    project_name: str,
+    operation_hours_per_day: float = Query(20.0, gt=0, le=24),
+    max_failed_rules: int = Query(2, ge=1, le=9),
+    max_near_misses: int = Query(20, ge=0, le=200),
+):
+    """Which project rules reject which machines, and the smallest changes that admit the near misses."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+        diagnosis = machine_catalog().diagnose(
+            projects_storage[project_name],
+            operation_hours_per_day=operation_hours_per_day,
+            max_failed_rules=max_failed_rules,
+            max_near_misses=max_near_misses,
         )
-        filter_hours_per_day = (
-            request.operation_hours_per_day
-            if request.operation_hours_per_day is not None
-            else (20 if has_throughput else None)
+        return DiagnosticsResponse(
+            success=True,
+            project_name=project_name,
+            **diagnosis,
+            message=(
+                f"{len(diagnosis['passing'])} of {len(diagnosis['machine_ids'])} machines pass the rules of "
+                f"project '{project_name}', {len(diagnosis['near_misses'])} near misses"
+            ),
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error diagnosing project constraints: {str(e)}")
 
-        # Filter machines based on project requirements and available hours/day
-        relevant_machines = filter_machines_for_project(all_machines, project, operation_hours_per_day=filter_hours_per_day)
-        
-        if not relevant_machines:
-            return ProjectTCOResponse(
-                success=True,
-                project=project.to_dict(),
-                relevant_machines=[],
-                tco_results=[],
-                message=f"No relevant machines found for project '{project_name}'"
-            )
-        
-        # Calculate TCO for each relevant machine
-        tco_results = []
-        for machine in relevant_machines:
-            # Commissioning should be construction-only (5 €/kg × total weight).
-            # Set training_cost to 0 so Cc = construction_cost_per_kg × total_weight_kg.
-            training_cost = 0.0
-
-            # Fallback to project defaults if not supplied in request (preserve zeros)
-            calc_years = request.years if request.years is not None else project.years
-            calc_electricity = (
+
+@router.post("/projects/{project_name}/breakeven", response_model=BreakEvenResponse)
+async def solve_project_break_even(project_name: str, request: BreakEvenRequest):
+    """Values of one input at which two machines have the same TCO, and which is cheaper in between."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+        project = projects_storage[project_name]
+        catalog = machine_catalog()
+        machines = []
+        for key in (request.machine_a, request.machine_b):
+            machine = catalog.machine(key)
+            if machine is None:
+                raise HTTPException(status_code=404, detail=f"Machine '{key}' not found")
+            machines.append(machine)
+
+        overrides = request.model_dump(
+            exclude={"machine_a", "machine_b", "parameter", "low", "high", "samples"}, exclude_none=True
+        )
+        calc_kwargs = tco_inputs(project, TCOCalculationRequest(**overrides))
+        result = solve_break_even(
+            *machines,
+            request.parameter,
+            low=request.low,
+            high=request.high,
+            samples=request.samples,
+            bases=tuple(catalog.basis(m) for m in machines),
+            **{k: calc_kwargs[k] for k in (
+                "years", "electricity_eur_per_kwh", "water_eur_per_l", "operation_hours_per_year",
+                "throughput_per_day", "workdays_per_week", "operation_hours_per_day",
+                "electricity_escalation_pct", "water_escalation_pct", "discount_rate",
+            )},
+        )
+
+        names = {"a": request.machine_a, "b": request.machine_b, "tie": "tie"}
+        current = calc_kwargs[request.parameter]
+        current = float(current) if isinstance(current, (int, float)) else None
+        cheaper_now = result.cheaper_at(current) if current is not None else None
+        values = ", ".join(f"{v:.6g}" for v in result.break_even) or "none"
+        return BreakEvenResponse(
+            success=True,
+            project_name=project_name,
+            parameter=request.parameter,
+            machine_a={"machine_id": request.machine_a, "label": machines[0].default_label()},
+            machine_b={"machine_id": request.machine_b, "label": machines[1].default_label()},
+            method=result.method,
+            break_even=result.break_even,
+            segments=[{**s, "cheaper": names[s["cheaper"]]} for s in result.segments],
+            current_value=current,
+            cheaper_at_current=names.get(cheaper_now),
+            evaluations=result.evaluations,
+            message=f"Break-even {request.parameter} in [{result.low:g}, {result.high:g}]: {values}",
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error solving break-even: {str(e)}")
+
+
+@router.post("/projects/{project_name}/tco/montecarlo", response_model=MonteCarloResponse)
+async def calculate_project_tco_montecarlo(project_name: str, request: MonteCarloRequest, http_request: Request = None):
+    """Monte Carlo TCO for all relevant machines: P10/P50/P90 bands and probability of being cheapest."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+
+        project = projects_storage[project_name]
+        catalog = machine_catalog()
+
+        # Same 20 h/day default cap as the deterministic TCO endpoint
+        hours_per_day = request.operation_hours_per_day if request.operation_hours_per_day is not None else 20
+        relevant_machines = filter_machines_for_project(catalog.machines, project, operation_hours_per_day=hours_per_day)
+
+        excluded_machines = []
+        if request.non_dominated_only:
+            excluded_machines = catalog.dominated(relevant_machines)
+            relevant_machines = catalog.non_dominated(relevant_machines)
+
+        def spec(requested: Optional[DistributionSpec], fixed_value: float) -> dict:
+            return requested.model_dump() if requested is not None else {"dist": "fixed", "value": fixed_value}
+
+        results = await run_in_threadpool(
+            run_montecarlo,
+            relevant_machines,
+            n_scenarios=request.n_scenarios,
+            years=request.years if request.years is not None else project.years,
+            electricity_eur_per_kwh=spec(request.electricity_eur_per_kwh, project.energy_price_eur_per_kwh),
+            water_eur_per_l=spec(request.water_eur_per_l, project.water_price_eur_per_l),
+            throughput_per_day=spec(request.throughput_per_day, project.customer_throughput_per_day),
+            unplanned_downtime=spec(request.unplanned_downtime, 0.0),
+            operation_hours_per_year=request.operation_hours_per_year,
+            operation_hours_per_day=hours_per_day,
+            workdays_per_week=(
+                request.workdays_per_week
+                if request.workdays_per_week is not None
+                else project.workdays_per_week
+            ),
+            electricity_escalation_pct=request.electricity_escalation_pct,
+            water_escalation_pct=request.water_escalation_pct,
+            discount_rate=request.discount_rate,
+            percentiles=request.percentiles,
+            seed=request.seed,
+        )
+
+        return negotiated(http_request, MonteCarloResponse(
+            success=True,
+            project=project.to_dict(),
+            n_scenarios=request.n_scenarios,
+            results=[r.to_dict() for r in results],
+            message=(
+                f"Monte Carlo TCO over {request.n_scenarios} scenarios for {len(results)} relevant machines"
+                if results
+                else f"No relevant machines found for project '{project_name}'"
+            ),
+            excluded_machines=excluded_machines,
+        ), "results")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating Monte Carlo TCO: {str(e)}")
+
+
+
+@router.post("/projects/{project_name}/fleet", response_model=FleetResponse)
+async def optimize_project_fleet(project_name: str, request: FleetRequest):
+    """Cheapest fleets of parallel machines that jointly meet the project's throughput and budgets."""
+    try:
+        if project_name not in projects_storage:
+            raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+
+        project = projects_storage[project_name]
+        all_machines = machine_catalog().machines
+
+        result = optimize_fleet(
+            all_machines,
+            project,
+            throughput_per_day=request.throughput_per_day,
+            max_units=request.max_units,
+            allow_mixed=request.allow_mixed,
+            top_n=request.top_n,
+            years=request.years if request.years is not None else project.years,
+            electricity_eur_per_kwh=(
                 request.electricity_eur_per_kwh
                 if request.electricity_eur_per_kwh is not None
                 else project.energy_price_eur_per_kwh
-            )
-            calc_water = (
+            ),
+            water_eur_per_l=(
                 request.water_eur_per_l
                 if request.water_eur_per_l is not None
                 else project.water_price_eur_per_l
-            )
-
-            # Determine workdays per week, allowing request override
-            calc_workdays_per_week = (
+            ),
+            workdays_per_week=(
                 request.workdays_per_week
                 if request.workdays_per_week is not None
                 else project.workdays_per_week
-            )
-
-            # Default to 20 hours/day cap when performing throughput-based calculations and not explicitly provided
-            has_throughput = (
-                request.throughput_per_day is not None or project.customer_throughput_per_day is not None
-            )
-            effective_hours_per_day = (
-                request.operation_hours_per_day
-                if request.operation_hours_per_day is not None
-                else (20 if has_throughput else None)
-            )
+            ),
+            # Same 20 h/day default cap as the TCO endpoints
+            operation_hours_per_day=request.operation_hours_per_day if request.operation_hours_per_day is not None else 20,
+            electricity_escalation_pct=request.electricity_escalation_pct,
+            water_escalation_pct=request.water_escalation_pct,
+            discount_rate=request.discount_rate,
+            max_footprint_m2=request.max_footprint_m2,
+            max_total_weight_kg=request.max_total_weight_kg,
+        )
 
-            tco = calculate_tco_for_machine(
-                machine,
-                years=calc_years,
-                electricity_eur_per_kwh=calc_electricity,
-                water_eur_per_l=calc_water,
-                training_cost=training_cost,
-                label=request.label,
-                operation_hours_per_year=request.operation_hours_per_year,
-                throughput_per_day=(
-                    request.throughput_per_day
-                    if request.throughput_per_day is not None
-                    else project.customer_throughput_per_day
-                ),
-                workdays_per_week=calc_workdays_per_week,
-                operation_hours_per_day=effective_hours_per_day
-            )
-            tco_results.append(tco.to_dict())
-        
-        return ProjectTCOResponse(
+        return FleetResponse(
             success=True,
             project=project.to_dict(),
-            relevant_machines=[machine.to_dict() for machine in relevant_machines],
-            tco_results=tco_results,
-            message=f"TCO calculated for {len(relevant_machines)} relevant machines"
+            **result.to_dict(),
+            message=(
+                f"Found {len(result.options)} fleets of up to {request.max_units} machines"
+                if result.options
+                else f"No feasible fleet of up to {request.max_units} machines for project '{project_name}'"
+            ),
         )
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calculating project TCO: {str(e)}")
-
+        raise HTTPException(status_code=500, detail=f"Error optimizing fleet: {str(e)}")
 
-def _magic_prompt() -> str:
-    return (
-        "You are an expert sales assistant. Extract structured data from the user's pasted text. "
-        "Return ONLY valid minified JSON and nothing else. Keys must match exactly and be present even if null. "
-        "Schema: {"
-        "\"company_name\": string|null, \"contact_person\": string|null, \"telefon_nummer\": string|null, \"email\": string|null, "
-        "\"application\": one of [\"Citrus\",\"Wine\",\"Beer\",\"Tea\",\"Fruit Juice\"] or null, \"sub_application\": string|null, "
-        "\"solids_percentage\": number|null, \"customer_throughput_per_day\": number|null, \"years\": number|null, \"workdays_per_week\": number|null, "
-        "\"energy_price_eur_per_kwh\": number|null, \"water_price_eur_per_l\": number|null, "
-        "\"protection_class\": one of [\"IP55\",\"IP00\"] or null, \"motor_efficiency\": one of [\"≥ IE3\",\"-\"] or null, "
-        "\"length_mm\": number|null, \"width_mm\": number|null, \"height_mm\": number|null, \"weight_kg\": number|null } "
-        "Numbers must be plain numbers (use dot as decimal separator). If a value is a range, pick the best single estimate. "
-        "If unknown or not present, use null. Normalize phone numbers into international format when possible."
-    )
-
-
-def _coerce_parsed(d: dict) -> dict:
-    """Coerce and sanitize parsed dict toward backend Project fields."""
-    def num(x):
-        try:
-            if x is None:
-                return None
-            return float(x)
-        except Exception:
-            return None
-
-    allowed_app = {"Citrus","Wine","Beer","Tea","Fruit Juice"}
-    allowed_prot = {"IP55","IP00"}
-    allowed_eff = {"≥ IE3","-"}
-
-    out = {
-        "company_name": (d.get("company_name") or None),
-        "contact_person": (d.get("contact_person") or None),
-        "telefon_nummer": (d.get("telefon_nummer") or None),
-        "email": (d.get("email") or None),
-        "application": (d.get("application") if d.get("application") in allowed_app else None),
-        "sub_application": (d.get("sub_application") or None),
-        "solids_percentage": num(d.get("solids_percentage")),
-        "customer_throughput_per_day": num(d.get("customer_throughput_per_day")),
-        "years": int(num(d.get("years")) or 0) or None,
-        "workdays_per_week": int(num(d.get("workdays_per_week")) or 0) or None,
-        "energy_price_eur_per_kwh": num(d.get("energy_price_eur_per_kwh")),
-        "water_price_eur_per_l": num(d.get("water_price_eur_per_l")),
-        "protection_class": (d.get("protection_class") if d.get("protection_class") in allowed_prot else None),
-        "motor_efficiency": (d.get("motor_efficiency") if d.get("motor_efficiency") in allowed_eff else None),
-        "length_mm": num(d.get("length_mm")),
-        "width_mm": num(d.get("width_mm")),
-        "height_mm": num(d.get("height_mm")),
-        "weight_kg": num(d.get("weight_kg")),
-    }
-    return {k: v for k, v in out.items() if v is not None}
-
-
-@router.post("/projects/{project_name}/magic-fill", response_model=MagicFillResponse)
-async def magic_fill(project_name: str, req: MagicFillRequest):
-    if project_name not in projects_storage:
-        raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
-    if not req.text or len(req.text.strip()) == 0:
-        raise HTTPException(status_code=400, detail="Text is required")
-
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
-        raise HTTPException(status_code=500, detail="OPENAI_API_KEY not configured on server")
-    client = OpenAI(api_key=key)
 
+@router.post("/tco/bulk", response_model=BulkTCOResponse)
+async def calculate_bulk_tco(request: BulkTCORequest, http_request: Request = None):
+    """Winners and totals for many projects at once (grouped by application, evaluated in parallel)."""
     try:
-        system_prompt = _magic_prompt()
-        user_payload = f"Extract fields from the following text:\n\n{req.text.strip()}"
-
-        chat = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_payload},
-            ],
-            temperature=0.2,
-            max_tokens=500,
-        )
-        content = chat.choices[0].message.content if chat.choices else "{}"
-        # Some models may wrap in code fences; strip them.
-        cleaned = content.strip()
-        if cleaned.startswith("```"):
-            cleaned = cleaned.strip("`")
-            if cleaned.lower().startswith("json"):
-                cleaned = cleaned[4:]
-            cleaned = cleaned.strip()
-        parsed_raw = json.loads(cleaned)
-        parsed = _coerce_parsed(parsed_raw or {})
-
-        # Merge into existing project
-        proj = projects_storage[project_name]
-        merged = proj.to_dict()
-        merged.update(parsed)
-        projects_storage[project_name] = Project(
-            project_name=merged["project_name"],
-            company_name=merged["company_name"],
-            telefon_nummer=merged["telefon_nummer"],
-            email=merged["email"],
-            contact_person=merged["contact_person"],
-            application=merged["application"],
-            sub_application=merged["sub_application"],
-            solids_percentage=float(merged["solids_percentage"] or 0),
-            customer_throughput_per_day=float(merged["customer_throughput_per_day"] or 0),
-            workdays_per_week=int(merged["workdays_per_week"] or 5),
-            protection_class=merged["protection_class"],
-            motor_efficiency=merged.get("motor_efficiency"),
-            length_mm=float(merged["length_mm"] or 0),
-            width_mm=float(merged["width_mm"] or 0),
-            height_mm=float(merged["height_mm"] or 0),
-            weight_kg=float(merged["weight_kg"] or 0),
-            years=int(merged.get("years") or 5),
-            energy_price_eur_per_kwh=float(merged.get("energy_price_eur_per_kwh") or 0.25),
-            water_price_eur_per_l=float(merged.get("water_price_eur_per_l") or 0.002),
-        )
+        if request.projects == "all":
+            projects = list(projects_storage.values())
+        else:
+            missing = [name for name in request.projects if name not in projects_storage]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Projects not found: {', '.join(missing)}")
+            projects = [projects_storage[name] for name in request.projects]
 
-        return MagicFillResponse(success=True, parsed=parsed, message="Extracted")
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=502, detail="Model did not return valid JSON")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Magic Fill failed: {str(e)}")
+        catalog = machine_catalog()
+        machines = catalog.non_dominated(catalog.machines) if request.non_dominated_only else catalog.machines
 
+        settings = PortfolioSettings(
+            years=request.years,
+            electricity_eur_per_kwh=request.electricity_eur_per_kwh,
+            water_eur_per_l=request.water_eur_per_l,
+            workdays_per_week=request.workdays_per_week,
+            operation_hours_per_year=request.operation_hours_per_year,
+            operation_hours_per_day=request.operation_hours_per_day,
+            electricity_escalation_pct=request.electricity_escalation_pct,
+            water_escalation_pct=request.water_escalation_pct,
+            discount_rate=request.discount_rate,
+        )
+        # CPU-bound and fans out to worker processes; keep the event loop free meanwhile
+        result = await run_in_threadpool(portfolio_tco, projects, machines, settings, max_workers=request.max_workers)
 
-@router.get("/machines", response_model=MachinesListResponse)
-async def list_machines():
-    """Return all machines loaded from the CSV file."""
-    try:
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'calculation_engine', 'machines.csv')
-        machines = load_machines_from_csv(csv_path)
-        return MachinesListResponse(
+        return negotiated(http_request, BulkTCOResponse(
             success=True,
-            count=len(machines),
-            machines=[m.to_dict() for m in machines]
-        )
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+            count=len(result.entries),
+            portfolio_total=result.portfolio_total,
+            projects_without_machine=result.projects_without_machine,
+            results=[e.to_dict() for e in result.entries],
+            message=f"TCO calculated for {len(result.entries)} projects",
+        ), "results")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error loading machines: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error calculating bulk TCO: {str(e)}")
 
 
 @router.get("/health")
@@ -0,0 +1,307 @@
+"""
+Machine catalog endpoints, and what a catalog change does to stored projects.
+
+A new catalog version is diffed against the previous one (see impact.py);
+only the projects the diff reaches lose their cached TCO and are recomputed
+in the background, every other cached result carries over.
+"""
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from dataclasses import replace
+import asyncio
+import os
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from config import config
+from src.calculation_engine.catalog import machine_id
+from src.calculation_engine.engine import filter_machines_for_project, rank_machines
+from src.calculation_engine.impact import (
+    CatalogImpact,
+    ProjectImpact,
+    ProjectMachineIndex,
+    affected_projects,
+    diff_catalogs,
+)
+from src.calculation_engine.project import Project
+from src.calculation_engine.shared_catalog import shared_catalog_store
+from src.routes.calculation_routes import default_tco_request, schedule_precompute, tco_inputs
+from src.routes.formats import negotiated
+from src.routes.state import (
+    WarmFilter,
+    impact_index,
+    impact_reports,
+    index_project,
+    machine_catalog,
+    machines_csv_path,
+    on_catalog_change,
+    projects_storage,
+    stage_versions,
+    warm_filter,
+    warm_tco,
+)
+
+router = APIRouter(prefix="/api/calculation", tags=["calculation"])
+
+
+class MachinesListResponse(BaseModel):
+    success: bool
+    count: int
+    machines: List[dict]
+    catalog_version: Optional[int] = None
+
+
+class CatalogImpactResponse(BaseModel):
+    success: bool
+    catalog_version: int
+    indexed_projects: int
+    reports: List[dict]
+
+
+class CatalogStatusResponse(BaseModel):
+    success: bool
+    version: int
+    csv_path: str
+    csv_modified_at: Optional[float] = None
+    csv_size: Optional[int] = None
+    last_error: Optional[str] = None
+    watching: Optional[str] = None
+
+
+def _default_hours_per_day(project: Project) -> Optional[float]:
+    return tco_inputs(project, default_tco_request(project))["operation_hours_per_day"]
+
+
+# Catalog changes are analyzed one at a time, in the order requests see them
+_impact_lock = asyncio.Lock()
+
+
+@on_catalog_change
+def _track_catalog(previous, catalog) -> None:
+    """Recompute only the projects a new catalog version reaches, off the event loop."""
+    if previous is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _process_catalog_change_now(previous, catalog)
+        return
+    loop.create_task(_process_catalog_change(previous, catalog))
+
+
+def _analyze_catalog_change(old, new, projects: Dict[str, Project], filter_versions: dict, index: ProjectMachineIndex) -> CatalogImpact:
+    """
+    Diff two catalog versions and find the projects the diff reaches.
+
+    CPU-bound, so it runs in a worker thread on snapshots: ``projects`` and
+    their filter versions as stored when the change was seen, and a copy of
+    the impact index. Entries of that copy not computed on ``old`` for the
+    project's filter version are refreshed first.
+    """
+    diff = diff_catalogs(old, new)
+    for name, project in projects.items():
+        entry = index.get(name)
+        filter_version = filter_versions.get(name)
+        if entry is None or entry.catalog_version != old.version or entry.filter_version != filter_version:
+            relevant = filter_machines_for_project(
+                old.machines, project, operation_hours_per_day=_default_hours_per_day(project)
+            )
+            index.set(name, [machine_id(m) for m in relevant], catalog_version=old.version, filter_version=filter_version)
+
+    affected = affected_projects(diff, index, projects, old, new, _default_hours_per_day)
+    return CatalogImpact(diff=diff, affected=affected, unaffected=len(projects) - len(affected))
+
+
+def _apply_catalog_change(impact: CatalogImpact, index: ProjectMachineIndex, projects: Dict[str, Project], old, new) -> None:
+    """
+    Drop the cached TCOs of the affected projects and carry every other project's over to the new version.
+
+    Entries already recomputed on the new catalog while the analysis ran are kept.
+    """
+    for name in projects:
+        analyzed = index.get(name)
+        entry = impact_index.get(name)
+        if entry is None or entry.catalog_version != new.version:
+            version = old.version if name in impact.affected else new.version
+            impact_index.set(name, analyzed.machine_ids, catalog_version=version, filter_version=analyzed.filter_version)
+        if name in impact.affected:
+            for cache in (warm_filter, warm_tco):
+                if name in cache and cache[name].catalog_version == old.version:
+                    del cache[name]
+            continue
+        filtered = warm_filter.get(name)
+        if filtered is not None and filtered.catalog_version == old.version:
+            warm_filter[name] = replace(filtered, catalog_version=new.version)
+        priced = warm_tco.get(name)
+        if priced is not None and priced.catalog_version == old.version:
+            warm_tco[name] = replace(priced, catalog_version=new.version)
+
+    impact_reports.append(impact)
+    print(
+        f"✅ Machine catalog version {new.version}: {len(impact.diff.touched)} machines changed, "
+        f"{len(impact.affected)} of {len(projects)} projects affected"
+    )
+    if not impact.affected:
+        impact.status = "done"
+        impact.finished_at = time.time()
+
+
+def _catalog_snapshot():
+    projects = dict(projects_storage)
+    filter_versions = {name: stage_versions.get(name, {}).get("filter") for name in projects}
+    return projects, filter_versions, impact_index.copy()
+
+
+async def _process_catalog_change(old, new) -> None:
+    """Analyze a catalog change in a worker thread, then recompute the affected projects in the background."""
+    async with _impact_lock:
+        try:
+            projects, filter_versions, index = _catalog_snapshot()
+            impact = await run_in_threadpool(_analyze_catalog_change, old, new, projects, filter_versions, index)
+        except Exception as e:
+            # Cached results still carry the old version, so they are simply recomputed on demand
+            print(f"⚠️ Warning: Could not analyze machine catalog version {new.version}: {e}")
+            return
+        _apply_catalog_change(impact, index, projects, old, new)
+        if impact.affected:
+            await _recompute_impacted(impact, index, old, new)
+
+
+def _process_catalog_change_now(old, new) -> None:
+    """Same as ``_process_catalog_change``, inline, for callers without an event loop."""
+    try:
+        projects, filter_versions, index = _catalog_snapshot()
+        impact = _analyze_catalog_change(old, new, projects, filter_versions, index)
+        _apply_catalog_change(impact, index, projects, old, new)
+        if impact.affected:
+            _apply_impact(impact, _reprice_impacted(impact, _impact_inputs(impact, index), old, new), new)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not analyze machine catalog version {new.version}: {e}")
+
+
+def _impact_inputs(impact: CatalogImpact, index: ProjectMachineIndex) -> Dict[str, tuple]:
+    """Per affected project still stored: (project, filter version, machine ids on the old catalog)."""
+    return {
+        name: (projects_storage[name], stage_versions.get(name, {}).get("filter"), index.get(name).machine_ids)
+        for name in impact.affected
+        if name in projects_storage
+    }
+
+
+def _reprice_impacted(impact: CatalogImpact, inputs: Dict[str, tuple], old, new) -> Dict[str, tuple]:
+    """Cheapest machine of each affected project's default TCO on the old and the new catalog."""
+    results = {}
+    for name, (project, _, before_ids) in inputs.items():
+        outcome = ProjectImpact(name, impact.affected[name])
+        relevant = None
+        try:
+            calc_kwargs = tco_inputs(project, default_tco_request(project))
+            relevant = filter_machines_for_project(
+                new.machines, project, operation_hours_per_day=calc_kwargs["operation_hours_per_day"]
+            )
+            before = [old.machine(key) for key in before_ids]
+            for side, machines in (("before", before), ("after", relevant)):
+                ranked = rank_machines(machines, 1, **calc_kwargs) if machines else []
+                if ranked:
+                    machine, tco = ranked[0]
+                    setattr(outcome, side, machine_id(machine))
+                    setattr(outcome, f"{side}_total", tco.total)
+        except Exception as e:
+            outcome.error = str(e)
+        results[name] = (outcome, relevant)
+    return results
+
+
+def _apply_impact(impact: CatalogImpact, results: Dict[str, tuple], new, inputs: Optional[Dict[str, tuple]] = None) -> None:
+    for name, (outcome, relevant) in results.items():
+        impact.projects.append(outcome)
+        project = projects_storage.get(name)
+        filter_version = stage_versions.get(name, {}).get("filter")
+        # Results for a project edited in between are dropped; its own precompute covers it
+        if relevant is None or project is None or (inputs is not None and inputs[name][1] != filter_version):
+            continue
+        index_project(name, new, relevant, filter_version)
+        warm_filter[name] = WarmFilter(filter_version, new.version, _default_hours_per_day(project), relevant)
+    impact.status = "done"
+    impact.finished_at = time.time()
+
+
+async def _recompute_impacted(impact: CatalogImpact, index: ProjectMachineIndex, old, new) -> None:
+    """Reprice the affected projects off the event loop, then warm their default TCO again."""
+    try:
+        inputs = _impact_inputs(impact, index)
+        results = await run_in_threadpool(_reprice_impacted, impact, inputs, old, new)
+        _apply_impact(impact, results, new, inputs)
+        for name, (project, _, _) in inputs.items():
+            if projects_storage.get(name) is project:
+                schedule_precompute(project)
+        if impact.flipped:
+            print(f"✅ Cheapest machine changed for {len(impact.flipped)} projects: {', '.join(impact.flipped)}")
+    except Exception as e:
+        impact.status = "failed"
+        impact.error = str(e)
+        impact.finished_at = time.time()
+        print(f"⚠️ Warning: Could not recompute projects after catalog version {new.version}: {e}")
+
+
+@router.get("/machines", response_model=MachinesListResponse)
+async def list_machines(http_request: Request = None):
+    """Return all machines loaded from the CSV file, with their Pareto-front status."""
+    try:
+        catalog = machine_catalog()
+        return negotiated(http_request, MachinesListResponse(
+            success=True,
+            count=len(catalog.machines),
+            machines=[
+                {
+                    **m.to_dict(),
+                    "machine_id": machine_id(m),
+                    "dominated_by": catalog.dominated_by[machine_id(m)],
+                }
+                for m in catalog.machines
+            ],
+            catalog_version=catalog.version,
+        ), "machines")
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading machines: {str(e)}")
+
+
+@router.get("/machines/catalog", response_model=CatalogStatusResponse)
+async def catalog_status():
+    """Version of the machine catalog being served, and the outcome of the last reload."""
+    try:
+        catalog = machine_catalog()
+        if not config.catalog_shared_memory:
+            return CatalogStatusResponse(success=True, version=catalog.version, csv_path=os.path.abspath(machines_csv_path()))
+        return CatalogStatusResponse(success=True, **shared_catalog_store(machines_csv_path(), directory=config.catalog_shm_dir).status())
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading machines: {str(e)}")
+
+
+@router.get("/machines/catalog/impact", response_model=CatalogImpactResponse)
+async def catalog_impact(limit: int = Query(1, ge=1, le=20)):
+    """Projects the latest catalog reloads reached, newest first, and whose cheapest machine flipped."""
+    try:
+        catalog = machine_catalog()
+        return CatalogImpactResponse(
+            success=True,
+            catalog_version=catalog.version,
+            indexed_projects=len(impact_index),
+            reports=[impact.to_dict() for impact in reversed(impact_reports)][:limit],
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing catalog impact: {str(e)}")
@@ -0,0 +1,234 @@
+"""
+Response formats for API clients that are not browsers.
+
+Content negotiation: endpoints that return lists of rows (machines, projects,
+TCO results) can also answer with
+
+- ``application/vnd.apache.arrow.stream``: the rows as one Arrow record batch
+  stream (one column per field, float series as list<double>), with the rest
+  of the response envelope as JSON in the schema metadata under ``envelope``
+- ``application/msgpack``: the complete response, binary-encoded
+
+when the client's ``Accept`` header prefers them over JSON. Browsers, and
+clients that send no ``Accept`` header, keep getting JSON. Arrow needs
+``pyarrow`` and msgpack needs ``msgpack``; if a client accepts only a format
+whose library is missing, the response is 406.
+
+Compression: ``CompressionMiddleware`` compresses complete responses above a
+size threshold with brotli (if the ``brotli`` package is installed and the
+client accepts ``br``) or gzip. Streamed responses pass through untouched.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+import gzip
+import io
+import json
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/msgpack"
+
+
+def _accepted(header: str) -> List[Tuple[str, float]]:
+    """Media ranges of an Accept header with their q-values, in header order."""
+    ranges = []
+    for part in header.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((fields[0].lower(), q))
+    return ranges
+
+
+def preferred_format(request: Optional[Request]) -> str:
+    """
+    The response format the client prefers: JSON, Arrow or msgpack.
+
+    JSON wins ties and is the answer whenever neither binary format is named
+    explicitly, so ``*/*`` and browser defaults stay on JSON.
+
+    Raises:
+        HTTPException: 406 if the client accepts only a binary format whose library is not installed
+    """
+    if request is None:
+        return JSON
+    ranges = _accepted(request.headers.get("accept", ""))
+    named = {media: q for media, q in reversed(ranges)}
+    if ARROW not in named and MSGPACK not in named:
+        return JSON
+
+    def quality(media: str) -> float:
+        if media in named:
+            return named[media]
+        main = media.split("/")[0]
+        return named.get(f"{main}/*", named.get("*/*", 0.0))
+
+    available = {JSON: True, ARROW: pa is not None, MSGPACK: msgpack is not None}
+    candidates = sorted(
+        (media for media in (JSON, ARROW, MSGPACK) if quality(media) > 0),
+        key=lambda media: -quality(media),
+    )
+    for media in candidates:
+        if available[media]:
+            return media
+    top = candidates[0] if candidates else None
+    library = {ARROW: "pyarrow", MSGPACK: "msgpack"}.get(top)
+    raise HTTPException(
+        status_code=406,
+        detail=f"{top} responses need {library}, which is not installed" if library else "None of the accepted formats is available",
+    )
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def arrow_stream(rows: List[Dict[str, Any]], envelope: Dict[str, Any]) -> bytes:
+    """Rows as an Arrow IPC stream; ``envelope`` goes into the schema metadata as JSON."""
+    table = pa.Table.from_pylist(rows) if rows else pa.table({})
+    metadata = {b"envelope": json.dumps(envelope, default=_default).encode("utf-8")}
+    table = table.replace_schema_metadata(metadata)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def negotiated(request: Optional[Request], payload: BaseModel, rows_field: str, rows: Optional[List[Dict[str, Any]]] = None):
+    """
+    Return ``payload`` in the format the client prefers.
+
+    Args:
+        request: Incoming request (None when the endpoint runs outside HTTP, e.g. as a job)
+        payload: Response model
+        rows_field: Field of the payload that holds the rows for Arrow
+        rows: Rows to send instead of that field (e.g. TCO results joined with their machines)
+
+    Returns:
+        The payload itself for JSON (so the endpoint's response model applies), else a binary Response
+    """
+    media = preferred_format(request)
+    if media == JSON:
+        return payload
+    data = payload.model_dump()
+    if media == MSGPACK:
+        body = msgpack.packb(data, use_bin_type=True, default=_default)
+    else:
+        table_rows = rows if rows is not None else data.get(rows_field) or []
+        envelope = {k: v for k, v in data.items() if k != rows_field}
+        body = arrow_stream(table_rows, envelope)
+    return Response(content=body, media_type=media, headers={"Vary": "Accept"})
+
+
+def _encodings(header: str) -> Dict[str, float]:
+    return {media: q for media, q in _accepted(header)}
+
+
+class CompressionMiddleware:
+    """
+    Compress complete HTTP responses of at least ``minimum_size`` bytes with brotli or gzip.
+
+    Responses that already carry a Content-Encoding, and streamed responses
+    (more than one body message), are sent as they are.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, scope) -> Optional[str]:
+        header = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                header = value.decode("latin-1")
+        accepted = _encodings(header)
+        wildcard = accepted.get("*", 0.0)
+        if brotli is not None and accepted.get("br", wildcard) > 0:
+            return "br"
+        if accepted.get("gzip", wildcard) > 0:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = list(start_message.get("headers", []))
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or any(name == b"content-encoding" for name, _ in headers)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers = [(name, value) for name, value in headers if name not in (b"content-length", b"vary")]
+            vary = [value for name, value in start_message.get("headers", []) if name == b"vary"]
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
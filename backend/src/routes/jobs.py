@@ -0,0 +1,185 @@
+"""Background jobs: TCO, Monte Carlo, fleet and bulk calculations that outlast an HTTP request."""
+
+from fastapi import APIRouter, HTTPException
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+import asyncio
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from config import config
+from src.calculation_engine.jobs import FINISHED, SUCCEEDED, JobManager
+from src.calculation_engine.project import Project
+from src.routes.calculation_routes import (
+    BulkTCORequest,
+    FleetRequest,
+    MonteCarloRequest,
+    TCOCalculationRequest,
+    calculate_bulk_tco,
+    calculate_project_tco,
+    calculate_project_tco_montecarlo,
+    optimize_project_fleet,
+)
+from src.routes.state import projects_storage
+
+router = APIRouter(prefix="/api/calculation", tags=["calculation"])
+
+
+class JobRequest(BaseModel):
+    kind: Literal["tco", "montecarlo", "fleet", "bulk"]
+    # Required for every kind except "bulk"
+    project_name: Optional[str] = None
+    # Request body of the matching endpoint (TCO, Monte Carlo, fleet or bulk TCO)
+    params: dict = {}
+    # Limits for this job, capped at the server's maxima
+    cpu_seconds: Optional[float] = Field(None, gt=0)
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+
+
+class JobResponse(BaseModel):
+    success: bool
+    job: dict
+    message: str
+
+
+class JobResultResponse(BaseModel):
+    success: bool
+    job: dict
+    result: dict
+    message: str
+
+
+# Local job queue for calculations that outlast an HTTP request (created on first use)
+_job_manager: Optional[JobManager] = None
+
+def _jobs() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(
+            config.jobs_dir,
+            runner="src.routes.jobs:run_job",
+            max_workers=config.job_workers,
+            ttl_seconds=config.job_ttl_seconds,
+            max_cpu_seconds=config.job_max_cpu_seconds,
+            max_timeout_seconds=config.job_max_seconds,
+        )
+    return _job_manager
+
+# Job kind -> (request model of the endpoint, endpoint handler)
+_JOB_KINDS = {
+    "tco": (TCOCalculationRequest, calculate_project_tco),
+    "montecarlo": (MonteCarloRequest, calculate_project_tco_montecarlo),
+    "fleet": (FleetRequest, optimize_project_fleet),
+    "bulk": (BulkTCORequest, calculate_bulk_tco),
+}
+
+def run_job(kind: str, payload: dict) -> dict:
+    """
+    Entry point of job workers: run the endpoint of ``kind`` to completion.
+
+    Workers do not share the server's memory, so ``payload`` carries the
+    projects the job calculates along with the request body.
+    """
+    # The worker's own store holds the demo projects it loaded on import
+    projects_storage.clear()
+    for data in payload["projects"]:
+        projects_storage[data["project_name"]] = Project(**data)
+    model, handler = _JOB_KINDS[kind]
+    params = model(**payload["params"])
+    args = (params,) if kind == "bulk" else (payload["project_name"], params)
+    return asyncio.run(handler(*args)).model_dump()
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    """Queue a TCO, Monte Carlo, fleet or bulk TCO calculation as a background job."""
+    try:
+        model, _ = _JOB_KINDS[request.kind]
+        params = model(**request.params)
+        if request.kind == "bulk":
+            names = list(projects_storage) if params.projects == "all" else params.projects
+            missing = [name for name in names if name not in projects_storage]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Projects not found: {', '.join(missing)}")
+        else:
+            if not request.project_name:
+                raise HTTPException(status_code=400, detail=f"project_name is required for '{request.kind}' jobs")
+            if request.project_name not in projects_storage:
+                raise HTTPException(status_code=404, detail=f"Project '{request.project_name}' not found")
+            names = [request.project_name]
+
+        payload = {
+            "project_name": request.project_name,
+            "params": params.model_dump(),
+            "projects": [projects_storage[name].to_dict() for name in names],
+        }
+        job = _jobs().submit(
+            request.kind,
+            payload,
+            cpu_seconds=request.cpu_seconds,
+            timeout_seconds=request.timeout_seconds,
+            meta={"project_name": request.project_name, "params": params.model_dump()},
+        )
+        return JobResponse(success=True, job=job.to_dict(), message=f"Job '{job.job_id}' queued")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting job: {str(e)}")
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Status and progress of a job."""
+    try:
+        job = _jobs().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return JobResponse(success=True, job=job.to_dict(), message=f"Job '{job_id}' is {job.status}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving job: {str(e)}")
+
+
+@router.get("/jobs/{job_id}/result", response_model=JobResultResponse)
+async def get_job_result(job_id: str):
+    """Result of a succeeded job (the response body of the matching endpoint)."""
+    try:
+        job = _jobs().get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        if job.status not in FINISHED:
+            raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job.status} ({job.progress:.0%})")
+        if job.status != SUCCEEDED:
+            raise HTTPException(status_code=409, detail=f"Job '{job_id}' {job.status}: {job.error}")
+        result = _jobs().result(job_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Result of job '{job_id}' not found")
+        return JobResultResponse(success=True, job=job.to_dict(), result=result, message=f"Result of job '{job_id}'")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving job result: {str(e)}")
+
+
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+async def delete_job(job_id: str):
+    """Cancel a queued or running job, or delete a finished job and its result."""
+    try:
+        current = _jobs().get(job_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        action = "deleted" if current.status in FINISHED else "cancelled"
+        job = _jobs().delete(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return JobResponse(success=True, job=job.to_dict(), message=f"Job '{job_id}' {action}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting job: {str(e)}")
@@ -0,0 +1,105 @@
+"""Live TCO recalculation for the Compare page sliders, over a WebSocket."""
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.calculation_engine.live import LiveSession
+from src.routes.state import machine_catalog, projects_storage
+
+router = APIRouter(prefix="/api/calculation", tags=["calculation"])
+
+
+# Quiet period after a slider delta before recomputing, so bursts collapse into one run
+LIVE_DEBOUNCE_SECONDS = 0.01
+
+
+@router.websocket("/projects/{project_name}/tco/live")
+async def live_project_tco(websocket: WebSocket, project_name: str):
+    """
+    Live TCO recalculation for the Compare page sliders.
+
+    The client sends parameter deltas ``{"seq": 3, "params": {"years": 7}}``
+    (or ``{"type": "reset"}`` to resend everything). The server answers each
+    settled burst of deltas with only the machines and series that changed.
+    """
+    await websocket.accept()
+    if project_name not in projects_storage:
+        await websocket.send_json({"type": "error", "detail": f"Project '{project_name}' not found"})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        catalog = machine_catalog()
+        session = LiveSession(projects_storage[project_name], catalog.machines, basis=catalog.basis)
+        evaluation = await run_in_threadpool(session.evaluate)
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": f"Error starting live TCO: {str(e)}"})
+        await websocket.close(code=1011)
+        return
+    await websocket.send_json({"type": "snapshot", "seq": None, **session.commit(evaluation)})
+
+    wake = asyncio.Event()
+    last_seq = None
+
+    async def recompute():
+        while True:
+            await wake.wait()
+            # Debounce: wait until deltas stop arriving
+            while True:
+                wake.clear()
+                await asyncio.sleep(LIVE_DEBOUNCE_SECONDS)
+                if not wake.is_set():
+                    break
+            generation, seq = session.generation, last_seq
+            started = asyncio.get_running_loop().time()
+            try:
+                evaluation = await run_in_threadpool(session.evaluate, dict(session.params), generation)
+            except ValueError as e:
+                if session.generation == generation:
+                    await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+                continue
+            except Exception as e:
+                # Keep the session open; the next delta gets another try
+                if session.generation == generation:
+                    await websocket.send_json({"type": "error", "seq": seq, "detail": f"Error calculating TCO: {str(e)}"})
+                continue
+            if session.generation != generation:
+                # Superseded while computing; the newer delta has set ``wake`` again
+                continue
+            update = session.commit(evaluation)
+            update["elapsed_ms"] = round((asyncio.get_running_loop().time() - started) * 1000, 2)
+            await websocket.send_json({"type": "update", "seq": seq, **update})
+
+    worker = asyncio.create_task(recompute())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "detail": "Message must be valid JSON"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Message must be a JSON object"})
+                continue
+            if message.get("type") == "reset":
+                session.reset()
+                session.generation += 1
+            else:
+                try:
+                    session.apply(message.get("params") or {})
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "seq": message.get("seq"), "detail": str(e)})
+                    continue
+            last_seq = message.get("seq")
+            wake.set()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
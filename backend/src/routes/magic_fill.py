@@ -0,0 +1,336 @@
+"""Magic Fill: project fields from pasted text, for one project or a batch of leads."""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+import json
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from config import config
+from src.calculation_engine.extract import pre_extract
+from src.calculation_engine.magic import (
+    ExtractionCache,
+    MagicProvider,
+    MagicResult,
+    OpenAIProvider,
+    StubProvider,
+    magic_extract,
+    run_batch,
+)
+from src.calculation_engine.project import Project
+from src.routes.calculation_routes import store_project
+from src.routes.state import project_versions, projects_storage
+
+router = APIRouter(prefix="/api/calculation", tags=["calculation"])
+
+
+class MagicFillRequest(BaseModel):
+    text: str
+
+class MagicFillResponse(BaseModel):
+    success: bool
+    parsed: dict
+    message: Optional[str] = None
+    extracted_locally: List[str] = []       # fields the rule-based pass resolved
+    requested_from_model: List[str] = []    # fields the language model was asked for
+
+class MagicFillBatchItem(BaseModel):
+    project_name: str
+    text: str
+
+class MagicFillBatchRequest(BaseModel):
+    items: List[MagicFillBatchItem] = Field(..., min_length=1, max_length=1000)
+    # Model calls in flight at most
+    max_concurrency: int = Field(8, ge=1, le=32)
+    # Model calls per text before giving up on rate limits, timeouts and server errors
+    max_attempts: int = Field(4, ge=1, le=10)
+    # Apply no merge at all unless every item succeeds
+    all_or_nothing: bool = False
+
+
+# Magic Fill output schema, field -> JSON type as the model is told it
+_MAGIC_SCHEMA = {
+    "company_name": "string|null",
+    "contact_person": "string|null",
+    "telefon_nummer": "string|null",
+    "email": "string|null",
+    "application": "one of [\"Citrus\",\"Wine\",\"Beer\",\"Tea\",\"Fruit Juice\"] or null",
+    "sub_application": "string|null",
+    "solids_percentage": "number|null",
+    "customer_throughput_per_day": "number|null",
+    "years": "number|null",
+    "workdays_per_week": "number|null",
+    "energy_price_eur_per_kwh": "number|null",
+    "water_price_eur_per_l": "number|null",
+    "protection_class": "one of [\"IP55\",\"IP00\"] or null",
+    "motor_efficiency": "one of [\"≥ IE3\",\"-\"] or null",
+    "length_mm": "number|null",
+    "width_mm": "number|null",
+    "height_mm": "number|null",
+    "weight_kg": "number|null",
+}
+
+
+def _magic_prompt(fields: Optional[List[str]] = None) -> str:
+    """System prompt asking for ``fields`` (default: the whole schema)."""
+    schema = ", ".join(f'"{k}": {v}' for k, v in _MAGIC_SCHEMA.items() if fields is None or k in fields)
+    return (
+        "You are an expert sales assistant. Extract structured data from the user's pasted text. "
+        "Return ONLY valid minified JSON and nothing else. Keys must match exactly and be present even if null. "
+        "Schema: {" + schema + " } "
+        "Numbers must be plain numbers (use dot as decimal separator). If a value is a range, pick the best single estimate. "
+        "If unknown or not present, use null. Normalize phone numbers into international format when possible."
+    )
+
+
+def _coerce_parsed(d: dict) -> dict:
+    """Coerce and sanitize parsed dict toward backend Project fields."""
+    def num(x):
+        try:
+            if x is None:
+                return None
+            return float(x)
+        except Exception:
+            return None
+
+    allowed_app = {"Citrus","Wine","Beer","Tea","Fruit Juice"}
+    allowed_prot = {"IP55","IP00"}
+    allowed_eff = {"≥ IE3","-"}
+
+    out = {
+        "company_name": (d.get("company_name") or None),
+        "contact_person": (d.get("contact_person") or None),
+        "telefon_nummer": (d.get("telefon_nummer") or None),
+        "email": (d.get("email") or None),
+        "application": (d.get("application") if d.get("application") in allowed_app else None),
+        "sub_application": (d.get("sub_application") or None),
+        "solids_percentage": num(d.get("solids_percentage")),
+        "customer_throughput_per_day": num(d.get("customer_throughput_per_day")),
+        "years": int(num(d.get("years")) or 0) or None,
+        "workdays_per_week": int(num(d.get("workdays_per_week")) or 0) or None,
+        "energy_price_eur_per_kwh": num(d.get("energy_price_eur_per_kwh")),
+        "water_price_eur_per_l": num(d.get("water_price_eur_per_l")),
+        "protection_class": (d.get("protection_class") if d.get("protection_class") in allowed_prot else None),
+        "motor_efficiency": (d.get("motor_efficiency") if d.get("motor_efficiency") in allowed_eff else None),
+        "length_mm": num(d.get("length_mm")),
+        "width_mm": num(d.get("width_mm")),
+        "height_mm": num(d.get("height_mm")),
+        "weight_kg": num(d.get("weight_kg")),
+    }
+    return {k: v for k, v in out.items() if v is not None}
+
+
+# Model answers shared by single and batch Magic Fill (keyed by text and requested fields)
+_magic_cache = ExtractionCache(max_entries=config.magic_fill_cache_size)
+# Set to force a provider, e.g. a StubProvider in tests; otherwise chosen from the environment
+magic_provider: Optional[MagicProvider] = None
+_magic_providers: dict[str, MagicProvider] = {}
+
+
+def _magic_provider() -> Optional[MagicProvider]:
+    """
+    The model provider for Magic Fill: ``MAGIC_FILL_PROVIDER=stub`` for the offline
+    stub, otherwise OpenAI if ``OPENAI_API_KEY`` is set, else None (local pass only).
+    """
+    if magic_provider is not None:
+        return magic_provider
+    if config.magic_fill_provider == "stub":
+        return _magic_providers.setdefault("stub", StubProvider())
+    key = os.getenv("OPENAI_API_KEY")
+    if not key:
+        return None
+    # One client per key, reused across requests
+    if key not in _magic_providers:
+        _magic_providers[key] = OpenAIProvider(key, _magic_prompt)
+    return _magic_providers[key]
+
+
+def _magic_plan(text: str) -> Tuple[dict, List[str]]:
+    """Fields the rule-based pass resolves, and the fields left for the model."""
+    extraction = pre_extract(text)
+    local = _coerce_parsed(extraction.values)
+    if extraction.free_text:
+        requested = [k for k in _MAGIC_SCHEMA if k not in local]
+    else:
+        # Nothing but labelled lines and recognised patterns: only unresolved labels are worth a call
+        requested = [k for k in _MAGIC_SCHEMA if k in extraction.labeled and k not in local]
+    return local, requested
+
+
+def _merge_magic(proj: Project, parsed: dict) -> Project:
+    """Project with Magic Fill values merged over its current ones."""
+    merged = proj.to_dict()
+    merged.update(parsed)
+    return Project(
+        project_name=merged["project_name"],
+        company_name=merged["company_name"],
+        telefon_nummer=merged["telefon_nummer"],
+        email=merged["email"],
+        contact_person=merged["contact_person"],
+        application=merged["application"],
+        sub_application=merged["sub_application"],
+        solids_percentage=float(merged["solids_percentage"] or 0),
+        customer_throughput_per_day=float(merged["customer_throughput_per_day"] or 0),
+        workdays_per_week=int(merged["workdays_per_week"] or 5),
+        protection_class=merged["protection_class"],
+        motor_efficiency=merged.get("motor_efficiency"),
+        length_mm=float(merged["length_mm"] or 0),
+        width_mm=float(merged["width_mm"] or 0),
+        height_mm=float(merged["height_mm"] or 0),
+        weight_kg=float(merged["weight_kg"] or 0),
+        years=int(merged.get("years") or 5),
+        energy_price_eur_per_kwh=float(merged.get("energy_price_eur_per_kwh") or 0.25),
+        water_price_eur_per_l=float(merged.get("water_price_eur_per_l") or 0.002),
+    )
+
+
+@router.post("/projects/{project_name}/magic-fill", response_model=MagicFillResponse)
+async def magic_fill(project_name: str, req: MagicFillRequest):
+    if project_name not in projects_storage:
+        raise HTTPException(status_code=404, detail=f"Project '{project_name}' not found")
+    if not req.text or len(req.text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Text is required")
+
+    provider = _magic_provider()
+    try:
+        # Rule-based pass first; the model only gets the fields it left open
+        result = await magic_extract(req.text, _magic_plan, _coerce_parsed, provider, cache=_magic_cache)
+        if provider is None:
+            if not result.local:
+                raise HTTPException(status_code=500, detail="OPENAI_API_KEY not configured on server")
+            print("⚠️ Warning: OPENAI_API_KEY not configured, Magic Fill uses local extraction only")
+        parsed = result.parsed
+
+        # Merge into existing project
+        store_project(_merge_magic(projects_storage[project_name], parsed))
+
+        return MagicFillResponse(
+            success=True,
+            parsed=parsed,
+            message="Extracted",
+            extracted_locally=sorted(result.local),
+            requested_from_model=result.requested if provider is not None else [],
+        )
+    except HTTPException:
+        raise
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=502, detail="Model did not return valid JSON")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Magic Fill failed: {str(e)}")
+
+
+def _commit_magic_batch(items, results: Dict[int, MagicResult], versions: dict, all_or_nothing: bool) -> dict:
+    """
+    Merge the successful batch results into the project store in one step.
+
+    Runs without awaiting, so no other request sees part of the batch. Items of a
+    project that was edited while the batch ran are conflicts and are not merged.
+    """
+    merged: dict[str, Project] = {}
+    conflicts, failed = [], {}
+    for i in sorted(results):
+        result = results[i]
+        if result.error is not None:
+            continue
+        name = items[i].project_name
+        if name not in projects_storage or project_versions.get(name) != versions.get(name):
+            conflicts.append(i)
+            continue
+        try:
+            merged[name] = _merge_magic(merged.get(name) or projects_storage[name], result.parsed)
+        except (TypeError, ValueError) as e:
+            failed[i] = str(e)
+
+    complete = not conflicts and not failed and all(r.error is None for r in results.values())
+    applied = bool(merged) and (complete or not all_or_nothing)
+    updated = []
+    if applied:
+        for name, project in merged.items():
+            change = store_project(project)
+            if change is None or change.changed:
+                updated.append(name)
+    return {"applied": applied, "updated_projects": updated, "conflicts": conflicts, "merge_errors": failed}
+
+
+@router.post("/magic-fill/batch")
+async def magic_fill_batch(request: MagicFillBatchRequest):
+    """
+    Magic Fill many texts, streaming one NDJSON line per item as it completes.
+
+    Identical texts are extracted once, cached answers are used first, and the
+    remaining model calls run with bounded concurrency and retry. The merges are
+    applied to the project store together after the last item, followed by a
+    summary line.
+    """
+    provider = _magic_provider()
+    items = request.items
+    # Versions the merges are checked against when they are applied
+    versions = {item.project_name: project_versions.get(item.project_name) for item in items}
+
+    def line(payload: dict) -> bytes:
+        return (json.dumps(payload, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    async def stream():
+        results = {}
+        counts = {"model_calls": 0, "cache_hits": 0, "duplicates": 0}
+        valid = []
+        for i, item in enumerate(items):
+            if item.project_name not in projects_storage:
+                error = f"Project '{item.project_name}' not found"
+            elif not item.text.strip():
+                error = "Text is required"
+            else:
+                valid.append(i)
+                continue
+            results[i] = MagicResult(local={}, requested=[], error=error)
+            yield line({"type": "item", "index": i, "project_name": item.project_name, "status": "error", "error": error})
+
+        async for indices, result in run_batch(
+            [items[i].text for i in valid],
+            _magic_plan,
+            _coerce_parsed,
+            provider,
+            cache=_magic_cache,
+            concurrency=request.max_concurrency,
+            attempts=request.max_attempts,
+        ):
+            if result.error is None and provider is None and not result.local:
+                result.error = "OPENAI_API_KEY not configured on server and no fields found in the text"
+            counts["model_calls"] += result.attempts
+            counts["cache_hits"] += result.source == "cache"
+            counts["duplicates"] += len(indices) - 1
+            first = valid[indices[0]]
+            for j in indices:
+                i = valid[j]
+                results[i] = result
+                yield line({
+                    "type": "item",
+                    "index": i,
+                    "project_name": items[i].project_name,
+                    "status": "error" if result.error else "ok",
+                    "parsed": result.parsed,
+                    "extracted_locally": sorted(result.local),
+                    "requested_from_model": result.requested if provider is not None else [],
+                    "source": result.source,
+                    "attempts": result.attempts,
+                    "duplicate_of": first if i != first else None,
+                    "error": result.error,
+                })
+
+        failed = sum(r.error is not None for r in results.values())
+        commit = _commit_magic_batch(items, results, versions, request.all_or_nothing)
+        yield line({
+            "type": "summary",
+            "total": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            **counts,
+            **commit,
+        })
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,92 @@
+"""Scenario history: TCO results stored per project, to list and reopen later."""
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.routes.calculation_routes import ProjectTCOResponse
+from src.routes.state import scenario_store
+
+router = APIRouter(prefix="/api/calculation", tags=["calculation"])
+
+
+class ScenarioListResponse(BaseModel):
+    success: bool
+    project_name: str
+    total: int
+    limit: int
+    offset: int
+    scenarios: List[dict]
+
+class ScenarioResponse(BaseModel):
+    success: bool
+    scenario: dict
+    # Normalized request the scenario was computed with
+    inputs: dict
+    result: ProjectTCOResponse
+
+
+@router.get("/projects/{project_name}/scenarios", response_model=ScenarioListResponse)
+async def list_project_scenarios(
+    project_name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """A project's stored TCO scenarios, newest first (from the index; no scenario is opened)."""
+    try:
+        store = scenario_store()
+        if store is None:
+            raise HTTPException(status_code=503, detail="Scenario history is disabled")
+        scenarios = await run_in_threadpool(
+            store.list,
+            project_name,
+            since=since.timestamp() if since is not None else None,
+            until=until.timestamp() if until is not None else None,
+            limit=limit,
+            offset=offset,
+        )
+        return ScenarioListResponse(
+            success=True,
+            project_name=project_name,
+            total=store.count(project_name),
+            limit=limit,
+            offset=offset,
+            scenarios=[info.to_dict() for info in scenarios],
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing scenarios: {str(e)}")
+
+
+@router.get("/projects/{project_name}/scenarios/{scenario_id}", response_model=ScenarioResponse)
+async def get_project_scenario(project_name: str, scenario_id: str):
+    """Reopen a stored TCO scenario as it was computed (a file read, not a recalculation)."""
+    try:
+        store = scenario_store()
+        if store is None:
+            raise HTTPException(status_code=503, detail="Scenario history is disabled")
+        scenario = await run_in_threadpool(store.load, scenario_id)
+        if scenario is None or scenario["info"]["project_name"] != project_name:
+            raise HTTPException(
+                status_code=404, detail=f"Scenario '{scenario_id}' not found for project '{project_name}'"
+            )
+        return ScenarioResponse(
+            success=True,
+            scenario=scenario["info"],
+            inputs=scenario["inputs"],
+            result=ProjectTCOResponse(**scenario["response"], scenario_id=scenario_id),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading scenario: {str(e)}")
@@ -0,0 +1,231 @@
+"""
+State shared by the calculation routers.
+
+Everything here is per worker process: the project store with its search
+index and version stamps, the warm results of the background precompute,
+the machine -> projects index of the catalog impact analysis, and access to
+the machine catalog (which itself is shared between workers and hot-reloaded,
+see shared_catalog.py and watch.py).
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, TYPE_CHECKING
+from collections import deque
+from types import SimpleNamespace
+import asyncio
+import os
+import sys
+
+from starlette.concurrency import run_in_threadpool
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from config import config
+from src.calculation_engine.catalog import Catalog, load_catalog, machine_id
+from src.calculation_engine.demo import get_demo_data
+from src.calculation_engine.history import ScenarioStore
+from src.calculation_engine.impact import ProjectMachineIndex
+from src.calculation_engine.machine_data import MachineData
+from src.calculation_engine.project import Project
+from src.calculation_engine.search import ProjectIndex
+from src.calculation_engine.shared_catalog import shared_catalog_store
+
+if TYPE_CHECKING:
+    from src.routes.calculation_routes import ProjectTCOResponse, TCOCalculationRequest
+
+
+def machines_csv_path() -> str:
+    return os.path.join(os.path.dirname(__file__), '..', 'calculation_engine', 'machines.csv')
+
+
+# In-memory storage for projects (using project_name as primary key)
+projects_storage: dict[str, Project] = {}
+# Search index over projects_storage, updated on every write to it
+project_index = ProjectIndex()
+# Per-project version, bumped on every stored change, and per TCO stage ("filter",
+# "pricing") the version whose change last invalidated it (see changes.py)
+project_versions: dict[str, int] = {}
+stage_versions: dict[str, dict[str, int]] = {}
+
+
+# Auto-load demo data on startup
+def _load_demo_data():
+    """Load demo data into projects storage on startup."""
+    try:
+        demo_data = get_demo_data()
+        for project in demo_data["projects"]:
+            projects_storage[project.project_name] = project
+            project_index.add(project.project_name, project)
+            project_versions[project.project_name] = 1
+            stage_versions[project.project_name] = {"filter": 1, "pricing": 1}
+        print(f"✅ Loaded {len(demo_data['projects'])} demo projects on startup")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not load demo data on startup: {e}")
+
+# Load demo data when module is imported
+_load_demo_data()
+
+
+@dataclass
+class WarmFilter:
+    """Relevant machines of one project version (filter stage)."""
+    filter_version: int
+    catalog_version: int
+    operation_hours_per_day: Optional[float]
+    relevant: List[MachineData]
+
+
+@dataclass
+class WarmTCO:
+    """Precomputed default-parameter TCO of one project version (pricing stage)."""
+    project: Project
+    pricing_version: int
+    catalog_version: int
+    inputs: dict
+    response: "ProjectTCOResponse"
+
+
+# project_name -> warm stage results, and the background task computing the next TCO
+warm_filter: dict[str, WarmFilter] = {}
+warm_tco: dict[str, WarmTCO] = {}
+warm_tasks: dict[str, asyncio.Task] = {}
+
+
+def cached_relevant(name: str, catalog: Catalog, operation_hours_per_day: Optional[float]) -> Optional[List[MachineData]]:
+    """Relevant machines from the filter stage cache, if still valid for this catalog and hours/day cap."""
+    warm = warm_filter.get(name)
+    if (
+        warm is not None
+        and warm.filter_version == stage_versions.get(name, {}).get("filter")
+        and warm.catalog_version == catalog.version
+        and warm.operation_hours_per_day == operation_hours_per_day
+    ):
+        return warm.relevant
+    return None
+
+
+# Machine -> projects index of the catalog impact analysis, and one report per reload
+impact_index = ProjectMachineIndex()
+impact_reports: deque = deque(maxlen=20)
+
+
+def index_project(name: str, catalog: Catalog, relevant: List[MachineData], filter_version: Optional[int]) -> None:
+    impact_index.set(
+        name, [machine_id(m) for m in relevant], catalog_version=catalog.version, filter_version=filter_version
+    )
+
+
+# Called as listener(previous, catalog) when a new catalog version is first seen;
+# previous is None for the first catalog of the process
+_catalog_listeners: List[Callable[[Optional[Catalog], Catalog], None]] = []
+_catalog_seen: Optional[Catalog] = None
+# Event loop the catalog watcher hands reloads to
+_catalog_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def on_catalog_change(listener: Callable[[Optional[Catalog], Catalog], None]):
+    """Register a listener for new catalog versions (usable as a decorator)."""
+    _catalog_listeners.append(listener)
+    return listener
+
+
+def _catalog_reloaded(version: Optional[int], error: Optional[str]) -> None:
+    if error:
+        print(f"⚠️ Warning: machines.csv was not reloaded, keeping catalog version {version}: {error}")
+    else:
+        print(f"✅ Machine catalog version {version} loaded")
+        # Tell the listeners now rather than on the next request
+        if _catalog_loop is not None:
+            try:
+                _catalog_loop.call_soon_threadsafe(_check_catalog)
+            except RuntimeError:
+                pass                    # loop closed
+
+
+def _check_catalog() -> None:
+    try:
+        machine_catalog()
+    except Exception as e:
+        print(f"⚠️ Warning: Could not load the machine catalog: {e}")
+
+
+def machine_catalog() -> Catalog:
+    """
+    Machine catalog, shared between worker processes unless CATALOG_SHARED_MEMORY=0.
+
+    The shared catalog is watched for changes (unless CATALOG_WATCH=0), so a new
+    machines.csv is loaded in the background and requests just pick up its version.
+    The first access that sees a new version tells the ``on_catalog_change`` listeners.
+    """
+    if not config.catalog_shared_memory:
+        catalog = load_catalog(machines_csv_path())
+    else:
+        store = shared_catalog_store(machines_csv_path(), directory=config.catalog_shm_dir)
+        catalog = store.catalog()
+        if config.catalog_watch:
+            store.watch(interval=config.catalog_watch_interval, listener=_catalog_reloaded)
+    _track_catalog(catalog)
+    return catalog
+
+
+def _track_catalog(catalog: Catalog) -> None:
+    global _catalog_seen, _catalog_loop
+    try:
+        _catalog_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    previous = _catalog_seen
+    if previous is not None and previous.version == catalog.version:
+        return
+    _catalog_seen = catalog
+    for listener in _catalog_listeners:
+        try:
+            listener(previous, catalog)
+        except Exception as e:
+            print(f"⚠️ Warning: Catalog listener failed on version {catalog.version}: {e}")
+
+
+# Scenario history on disk (created on first use; SCENARIO_HISTORY=0 disables it)
+_scenario_store: Optional[ScenarioStore] = None
+
+def scenario_store() -> Optional[ScenarioStore]:
+    global _scenario_store
+    if not config.scenario_history:
+        return None
+    if _scenario_store is None:
+        _scenario_store = ScenarioStore(
+            config.scenario_history_dir,
+            max_per_project=config.scenario_history_max_per_project,
+            max_age_days=config.scenario_history_max_age_days,
+        )
+    return _scenario_store
+
+
+async def record_scenario(
+    project_name: str,
+    request: "TCOCalculationRequest",
+    inputs: dict,
+    catalog,
+    response: "ProjectTCOResponse",
+) -> Optional[str]:
+    """Store a TCO response in the scenario history; failures only cost the history entry."""
+    store = scenario_store()
+    if store is None:
+        return None
+    try:
+        normalized = {**inputs, "non_dominated_only": request.non_dominated_only, "top_k": request.top_k}
+        payload = response.model_dump(exclude={"scenario_id"})
+        machine_ids = [machine_id(SimpleNamespace(**m)) for m in response.relevant_machines]
+        info = await run_in_threadpool(
+            store.save,
+            project_name,
+            inputs=normalized,
+            catalog_version=catalog.version,
+            response=payload,
+            machine_ids=machine_ids,
+        )
+        return info.scenario_id
+    except Exception as e:
+        print(f"⚠️ Warning: Could not record TCO scenario for project '{project_name}': {e}")
+        return None
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Run from backend/ or the repository root: imports are relative to backend/
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from src.calculation_engine.catalog import load_catalog
+from src.calculation_engine.demo import create_demo_projects
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    return load_catalog(os.path.join(BACKEND_DIR, 'src', 'calculation_engine', 'machines.csv'))
+
+
+@pytest.fixture(scope="session")
+def demo_projects():
+    return create_demo_projects()
@@ -0,0 +1,79 @@
+"""The alternatives index and the constraint columns agree with the engine filter."""
+
+from dataclasses import replace
+import random
+
+import numpy as np
+import pytest
+
+from src.calculation_engine.catalog import machine_id
+from src.calculation_engine.diagnostics import ConstraintColumns
+from src.calculation_engine.engine import filter_machines_for_project
+
+EFFICIENCIES = [None, "", "-", "IE2", "≥ IE3", "IE4", "premium"]
+PROTECTION_CLASSES = ["", "IP54", "IP55", "IP65"]
+
+
+def _projects(catalog, demo_projects, n=300, seed=7):
+    """Projects of every application of the catalog with random rules, about a third of them unconstrained in size."""
+    rng = random.Random(seed)
+    base = demo_projects[0]
+    projects = []
+    for i in range(n):
+        machine = rng.choice(catalog.machines)
+        sizes = [0.0] * 4 if i % 3 == 0 else [rng.uniform(500, 4000) for _ in range(3)] + [rng.uniform(500, 8000)]
+        projects.append(replace(
+            base,
+            project_name=f"P{i}",
+            application=machine.application,
+            sub_application=machine.sub_application,
+            solids_percentage=rng.choice([machine.feed_solids_min_vol_perc, rng.uniform(0, 10)]),
+            customer_throughput_per_day=rng.choice([0.0, rng.uniform(1000, 300000)]),
+            protection_class=rng.choice(PROTECTION_CLASSES),
+            motor_efficiency=rng.choice(EFFICIENCIES),
+            length_mm=sizes[0],
+            width_mm=sizes[1],
+            height_mm=sizes[2],
+            weight_kg=sizes[3],
+        ))
+    return projects
+
+
+@pytest.mark.parametrize("hours", [None, 8.0])
+def test_distance_zero_exactly_for_filtered_machines(catalog, demo_projects, hours):
+    for project in _projects(catalog, demo_projects):
+        accepted = {
+            machine_id(m)
+            for m in filter_machines_for_project(catalog.machines, project, operation_hours_per_day=hours)
+        }
+        closest = catalog._alternatives.closest(project, len(catalog.machines), operation_hours_per_day=hours)
+        at_zero = {machine_id(catalog.machines[a.index]) for a in closest if a.distance == 0}
+        assert at_zero == accepted, project
+
+
+def test_unparsed_efficiency_requirement_rules_out_unrated_machines(catalog, demo_projects):
+    unrated = [m for m in catalog.machines if not m.motor_efficiency]
+    assert unrated
+    machine = unrated[0]
+    project = replace(
+        demo_projects[0],
+        application=machine.application,
+        sub_application=machine.sub_application,
+        solids_percentage=machine.feed_solids_min_vol_perc,
+        customer_throughput_per_day=0.0,
+        protection_class="",
+        motor_efficiency="-",
+        length_mm=0.0, width_mm=0.0, height_mm=0.0, weight_kg=0.0,
+    )
+    closest = catalog._alternatives.closest(project, len(catalog.machines))
+    gaps = {machine_id(catalog.machines[a.index]): a for a in closest}
+    assert gaps[machine_id(machine)].distance > 0
+    assert "motor_efficiency" in gaps[machine_id(machine)].gaps
+
+
+def test_constraint_columns_reject_exactly_the_filtered_out_machines(catalog, demo_projects):
+    columns = ConstraintColumns(catalog.machines)
+    for project in _projects(catalog, demo_projects):
+        accepted = {id(m) for m in filter_machines_for_project(catalog.machines, project)}
+        passes = ~columns.masks(project).any(axis=0)
+        assert np.array_equal(passes, [id(m) in accepted for m in catalog.machines]), project
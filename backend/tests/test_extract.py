@@ -0,0 +1,115 @@
+"""Magic Fill pre-pass: what is taken locally and what is left to the model."""
+
+import pytest
+
+from src.calculation_engine.extract import parse_number, pre_extract
+from src.routes.magic_fill import _magic_plan
+
+ENQUIRY_FORM = """Firma: Brauerei Müller GmbH
+Ansprechpartner: Hans Müller
+Telefon: 0049 89 1234567
+E-Mail: h.mueller@brauerei-mueller.de
+Anwendung: Bier
+Feststoffgehalt: 3,5 %
+Durchsatz: 85.000 l/Tag
+Schutzart: IP55
+Motor: IE3
+Länge [mm]: 3000
+Höhe (m): 2,5
+Max. Gewicht: 4,5 t
+Strompreis: 28 ct/kWh
+Wasserpreis: 2,10 €/m³
+Laufzeit: 10 Jahre
+Datum: 12.03.2026"""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("85.000", 85000), ("0,002", 0.002), ("1.234,5", 1234.5), ("1,234.5", 1234.5),
+    ("2.5", 2.5), ("6,5", 6.5), ("85 000", 85000), ("12", 12),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+
+def test_enquiry_form_is_read_locally():
+    extraction = pre_extract(ENQUIRY_FORM)
+    assert extraction.values == {
+        "company_name": "Brauerei Müller GmbH",
+        "contact_person": "Hans Müller",
+        "telefon_nummer": "+49 89 1234567",
+        "email": "h.mueller@brauerei-mueller.de",
+        "application": "Beer",
+        "solids_percentage": 3.5,
+        "customer_throughput_per_day": 85000.0,
+        "protection_class": "IP55",
+        "motor_efficiency": "≥ IE3",
+        "length_mm": 3000.0,
+        "height_mm": 2500.0,
+        "weight_kg": 4500.0,
+        "energy_price_eur_per_kwh": 0.28,
+        "water_price_eur_per_l": 0.0021,
+        "years": 10.0,
+    }
+    assert not extraction.free_text
+    parsed, requested = _magic_plan(ENQUIRY_FORM)
+    assert requested == []
+    assert parsed["years"] == 10
+
+
+def test_free_text_patterns():
+    extraction = pre_extract(
+        "We are a winery planning a sparkling wine line. Roughly 20 hl per day at about 2 % solids, "
+        "space is 2500 x 1800 x 2200 mm. Motors IE3, IP55. Call +49 6321 98765 or anna@weingut-example.de"
+    )
+    assert extraction.values == {
+        "email": "anna@weingut-example.de",
+        "length_mm": 2500.0,
+        "width_mm": 1800.0,
+        "height_mm": 2200.0,
+        "customer_throughput_per_day": 2000.0,
+        "solids_percentage": 2.0,
+        "protection_class": "IP55",
+        "motor_efficiency": "≥ IE3",
+        "telefon_nummer": "+49 6321 98765",
+        "application": "Wine",
+    }
+    assert extraction.free_text
+
+
+@pytest.mark.parametrize("text", [
+    "Payment term: 30 days",
+    "Project duration: 18 months",
+    "Water content: 80 %",
+])
+def test_ambiguous_labels_are_not_fields(text):
+    assert pre_extract(text).values == {}
+    assert _magic_plan(text) == ({}, [])
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Laufzeit: 10", "years"),
+    ("Years in business: 25", "years"),
+    ("Strompreis: 0,25", "energy_price_eur_per_kwh"),
+    ("Electricity: 400 V", "energy_price_eur_per_kwh"),
+    ("Water price: 2", "water_price_eur_per_l"),
+    ("Throughput (l/h): 5000", "customer_throughput_per_day"),
+    ("Capacity: 5000", "customer_throughput_per_day"),
+])
+def test_numbers_without_their_unit_are_left_to_the_model(text, name):
+    assert name not in pre_extract(text).values
+    assert _magic_plan(text) == ({}, [name])
+
+
+@pytest.mark.parametrize("text, name, value", [
+    ("Years: 10", "years", 10),
+    ("Laufzeit [Jahre]: 8", "years", 8),
+    ("Horizon: 12 years", "years", 12),
+    ("Strompreis [€/kWh]: 0,25", "energy_price_eur_per_kwh", 0.25),
+    ("Energy price: 21 ct/kWh", "energy_price_eur_per_kwh", 0.21),
+    ("Water cost: 3 EUR/m3", "water_price_eur_per_l", 0.003),
+    ("Capacity: 40 hl/day", "customer_throughput_per_day", 4000.0),
+])
+def test_numbers_with_their_unit_are_taken(text, name, value):
+    parsed, requested = _magic_plan(text)
+    assert parsed == {name: value}
+    assert requested == []
@@ -0,0 +1,29 @@
+"""Fleet units follow the per-machine rules of the project filter."""
+
+import dataclasses
+import math
+
+from src.calculation_engine.engine import filter_machines_for_project
+from src.calculation_engine.fleet import fleet_unit_candidates
+
+
+def _without_joint_rules(project):
+    return dataclasses.replace(project, customer_throughput_per_day=0.0, weight_kg=0.0)
+
+
+def test_units_are_the_filtered_machines_without_throughput_and_weight(catalog, demo_projects):
+    for project in demo_projects:
+        for variant in (project, dataclasses.replace(project, weight_kg=1.0, customer_throughput_per_day=1e9)):
+            expected = [
+                m for m in filter_machines_for_project(catalog.machines, _without_joint_rules(variant))
+                if m.capacity_max_inp > 0
+            ]
+            assert fleet_unit_candidates(catalog.machines, variant) == expected
+
+
+def test_unparsable_size_limits_and_missing_solids(catalog, demo_projects):
+    project = demo_projects[0]
+    unparsable = dataclasses.replace(project, length_mm="n/a")
+    expected = filter_machines_for_project(catalog.machines, _without_joint_rules(unparsable))
+    assert fleet_unit_candidates(catalog.machines, unparsable) == [m for m in expected if m.capacity_max_inp > 0]
+    assert fleet_unit_candidates(catalog.machines, dataclasses.replace(project, solids_percentage=math.nan)) == []
@@ -0,0 +1,111 @@
+"""Scenario history: series encoding, deduplication and retention."""
+
+import time
+
+import numpy as np
+import pytest
+
+from src.calculation_engine.history import ScenarioStore, decode_series, encode_series
+
+ODD_VALUES = [
+    0.0, -0.0, 1.5, -1e308, 1e308, 5e-324, -5e-324, np.inf, -np.inf, np.nan,
+    np.frombuffer(np.int64(0x7FF8DEADBEEF0001).tobytes(), dtype=np.float64)[0],     # NaN with a payload
+]
+
+
+def _bits(values):
+    return np.asarray(values, dtype=np.float64).view(np.int64)
+
+
+def _save(store, project="P", inputs=None, response=None, machines=()):
+    response = response or _response(machines)
+    return store.save(
+        project, inputs=inputs or {"years": 2}, catalog_version=1, response=response,
+        machine_ids=[r["label"] for r in response["tco_results"]],
+    )
+
+
+def _response(machines, include_series=True):
+    results = [m.calculate_toc(years=2, operation_hours_per_year=2080.0).to_dict(include_series) for m in machines]
+    return {
+        "project": {"name": "P"},
+        "relevant_machines": [{"langtyp": m.langtyp} for m in machines],
+        "tco_results": results,
+    }
+
+
+@pytest.fixture()
+def store(tmp_path):
+    return ScenarioStore(str(tmp_path / "history"))
+
+
+@pytest.fixture(scope="module")
+def machines(catalog):
+    return [m for m in catalog.machines if m.capacity_max_inp > 0][:6]
+
+
+def test_best_machine_without_series(store, machines):
+    response = _response(machines, include_series=False)
+    ids = [m.langtyp for m in machines]
+    info = store.save("P", inputs={"years": 2}, catalog_version=1, response=response, machine_ids=ids)
+    totals = [r["total"] for r in response["tco_results"]]
+    assert info.best_total == min(totals)
+    assert info.best_machine_id == ids[totals.index(min(totals))]
+    reopened = store.load(info.scenario_id)["response"]["tco_results"]
+    assert [r["total"] for r in reopened] == totals
+    assert all(r["monthly_cum_total"] == [] for r in reopened)
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [42.0],
+    ODD_VALUES,
+    np.cumsum(np.random.default_rng(0).normal(0.0, 1e4, 600)),
+    -np.cumsum(np.random.default_rng(1).uniform(0.0, 1e6, 240)),
+])
+def test_series_round_trip_is_bit_exact(values):
+    encoded = encode_series(np.asarray(values, dtype=np.float64))
+    assert encoded.dtype == np.uint8 and encoded.shape == (8, len(values))
+    np.testing.assert_array_equal(_bits(decode_series(encoded)), _bits(values))
+
+
+def test_stored_series_reopen_bit_exact(store, machines):
+    response = _response(machines[:3])
+    response["tco_results"][1]["monthly_cum_total"] = list(ODD_VALUES)
+    response["tco_results"][2]["monthly_cum_total"] = []
+    info = _save(store, response=response)
+    reopened = store.load(info.scenario_id)["response"]["tco_results"]
+    for original, loaded in zip(response["tco_results"], reopened):
+        np.testing.assert_array_equal(_bits(loaded["monthly_cum_total"]), _bits(original["monthly_cum_total"]))
+
+
+def test_identical_scenario_is_stored_once(store, machines):
+    first = _save(store, machines=machines)
+    assert _save(store, machines=machines).scenario_id == first.scenario_id
+    assert store.count("P") == 1
+    changed = _save(store, inputs={"years": 3}, machines=machines)
+    assert changed.scenario_id != first.scenario_id
+    # Only the latest scenario is compared: going back to the first inputs stores a new one
+    assert _save(store, machines=machines).scenario_id not in (first.scenario_id, changed.scenario_id)
+    assert store.count("P") == 3
+
+
+def test_retention_keeps_the_newest_per_project(tmp_path, machines):
+    store = ScenarioStore(str(tmp_path / "history"), max_per_project=3)
+    saved = [_save(store, inputs={"years": 2, "run": i}, machines=machines[:2]) for i in range(5)]
+    other = _save(store, project="Q", machines=machines[:2])
+    assert [info.scenario_id for info in store.list("P")] == [info.scenario_id for info in saved[:1:-1]]
+    assert store.load(saved[0].scenario_id) is None
+    assert store.count("Q") == 1 and store.info(other.scenario_id) is not None
+
+
+def test_retention_drops_old_scenarios(tmp_path, machines):
+    store = ScenarioStore(str(tmp_path / "history"), max_age_days=0.5 / 86400.0)
+    old = _save(store, machines=machines[:2])
+    time.sleep(0.6)
+    fresh = _save(store, project="Q", machines=machines[:2])
+    assert store.info(old.scenario_id) is None and store.load(old.scenario_id) is None
+    assert store.info(fresh.scenario_id) is not None
+    time.sleep(0.6)
+    assert store.prune() == 1
+    assert store.count("Q") == 0
@@ -0,0 +1,163 @@
+"""Catalog change impact: row diffs, affected projects, cache carry-over and flips."""
+
+from dataclasses import replace
+
+import pytest
+
+from src.calculation_engine.catalog import build_catalog, machine_id
+from src.calculation_engine.engine import filter_machines_for_project, rank_machines
+from src.calculation_engine.impact import ProjectMachineIndex, affected_projects, diff_catalogs
+from src.routes import catalog as catalog_routes
+from src.routes.calculation_routes import default_tco_request, tco_inputs
+from src.routes.state import WarmFilter, WarmTCO
+
+TEA = "GFA 10-50-645|standard - Level|flat - belt drive"
+WINE = "GFA 40-87-600|standard - Level|flat - belt drive"
+
+
+@pytest.fixture(scope="module")
+def projects(demo_projects):
+    return {p.project_name: p for p in demo_projects}
+
+
+def _name(projects, application):
+    return next(name for name, p in projects.items() if p.application == application)
+
+
+def _edit(catalog, version, *, drop=(), change=None, add=()):
+    """Next catalog version: rows dropped, rows changed ({machine_id: fields}), rows appended."""
+    change = change or {}
+    machines = [
+        replace(m, **change.get(machine_id(m), {}))
+        for m in catalog.machines
+        if machine_id(m) not in drop
+    ]
+    new = build_catalog(machines + list(add))
+    new.version = version
+    return new
+
+
+def _no_cap(project):
+    return None
+
+
+def _index(catalog, projects):
+    index = ProjectMachineIndex()
+    for name, project in projects.items():
+        relevant = filter_machines_for_project(catalog.machines, project, operation_hours_per_day=None)
+        index.set(name, [machine_id(m) for m in relevant], catalog_version=catalog.version)
+    return index
+
+
+def _affected(old, new, projects):
+    return affected_projects(diff_catalogs(old, new), _index(old, projects), projects, old, new, _no_cap)
+
+
+def test_diff_reports_added_removed_and_changed_rows(catalog):
+    removed = machine_id(catalog.machines[0])
+    twin = replace(catalog.machine(WINE), langtyp="GFA 40-87-600 X")
+    price = catalog.machine(TEA).list_price
+    new = _edit(catalog, catalog.version + 1, drop=[removed], change={TEA: {"list_price": price + 100.0}}, add=[twin])
+
+    diff = diff_catalogs(catalog, new)
+    assert (diff.from_version, diff.to_version) == (catalog.version, catalog.version + 1)
+    assert diff.removed == [removed]
+    assert diff.added == [machine_id(twin)]
+    assert diff.changed == {TEA: {"list_price": (price, price + 100.0)}}
+    assert diff.touched == {removed, machine_id(twin), TEA}
+    assert diff_catalogs(catalog, _edit(catalog, catalog.version + 1)).is_empty
+
+
+def test_changed_and_removed_machines_reach_their_projects_only(catalog, projects):
+    price = catalog.machine(TEA).list_price
+    changed = _edit(catalog, catalog.version + 1, change={TEA: {"list_price": price * 2}})
+    assert _affected(catalog, changed, projects) == {_name(projects, "Tea"): [f"changed {TEA}"]}
+
+    index = _index(catalog, projects)
+    only_one = next(key for key in index.get(_name(projects, "Wine")).machine_ids if len(index.projects_of(key)) == 1)
+    removed = _edit(catalog, catalog.version + 1, drop=[only_one])
+    assert _affected(catalog, removed, projects) == {_name(projects, "Wine"): [f"removed {only_one}"]}
+
+
+def test_new_machine_reaches_projects_it_passes(catalog, projects):
+    twin = replace(catalog.machine(WINE), langtyp="GFA 40-87-600 X")
+    affected = _affected(catalog, _edit(catalog, catalog.version + 1, add=[twin]), projects)
+    wine = {name for name, p in projects.items() if p.application == "Wine"}
+    assert set(affected) == wine
+    assert all(reasons == [f"{machine_id(twin)} now passes"] for reasons in affected.values())
+
+
+def test_project_without_relevant_machine(catalog, projects):
+    beer = _name(projects, "Beer")
+    assert _index(catalog, projects).get(beer).machine_ids == ()
+
+    other = next(machine_id(m) for m in catalog.machines if m.application == "Beer")
+    changed = _edit(catalog, catalog.version + 1, change={other: {"list_price": 1.0}})
+    assert _affected(catalog, changed, projects) == {beer: ["closest alternatives may change"]}
+
+    # A change in another application leaves its closest alternatives alone
+    unrelated = _edit(catalog, catalog.version + 1, change={TEA: {"list_price": 1.0}})
+    assert beer not in _affected(catalog, unrelated, projects)
+
+
+def test_unaffected_warm_caches_carry_over(catalog, projects, monkeypatch):
+    monkeypatch.setattr(catalog_routes, "impact_index", ProjectMachineIndex())
+    monkeypatch.setattr(catalog_routes, "impact_reports", [])
+    warm_filter = {name: WarmFilter(1, catalog.version, None, []) for name in projects}
+    warm_tco = {name: WarmTCO(p, 1, catalog.version, {}, None) for name, p in projects.items()}
+    monkeypatch.setattr(catalog_routes, "warm_filter", warm_filter)
+    monkeypatch.setattr(catalog_routes, "warm_tco", warm_tco)
+
+    new = _edit(catalog, catalog.version + 1, change={TEA: {"list_price": 1.0}})
+    index = ProjectMachineIndex()
+    impact = catalog_routes._analyze_catalog_change(catalog, new, projects, {}, index)
+    catalog_routes._apply_catalog_change(impact, index, projects, catalog, new)
+
+    tea = _name(projects, "Tea")
+    assert set(impact.affected) == {tea} and impact.unaffected == len(projects) - 1
+    assert tea not in warm_filter and tea not in warm_tco
+    assert {name: w.catalog_version for name, w in warm_filter.items()} == dict.fromkeys(set(projects) - {tea}, new.version)
+    assert {name: w.catalog_version for name, w in warm_tco.items()} == dict.fromkeys(set(projects) - {tea}, new.version)
+    # The affected project's index entry stays on the old catalog until it is recomputed
+    assert catalog_routes.impact_index.get(tea).catalog_version == catalog.version
+    assert catalog_routes.impact_reports == [impact] and impact.status == "running"
+
+
+def _reprice(old, new, projects):
+    index = ProjectMachineIndex()
+    impact = catalog_routes._analyze_catalog_change(old, new, projects, {}, index)
+    inputs = {name: (projects[name], None, index.get(name).machine_ids) for name in impact.affected}
+    for outcome, _ in catalog_routes._reprice_impacted(impact, inputs, old, new).values():
+        impact.projects.append(outcome)
+    return impact
+
+
+def _cheapest(catalog, project):
+    calc_kwargs = tco_inputs(project, default_tco_request(project))
+    relevant = filter_machines_for_project(
+        catalog.machines, project, operation_hours_per_day=calc_kwargs["operation_hours_per_day"]
+    )
+    return machine_id(rank_machines(relevant, 1, **calc_kwargs)[0][0]) if relevant else None
+
+
+def test_cheapest_machine_flip_is_reported(catalog, projects):
+    wine = _name(projects, "Wine")
+    cheapest = _cheapest(catalog, projects[wine])
+    cheapest_anywhere = {_cheapest(catalog, p) for p in projects.values()}
+    runner_up = next(key for key in _index(catalog, projects).get(wine).machine_ids if key not in cheapest_anywhere)
+
+    # Pricier runner-up: every affected project keeps its cheapest machine
+    kept = _reprice(catalog, _edit(catalog, catalog.version + 1, change={runner_up: {"list_price": 1e9}}), projects)
+    assert wine in kept.affected and kept.flipped == []
+    assert all(p.before == p.after and p.after_total == pytest.approx(p.before_total) for p in kept.projects)
+
+    # Pricier cheapest machine: the projects it was cheapest for flip to another one
+    price = catalog.machine(cheapest).list_price
+    flipped = _reprice(catalog, _edit(catalog, catalog.version + 1, change={cheapest: {"list_price": price + 1e9}}), projects)
+    assert wine in flipped.flipped
+    for outcome in flipped.projects:
+        assert outcome.error is None
+        assert outcome.flipped == (outcome.before == cheapest)
+        if outcome.flipped:
+            assert outcome.after != cheapest and outcome.after_total < outcome.before_total + 1e9
+    assert flipped.to_dict()["flipped"] == flipped.flipped
@@ -0,0 +1,87 @@
+"""Job queue: results, errors, CPU and wall-clock limits, cancelling and expiry."""
+
+import os
+import time
+
+import pytest
+
+from src.calculation_engine.jobs import CANCELLED, FAILED, FINISHED, QUEUED, RUNNING, SUCCEEDED, JobManager, report_progress
+
+
+def run(kind, payload):
+    """Runner of the test managers (imported by name in the workers)."""
+    if kind == "echo":
+        report_progress(0.5)
+        return {"echo": payload}
+    if kind == "fail":
+        raise ValueError("bad input")
+    if kind == "sleep":
+        time.sleep(payload)
+        return {}
+    if kind == "spin":
+        while True:
+            pass
+    raise ValueError(f"unknown kind {kind}")
+
+
+@pytest.fixture()
+def manager(tmp_path):
+    return JobManager(str(tmp_path / "jobs"), runner=f"{__name__}:run", max_workers=1, poll_interval=0.05)
+
+
+def _wait(manager, job_id, statuses=FINISHED, limit=30.0):
+    deadline = time.time() + limit
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job is None or job.status in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {manager.get(job_id).status}")
+
+
+def test_result(manager):
+    job = manager.submit("echo", {"x": [1, 2]})
+    job = _wait(manager, job.job_id)
+    assert job.status == SUCCEEDED and job.progress == 1.0
+    assert manager.result(job.job_id) == {"echo": {"x": [1, 2]}}
+
+
+def test_error(manager):
+    job = _wait(manager, manager.submit("fail").job_id)
+    assert job.status == FAILED and job.error == "bad input"
+    assert manager.result(job.job_id) is None
+
+
+def test_cpu_limit(manager):
+    job = _wait(manager, manager.submit("spin", cpu_seconds=1).job_id)
+    assert job.status == FAILED and job.error == "CPU limit of 1 s exceeded"
+
+
+def test_wall_clock_limit(manager):
+    job = _wait(manager, manager.submit("sleep", 30, timeout_seconds=0.5).job_id)
+    assert job.status == FAILED and job.error == "Time limit of 0.5 s exceeded"
+
+
+def test_cancel_running_and_queued(manager):
+    running = manager.submit("sleep", 30)
+    queued = manager.submit("sleep", 30)
+    _wait(manager, running.job_id, statuses=(RUNNING,))
+    assert manager.get(queued.job_id).status == QUEUED
+
+    assert manager.delete(queued.job_id).status == CANCELLED
+    assert manager.delete(running.job_id).status == CANCELLED
+    assert manager.get(running.job_id).status == CANCELLED
+
+    # Deleting a finished job removes it with its directory
+    manager.delete(running.job_id)
+    assert manager.get(running.job_id) is None
+    assert not os.path.exists(os.path.join(manager.jobs_dir, running.job_id))
+
+
+def test_finished_jobs_expire(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), runner=f"{__name__}:run", ttl_seconds=0.2, poll_interval=0.05)
+    job = _wait(manager, manager.submit("echo", 1).job_id)
+    assert job.status == SUCCEEDED
+    time.sleep(0.5)
+    assert manager.get(job.job_id) is None
+    assert not os.path.exists(os.path.join(manager.jobs_dir, job.job_id))
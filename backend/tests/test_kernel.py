@@ -0,0 +1,117 @@
+"""The vectorized kernel and the closed form against an exact monthly reference."""
+
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from src.calculation_engine.engine import rank_machines
+from src.calculation_engine.kernel import closed_form_total, cost_basis, simulate_batch, stack_bases
+
+PRICES = dict(electricity_eur_per_kwh=0.22, water_eur_per_l=0.0021)
+
+# Whole hours/day on 1..7 workdays: the schedules that land exactly on cleaning boundaries
+WHOLE_HOURS = sorted({d * w * 52 for d in range(1, 25) for w in range(1, 8)})
+
+
+@pytest.fixture(scope="module")
+def machines(catalog):
+    return [m for m in catalog.machines if m.capacity_max_inp > 0]
+
+
+@pytest.fixture(scope="module")
+def sample(machines):
+    return machines[:: max(1, len(machines) // 8)]
+
+
+def _reference(basis, hours_per_year, months):
+    """
+    Month-by-month cumulative totals with exact (rational) hour counting.
+
+    A cleaning is due each time the scheduled hours reach a multiple of 10 h,
+    a service once 8000 effective hours or 24 months have passed since the last.
+    """
+    h = Fraction(hours_per_year) / 12
+    downtime = min(h, 2)
+    eur_per_hour = basis.power_kw * PRICES["electricity_eur_per_kwh"] + basis.water_l_s * 3600.0 * PRICES["water_eur_per_l"]
+    cum, total = [basis.upfront], basis.upfront
+    scheduled, cycles, since_service, last_service = Fraction(0), 0, Fraction(0), 0
+    for month in range(1, months + 1):
+        scheduled += h
+        new_cycles = int(scheduled // 10) - cycles
+        cycles += new_cycles
+        effective = h - downtime * new_cycles
+        since_service += effective
+        total += new_cycles * basis.cleaning_cost_per_cycle + float(effective) * eur_per_hour
+        if since_service >= 8000 or month - last_service == 24:
+            total += basis.service_cost
+            since_service, last_service = Fraction(0), month
+        cum.append(total)
+    return cum
+
+
+@pytest.mark.parametrize("years", [1, 5, 20])
+def test_batch_matches_reference(sample, years):
+    for machine in sample:
+        basis = cost_basis(machine)
+        series = simulate_batch(basis, WHOLE_HOURS, months=years * 12, **PRICES)
+        for i, hours in enumerate(WHOLE_HOURS):
+            np.testing.assert_allclose(series.cum_total[i], _reference(basis, hours, years * 12), rtol=1e-9)
+
+
+def test_stacked_bases_run_one_machine_per_scenario(machines):
+    hours = [WHOLE_HOURS[i % len(WHOLE_HOURS)] for i in range(len(machines))]
+    stacked = simulate_batch(stack_bases(cost_basis(m) for m in machines), hours, months=120, **PRICES)
+    for i, machine in enumerate(machines):
+        single = simulate_batch(cost_basis(machine), [hours[i]], months=120, **PRICES)
+        np.testing.assert_allclose(stacked.cum_total[i], single.cum_total[0], rtol=1e-12)
+
+
+@pytest.mark.parametrize("years", [1, 5, 20])
+def test_closed_form_total_matches_reference(sample, years):
+    for machine in sample:
+        basis = cost_basis(machine)
+        for hours in WHOLE_HOURS:
+            total = closed_form_total(basis, hours, months=years * 12, **PRICES)
+            assert total == pytest.approx(_reference(basis, hours, years * 12)[-1], rel=1e-9)
+
+
+@pytest.mark.parametrize("years", [1, 5, 10])
+def test_flat_curve_equals_scalar_price(sample, years):
+    elec, water = PRICES["electricity_eur_per_kwh"], PRICES["water_eur_per_l"]
+    for machine in sample:
+        for hours in WHOLE_HOURS:
+            scalar = machine.calculate_toc(years=years, operation_hours_per_year=hours, **PRICES)
+            curve = machine.calculate_toc(
+                years=years, operation_hours_per_year=hours,
+                electricity_eur_per_kwh=[elec] * years, water_eur_per_l=[water] * years,
+            )
+            assert curve.monthly_cum_total == scalar.monthly_cum_total
+            assert (curve.co, curve.cm) == (scalar.co, scalar.cm)
+
+
+def test_flat_curve_equals_scalar_price_at_cleaning_boundary(catalog):
+    # 2600 h/year = 10 h/day on 5 days x 52 weeks: every third month ends exactly on a cleaning
+    machine = next(m for m in catalog.machines if m.langtyp.startswith("GFA 200-30-820"))
+    scalar = machine.calculate_toc(years=5, operation_hours_per_year=2600, electricity_eur_per_kwh=0.156)
+    curve = machine.calculate_toc(years=5, operation_hours_per_year=2600, electricity_eur_per_kwh=[0.156] * 5)
+    assert curve.total == scalar.total
+
+
+@pytest.mark.parametrize("years", [1, 5, 10])
+def test_lazy_total_matches_materialized_series(sample, years):
+    # Closed form vs running sum: equal up to summation rounding, never a cleaning cycle apart
+    for machine in sample:
+        for hours in WHOLE_HOURS:
+            lazy = machine.calculate_toc(years=years, operation_hours_per_year=hours, lazy=True, **PRICES)
+            tco = machine.calculate_toc(years=years, operation_hours_per_year=hours, **PRICES)
+            assert lazy.total == pytest.approx(tco.monthly_cum_total[-1], rel=1e-12)
+            assert lazy.monthly_cum_total == pytest.approx(tco.monthly_cum_total, rel=1e-12)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_rank_machines_matches_full_ranking(machines, lazy):
+    for hours in (2080.0, 2600.0, 4160.0):
+        ranked = rank_machines(machines, 5, years=5, operation_hours_per_year=hours, lazy=lazy, **PRICES)
+        totals = sorted(m.calculate_toc(years=5, operation_hours_per_year=hours, **PRICES).total for m in machines)
+        assert [tco.total for _, tco in ranked] == pytest.approx(totals[:5], rel=1e-12)
@@ -0,0 +1,74 @@
+"""Magic Fill batch runner with the offline provider."""
+
+import asyncio
+
+import pytest
+
+from src.calculation_engine.magic import ExtractionCache, MagicProvider, StubProvider, run_batch
+from src.routes.magic_fill import _coerce_parsed, _magic_plan
+
+FORM = "Company: Alpine Tea AG\nEmail: s.keller@alpine-tea.ch\nContact: Sarah Keller\nLaufzeit: 10"
+LETTER = "Hello, we bottle iced tea near Zurich and need a separator for our new line, IP55 please."
+
+
+def _run(texts, provider, **kwargs):
+    async def collect():
+        return [item async for item in run_batch(texts, _magic_plan, _coerce_parsed, provider, base_delay=0, **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_provider_must_implement_extract():
+    with pytest.raises(TypeError):
+        MagicProvider()
+
+
+def test_duplicates_are_extracted_once():
+    provider = StubProvider({"years": 10, "company_name": "Wrong AG"})
+    results = _run([FORM, FORM + "\r\n", "  " + FORM], provider)
+    assert len(results) == 1
+    indices, result = results[0]
+    assert indices == [0, 1, 2]
+    assert provider.calls == [(FORM, ["years"])]
+    # Local values win, the model only fills the requested field
+    assert result.parsed["company_name"] == "Alpine Tea AG"
+    assert result.parsed["years"] == 10
+    assert result.source == "model"
+
+
+def test_cache_answers_repeated_texts():
+    provider = StubProvider({"years": 10})
+    cache = ExtractionCache()
+    _run([FORM], provider, cache=cache)
+    results = _run([FORM], provider, cache=cache)
+    assert len(provider.calls) == 1
+    assert results[0][1].source == "cache"
+    assert results[0][1].parsed["years"] == 10
+
+
+def test_texts_without_open_fields_skip_the_provider():
+    provider = StubProvider()
+    results = _run(["Email: a@b.de\nTel: +49 1234 5678"], provider)
+    assert provider.calls == []
+    assert results[0][1].source == "local"
+
+
+def test_transient_failures_are_retried():
+    provider = StubProvider({"years": 10}, transient_failures=2)
+    results = _run([FORM], provider, attempts=4)
+    result = results[0][1]
+    assert result.error is None
+    assert result.attempts == 3
+    assert result.parsed["years"] == 10
+
+
+def test_giving_up_does_not_stop_the_batch():
+    provider = StubProvider({"years": 10}, transient_failures=2)
+    results = dict((tuple(i), r) for i, r in _run([FORM, LETTER], provider, attempts=2, concurrency=1))
+    failed = [r for r in results.values() if r.error]
+    assert len(failed) == 1
+    assert failed[0].error.startswith("Gave up after 2 attempts")
+    assert len(provider.calls) == 3
+    # The cache only keeps answers
+    cache = ExtractionCache()
+    _run([FORM], StubProvider(transient_failures=5), attempts=2, cache=cache)
+    assert len(cache) == 0
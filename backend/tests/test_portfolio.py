@@ -0,0 +1,42 @@
+"""Bulk TCO: agreement with the per-project TCO endpoint, and the lazily started shared pool."""
+
+import dataclasses
+
+import pytest
+
+from src.calculation_engine import portfolio
+from src.calculation_engine.portfolio import configure_pool, portfolio_tco, shutdown_pool
+from src.routes.calculation_routes import _calculate_project_tco, default_tco_request
+
+
+@pytest.mark.parametrize("workdays", [5, 6])
+def test_winner_matches_project_tco(catalog, demo_projects, workdays):
+    projects = [dataclasses.replace(project, workdays_per_week=workdays) for project in demo_projects]
+    result = portfolio_tco(projects, catalog.machines, max_workers=1)
+    for project, entry in zip(projects, result.entries):
+        response = _calculate_project_tco(project, default_tco_request(project), catalog)
+        totals = [r["monthly_cum_total"][-1] for r in response.tco_results]
+        if not totals:
+            assert entry.winner is None
+            continue
+        assert entry.relevant_machines == len(totals)
+        assert entry.winner["total"] == pytest.approx(min(totals), rel=1e-12)
+
+
+def test_shared_pool_starts_on_first_use(catalog, demo_projects):
+    many = [
+        dataclasses.replace(project, project_name=f"{project.project_name} {i}")
+        for i in range(5) for project in demo_projects
+    ]
+    configure_pool(2)
+    try:
+        assert portfolio._pool is None
+        portfolio_tco(demo_projects, catalog.machines)
+        assert portfolio._pool is None              # too few projects for workers
+        pooled = portfolio_tco(many, catalog.machines, chunk_size=2)
+        assert portfolio._pool is not None
+    finally:
+        shutdown_pool()
+    assert portfolio._pool is None
+    inline = portfolio_tco(many, catalog.machines, max_workers=1)
+    assert pooled.to_dict() == inline.to_dict()
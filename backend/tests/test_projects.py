@@ -0,0 +1,79 @@
+"""Project PATCH: staged cache invalidation, optimistic concurrency, and project defaults in /tco."""
+
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("SCENARIO_HISTORY", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from src.routes import state  # noqa: E402
+
+NAME = "Patch Test Project"
+URL = f"/api/calculation/projects/{NAME}"
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        project = client.get("/api/calculation/projects/NoveWine Project 2026").json()["project"]
+        response = client.post("/api/calculation/projects", json={**project, "project_name": NAME})
+        assert response.status_code == 200
+        yield client
+
+
+def _settle():
+    deadline = time.time() + 10.0
+    while state.warm_tasks and time.time() < deadline:
+        time.sleep(0.02)
+    assert not state.warm_tasks
+
+
+def _version(client):
+    return client.get(URL).json()["version"]
+
+
+def test_contact_edit_schedules_no_precompute(client):
+    _settle()
+    warm = state.warm_tco.get(NAME)
+    response = client.patch(URL, json={"email": "someone@example.com"})
+    assert response.status_code == 200
+    assert response.json()["invalidated"] == "none"
+    assert NAME not in state.warm_tasks
+    assert state.warm_tco.get(NAME) is warm
+
+
+def test_pricing_edit_keeps_the_filter_stage(client):
+    _settle()
+    assert client.post(f"{URL}/tco", json={}).status_code == 200
+    warm = state.warm_filter[NAME]
+    response = client.patch(URL, json={"energy_price_eur_per_kwh": 0.31})
+    assert response.status_code == 200
+    assert response.json()["invalidated"] == "pricing"
+    assert state.warm_filter[NAME] is warm
+    catalog = state.machine_catalog()
+    assert state.cached_relevant(NAME, catalog, warm.operation_hours_per_day) is warm.relevant
+    _settle()
+
+
+def test_stale_expected_version_is_rejected(client):
+    version = _version(client)
+    response = client.patch(URL, json={"weight_kg": 123456.0, "expected_version": version - 1})
+    assert response.status_code == 409
+    assert client.get(URL).json()["project"]["weight_kg"] != 123456.0
+    assert _version(client) == version
+    assert client.patch(URL, json={"years": 7, "expected_version": version}).status_code == 200
+    _settle()
+
+
+def test_tco_defaults_to_the_project_workdays(client):
+    assert client.patch(URL, json={"workdays_per_week": 6}).status_code == 200
+    default = client.post(f"{URL}/tco", json={"years": 3}).json()["tco_results"]
+    six = client.post(f"{URL}/tco", json={"years": 3, "workdays_per_week": 6}).json()["tco_results"]
+    five = client.post(f"{URL}/tco", json={"years": 3, "workdays_per_week": 5}).json()["tco_results"]
+    assert [r["monthly_cum_total"][-1] for r in default] == [r["monthly_cum_total"][-1] for r in six]
+    assert [r["monthly_cum_total"][-1] for r in default] != [r["monthly_cum_total"][-1] for r in five]
+    _settle()
@@ -0,0 +1,132 @@
+"""Shared catalog: publishing and attaching, the seqlock pointer, stale segments and rejected CSVs."""
+
+import csv
+import importlib
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+from src.calculation_engine.shared_catalog import SharedCatalog
+
+# The package re-exports the ``shared_catalog`` function under the module's name
+shared = importlib.import_module("src.calculation_engine.shared_catalog")
+
+CSV = os.path.join(os.path.dirname(__file__), "..", "src", "calculation_engine", "machines.csv")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "machines.csv"
+    shutil.copy(CSV, path)
+    return path
+
+
+def _store(csv_path):
+    return SharedCatalog(str(csv_path), directory=str(csv_path.parent), name="test_catalog")
+
+
+def _add_row(path, suffix):
+    """Append a copy of the first machine; without a suffix it duplicates that machine's id."""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    row = list(rows[1])
+    row[rows[0].index("SEP_SQLLangtyp")] += suffix
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(row)
+
+
+def _segments(csv_path):
+    return sorted(p.name for p in csv_path.parent.glob("test_catalog.v*"))
+
+
+def test_second_process_attaches_published_version(csv_path, catalog):
+    first = _store(csv_path).catalog()
+    second = _store(csv_path).catalog()           # a new store, as in another worker: maps, doesn't build
+    assert first.version == second.version == 1
+    assert _segments(csv_path) == ["test_catalog.v1"]
+    assert second.machines == first.machines == catalog.machines
+    assert second.dominated_by == first.dominated_by == catalog.dominated_by
+    for name in shared.BASIS_COLUMNS:
+        column = getattr(second.bases, name)
+        np.testing.assert_array_equal(column, getattr(catalog.bases, name))
+        assert not column.flags.writeable        # a view of the read-only mapping, not a copy
+
+
+def test_changed_csv_becomes_next_version(csv_path):
+    writer, reader = _store(csv_path), _store(csv_path)
+    old = reader.catalog()
+    _add_row(csv_path, " X")
+    assert writer.catalog().version == 2
+    new = reader.catalog()
+    assert new.version == 2 and len(new.machines) == len(old.machines) + 1
+    assert _segments(csv_path) == ["test_catalog.v2"]
+    # The unlinked segment stays readable for requests still holding the old catalog
+    assert old.bases.upfront.sum() > 0 and old.machines[0].langtyp
+
+
+def test_pointer_reads_wait_for_even_sequence(csv_path):
+    store = _store(csv_path)
+    store.catalog()
+    pointer = store._open_pointer()
+    sequence = shared._SEQUENCE.unpack_from(pointer)[0]
+    assert sequence % 2 == 0
+
+    shared._SEQUENCE.pack_into(pointer, 0, sequence + 1)     # a writer in the middle of an update
+    read = []
+    reader = threading.Thread(target=lambda: read.append(_store(csv_path)._read_pointer()), daemon=True)
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive() and not read
+
+    shared._SEQUENCE.pack_into(pointer, 0, sequence + 2)
+    reader.join(5.0)
+    assert read[0][0] == 1
+
+    store._write_pointer(7, (11, 13))
+    assert shared._SEQUENCE.unpack_from(pointer)[0] == sequence + 4
+    assert store._read_pointer() == (7, (11, 13))
+
+
+def test_segment_with_other_layout_is_rebuilt(csv_path):
+    _store(csv_path).catalog()
+    with open(csv_path.parent / "test_catalog.v1", "r+b") as f:
+        magic, layout, version, rows, text_bytes = shared._HEADER.unpack(f.read(shared._HEADER.size))
+        f.seek(0)
+        f.write(shared._HEADER.pack(magic, layout ^ 1, version, rows, text_bytes))
+
+    with pytest.raises(shared._StaleSegment):
+        shared._map_segment(str(csv_path.parent / "test_catalog.v1"), 1)
+    rebuilt = _store(csv_path).catalog()
+    assert rebuilt.version == 2 and rebuilt.machines
+    assert _segments(csv_path) == ["test_catalog.v2"]
+
+
+def test_invalid_csv_keeps_current_version(csv_path, monkeypatch):
+    store = _store(csv_path)
+    current = store.catalog()
+    _add_row(csv_path, "")
+
+    assert store.catalog() is current
+    assert "duplicate machine" in store.last_error
+    assert store.status()["version"] == 1 and store.status()["last_error"] == store.last_error
+
+    # The rejected file is not parsed again until it changes
+    parsed = []
+    load = shared.load_machines_from_csv
+    monkeypatch.setattr(shared, "load_machines_from_csv", lambda path: parsed.append(path) or load(path))
+    assert store.catalog() is current and not parsed
+
+    shutil.copy(CSV, csv_path)
+    _add_row(csv_path, " X")
+    assert store.catalog().version == 2 and parsed
+    assert store.last_error is None
+
+
+def test_invalid_csv_without_version_raises(csv_path):
+    _add_row(csv_path, "")
+    with pytest.raises(ValueError, match="duplicate machine"):
+        _store(csv_path).catalog()
+    assert _segments(csv_path) == []
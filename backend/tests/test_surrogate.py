@@ -0,0 +1,26 @@
+"""Surrogate totals stay within their error bound of the exact TCO."""
+
+import numpy as np
+import pytest
+
+from src.calculation_engine.kernel import cost_basis
+from src.calculation_engine.surrogate import build_grid
+
+PRICES = dict(electricity_eur_per_kwh=0.25, water_eur_per_l=0.002)
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return build_grid(max_years=10)
+
+
+@pytest.mark.parametrize("years", [1, 3, 10])
+def test_error_bound_holds(catalog, grid, years):
+    hours = np.concatenate([
+        np.random.default_rng(years).uniform(grid.hours[0], grid.hours[-1], 100),
+        [d * w * 52.0 for d in range(1, 25) for w in range(1, 8)],
+    ])
+    for machine in [m for m in catalog.machines if m.capacity_max_inp > 0][::4]:
+        approx = grid.evaluate(cost_basis(machine), hours, years=years, **PRICES)
+        exact = [machine.calculate_toc(years=years, operation_hours_per_year=h, **PRICES).total for h in hours]
+        assert np.all(np.abs(approx.total - exact) <= approx.error_bound)
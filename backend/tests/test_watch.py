@@ -0,0 +1,64 @@
+"""File watcher: changes made before the watcher thread runs are still reported."""
+
+import csv
+import os
+import shutil
+import threading
+
+from src.calculation_engine.shared_catalog import SharedCatalog
+from src.calculation_engine.watch import FileWatcher
+
+CSV = os.path.join(os.path.dirname(__file__), "..", "src", "calculation_engine", "machines.csv")
+
+
+def _append_row(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    # Same machine under a new type designation: a valid, bigger catalog
+    row = list(rows[1])
+    row[rows[0].index("SEP_SQLLangtyp")] += " X"
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(row)
+
+
+def test_change_before_start_is_reported(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a")
+    changed = threading.Event()
+    watcher = FileWatcher(str(path), changed.set, interval=0.05, debounce=0.05, use_inotify=False)
+    path.write_text("bb")                   # before the thread even exists
+    watcher.start()
+    try:
+        assert changed.wait(5.0)
+    finally:
+        watcher.stop()
+
+
+def test_baseline_from_caller(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a")
+    changed = threading.Event()
+    watcher = FileWatcher(str(path), changed.set, interval=0.05, debounce=0.05, use_inotify=False, baseline=(0, 0))
+    watcher.start()
+    try:
+        assert changed.wait(5.0)
+    finally:
+        watcher.stop()
+
+
+def test_shared_catalog_reloads_change_made_before_watch(tmp_path):
+    path = tmp_path / "machines.csv"
+    shutil.copy(CSV, path)
+    store = SharedCatalog(str(path), directory=str(tmp_path))
+    before = store.catalog()
+
+    _append_row(path)
+    reloaded = threading.Event()
+    watcher = store.watch(interval=0.05, debounce=0.05, listener=lambda version, error: reloaded.set())
+    try:
+        assert reloaded.wait(5.0)
+        after = store.catalog()
+        assert after.version == before.version + 1
+        assert len(after.machines) == len(before.machines) + 1
+    finally:
+        watcher.stop()